@@ -0,0 +1,43 @@
+"""add run listing indexes
+
+Revision ID: k5678l9012m3_add_run_listing_indexes
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'k5678l9012m3_add_run_listing_indexes'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large run tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        # Per-project listing: WHERE project_id IN (...) AND deleted_at IS NULL ORDER BY created_at DESC
+        op.create_index(
+            'ix_run_project_deleted_created',
+            'run',
+            ['project_id', 'deleted_at', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        # Status filters and the admin run list: WHERE status = ... ORDER BY created_at DESC
+        op.create_index(
+            'ix_run_status_created',
+            'run',
+            ['status', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_run_status_created', table_name='run', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_run_project_deleted_created', table_name='run', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,70 @@
+"""add admin stats materialized views
+
+Revision ID: l6789m0123n4_add_admin_stats_views
+Revises: k5678l9012m3_add_run_listing_indexes
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'l6789m0123n4_add_admin_stats_views'
+down_revision = 'k5678l9012m3_add_run_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Platform totals for the admin dashboard (one row)
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS admin_stats_totals AS
+        SELECT
+            1 AS id,
+            (SELECT count(*) FROM app_user) AS total_users,
+            (SELECT count(*) FROM project) AS total_projects,
+            (SELECT count(*) FROM run) AS total_runs,
+            (SELECT count(*) FROM artifact) AS total_artifacts,
+            now() AS refreshed_at
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_admin_stats_totals_id ON admin_stats_totals (id)")
+
+    # Hourly run throughput over the last 30 days
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS run_stats_hourly AS
+        SELECT
+            date_trunc('hour', created_at) AS bucket,
+            count(*) AS runs_created,
+            count(*) FILTER (WHERE status = 'SUCCEEDED') AS succeeded,
+            count(*) FILTER (WHERE status = 'FAILED') AS failed,
+            count(*) FILTER (WHERE status = 'CANCELED') AS canceled,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM started_at - created_at))
+                FILTER (WHERE started_at IS NOT NULL) AS median_queue_wait_seconds,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM finished_at - started_at))
+                FILTER (WHERE status = 'SUCCEEDED' AND started_at IS NOT NULL AND finished_at IS NOT NULL) AS median_jmp_seconds,
+            coalesce(sum(image_count) FILTER (WHERE status = 'SUCCEEDED'), 0) AS images
+        FROM run
+        WHERE created_at >= now() - interval '30 days'
+        GROUP BY 1
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_run_stats_hourly_bucket ON run_stats_hourly (bucket)")
+
+    # Per-project run aggregates for /admin/projects
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS project_run_stats AS
+        SELECT
+            project_id,
+            count(*) AS run_count,
+            count(*) FILTER (WHERE status = 'SUCCEEDED') AS succeeded,
+            count(*) FILTER (WHERE status = 'FAILED') AS failed,
+            max(created_at) AS last_run_at
+        FROM run
+        WHERE project_id IS NOT NULL
+        GROUP BY project_id
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_project_run_stats_project ON project_run_stats (project_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS project_run_stats")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS run_stats_hourly")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS admin_stats_totals")
@@ -0,0 +1,24 @@
+"""add run file manifest
+
+Revision ID: m7890n1234o5_add_run_file_manifest
+Revises: l6789m0123n4_add_admin_stats_views
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'm7890n1234o5_add_run_file_manifest'
+down_revision = 'l6789m0123n4_add_admin_stats_views'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Files of the finished task folder (see app/services/run_files.py)
+    op.add_column('run', sa.Column('file_manifest', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('run', 'file_manifest')
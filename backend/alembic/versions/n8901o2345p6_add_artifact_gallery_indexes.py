@@ -0,0 +1,44 @@
+"""add artifact gallery indexes
+
+Revision ID: n8901o2345p6_add_artifact_gallery_indexes
+Revises: m7890n1234o5_add_run_file_manifest
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'n8901o2345p6_add_artifact_gallery_indexes'
+down_revision = 'm7890n1234o5_add_run_file_manifest'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Artifacts of a run: WHERE run_id = ...
+        op.create_index(
+            'ix_artifact_run_id',
+            'artifact',
+            ['run_id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        # Live comments of an artifact, newest first (counts and latest comment)
+        op.create_index(
+            'ix_artifact_comment_artifact_live',
+            'artifact_comment',
+            ['artifact_id', 'created_at'],
+            unique=False,
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artifact_comment_artifact_live', table_name='artifact_comment', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_artifact_run_id', table_name='artifact', postgresql_concurrently=True, if_exists=True)
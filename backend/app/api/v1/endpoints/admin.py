@@ -1,24 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update
+from sqlalchemy import select, update
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
 import uuid
 import json
-import httpx
-import time
-import hmac
-import hashlib
-import base64
-import urllib.parse
-
-from app.core.database import get_db
+import logging
+
+from app.core.database import get_db, get_read_db, all_engines, ENGINE_PROFILE
+from app.core.db_metrics import query_stats
 from app.core.auth import get_current_user, get_password_hash
-from app.models import AppUser, Project, Run, Artifact, AuditLog, ProjectMember, AppSetting, NotificationType, ScheduledNotification
+from app.core.access import invalidate_user
+from app.core.config import settings
+from app.core.pagination import apply_keyset, finish_page
+from app.models import AppUser, Project, Run, RunStatus, AuditLog, ProjectMember, AppSetting, NotificationType, ScheduledNotification
 from app.core.extensions import ExtensionManager
+from app.services import admin_stats
 from app.services.notification_service import NotificationService
+from app.services.webhook_delivery import deliver_webhooks, send_webhook
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class AdminStats(BaseModel):
     total_users: int
@@ -26,6 +29,32 @@ class AdminStats(BaseModel):
     total_runs: int
     total_artifacts: int
     active_runs: int
+    refreshed_at: Optional[str] = None  # when the totals were last materialized
+
+class ThroughputBucket(BaseModel):
+    bucket: str
+    runs_created: int
+    succeeded: int
+    failed: int
+    canceled: int
+    failure_rate: Optional[float] = None
+    median_queue_wait_seconds: Optional[float] = None
+    median_jmp_seconds: Optional[float] = None
+    images: int
+
+class ThroughputSummary(BaseModel):
+    runs: int
+    succeeded: int
+    failed: int
+    failure_rate: Optional[float] = None
+    runs_per_hour: float
+    median_queue_wait_seconds: Optional[float] = None
+    median_jmp_seconds: Optional[float] = None
+
+class ThroughputResponse(BaseModel):
+    hours: int
+    summary: ThroughputSummary
+    buckets: List[ThroughputBucket]
 
 class UserResponse(BaseModel):
     id: str
@@ -44,6 +73,9 @@ class ProjectAdminResponse(BaseModel):
     owner_display_name: Optional[str] = None
     created_at: str
     run_count: int
+    succeeded_runs: int = 0
+    failed_runs: int = 0
+    last_run_at: Optional[str] = None
 
 class RunAdminResponse(BaseModel):
     id: str
@@ -108,32 +140,76 @@ async def get_admin_stats(
     db: AsyncSession = Depends(get_db),
     admin_user: AppUser = Depends(require_admin)
 ):
-    """Get platform statistics."""
-    
-    # Get counts
-    users_count = await db.scalar(select(func.count(AppUser.id)))
-    projects_count = await db.scalar(select(func.count(Project.id)))
-    runs_count = await db.scalar(select(func.count(Run.id)))
-    artifacts_count = await db.scalar(select(func.count(Artifact.id)))
-    
-    # Active runs (running or queued)
-    active_runs_count = await db.scalar(
-        select(func.count(Run.id)).where(
-            Run.status.in_(["running", "queued"])
-        )
-    )
+    """Get platform statistics (materialized totals plus live active runs)."""
+    totals = await admin_stats.get_dashboard_totals(db)
+    refreshed_at = totals.get("refreshed_at")
     
     return AdminStats(
-        total_users=users_count,
-        total_projects=projects_count,
-        total_runs=runs_count,
-        total_artifacts=artifacts_count,
-        active_runs=active_runs_count
+        total_users=totals["total_users"],
+        total_projects=totals["total_projects"],
+        total_runs=totals["total_runs"],
+        total_artifacts=totals["total_artifacts"],
+        active_runs=totals["active_runs"],
+        refreshed_at=refreshed_at.isoformat() if refreshed_at else None
     )
 
+@router.get("/stats/throughput", response_model=ThroughputResponse)
+async def get_run_throughput(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: AppUser = Depends(require_admin)
+):
+    """Hourly run throughput: runs per hour, failure rate, median queue wait and JMP time."""
+    buckets = await admin_stats.get_run_throughput(db, hours)
+    
+    return ThroughputResponse(
+        hours=hours,
+        summary=ThroughputSummary(**admin_stats.summarize_throughput(buckets, hours)),
+        buckets=[
+            ThroughputBucket(**{**bucket, "bucket": bucket["bucket"].isoformat()})
+            for bucket in buckets
+        ]
+    )
+
+@router.post("/stats/refresh")
+async def refresh_admin_stats(
+    db: AsyncSession = Depends(get_db),
+    admin_user: AppUser = Depends(require_admin)
+):
+    """Refresh the materialized statistics now instead of waiting for the periodic refresh."""
+    timings = await admin_stats.refresh_materialized_views(db)
+    return {"message": "Statistics refreshed", "timings": timings}
+
+@router.get("/db-stats")
+async def get_db_stats(
+    limit: int = Query(25, ge=1, le=500),
+    order_by: str = Query("total_ms", pattern="^(total_ms|calls|p50_ms|p99_ms|max_ms|mean_ms)$"),
+    admin_user: AppUser = Depends(require_admin)
+):
+    """Query timings per statement fingerprint (p50/p99) and pool usage of this API process."""
+    pools = []
+    for db_engine in all_engines():
+        pool = db_engine.pool
+        pools.append({
+            "engine": db_engine.url.render_as_string(hide_password=True),
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return {"profile": ENGINE_PROFILE, "pools": pools, **query_stats.snapshot(limit=limit, order_by=order_by)}
+
+@router.post("/db-stats/reset")
+async def reset_db_stats(
+    admin_user: AppUser = Depends(require_admin)
+):
+    """Start a fresh query timing window."""
+    query_stats.reset()
+    return {"message": "Database statistics reset"}
+
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     admin_user: AppUser = Depends(require_admin)
 ):
     """List all users."""
@@ -158,29 +234,25 @@ async def list_projects_admin(
     admin_user: AppUser = Depends(require_admin)
 ):
     """List all projects with admin details."""
+    # Owner and run aggregates (materialized, see app/services/admin_stats.py) in one query
+    stats = admin_stats.project_run_stats
     result = await db.execute(
-        select(Project).order_by(Project.created_at.desc())
+        select(
+            Project,
+            AppUser.email,
+            AppUser.display_name,
+            stats.c.run_count,
+            stats.c.succeeded,
+            stats.c.failed,
+            stats.c.last_run_at
+        )
+        .outerjoin(AppUser, AppUser.id == Project.owner_id)
+        .outerjoin(stats, stats.c.project_id == Project.id)
+        .order_by(Project.created_at.desc())
     )
     
     projects = []
-    for project in result.scalars().all():
-        # Get run count
-        run_count = await db.scalar(
-            select(func.count(Run.id)).where(Run.project_id == project.id)
-        )
-        
-        # Get owner details
-        owner_email = None
-        owner_display_name = None
-        if project.owner_id:
-            owner_result = await db.execute(
-                select(AppUser).where(AppUser.id == project.owner_id)
-            )
-            owner = owner_result.scalar_one_or_none()
-            if owner:
-                owner_email = owner.email
-                owner_display_name = owner.display_name
-        
+    for project, owner_email, owner_display_name, run_count, succeeded, failed, last_run_at in result.all():
         projects.append(ProjectAdminResponse(
             id=str(project.id),
             name=project.name,
@@ -189,60 +261,64 @@ async def list_projects_admin(
             owner_email=owner_email,
             owner_display_name=owner_display_name,
             created_at=project.created_at.isoformat(),
-            run_count=run_count or 0
+            run_count=run_count or 0,
+            succeeded_runs=succeeded or 0,
+            failed_runs=failed or 0,
+            last_run_at=last_run_at.isoformat() if last_run_at else None
         ))
     
     return projects
 
 @router.get("/runs", response_model=List[RunAdminResponse])
 async def list_runs_admin(
+    response: Response,
+    limit: int = Query(settings.RUN_LIST_DEFAULT_LIMIT, ge=1, le=settings.RUN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    status_filter: Optional[RunStatus] = Query(None, alias="status"),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
     db: AsyncSession = Depends(get_db),
     admin_user: AppUser = Depends(require_admin)
 ):
-    """List all runs with admin details."""
-    result = await db.execute(
-        select(Run).order_by(Run.created_at.desc())
+    """List runs with admin details (project and owner joined in one query), cursor-paginated."""
+    query = (
+        select(
+            Run.id, Run.project_id, Run.status, Run.task_name, Run.message, Run.image_count,
+            Run.created_at, Run.started_at, Run.finished_at,
+            Project.name.label("project_name"),
+            AppUser.email.label("owner_email"),
+            AppUser.display_name.label("owner_display_name")
+        )
+        .outerjoin(Project, Project.id == Run.project_id)
+        .outerjoin(AppUser, AppUser.id == Project.owner_id)
     )
+    if status_filter is not None:
+        query = query.where(Run.status == status_filter)
+    if created_after is not None:
+        query = query.where(Run.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(Run.created_at < created_before)
     
-    runs = []
-    for run in result.scalars().all():
-        # Get project name and owner information
-        project_name = None
-        project_owner_email = None
-        project_owner_display_name = None
-        if run.project_id:
-            project_result = await db.execute(
-                select(Project).where(Project.id == run.project_id)
-            )
-            project = project_result.scalar_one_or_none()
-            if project:
-                project_name = project.name
-                # Get owner details
-                if project.owner_id:
-                    owner_result = await db.execute(
-                        select(AppUser).where(AppUser.id == project.owner_id)
-                    )
-                    owner = owner_result.scalar_one_or_none()
-                    if owner:
-                        project_owner_email = owner.email
-                        project_owner_display_name = owner.display_name
-        
-        runs.append(RunAdminResponse(
-            id=str(run.id),
-            project_id=str(run.project_id),
-            project_name=project_name,
-            project_owner_email=project_owner_email,
-            project_owner_display_name=project_owner_display_name,
-            status=run.status.value,
-            task_name=run.task_name,
-            message=run.message,
-            image_count=run.image_count,
-            created_at=run.created_at.isoformat(),
-            started_at=run.started_at.isoformat() if run.started_at else None,
-            finished_at=run.finished_at.isoformat() if run.finished_at else None
-        ))
+    result = await db.execute(apply_keyset(query, Run.created_at, Run.id, cursor, limit))
+    rows = finish_page(result.all(), limit, response)
     
-    return runs
+    return [
+        RunAdminResponse(
+            id=str(row.id),
+            project_id=str(row.project_id),
+            project_name=row.project_name,
+            project_owner_email=row.owner_email,
+            project_owner_display_name=row.owner_display_name,
+            status=row.status.value,
+            task_name=row.task_name,
+            message=row.message,
+            image_count=row.image_count or 0,
+            created_at=row.created_at.isoformat(),
+            started_at=row.started_at.isoformat() if row.started_at else None,
+            finished_at=row.finished_at.isoformat() if row.finished_at else None
+        )
+        for row in rows
+    ]
 
 class PasswordResetRequest(BaseModel):
     user_id: str
@@ -330,6 +406,7 @@ async def delete_user(
     # Delete user (cascade will handle related data)
     await db.delete(user)
     await db.commit()
+    await invalidate_user(user_uuid)
     
     # Log the action
     audit_log = AuditLog(
@@ -1039,91 +1116,9 @@ class WebhookResponse(BaseModel):
 class WebhookListResponse(BaseModel):
     webhooks: List[WebhookResponse]
 
-def get_dingtalk_sign_and_timestamp(secret: str) -> tuple:
-    """
-    Generate DingTalk webhook signature and timestamp.
-    
-    DingTalk signing process:
-    1. Use timestamp and secret as signature string (timestamp\nsecret)
-    2. Calculate signature using HmacSHA256 algorithm
-    3. Base64 encode the signature
-    4. URL encode the signature (using UTF-8 charset)
-    
-    This matches the exact implementation from DingTalk documentation.
-    """
-    timestamp = str(round(time.time() * 1000))
-    # Step 1: Create signature string: timestamp\nsecret
-    string_to_sign = f"{timestamp}\n{secret}"
-    
-    # Step 2: Calculate HMAC-SHA256 signature
-    hmac_code = hmac.new(
-        secret.encode('utf-8'),
-        string_to_sign.encode('utf-8'),
-        digestmod=hashlib.sha256
-    ).digest()
-    
-    # Step 3: Base64 encode (returns bytes)
-    # Step 4: URL encode - quote_plus can accept bytes directly
-    # This exactly matches: urllib.parse.quote_plus(base64.b64encode(hmac_code))
-    sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))
-    
-    return sign, timestamp
-
 async def send_to_webhook(webhook_url: str, title: str, message: str, secret: Optional[str] = None) -> dict:
     """Send message to a webhook (DingTalk format with optional signing). Returns response info."""
-    try:
-        # DingTalk webhook format
-        payload = {
-            "msgtype": "text",
-            "text": {
-                "content": f"{title}\n\n{message}"
-            },
-            "at": {
-                "isAtAll": False
-            }
-        }
-        
-        # If secret is provided, add signature and timestamp to URL
-        final_url = webhook_url
-        if secret:
-            sign, timestamp = get_dingtalk_sign_and_timestamp(secret)
-            # Add timestamp and sign parameters to the URL
-            # Use simple string concatenation to match DingTalk's expected format
-            # Format: original_url&timestamp=xxx&sign=xxx
-            separator = '&' if '?' in webhook_url else '?'
-            final_url = f"{webhook_url}{separator}timestamp={timestamp}&sign={sign}"
-        
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(final_url, json=payload, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
-            
-            # Get response data
-            try:
-                response_data = response.json()
-            except:
-                response_data = {"text": response.text, "status_code": response.status_code}
-            
-            return {
-                "success": True,
-                "status_code": response.status_code,
-                "response": response_data,
-                "url": webhook_url
-            }
-    except Exception as e:
-        error_info = {
-            "success": False,
-            "error": str(e),
-            "url": webhook_url
-        }
-        # Try to get response if available
-        if hasattr(e, 'response') and e.response is not None:
-            try:
-                error_info["status_code"] = e.response.status_code
-                error_info["response"] = e.response.json() if e.response.headers.get("content-type", "").startswith("application/json") else e.response.text
-            except:
-                pass
-        print(f"Failed to send to webhook {webhook_url}: {e}")
-        return error_info
+    return await send_webhook(webhook_url, title, message, secret=secret)
 
 async def get_webhooks_from_settings(db: AsyncSession) -> List[dict]:
     """Get all webhooks from AppSetting."""
@@ -1218,42 +1213,28 @@ async def broadcast_announcement(
     admin_user: AppUser = Depends(require_admin)
 ):
     """Broadcast an important announcement to all users and webhooks."""
-    # Get all users
-    result = await db.execute(select(AppUser))
-    users = result.scalars().all()
-    
-    # Create notifications for all users
-    notifications_created = 0
-    enum_error_occurred = False
-    
-    for user in users:
-        try:
-            await NotificationService.create_notification(
-                db=db,
-                user_id=user.id,
-                notification_type=NotificationType.ANNOUNCEMENT,
-                title=request.title,
-                message=request.message
+    # Create notifications for all users in bulk
+    try:
+        notifications_created = await NotificationService.create_notifications_for_all_users(
+            db=db,
+            notification_type=NotificationType.ANNOUNCEMENT,
+            title=request.title,
+            message=request.message
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        error_str = str(e)
+        # Check if it's an enum error
+        if "ANNOUNCEMENT" in error_str or "invalid input value for enum" in error_str or "InvalidTextRepresentationError" in error_str:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="ANNOUNCEMENT enum value not found in database. Please run: alembic upgrade head, or execute the SQL in backend/add_announcement_enum.sql"
             )
-            notifications_created += 1
-        except Exception as e:
-            error_str = str(e)
-            # Check if it's an enum error
-            if "ANNOUNCEMENT" in error_str or "invalid input value for enum" in error_str or "InvalidTextRepresentationError" in error_str:
-                await db.rollback()
-                enum_error_occurred = True
-                break  # Stop trying - all will fail with same error
-            else:
-                # For other errors, rollback and continue with next user
-                await db.rollback()
-                print(f"Failed to create notification for user {user.id}: {e}")
-                continue
-    
-    # If enum error occurred, return helpful error message
-    if enum_error_occurred:
+        logger.error(f"[ANNOUNCEMENT] Failed to create announcement notifications: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="ANNOUNCEMENT enum value not found in database. Please run: alembic upgrade head, or execute the SQL in backend/add_announcement_enum.sql"
+            detail=f"Failed to create notifications: {error_str}"
         )
     
     # Ensure default webhook exists before broadcasting
@@ -1264,13 +1245,8 @@ async def broadcast_announcement(
     webhooks_notified = 0
     webhook_results = []
     
-    for webhook in webhooks:
-        result = await send_to_webhook(
-            webhook["url"], 
-            request.title, 
-            request.message,
-            secret=webhook.get("secret")
-        )
+    results = await deliver_webhooks(webhooks, request.title, request.message)
+    for webhook, result in zip(webhooks, results):
         if result.get("success"):
             webhooks_notified += 1
         
@@ -0,0 +1,197 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from typing import List, Optional
+from pathlib import Path
+import asyncio
+import hmac
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+
+from app.core.config import settings
+from app.core.auth import get_current_user
+from app.core.progress import publish_progress_events
+from app.models import AppUser
+from app.services import jmp_agents
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class AgentRegisterRequest(BaseModel):
+    agent_id: str
+    hostname: str
+    capacity: int = 1
+    platform: Optional[str] = None
+    version: Optional[str] = None
+    fake: bool = False
+
+
+class AgentHeartbeatRequest(BaseModel):
+    running_jobs: List[str] = []
+    busy: int = 0
+
+
+class AgentProgressRequest(BaseModel):
+    agent_id: str
+    message: Optional[str] = None
+    images_done: Optional[int] = None
+
+
+async def verify_agent_token(x_agent_token: Optional[str] = Header(None)):
+    """Authenticate a runner agent with the shared JMP_AGENT_TOKEN."""
+    if not settings.JMP_AGENT_TOKEN:
+        raise HTTPException(status_code=503, detail="Remote JMP agents are not enabled on this server")
+    if not x_agent_token or not hmac.compare_digest(x_agent_token, settings.JMP_AGENT_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid agent token")
+
+
+async def _get_owned_job(job_id: str, agent_id: str) -> dict:
+    job = await jmp_agents.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await jmp_agents.owns_job(job_id, agent_id):
+        raise HTTPException(status_code=409, detail="Job lease lost (reassigned or timed out)")
+    return job
+
+
+@router.post("/register", dependencies=[Depends(verify_agent_token)])
+async def register_agent(request: AgentRegisterRequest):
+    """Register a runner agent and its JMP capacity."""
+    await jmp_agents.register_agent(request.agent_id, request.model_dump(exclude={"agent_id"}))
+    return {
+        "agent_id": request.agent_id,
+        "heartbeat_interval": settings.JMP_AGENT_HEARTBEAT_INTERVAL,
+        "lease_seconds": settings.JMP_AGENT_LEASE_SECONDS
+    }
+
+
+@router.post("/{agent_id}/heartbeat", dependencies=[Depends(verify_agent_token)])
+async def agent_heartbeat(agent_id: str, request: AgentHeartbeatRequest):
+    """Keep an agent alive and renew the leases of its running jobs."""
+    if not await jmp_agents.heartbeat_agent(agent_id, request.running_jobs, request.busy):
+        raise HTTPException(status_code=404, detail="Agent not registered")
+    return {"status": "ok"}
+
+
+@router.post("/{agent_id}/claim", dependencies=[Depends(verify_agent_token)])
+async def claim_job(agent_id: str):
+    """Give the agent its next job (or steal an abandoned one). Returns job=null when idle."""
+    job = await jmp_agents.claim_job(agent_id)
+    if not job:
+        return {"job": None}
+    logger.info(f"[AGENTS] Job {job['spec']['job_id']} claimed by {agent_id} (attempt {job.get('attempts')})")
+    return {"job": job["spec"]}
+
+
+@router.get("/jobs/{job_id}/bundle", dependencies=[Depends(verify_agent_token)])
+async def download_job_bundle(job_id: str, agent_id: str):
+    """Stream a zip with the job's CSV and JSL."""
+    job = await _get_owned_job(job_id, agent_id)
+    spec = job["spec"]
+    job_dir = Path(job["job_dir"])
+
+    def build_bundle() -> str:
+        fd, bundle_path = tempfile.mkstemp(suffix=".zip", prefix=f"job_{job_id}_")
+        os.close(fd)
+        with zipfile.ZipFile(bundle_path, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+            for name in (spec["csv_name"], spec["jsl_name"]):
+                bundle.write(job_dir / name, arcname=name)
+        return bundle_path
+
+    try:
+        bundle_path = await asyncio.to_thread(build_bundle)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=410, detail=f"Job files are gone: {e}")
+
+    return FileResponse(
+        bundle_path,
+        media_type="application/zip",
+        filename=f"job_{job_id}.zip",
+        background=BackgroundTask(os.remove, bundle_path)
+    )
+
+
+@router.post("/jobs/{job_id}/progress", dependencies=[Depends(verify_agent_token)])
+async def report_job_progress(job_id: str, request: AgentProgressRequest):
+    """Forward an agent's progress to the run's progress stream."""
+    job = await _get_owned_job(job_id, request.agent_id)
+    run_id = job["spec"]["run_id"]
+    event = {
+        "type": "run_progress",
+        "run_id": run_id,
+        "status": "running",
+        "message": request.message,
+        "agent_id": request.agent_id,
+    }
+    if request.images_done is not None:
+        event["agent_images_done"] = request.images_done
+    await publish_progress_events(run_id, [event])
+    return {"status": "ok"}
+
+
+@router.post("/jobs/{job_id}/result", dependencies=[Depends(verify_agent_token)])
+async def upload_job_result(
+    job_id: str,
+    agent_id: str = Form(...),
+    status: str = Form(...),
+    error: Optional[str] = Form(None),
+    results: Optional[UploadFile] = File(None)
+):
+    """Receive a finished job: a zip of the rendered PNGs is unpacked into the job folder."""
+    job = await _get_owned_job(job_id, agent_id)
+    job_dir = Path(job["job_dir"])
+
+    images: List[str] = []
+    if results is not None:
+        with tempfile.TemporaryFile() as spooled:
+            while chunk := await results.read(UPLOAD_CHUNK_SIZE):
+                spooled.write(chunk)
+            spooled.seek(0)
+
+            def extract() -> List[str]:
+                extracted = []
+                with zipfile.ZipFile(spooled) as archive:
+                    for member in archive.infolist():
+                        # Flatten names so a bundle can never write outside the job folder
+                        name = Path(member.filename).name
+                        if member.is_dir() or not name.lower().endswith(".png"):
+                            continue
+                        with archive.open(member) as src, open(job_dir / name, "wb") as dst:
+                            shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+                        extracted.append(name)
+                return extracted
+
+            try:
+                images = await asyncio.to_thread(extract)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail="Results must be a zip archive")
+
+    await jmp_agents.complete_job(job_id, {
+        "status": status,
+        "error": error,
+        "agent_id": agent_id,
+        "images": images,
+        "image_count": len(images)
+    })
+    logger.info(f"[AGENTS] Job {job_id} finished on {agent_id}: {status} ({len(images)} images)")
+    return {"status": "ok", "image_count": len(images)}
+
+
+@router.get("")
+async def list_agents(current_user: AppUser = Depends(get_current_user)):
+    """List live runner agents and the job queue depth (admin only)."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "execution_mode": settings.JMP_EXECUTION_MODE,
+        "agents": await jmp_agents.list_agents(),
+        "queue": await jmp_agents.queue_depth()
+    }
@@ -8,10 +8,12 @@ from datetime import datetime
 
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
+from app.core.access import get_project_access
 from app.models import (
-    Artifact, ArtifactComment, AppUser, Project, ProjectMember, RoleEnum
+    Artifact, ArtifactComment, AppUser, Project, RoleEnum
 )
 from app.services.notification_service import NotificationService
+from app.services.run_gallery import invalidate_run_gallery
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -45,111 +47,41 @@ async def check_project_access_for_comments(db: AsyncSession, project_id: str, u
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    # Get project
-    result = await db.execute(
-        select(Project).where(Project.id == uuid.UUID(project_id), Project.deleted_at.is_(None))
-    )
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check if user is owner
-    if project.owner_id == user.id:
-        return project, RoleEnum.OWNER
-    
-    # Check if user is a member
-    result = await db.execute(
-        select(ProjectMember).where(
-            ProjectMember.project_id == uuid.UUID(project_id),
-            ProjectMember.user_id == user.id
-        )
-    )
-    membership = result.scalar_one_or_none()
+    access = await get_project_access(db, project_id, user, include_deleted=False)
     
-    if membership:
-        return project, membership.role
-    else:
-        # Allow all registered users to comment (default to watcher role)
-        return project, RoleEnum.WATCHER
+    if access.is_owner:
+        return access.project, RoleEnum.OWNER
+    if access.is_member:
+        return access.project, access.member_role
+    # Allow all registered users to comment (default to watcher role)
+    return access.project, RoleEnum.WATCHER
 
 # Helper function to check project access
 async def check_project_access(db: AsyncSession, project_id: str, user: Optional[AppUser], required_role: Optional[RoleEnum] = None):
     """Check if user has access to project with optional role requirement."""
+    access = await get_project_access(db, project_id, user, include_deleted=False)
+    project = access.project
+    
     if not user:
         # Check if project allows guests
-        result = await db.execute(
-            select(Project).where(
-                and_(
-                    Project.id == uuid.UUID(project_id),
-                    Project.allow_guest == True,
-                    Project.deleted_at.is_(None)
-                )
-            )
-        )
-        project = result.scalar_one_or_none()
-        if not project:
+        if not project.allow_guest:
             raise HTTPException(status_code=401, detail="Authentication required")
         return project, "guest"
     
     # Admins have full access to all projects
-    if user.is_admin:
-        result = await db.execute(
-            select(Project).where(
-                and_(
-                    Project.id == uuid.UUID(project_id),
-                    Project.deleted_at.is_(None)
-                )
-            )
-        )
-        project = result.scalar_one_or_none()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+    if access.is_admin:
         return project, "admin"
     
-    # Check if user is project owner
-    result = await db.execute(
-        select(Project).where(
-            and_(
-                Project.id == uuid.UUID(project_id),
-                Project.owner_id == user.id,
-                Project.deleted_at.is_(None)
-            )
-        )
-    )
-    project = result.scalar_one_or_none()
-    if project:
+    if access.is_owner:
         return project, "owner"
     
-    # Check if user is project member
-    result = await db.execute(
-        select(ProjectMember, Project).join(Project).where(
-            and_(
-                ProjectMember.project_id == uuid.UUID(project_id),
-                ProjectMember.user_id == user.id,
-                Project.deleted_at.is_(None)
-            )
-        )
-    )
-    membership = result.first()
-    if membership:
-        member, project = membership
-        if required_role and member.role != required_role:
+    if access.is_member:
+        if required_role and access.member_role != required_role:
             raise HTTPException(status_code=403, detail=f"Role {required_role.value} required")
-        return project, member.role.value
+        return project, access.member_role
     
     # Check if project is public
-    result = await db.execute(
-        select(Project).where(
-            and_(
-                Project.id == uuid.UUID(project_id),
-                Project.is_public == True,
-                Project.deleted_at.is_(None)
-            )
-        )
-    )
-    project = result.scalar_one_or_none()
-    if project:
+    if project.is_public:
         return project, "public"
     
     raise HTTPException(status_code=403, detail="Access denied")
@@ -275,6 +207,7 @@ async def create_artifact_comment(
     db.add(comment)
     await db.commit()
     await db.refresh(comment)
+    await invalidate_run_gallery(artifact.run_id)
     
     # Send notification to project members about new artifact comment
     await NotificationService.notify_artifact_comment_added(
@@ -334,6 +267,7 @@ async def update_artifact_comment(
     # Update comment
     comment.content = comment_data.content
     await db.commit()
+    await invalidate_run_gallery(artifact.run_id)
     
     return {"message": "Comment updated successfully"}
 
@@ -382,6 +316,7 @@ async def delete_artifact_comment(
     # Soft delete comment
     comment.deleted_at = datetime.utcnow()
     await db.commit()
+    await invalidate_run_gallery(artifact.run_id)
     
     return {"message": "Comment deleted successfully"}
 
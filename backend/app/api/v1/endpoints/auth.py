@@ -8,6 +8,7 @@ import uuid
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.access import invalidate_user
 from app.core.auth import (
     authenticate_user, 
     create_access_token, 
@@ -63,6 +64,7 @@ async def login(
     # Update last login
     user.last_login = datetime.utcnow()
     await db.commit()
+    await invalidate_user(user.id)
     
     access_token = create_access_token(data={"sub": str(user.id), "is_guest": user.is_guest, "is_admin": user.is_admin})
     refresh_token = create_refresh_token(data={"sub": str(user.id), "is_guest": user.is_guest, "is_admin": user.is_admin})
@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 
 from app.core.database import get_db
 from app.core.auth import get_current_user, get_current_user_optional
+from app.core.access import load_project
 from app.models import Project, DrawingFolder, DrawingImage, AppUser
 from app.core.storage import local_storage
 from app.core.config import settings
@@ -96,12 +97,7 @@ async def check_project_access_for_drawing(
     require_owner: bool = False
 ) -> Project:
     """Check if user has access to project for drawing operations."""
-    # Get project
-    result = await db.execute(select(Project).where(Project.id == project_id))
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await load_project(db, project_id)
     
     # Admins have full access to all projects
     if user and user.is_admin:
@@ -7,7 +7,8 @@ import uuid
 
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
-from app.models import AppUser, Project, ProjectMember, RoleEnum, ProjectComment
+from app.core.access import get_project_access, invalidate_member
+from app.models import AppUser, ProjectMember, RoleEnum, ProjectComment
 from app.services.notification_service import NotificationService
 from pydantic import BaseModel
 
@@ -51,40 +52,20 @@ async def check_project_access(db: AsyncSession, project_id: str, user: Optional
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    # Get project
-    result = await db.execute(
-        select(Project).where(Project.id == uuid.UUID(project_id), Project.deleted_at.is_(None))
-    )
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    access = await get_project_access(db, project_id, user, include_deleted=False)
     
     # Admins have full access to all projects
-    if user.is_admin:
-        return project, RoleEnum.OWNER  # Return OWNER role for admins
-    
-    # Check if user is owner
-    if project.owner_id == user.id:
-        return project, RoleEnum.OWNER
-    
-    # Check if user is a member
-    result = await db.execute(
-        select(ProjectMember).where(
-            ProjectMember.project_id == uuid.UUID(project_id),
-            ProjectMember.user_id == user.id
-        )
-    )
-    membership = result.scalar_one_or_none()
+    if access.is_admin or access.is_owner:
+        return access.project, RoleEnum.OWNER
     
-    if not membership:
+    if not access.is_member:
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Check role requirement
-    if required_role and membership.role != required_role and membership.role != RoleEnum.OWNER:
+    if required_role and access.member_role != required_role and access.member_role != RoleEnum.OWNER:
         raise HTTPException(status_code=403, detail=f"Role {required_role.value} required")
     
-    return project, membership.role
+    return access.project, access.member_role
 
 # Helper function to check project access for comments (allows all registered users)
 async def check_project_access_for_comments(db: AsyncSession, project_id: str, user: Optional[AppUser]):
@@ -92,33 +73,14 @@ async def check_project_access_for_comments(db: AsyncSession, project_id: str, u
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    # Get project
-    result = await db.execute(
-        select(Project).where(Project.id == uuid.UUID(project_id), Project.deleted_at.is_(None))
-    )
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check if user is owner
-    if project.owner_id == user.id:
-        return project, RoleEnum.OWNER
-    
-    # Check if user is a member
-    result = await db.execute(
-        select(ProjectMember).where(
-            ProjectMember.project_id == uuid.UUID(project_id),
-            ProjectMember.user_id == user.id
-        )
-    )
-    membership = result.scalar_one_or_none()
+    access = await get_project_access(db, project_id, user, include_deleted=False)
     
-    if membership:
-        return project, membership.role
-    else:
-        # Allow all registered users to comment (default to watcher role)
-        return project, RoleEnum.WATCHER
+    if access.is_owner:
+        return access.project, RoleEnum.OWNER
+    if access.is_member:
+        return access.project, access.member_role
+    # Allow all registered users to comment (default to watcher role)
+    return access.project, RoleEnum.WATCHER
 
 # Project Members endpoints
 @router.get("/projects/{project_id}/members", response_model=List[ProjectMemberResponse])
@@ -214,6 +176,7 @@ async def add_project_member(
         "user_id": member_data.user_id
     })
     await db.commit()
+    await invalidate_member(project_id, member_data.user_id)
     
     # Send notification to the added user
     await NotificationService.notify_user_added_to_project(
@@ -281,6 +244,7 @@ async def update_project_member_role(
         "user_id": user_id
     })
     await db.commit()
+    await invalidate_member(project_id, user_id)
     
     return {"message": "Member role updated successfully"}
 
@@ -317,6 +281,7 @@ async def remove_project_member(
     # Remove membership
     await db.delete(membership)
     await db.commit()
+    await invalidate_member(project_id, user_id)
     
     # Create history log
     from app.api.v1.endpoints.projects import create_history_log
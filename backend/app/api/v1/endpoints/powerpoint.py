@@ -19,8 +19,10 @@ import json
 
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
+from app.core.access import get_project_access
 from app.models import Project, Run, Artifact, DrawingFolder, DrawingImage, AppUser
 from app.core.storage import local_storage
+from app.services.run_files import with_manifest, run_task_dir, get_run_manifest, iter_manifest_files
 
 router = APIRouter()
 
@@ -61,33 +63,13 @@ async def check_project_access_for_powerpoint(
     user: Optional[AppUser]
 ) -> Project:
     """Check if user has access to project - ensures members and owners can access."""
-    result = await db.execute(select(Project).where(Project.id == project_id))
-    project = result.scalar_one_or_none()
+    access = await get_project_access(db, project_id, user)
+    project = access.project
     
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Admins have full access to all projects
-    if user and user.is_admin:
-        return project
-    
-    # Check if user is owner
-    if user and project.owner_id == user.id:
+    # Admins, owners and members have access
+    if access.is_admin or access.is_owner or access.is_member:
         return project
     
-    # Check if user is a member
-    if user:
-        from app.models import ProjectMember
-        member_result = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == user.id
-            )
-        )
-        member = member_result.scalar_one_or_none()
-        if member:
-            return project
-    
     # Allow guest access if project allows it
     if not user:
         if project.allow_guest:
@@ -243,7 +225,7 @@ async def get_run_images(
     """Get all images from a run's task folder."""
     
     # Get run and check access
-    result = await db.execute(select(Run).where(Run.id == uuid.UUID(run_id)))
+    result = await db.execute(select(Run).options(with_manifest()).where(Run.id == uuid.UUID(run_id)))
     run = result.scalar_one_or_none()
     
     if not run:
@@ -255,29 +237,21 @@ async def get_run_images(
     if not run.jmp_task_id:
         return []
     
-    from app.core.config import settings
-    tasks_root = Path(settings.TASKS_DIRECTORY).expanduser().resolve()
-    task_dir = tasks_root / f"task_{run.jmp_task_id}"
-    
-    if not task_dir.exists():
-        return []
-    
-    # Find all image files in task directory
-    image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'}
+    # Image files of the task folder, from the run's file manifest
+    import base64
+    task_dir_name = run_task_dir(run).name
     images = []
     
-    for file_path in task_dir.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-            relative_path = file_path.relative_to(tasks_root)
-            # Create URL for serving the image
-            import base64
-            encoded_path = base64.b64encode(str(relative_path).encode()).decode()
-            
-            images.append(RunImageInfo(
-                filename=file_path.name,
-                path=str(relative_path),
-                url=f"/api/v1/uploads/file-serve?path={encoded_path}"
-            ))
+    for entry in iter_manifest_files(await get_run_manifest(db, run), kind="image"):
+        relative_path = f"{task_dir_name}/{entry['path']}"
+        # Create URL for serving the image
+        encoded_path = base64.b64encode(relative_path.encode()).decode()
+        
+        images.append(RunImageInfo(
+            filename=entry["name"],
+            path=relative_path,
+            url=f"/api/v1/uploads/file-serve?path={encoded_path}"
+        ))
     
     return sorted(images, key=lambda x: x.filename)
 
@@ -7,6 +7,7 @@ import uuid
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.access import invalidate_user
 from app.core.auth import (
     get_current_user,
     verify_password,
@@ -47,7 +48,8 @@ async def change_password(
             detail="Guest users cannot change passwords"
         )
     
-    # Verify current password
+    # Verify current password (not part of the cached user record)
+    await db.refresh(current_user, ["password_hash"])
     if not verify_password(password_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -132,6 +134,7 @@ async def update_profile(
             current_user.business_group_id = uuid.UUID(profile_data.business_group_id)
     
     await db.commit()
+    await invalidate_user(current_user.id)
     await db.refresh(current_user)
     
     return ProfileUpdateResponse(
@@ -6,10 +6,13 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timezone
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.auth import get_current_user, get_current_user_optional
+from app.core.access import get_project_access, invalidate_member
+from app.services.run_files import with_manifest, get_run_manifest, manifest_paths
 from app.core.storage import local_storage
 from app.core.config import settings
+from app.core.metrics import observe_stage
 from app.models import Project, ProjectMember, AppUser, Artifact, Run, RunStatus, ProjectAttachment, ProjectHistoryLog
 
 router = APIRouter()
@@ -59,36 +62,14 @@ async def check_project_access(
     require_owner: bool = False
 ) -> Project:
     """Check if user has access to project."""
-    result = await db.execute(select(Project).where(Project.id == project_id, Project.deleted_at.is_(None)))
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Admins have full access to all projects
-    if user and user.is_admin:
-        return project
+    access = await get_project_access(db, project_id, user, include_deleted=False)
     
-    # Check if user is owner
-    if user and project.owner_id == user.id:
-        return project
-    
-    # Check if user is member
-    if user:
-        member_result = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == user.id
-            )
-        )
-        member = member_result.scalar_one_or_none()
-        if member:
-            if require_owner:
-                raise HTTPException(status_code=403, detail="Owner access required")
-            return project
+    # Members that aren't the owner can't perform owner actions
+    if require_owner and access.is_member and not (access.is_admin or access.is_owner):
+        raise HTTPException(status_code=403, detail="Owner access required")
     
     # Allow guest access to all projects (shared access)
-    return project
+    return access.project
 
 @router.post("/", response_model=ProjectResponse)
 @router.post("", response_model=ProjectResponse)
@@ -172,7 +153,7 @@ async def create_project(
 @router.get("/", response_model=List[ProjectResponse])
 @router.get("", response_model=List[ProjectResponse])
 async def list_projects(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
     """List projects accessible to the current user."""
@@ -559,6 +540,7 @@ async def add_project_member(
     )
     db.add(member)
     await db.commit()
+    await invalidate_member(project_id, user.id)
     
     # Create history log
     await create_history_log(
@@ -908,7 +890,7 @@ async def download_public_run_zip(
         raise HTTPException(status_code=403, detail="Project is not public")
     
     # Get run details
-    result = await db.execute(select(Run).where(
+    result = await db.execute(select(Run).options(with_manifest()).where(
         Run.id == uuid.UUID(run_id),
         Run.project_id == uuid.UUID(project_id),
         Run.deleted_at.is_(None)
@@ -946,15 +928,19 @@ async def download_public_run_zip(
     if not full_task_dir.exists():
         raise HTTPException(status_code=404, detail="Task directory not found")
     
+    # Files come from the run's manifest; only folders it doesn't describe are walked
+    manifest = await get_run_manifest(db, run)
+    if manifest and manifest.get("task_dir") == full_task_dir.name:
+        arcnames = manifest_paths(manifest)
+    else:
+        arcnames = [str(p.relative_to(full_task_dir)) for p in full_task_dir.rglob('*') if p.is_file()]
+    
     # Create temporary ZIP file
     with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add all files from the task directory
-            for file_path in full_task_dir.rglob('*'):
-                if file_path.is_file():
-                    # Add file to zip with relative path
-                    arcname = file_path.relative_to(full_task_dir)
-                    zipf.write(file_path, arcname)
+        with observe_stage("zip"), zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            # Add file to zip with relative path
+            for arcname in arcnames:
+                zipf.write(full_task_dir / arcname, arcname)
         
         # Return the ZIP file
         return FileResponse(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from pydantic import BaseModel
@@ -9,20 +9,33 @@ from pathlib import Path
 import re
 import logging
 import base64
-from fastapi.responses import Response
+from fastapi.responses import Response, FileResponse
 
-from app.core.database import get_db, AsyncSessionLocal
+from app.core.database import get_db, get_read_db, AsyncSessionLocal
 from app.core.auth import get_current_user, get_current_user_optional
+from app.core.access import load_project
 from app.core.celery import celery_app
 from app.core.websocket import publish_run_update
+from app.core.tracing import StageSpans, celery_headers, current_span, remember_run_trace, traced
 from app.core.storage import local_storage
 from app.core.config import settings
+from app.core.pagination import apply_keyset, finish_page
+from app.services.run_files import (
+    with_manifest, run_task_dir, get_run_manifest, iter_manifest_files, find_manifest_file
+)
+from app.services.run_gallery import artifact_download_url, get_run_gallery
 from app.models import Project, Run, RunStatus, AppUser, Artifact, ProjectMember, AppSetting, RunComment, ProjectAttachment, ProjectHistoryLog
 from app.services.notification_service import NotificationService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Columns selected for run listings (avoids loading full Run rows)
+RUN_LIST_COLUMNS = (
+    Run.id, Run.project_id, Run.status, Run.task_name, Run.message, Run.image_count,
+    Run.created_at, Run.started_at, Run.finished_at, Run.started_by,
+)
+
 class RunCreate(BaseModel):
     project_id: str
     csv_key: str
@@ -76,6 +89,26 @@ class RunArtifactWithCommentsResponse(BaseModel):
     kind: str
     comment_count: int
 
+class GalleryComment(BaseModel):
+    id: str
+    content: str
+    created_at: datetime
+    user_email: Optional[str]
+
+class GalleryOcr(BaseModel):
+    artifact_id: str
+    filename: str
+    success: Optional[bool] = None
+    confidence: Optional[float] = None
+    text_length: Optional[int] = None
+
+class RunGalleryItem(ArtifactResponse):
+    width: Optional[int] = None
+    height: Optional[int] = None
+    comment_count: int = 0
+    latest_comment: Optional[GalleryComment] = None
+    ocr: Optional[GalleryOcr] = None
+
 class RunCommentUpdate(BaseModel):
     content: str
 
@@ -84,54 +117,65 @@ class RunTaskNameUpdate(BaseModel):
 
 @router.get("/", response_model=List[RunResponse])
 async def list_runs(
+    response: Response,
+    limit: int = Query(settings.RUN_LIST_DEFAULT_LIMIT, ge=1, le=settings.RUN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    status_filter: Optional[RunStatus] = Query(None, alias="status"),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
     current_user: Optional[AppUser] = Depends(get_current_user_optional),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all runs for the current user."""
+    """
+    List runs of the projects the current user can access, newest first.
+    Without a user only runs of public projects are listed.
+    
+    Cursor-paginated: pass the X-Next-Cursor response header back as ``cursor``
+    to get the next page. Only the columns the response needs are selected.
+    """
+    query = (
+        select(*RUN_LIST_COLUMNS, AppUser.email, AppUser.is_guest)
+        .outerjoin(AppUser, AppUser.id == Run.started_by)
+        .where(Run.deleted_at.is_(None))
+    )
     if current_user:
-        # Get all projects the user has access to
-        result = await db.execute(
-            select(Project).where(
-                (Project.owner_id == current_user.id) |
-                (Project.members.any(ProjectMember.user_id == current_user.id))
-            )
-        )
-        user_projects = result.scalars().all()
-        project_ids = [str(p.id) for p in user_projects]
-        
-        if not project_ids:
-            return []
-        
-        # Get all runs for user's projects
-        result = await db.execute(
-            select(Run).where(Run.project_id.in_(project_ids), Run.deleted_at.is_(None))
-            .order_by(Run.created_at.desc())
+        # Projects the user owns or is a member of, resolved inside the query
+        accessible_projects = select(Project.id).where(Project.owner_id == current_user.id).union(
+            select(ProjectMember.project_id).where(ProjectMember.user_id == current_user.id)
         )
-        runs = result.scalars().all()
     else:
-        # Guest user - show all runs (shared access)
-        result = await db.execute(
-            select(Run).where(Run.deleted_at.is_(None))
-            .order_by(Run.created_at.desc())
+        # No user to be a member of anything - only public projects are reachable
+        accessible_projects = select(Project.id).where(
+            Project.is_public.is_(True), Project.deleted_at.is_(None)
         )
-        runs = result.scalars().all()
+    query = query.where(Run.project_id.in_(accessible_projects))
+    
+    if status_filter is not None:
+        query = query.where(Run.status == status_filter)
+    if created_after is not None:
+        query = query.where(Run.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(Run.created_at < created_before)
+    
+    result = await db.execute(apply_keyset(query, Run.created_at, Run.id, cursor, limit))
+    rows = finish_page(result.all(), limit, response)
     
     return [
         RunResponse(
-            id=str(run.id),
-            project_id=str(run.project_id),
-            status=run.status.value,
-            task_name=run.task_name,
-            message=run.message,
-            image_count=run.image_count,
-            created_at=run.created_at,
-            started_at=run.started_at,
-            finished_at=run.finished_at,
-            started_by=str(run.started_by) if run.started_by else None,
-            started_by_email=None,
-            started_by_is_guest=None
+            id=str(row.id),
+            project_id=str(row.project_id),
+            status=row.status.value,
+            task_name=row.task_name,
+            message=row.message,
+            image_count=row.image_count or 0,
+            created_at=row.created_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+            started_by=str(row.started_by) if row.started_by else None,
+            started_by_email=row.email,
+            started_by_is_guest=row.is_guest
         )
-        for run in runs
+        for row in rows
     ]
 
 async def check_project_access(
@@ -140,37 +184,11 @@ async def check_project_access(
     user: Optional[AppUser]
 ) -> Project:
     """Check if user has access to project."""
-    result = await db.execute(select(Project).where(Project.id == project_id))
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Admins have full access to all projects
-    if user and user.is_admin:
-        return project
-    
-    # Check if user is owner
-    if user and project.owner_id == user.id:
-        return project
-    
-    # Check if user is member
-    if user:
-        from app.models import ProjectMember
-        member_result = await db.execute(
-            select(ProjectMember).where(
-                ProjectMember.project_id == project_id,
-                ProjectMember.user_id == user.id
-            )
-        )
-        member = member_result.scalar_one_or_none()
-        if member:
-            return project
-    
-    # Allow guest access to all projects (shared access)
-    return project
+    # Runs are shared with everyone who can reach the project, so only existence matters here
+    return await load_project(db, project_id)
 
 @router.post("/", response_model=RunResponse)
+@traced("create_run")
 async def create_run(
     project_id: str = Form(...),
     csv_file: UploadFile = File(...),
@@ -189,8 +207,13 @@ async def create_run(
     5. Generate task folder with processed files
     6. Copy processed files to task folder
     7. Queue Celery task
+    
+    The run's trace starts here; each step is a span and the trace context
+    travels with the Celery task and every run update.
     """
-    stage = "init"
+    trace_root = current_span()
+    stages = StageSpans("create_run.")
+    stage = stages.next("init")
     try:
         project_uuid = uuid.UUID(project_id)
         project = await check_project_access(db, project_uuid, current_user)
@@ -216,6 +239,9 @@ async def create_run(
                 await create_db.refresh(run)
                 
                 logger.info(f"[RUNS] Run created: {run.id}")
+                trace_root.set_attribute("run.id", str(run.id))
+                trace_root.set_attribute("project.id", project_id)
+                await remember_run_trace(str(run.id), trace_root.traceparent)
                 
                 # STEP 2: Create run folder immediately after run is created
                 run_dir_key = f"runs/{str(run.id)}"
@@ -225,7 +251,7 @@ async def create_run(
                 logger.info(f"[RUNS] Run folder created: {run_dir_path}")
                 
                 # STEP 3: Save uploaded CSV and JSL to run folder
-                stage = "save_files"
+                stage = stages.next("save_files")
                 csv_content = await csv_file.read()
                 jsl_content = await jsl_file.read()
                 
@@ -252,7 +278,7 @@ async def create_run(
                 logger.info(f"  JSL: {jsl_storage_path} (size: {len(jsl_content)} bytes)")
                 
                 # STEP 4: Create artifacts for uploaded files
-                stage = "create_artifacts"
+                stage = stages.next("create_artifacts")
                 csv_artifact = Artifact(
                     project_id=project_uuid,
                     run_id=run.id,
@@ -280,7 +306,7 @@ async def create_run(
                 logger.info(f"[RUNS] Artifacts created for uploaded files")
                 
                 # STEP 5: Process CSV and JSL (validate and prepare)
-                stage = "process_files"
+                stage = stages.next("process_files")
                 # Read CSV to validate it's valid
                 try:
                     csv_text = csv_storage_path.read_text(encoding='utf-8')
@@ -304,7 +330,7 @@ async def create_run(
                 logger.info(f"[RUNS] CSV and JSL files validated successfully")
                 
                 # STEP 6: Generate task folder with processed files
-                stage = "create_task_folder"
+                stage = stages.next("create_task_folder")
                 ts_task = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
                 task_uid = str(uuid.uuid4())  # Use full UUID for better uniqueness
                 jmp_task_id = f"{ts_task}_{task_uid}"
@@ -316,7 +342,7 @@ async def create_run(
                 logger.info(f"[RUNS] Task folder created: {task_dir}")
                 
                 # STEP 7: Copy processed files to task folder
-                stage = "copy_to_task_folder"
+                stage = stages.next("copy_to_task_folder")
                 csv_dst = task_dir / csv_filename
                 jsl_dst = task_dir / jsl_filename
                 
@@ -358,7 +384,7 @@ Open("{absolute_csv_path}");
                     raise RuntimeError(f"Failed to copy files into task folder: {task_dir}")
                 
                 # STEP 8: Set jmp_task_id on run and commit
-                stage = "persist_task_id"
+                stage = stages.next("persist_task_id")
                 run.jmp_task_id = jmp_task_id
                 await create_db.commit()
                 
@@ -374,7 +400,7 @@ Open("{absolute_csv_path}");
                 })
                 
                 # STEP 9: Queue Celery task (after task folder is prepared)
-                stage = "queue_task"
+                stage = stages.next("queue_task")
                 # Check queue mode setting
                 queue_mode_result = await create_db.execute(
                     select(AppSetting).where(AppSetting.k == "queue_mode")
@@ -405,9 +431,9 @@ Open("{absolute_csv_path}");
                             "message": "Run queued - waiting for other tasks to complete"
                         })
                     else:
-                        celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                        celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                 else:
-                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                 
                 logger.info(f"[RUNS] Celery task queued for run {run.id}")
                 
@@ -454,6 +480,7 @@ Open("{absolute_csv_path}");
                 )
                 
             except Exception as e:
+                stages.end(error=e)
                 logger.error(f"[RUNS] Failed to create run: {e}", exc_info=True)
                 raise HTTPException(
                     status_code=400,
@@ -468,6 +495,8 @@ Open("{absolute_csv_path}");
             status_code=500,
             detail=f"Unexpected error creating run: {str(e)}"
         )
+    finally:
+        stages.end()
 
 @router.get("/{run_id}", response_model=RunResponse)
 async def get_run(
@@ -509,7 +538,7 @@ async def get_run(
 @router.get("/{run_id}/artifacts", response_model=List[ArtifactResponse])
 async def get_run_artifacts(
     run_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
     """Get artifacts for a run."""
@@ -530,20 +559,6 @@ async def get_run_artifacts(
     
     artifact_responses = []
     for artifact in artifacts:
-        # Generate download URL based on storage key
-        if artifact.storage_key:
-            # For local storage, create a direct file URL
-            if artifact.storage_key.startswith("tasks/"):
-                # Task directory images - use a simple endpoint with base64 encoding
-                import base64
-                encoded_path = base64.b64encode(artifact.storage_key.encode()).decode()
-                download_url = f"/api/v1/uploads/file-serve?path={encoded_path}"
-            else:
-                # Upload directory files - use existing upload system
-                download_url = f"/api/v1/uploads/download/{artifact.storage_key}"
-        else:
-            download_url = None
-        
         artifact_responses.append(ArtifactResponse(
             id=str(artifact.id),
             kind=artifact.kind,
@@ -551,7 +566,7 @@ async def get_run_artifacts(
             size_bytes=artifact.size_bytes,
             mime_type=artifact.mime_type,
             created_at=artifact.created_at,
-            download_url=download_url
+            download_url=artifact_download_url(artifact.storage_key)
         ))
     
     return artifact_responses
@@ -562,8 +577,10 @@ async def get_run_task_images(
     db: AsyncSession = Depends(get_db),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
-    """Get images directly from the run's task folder (not from database artifacts)."""
-    result = await db.execute(select(Run).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None)))
+    """Get images of the run's task folder from its file manifest (not from database artifacts)."""
+    result = await db.execute(
+        select(Run).options(with_manifest()).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None))
+    )
     run = result.scalar_one_or_none()
     
     if not run:
@@ -581,31 +598,29 @@ async def get_run_task_images(
             "message": "Task folder not yet created"
         }
     
-    # Construct task folder path
-    tasks_root = Path(settings.TASKS_DIRECTORY).expanduser().resolve()
-    task_dir = tasks_root / f"task_{run.jmp_task_id}"
+    task_dir = run_task_dir(run)
+    manifest = await get_run_manifest(db, run)
     
     images = []
-    if task_dir.exists() and task_dir.is_dir():
-        # Find all image files in the task folder
-        image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'}
-        for file_path in sorted(task_dir.glob("*")):
-            if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                # Create a URL to serve the image
-                relative_path = file_path.relative_to(tasks_root)
-                encoded_path = base64.b64encode(str(relative_path).encode()).decode()
-                images.append({
-                    "filename": file_path.name,
-                    "size": file_path.stat().st_size,
-                    "modified": file_path.stat().st_mtime,
-                    "url": f"/api/v1/runs/{run_id}/task-image/{file_path.name}",
-                    "encoded_path": encoded_path
-                })
+    for entry in iter_manifest_files(manifest, kind="image", top_level=True):
+        # Create a URL to serve the image
+        relative_path = f"{task_dir.name}/{entry['path']}"
+        encoded_path = base64.b64encode(relative_path.encode()).decode()
+        images.append({
+            "filename": entry["name"],
+            "size": entry["size"],
+            "modified": entry["modified"],
+            "width": entry.get("width"),
+            "height": entry.get("height"),
+            "sha256": entry.get("sha256"),
+            "url": f"/api/v1/runs/{run_id}/task-image/{entry['name']}",
+            "encoded_path": encoded_path
+        })
     
     return {
         "run_id": run_id,
         "images": images,
-        "task_dir": str(task_dir) if task_dir.exists() else None,
+        "task_dir": str(task_dir) if manifest is not None else None,
         "count": len(images)
     }
 
@@ -613,11 +628,14 @@ async def get_run_task_images(
 async def get_run_task_image(
     run_id: str,
     filename: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
     """Serve an image directly from the run's task folder."""
-    result = await db.execute(select(Run).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None)))
+    result = await db.execute(
+        select(Run).options(with_manifest()).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None))
+    )
     run = result.scalar_one_or_none()
     
     if not run:
@@ -629,34 +647,24 @@ async def get_run_task_image(
     if not run.jmp_task_id:
         raise HTTPException(status_code=404, detail="Task folder not found")
     
-    # Construct task folder path
-    tasks_root = Path(settings.TASKS_DIRECTORY).expanduser().resolve()
-    task_dir = tasks_root / f"task_{run.jmp_task_id}"
-    image_path = task_dir / filename
-    
-    if not image_path.exists() or not image_path.is_file():
+    # Only files listed in the manifest are served, which also rules out path traversal
+    manifest = await get_run_manifest(db, run)
+    entry = find_manifest_file(manifest, filename)
+    if not entry or entry["kind"] != "image":
         raise HTTPException(status_code=404, detail="Image not found")
     
-    # Verify the image is actually in the task directory (security check)
-    try:
-        image_path.resolve().relative_to(task_dir.resolve())
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Determine content type
-    content_type = "image/png"
-    if filename.lower().endswith('.jpg') or filename.lower().endswith('.jpeg'):
-        content_type = "image/jpeg"
-    elif filename.lower().endswith('.gif'):
-        content_type = "image/gif"
-    elif filename.lower().endswith('.bmp'):
-        content_type = "image/bmp"
-    elif filename.lower().endswith('.tiff'):
-        content_type = "image/tiff"
-    
-    # Read and return the image
-    image_data = image_path.read_bytes()
-    return Response(content=image_data, media_type=content_type)
+    headers = {}
+    if entry.get("sha256"):
+        # Finished runs never change, so clients may cache the image indefinitely
+        headers["ETag"] = f'"{entry["sha256"]}"'
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+    
+    image_path = run_task_dir(run) / entry["path"]
+    if not image_path.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(image_path, media_type=entry["mime_type"], headers=headers)
 
 @router.get("/{run_id}/download-zip")
 async def get_run_zip_download_url(
@@ -1128,7 +1136,9 @@ async def get_run_artifacts_with_comments(
 ):
     """Get artifacts for a run with their comment counts."""
     # Get run and check access
-    result = await db.execute(select(Run).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None)))
+    result = await db.execute(
+        select(Run).options(with_manifest()).where(Run.id == uuid.UUID(run_id), Run.deleted_at.is_(None))
+    )
     run = result.scalar_one_or_none()
     
     if not run:
@@ -1137,36 +1147,43 @@ async def get_run_artifacts_with_comments(
     # Check project access
     await check_project_access(db, run.project_id, current_user)
     
-    # Get artifacts for this run
-    artifacts_result = await db.execute(
-        select(Artifact).where(Artifact.run_id == uuid.UUID(run_id))
-    )
-    artifacts = artifacts_result.scalars().all()
-    
-    if not artifacts:
-        return []
+    # Same joined (and cached) query as the gallery
+    return [
+        RunArtifactWithCommentsResponse(
+            artifact_id=item["id"],
+            filename=item["filename"],
+            kind=item["kind"],
+            comment_count=item["comment_count"]
+        )
+        for item in await get_run_gallery(db, run)
+    ]
+
+@router.get("/{run_id}/gallery", response_model=List[RunGalleryItem])
+async def get_run_gallery_items(
+    run_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[AppUser] = Depends(get_current_user_optional)
+):
+    """
+    Get a run's artifacts for the image gallery in one request
     
-    # Get artifact IDs
-    artifact_ids = [str(artifact.id) for artifact in artifacts]
+    Each artifact comes with its comment count, latest comment, OCR result
+    (for images that were OCR'd) and pixel dimensions.
+    """
+    try:
+        run_uuid = uuid.UUID(run_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid run ID format")
     
-    # Get comment counts for these artifacts
-    from app.api.v1.endpoints.artifacts import get_artifact_comment_counts
-    comment_counts_response = await get_artifact_comment_counts(artifact_ids, db, current_user)
+    result = await db.execute(
+        select(Run).options(with_manifest()).where(Run.id == run_uuid, Run.deleted_at.is_(None))
+    )
+    run = result.scalar_one_or_none()
     
-    # Create a map of artifact_id to comment_count
-    comment_counts_map = {item.artifact_id: item.comment_count for item in comment_counts_response}
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
     
-    # Build response with artifacts and their comment counts
-    result = []
-    for artifact in artifacts:
-        artifact_id = str(artifact.id)
-        comment_count = comment_counts_map.get(artifact_id, 0)
-        
-        result.append(RunArtifactWithCommentsResponse(
-            artifact_id=artifact_id,
-            filename=artifact.filename,
-            kind=artifact.kind,
-            comment_count=comment_count
-        ))
+    # Check project access
+    await check_project_access(db, run.project_id, current_user)
     
-    return result
+    return await get_run_gallery(db, run)
@@ -1,21 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import mimetypes
+import time
 import uuid
 from datetime import datetime, timedelta
 import os
 
 from app.core.database import get_db
-from app.core.auth import get_current_user_optional
+from app.core.auth import get_current_user, get_current_user_optional
+from app.core.access import get_project_access
 from app.core.config import settings
 from app.core.storage import local_storage
-from app.models import AppUser, Artifact, Run, Project
-from sqlalchemy import select
+from app.core.object_storage import StorageKeyError, check_key, get_storage, sign_request, verify_signature
+from app.core.metrics import observe_stage
+from app.models import AppUser, Artifact, Run, Project, Workspace, WorkspaceMember, WorkflowArtifact
+from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class PresignedUploadRequest(BaseModel):
     filename: str
@@ -26,13 +34,79 @@ class PresignedUploadResponse(BaseModel):
     upload_url: str
     storage_key: str
     expires_in: int
+    method: str = "POST"
+    headers: Dict[str, str] = {}
+    # Multipart uploads (large files on S3): PUT each part to its URL, then POST /complete
+    upload_id: Optional[str] = None
+    part_size: Optional[int] = None
+    part_urls: Optional[List[str]] = None
+    complete_token: Optional[str] = None
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteUploadRequest(BaseModel):
+    storage_key: str
+    upload_id: str
+    complete_token: str
+    parts: List[UploadedPart]
+
+def _max_upload_size(current_user: Optional[AppUser]) -> int:
+    if current_user and current_user.is_guest:
+        return settings.GUEST_MAX_FILE_SIZE
+    return settings.MAX_FILE_SIZE
+
+def _complete_scope(user: AppUser, upload_id: str) -> str:
+    """Signed scope of a multipart upload: only the user who started it can complete it"""
+    return f"COMPLETE {user.id} {upload_id}"
+
+async def _check_download_access(db: AsyncSession, storage_key: str, user: AppUser) -> None:
+    """
+    Allow downloading a key only if it belongs to something the user can see
+
+    The key must be stored by a run artifact of a project the user owns, is a
+    member of or that is public, or by a workflow artifact of a workspace they
+    own, are a member of or that is public. Unknown keys get a 404 either way.
+    """
+    if user.is_admin:
+        return
+    
+    project_ids = (await db.execute(
+        select(Artifact.project_id).where(Artifact.storage_key == storage_key).distinct()
+    )).scalars().all()
+    for project_id in project_ids:
+        if project_id is None:
+            continue
+        try:
+            access = await get_project_access(db, project_id, user, include_deleted=False)
+        except HTTPException:
+            continue
+        if access.is_owner or access.is_member or access.project.is_public:
+            return
+    
+    workspace_id = (await db.execute(
+        select(Workspace.id)
+        .join(WorkflowArtifact, WorkflowArtifact.workspace_id == Workspace.id)
+        .outerjoin(WorkspaceMember, (WorkspaceMember.workspace_id == Workspace.id) & (WorkspaceMember.user_id == user.id))
+        .where(
+            WorkflowArtifact.storage_key == storage_key,
+            Workspace.deleted_at.is_(None),
+            or_(Workspace.owner_id == user.id, Workspace.is_public.is_(True), WorkspaceMember.id.isnot(None))
+        )
+        .limit(1)
+    )).scalar_one_or_none()
+    if workspace_id is not None:
+        return
+    
+    raise HTTPException(status_code=404, detail="File not found")
 
 @router.post("/presign", response_model=PresignedUploadResponse)
 async def get_presigned_upload_url(
     request: PresignedUploadRequest,
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
-    """Get a presigned URL for file upload."""
+    """Get a presigned URL for file upload (straight to the bucket on S3 storage)."""
     
     # Validate file type
     if not request.content_type or request.content_type not in settings.ALLOWED_FILE_TYPES:
@@ -41,37 +115,95 @@ async def get_presigned_upload_url(
             detail=f"File type '{request.content_type}' not allowed. Allowed types: {settings.ALLOWED_FILE_TYPES}"
         )
     
+    storage = get_storage()
+    
+    # URLs straight to the bucket are signed for this exact size; local uploads are checked by /upload
+    if request.file_size is None and storage.name != "local":
+        raise HTTPException(status_code=400, detail="file_size is required")
+    
     # Check file size limits (only if file_size is provided)
     if request.file_size is not None:
-        max_size = settings.MAX_FILE_SIZE
-        if current_user and current_user.is_guest:
-            max_size = settings.GUEST_MAX_FILE_SIZE
+        max_size = _max_upload_size(current_user)
         
+        if request.file_size <= 0:
+            raise HTTPException(status_code=400, detail="File size must be positive")
         if request.file_size > max_size:
             raise HTTPException(
                 status_code=400,
                 detail=f"File size {request.file_size} exceeds limit {max_size}"
             )
     
-    # Generate storage key using local storage
     storage_key = local_storage.generate_storage_key(request.filename, request.content_type)
+    expires_in = settings.STORAGE_PRESIGN_EXPIRES
     
-    # For local development, we'll use a simple upload endpoint
-    upload_url = f"/api/v1/uploads/upload?storage_key={storage_key}"
+    # Multipart uploads are completed through /complete, which only their (signed-in) starter may call
+    if request.file_size and storage.supports_multipart and current_user:
+        multipart = await asyncio.to_thread(
+            storage.presign_multipart, storage_key, request.content_type, request.file_size, expires_in
+        )
+        if multipart:
+            expires = int(time.time()) + expires_in
+            return PresignedUploadResponse(
+                upload_url=multipart["part_urls"][0],
+                storage_key=storage_key,
+                expires_in=expires_in,
+                method="PUT",
+                complete_token=f"{expires}.{sign_request(_complete_scope(current_user, multipart['upload_id']), storage_key, expires)}",
+                **multipart
+            )
     
+    upload = storage.presign_upload(storage_key, request.content_type, expires_in, request.file_size)
     return PresignedUploadResponse(
-        upload_url=upload_url,
+        upload_url=upload["url"],
         storage_key=storage_key,
-        expires_in=3600
+        expires_in=expires_in,
+        method=upload["method"],
+        headers=upload["headers"]
     )
 
+@router.post("/complete")
+async def complete_multipart_upload(
+    request: CompleteUploadRequest,
+    current_user: AppUser = Depends(get_current_user)
+):
+    """Finish a multipart upload started by /presign (by the same user)."""
+    expires, _, signature = request.complete_token.partition(".")
+    scope = _complete_scope(current_user, request.upload_id)
+    if not expires.isdigit() or not verify_signature(scope, request.storage_key, int(expires), signature):
+        raise HTTPException(status_code=403, detail="Upload cannot be completed by this user or has expired")
+    
+    storage = get_storage()
+    try:
+        await storage.complete_multipart(
+            request.storage_key, request.upload_id, [part.model_dump() for part in request.parts]
+        )
+    except (ValueError, NotImplementedError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Part URLs are signed per size, but check the assembled object against the caller's limit too
+    max_size = _max_upload_size(current_user)
+    size = await storage.size(request.storage_key)
+    if size is not None and size > max_size:
+        await storage.delete(request.storage_key)
+        raise HTTPException(status_code=400, detail=f"File size {size} exceeds limit {max_size}")
+    
+    return {
+        "message": "File uploaded successfully",
+        "storage_key": request.storage_key
+    }
+
 @router.post("/upload")
 async def upload_file(
     storage_key: str = Query(...),
+    expires: int = Query(...),
+    signature: str = Query(...),
     file: UploadFile = File(...),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
-    """Upload a file to local storage."""
+    """Upload a file to local storage through a URL signed by /presign."""
+    
+    if not verify_signature("POST", storage_key, expires, signature):
+        raise HTTPException(status_code=403, detail="Upload URL is invalid or has expired")
     
     # Validate file type
     if not file.content_type or file.content_type not in settings.ALLOWED_FILE_TYPES:
@@ -80,42 +212,83 @@ async def upload_file(
             detail=f"File type '{file.content_type}' not allowed. Allowed types: {settings.ALLOWED_FILE_TYPES}"
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Check file size
-    max_size = settings.MAX_FILE_SIZE
-    if current_user and current_user.is_guest:
-        max_size = settings.GUEST_MAX_FILE_SIZE
+    max_size = _max_upload_size(current_user)
     
-    if len(content) > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size {len(content)} exceeds limit {max_size}"
-        )
+    async def chunks():
+        # Stream the upload, checking the size as it arrives
+        received = 0
+        while True:
+            chunk = await file.read(settings.STORAGE_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > max_size:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File size exceeds limit {max_size}"
+                )
+            yield chunk
     
-    # Save file
-    file_path = local_storage.save_file(content, storage_key)
+    try:
+        size = await get_storage().put_stream(storage_key, chunks(), file.content_type)
+    except StorageKeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "message": "File uploaded successfully",
         "storage_key": storage_key,
-        "file_path": file_path
+        "size": size
     }
 
-@router.get("/download/{storage_key}")
+@router.get("/object")
+async def get_signed_object(
+    storage_key: str = Query(...),
+    expires: int = Query(...),
+    signature: str = Query(...)
+):
+    """Stream a file through a download URL signed by /download (local storage)."""
+    
+    if not verify_signature("GET", storage_key, expires, signature):
+        raise HTTPException(status_code=403, detail="Download URL is invalid or has expired")
+    
+    storage = get_storage()
+    try:
+        size = await storage.size(storage_key)
+    except StorageKeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if size is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    filename = storage_key.rsplit("/", 1)[-1]
+    return StreamingResponse(
+        storage.stream(storage_key),
+        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        headers={
+            "Content-Length": str(size),
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
+
+@router.get("/download/{storage_key:path}")
 async def get_download_url(
     storage_key: str,
-    current_user: Optional[AppUser] = Depends(get_current_user_optional)
+    current_user: AppUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a download URL for a file."""
+    """Get a presigned download URL for a file of a project or workspace the user can access."""
+    
+    try:
+        storage_key = check_key(storage_key)
+    except StorageKeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await _check_download_access(db, storage_key, current_user)
     
-    # Generate download URL
-    download_url = local_storage.get_file_url(storage_key)
+    expires_in = settings.STORAGE_PRESIGN_EXPIRES
+    download_url = get_storage().presign_download(storage_key, expires_in)
     
     return {
         "download_url": download_url,
-        "expires_in": 3600
+        "expires_in": expires_in
     }
 
 @router.get("/test")
@@ -356,10 +529,11 @@ async def download_run_zip(
     from sqlalchemy import select
     from app.core.database import AsyncSessionLocal
     from app.models import Run, Artifact
+    from app.services.run_files import with_manifest, get_run_manifest, manifest_paths
     
     # Get run details to verify access
     async with AsyncSessionLocal() as db:
-        result = await db.execute(select(Run).where(Run.id == run_id))
+        result = await db.execute(select(Run).options(with_manifest()).where(Run.id == run_id))
         run = result.scalar_one_or_none()
         
         if not run:
@@ -447,17 +621,29 @@ async def download_run_zip(
         if not full_task_dir or not full_task_dir.exists():
             raise HTTPException(status_code=404, detail="Task directory not found")
         
+        # Files come from the run's manifest; only folders it doesn't describe are walked
+        manifest = await get_run_manifest(db, run)
+        if manifest and manifest.get("task_dir") == full_task_dir.name:
+            arcnames = manifest_paths(manifest)
+        else:
+            arcnames = [
+                str((Path(root) / file).relative_to(full_task_dir))
+                for root, _, files in os.walk(full_task_dir)
+                for file in files
+            ]
+        
         # Create temporary ZIP file
         temp_zip_path = tempfile.mktemp(suffix='.zip')
         try:
-            with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add all files from the directory
-                for root, _, files in os.walk(full_task_dir):
-                    for file in files:
-                        fp = Path(root) / file
-                        # Preserve relative structure inside zip
-                        arcname = str(fp.relative_to(full_task_dir))
-                        zipf.write(str(fp), arcname)
+            with observe_stage("zip"), zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                # Preserve relative structure inside zip
+                for arcname in arcnames:
+                    file_path = full_task_dir / arcname
+                    if not file_path.is_file():
+                        # Removed since the manifest was built; leave it out rather than fail the download
+                        logger.warning(f"[ZIP] Skipping missing file {arcname} of run {run_id}")
+                        continue
+                    zipf.write(str(file_path), arcname)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to create ZIP file: {str(e)}")
         
@@ -3621,7 +3621,19 @@ async def execute_excel2jmp_node(
             except Exception:
                 pass
         
-        # Generate files
+        # Create timestamped pair folder
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        pair_id = str(uuid.uuid4())[:8]
+        pair_folder = output_path / f"pair_{timestamp}_{pair_id}"
+        pair_folder.mkdir(parents=True, exist_ok=True)
+        
+        csv_filename = f"data_{timestamp}_{pair_id}.csv"
+        jsl_filename = f"script_{timestamp}_{pair_id}.jsl"
+        
+        csv_path = pair_folder / csv_filename
+        jsl_path = pair_folder / jsl_filename
+        
+        # Generate files (the CSV is streamed into the pair folder)
         file_result = file_processor.generate_files(
             df_meta,
             process_result["processed_data"],
@@ -3632,28 +3644,15 @@ async def execute_excel2jmp_node(
             list_check_values=list_check_list,
             value_order=value_order_list,
             caption_box_statistics=caption_box_stats_list,
+            csv_path=str(csv_path),
         )
         
         if not file_result.get("success"):
+            shutil.rmtree(pair_folder, ignore_errors=True)
             raise HTTPException(status_code=400, detail=f"File generation failed: {file_result.get('error')}")
         
-        # Create timestamped pair folder
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pair_id = str(uuid.uuid4())[:8]
-        pair_folder = output_path / f"pair_{timestamp}_{pair_id}"
-        pair_folder.mkdir(parents=True, exist_ok=True)
-        
-        # Save CSV and JSL files
-        csv_content = file_result["files"]["csv_content"]
+        # Save JSL file
         jsl_content = file_result["files"]["jsl_content"]
-        
-        csv_filename = f"data_{timestamp}_{pair_id}.csv"
-        jsl_filename = f"script_{timestamp}_{pair_id}.jsl"
-        
-        csv_path = pair_folder / csv_filename
-        jsl_path = pair_folder / jsl_filename
-        
-        csv_path.write_text(csv_content, encoding='utf-8')
         jsl_path.write_text(jsl_content, encoding='utf-8')
         
         # Set JSL file permissions
@@ -3889,6 +3888,7 @@ async def run_jmp_from_pair(
         from app.core.websocket import publish_run_update
         from app.models import Run, RunStatus, Artifact
         from app.core.celery import celery_app
+        from app.core.tracing import celery_headers
         
         async with AsyncSessionLocal() as create_db:
             # Create run
@@ -4026,7 +4026,7 @@ Open("{absolute_csv_path}");
             await create_db.commit()
             
             # Queue Celery task
-            celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+            celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
             
             # Publish status
             await publish_run_update(str(run.id), {
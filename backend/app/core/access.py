@@ -0,0 +1,215 @@
+"""
+Shared project access control with a Redis-backed auth cache.
+
+Every authenticated request used to load the ``AppUser`` row, and every project
+endpoint then ran its own copy of ``check_project_access`` with separate
+``Project`` and ``ProjectMember`` queries. This module is the single place that
+resolves who a user is and what role they hold on a project:
+
+- user records are cached as snapshots under ``access:user:{id}`` and merged
+  back into the request's session without a SELECT;
+- (project, user) -> membership role is cached under
+  ``access:role:{project_id}:{user_id}`` (including "not a member").
+
+Both live in Redis so all API processes share them, expire after a short TTL,
+and are invalidated explicitly when users or memberships change. If Redis is
+unavailable the lookups fall back to the database.
+
+Endpoint modules keep their own policy (guest access, required roles, owner-only
+actions) as thin wrappers around ``get_project_access``.
+"""
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models import AppUser, Project, ProjectMember
+
+logger = logging.getLogger(__name__)
+
+USER_KEY = "access:user:{user_id}"
+ROLE_KEY = "access:role:{project_id}:{user_id}"
+NO_ROLE = "-"
+
+# Columns kept in the user snapshot; password_hash deliberately stays out of Redis
+_USER_COLUMNS = ("email", "display_name", "department_id", "business_group_id", "is_admin", "is_guest")
+_USER_UUID_COLUMNS = ("department_id", "business_group_id")
+_USER_DATETIME_COLUMNS = ("created_at", "last_login")
+
+
+@dataclass
+class ProjectAccess:
+    """A project and the caller's standing on it."""
+    project: Project
+    is_admin: bool = False
+    is_owner: bool = False
+    member_role: Optional[str] = None  # ProjectMember.role as stored (RoleEnum value)
+
+    @property
+    def is_member(self) -> bool:
+        return self.member_role is not None
+
+
+async def _get_cache():
+    if not settings.ACCESS_CACHE_ENABLED:
+        return None
+    from app.core.websocket import get_redis
+    try:
+        return await get_redis()
+    except Exception as e:
+        logger.warning(f"[ACCESS] Redis unavailable, skipping auth cache: {e}")
+        return None
+
+
+async def _cache_get(key: str) -> Optional[str]:
+    client = await _get_cache()
+    if client is None:
+        return None
+    try:
+        value = await client.get(key)
+    except Exception as e:
+        logger.warning(f"[ACCESS] Cache read failed for {key}: {e}")
+        return None
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def _cache_set(key: str, value: str, ttl: int) -> None:
+    client = await _get_cache()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.warning(f"[ACCESS] Cache write failed for {key}: {e}")
+
+
+async def _cache_delete(*keys: str) -> None:
+    client = await _get_cache()
+    if client is None:
+        return
+    try:
+        await client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"[ACCESS] Cache invalidation failed for {keys}: {e}")
+
+
+def _user_snapshot(user: AppUser) -> str:
+    data = {"id": str(user.id)}
+    for column in _USER_COLUMNS:
+        value = getattr(user, column)
+        data[column] = str(value) if column in _USER_UUID_COLUMNS and value is not None else value
+    for column in _USER_DATETIME_COLUMNS:
+        value = getattr(user, column)
+        data[column] = value.isoformat() if value is not None else None
+    return json.dumps(data)
+
+
+def _user_from_snapshot(raw: str) -> AppUser:
+    data = json.loads(raw)
+    values = {"id": uuid.UUID(data["id"])}
+    for column in _USER_COLUMNS:
+        value = data.get(column)
+        values[column] = uuid.UUID(value) if column in _USER_UUID_COLUMNS and value else value
+    for column in _USER_DATETIME_COLUMNS:
+        value = data.get(column)
+        values[column] = datetime.fromisoformat(value) if value else None
+    user = AppUser(**values)
+    # Treat it as a clean row loaded earlier so merge(load=False) attaches it without a SELECT
+    make_transient_to_detached(user)
+    return user
+
+
+async def load_user(db: AsyncSession, user_id: uuid.UUID) -> Optional[AppUser]:
+    """
+    Return the user attached to ``db``, from the cache when possible
+
+    Unlike a plain SELECT, ``password_hash`` is not loaded for cached users;
+    callers that need it must ``await db.refresh(user, ["password_hash"])``.
+    """
+    key = USER_KEY.format(user_id=user_id)
+    cached = await _cache_get(key)
+    if cached:
+        try:
+            return await db.merge(_user_from_snapshot(cached), load=False)
+        except Exception as e:
+            logger.warning(f"[ACCESS] Discarding unreadable user snapshot {key}: {e}")
+
+    result = await db.execute(select(AppUser).where(AppUser.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        await _cache_set(key, _user_snapshot(user), settings.ACCESS_USER_CACHE_TTL)
+    return user
+
+
+async def invalidate_user(user_id: uuid.UUID) -> None:
+    """Drop a cached user record; call after changing or deleting the user."""
+    await _cache_delete(USER_KEY.format(user_id=user_id))
+
+
+async def get_member_role(db: AsyncSession, project_id: uuid.UUID, user_id: uuid.UUID) -> Optional[str]:
+    """Membership role of a user on a project, or None if they are not a member."""
+    key = ROLE_KEY.format(project_id=project_id, user_id=user_id)
+    cached = await _cache_get(key)
+    if cached is not None:
+        return None if cached == NO_ROLE else cached
+
+    result = await db.execute(
+        select(ProjectMember.role).where(
+            ProjectMember.project_id == project_id,
+            ProjectMember.user_id == user_id
+        )
+    )
+    role = result.scalar_one_or_none()
+    await _cache_set(key, role if role is not None else NO_ROLE, settings.ACCESS_ROLE_CACHE_TTL)
+    return role
+
+
+async def invalidate_member(project_id, user_id) -> None:
+    """Drop a cached (project, user) role; call after adding, changing or removing a membership."""
+    await _cache_delete(ROLE_KEY.format(project_id=project_id, user_id=user_id))
+
+
+async def load_project(db: AsyncSession, project_id: uuid.UUID, include_deleted: bool = True) -> Project:
+    """Load a project or raise 404."""
+    query = select(Project).where(Project.id == project_id)
+    if not include_deleted:
+        query = query.where(Project.deleted_at.is_(None))
+    project = (await db.execute(query)).scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+async def get_project_access(
+    db: AsyncSession,
+    project_id,
+    user: Optional[AppUser],
+    include_deleted: bool = True
+) -> ProjectAccess:
+    """
+    Resolve a user's standing on a project
+
+    Raises 404 if the project doesn't exist. Owners are answered from the
+    project row; other authenticated users need the (cached) membership
+    lookup. Whether that standing is enough is up to the calling endpoint.
+    """
+    if not isinstance(project_id, uuid.UUID):
+        project_id = uuid.UUID(str(project_id))
+    project = await load_project(db, project_id, include_deleted=include_deleted)
+    if user is None:
+        return ProjectAccess(project=project)
+    if project.owner_id == user.id:
+        return ProjectAccess(project=project, is_admin=bool(user.is_admin), is_owner=True)
+    return ProjectAccess(
+        project=project,
+        is_admin=bool(user.is_admin),
+        member_role=await get_member_role(db, project_id, user.id)
+    )
@@ -11,6 +11,7 @@ import uuid
 
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.access import load_user
 from app.models import AppUser
 
 # Password hashing
@@ -98,7 +99,10 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_id(db, uuid.UUID(user_id))
+    try:
+        user = await load_user(db, uuid.UUID(user_id))
+    except ValueError:
+        raise credentials_exception
     if user is None:
         raise credentials_exception
     
@@ -120,8 +124,10 @@ async def get_current_user_optional(
     except JWTError:
         return None
     
-    user = await get_user_by_id(db, uuid.UUID(user_id))
-    return user
+    try:
+        return await load_user(db, uuid.UUID(user_id))
+    except ValueError:
+        return None
 
 async def create_guest_user(db: AsyncSession) -> AppUser:
     """Create a temporary guest user."""
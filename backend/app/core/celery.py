@@ -1,7 +1,12 @@
 from celery import Celery
-from celery.signals import task_prerun, task_postrun, task_failure
+from celery.signals import (
+    task_prerun, task_postrun, task_failure, worker_init, worker_process_init, worker_process_shutdown
+)
 import logging
+import os
+import time
 from app.core.config import settings
+from app.core.metrics import CELERY_TASK_SECONDS, mark_process_dead, start_worker_exporter
 
 # Create Celery instance
 celery_app = Celery(
@@ -22,14 +27,21 @@ celery_app.conf.update(
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=1,  # Restart worker after each task
+    # Warm workers: one event loop and connection pool per process (app/worker/runtime.py),
+    # recycled on memory growth instead of after every task
+    worker_max_tasks_per_child=settings.CELERY_MAX_TASKS_PER_CHILD or None,
+    worker_max_memory_per_child=settings.CELERY_MAX_MEMORY_PER_CHILD_MB * 1024,  # KB
 )
 
 # Signal hooks for richer debug logs
 logger = logging.getLogger(__name__)
 
+# task id -> perf_counter at prerun, for celery_task_duration_seconds
+_task_started = {}
+
 @task_prerun.connect
 def _on_task_prerun(sender=None, task_id=None, task=None, args=None, kwargs=None, **extras):
+    _task_started[task_id] = time.perf_counter()
     try:
         logger.info("[Celery] Task received: %s id=%s args=%s kwargs=%s", sender, task_id, args, kwargs)
     except Exception:
@@ -37,11 +49,31 @@ def _on_task_prerun(sender=None, task_id=None, task=None, args=None, kwargs=None
 
 @task_postrun.connect
 def _on_task_postrun(sender=None, task_id=None, retval=None, state=None, **extras):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_SECONDS.labels(task=getattr(sender, "name", str(sender)), state=state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
     try:
         logger.info("[Celery] Task finished: %s id=%s state=%s retval_summary=%s", sender, task_id, state, str(retval)[:200])
     except Exception:
         pass
 
+@worker_init.connect
+def _on_worker_init(**extras):
+    start_worker_exporter()
+
+@worker_process_init.connect
+def _on_worker_process_init(**extras):
+    from app.worker.runtime import init_worker_process
+    init_worker_process()
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**extras):
+    from app.worker.runtime import shutdown_worker_process
+    shutdown_worker_process()
+    mark_process_dead(os.getpid())
+
 @task_failure.connect
 def _on_task_failure(sender=None, task_id=None, exception=None, einfo=None, **extras):
     try:
@@ -59,6 +91,7 @@ celery_app.conf.update(
 celery_app.conf.update(
     task_routes={
         'run_jmp_boxplot': {'queue': 'jmp'},
+        'run_jmp_shard': {'queue': 'jmp'},
     }
 )
 
@@ -70,5 +103,9 @@ celery_app.conf.beat_schedule = {
         'task': 'send_scheduled_notifications',
         'schedule': crontab(minute='*'),  # Run every minute to check for scheduled notifications
     },
+    'refresh-admin-stats': {
+        'task': 'refresh_admin_stats',
+        'schedule': float(settings.ADMIN_STATS_REFRESH_SECONDS),
+    },
 }
 celery_app.conf.timezone = 'UTC'
@@ -1,14 +1,100 @@
+import logging
+import sys
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.db_metrics import instrument_engine, query_stats
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing per process type. API processes serve many concurrent requests and
+# keep their connections busy, so stale connections are handled by pool_recycle
+# rather than a ping on every checkout. Worker processes run one task at a time
+# and can sit idle between tasks, so they keep a small pool and ping it; beat
+# only enqueues tasks.
+ENGINE_PROFILES = {
+    "api": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": False},
+    "worker": {"pool_size": 2, "max_overflow": 4, "pool_pre_ping": True},
+    "beat": {"pool_size": 1, "max_overflow": 1, "pool_pre_ping": True},
+}
+
+
+def resolve_engine_profile() -> str:
+    """DB_ENGINE_PROFILE, else guessed from how the process was started."""
+    profile = settings.DB_ENGINE_PROFILE
+    if not profile:
+        argv = [arg.lower() for arg in sys.argv]
+        if any("celery" in arg for arg in argv):
+            profile = "beat" if "beat" in argv else "worker"
+        else:
+            profile = "api"
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE {profile!r}; expected one of {sorted(ENGINE_PROFILES)}")
+    return profile
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            query_stats.record_pool_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        query_stats.record_pool_wait(time.perf_counter() - started)
+        return connection
+
+
+def _create_engine(url: str, name: str, profile: str):
+    options = dict(ENGINE_PROFILES[profile])
+    if settings.DB_POOL_SIZE is not None:
+        options["pool_size"] = settings.DB_POOL_SIZE
+    if settings.DB_MAX_OVERFLOW is not None:
+        options["max_overflow"] = settings.DB_MAX_OVERFLOW
+
+    connect_args = {}
+    url = make_url(url)
+    if url.drivername.endswith("+asyncpg"):
+        # SQLAlchemy's per-connection prepared statement cache and asyncpg's own
+        # statement cache; both must be 0 behind pgbouncer in transaction mode
+        if "prepared_statement_cache_size" not in url.query:
+            url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+
+    new_engine = create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=TimedAsyncQueuePool,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=connect_args,
+        **options,
+    )
+    instrument_engine(new_engine, name)
+    logger.info(
+        f"[DB] {name} engine ({profile} profile): pool_size={options['pool_size']} "
+        f"max_overflow={options['max_overflow']} pre_ping={options['pool_pre_ping']}"
+    )
+    return new_engine
+
+
+ENGINE_PROFILE = resolve_engine_profile()
 
 # Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-    pool_recycle=300,
+engine = _create_engine(settings.DATABASE_URL, "primary", ENGINE_PROFILE)
+
+# Read-only traffic goes to the replica when one is configured
+read_engine = (
+    _create_engine(settings.DATABASE_REPLICA_URL, "replica", ENGINE_PROFILE)
+    if settings.DATABASE_REPLICA_URL else engine
 )
 
 # Create async session factory
@@ -18,6 +104,18 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+ReadAsyncSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+
+def all_engines():
+    """Distinct engines of this process (primary, plus the replica if configured)."""
+    return [engine] if read_engine is engine else [engine, read_engine]
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -28,3 +126,11 @@ async def get_db() -> AsyncSession:
             yield session
         finally:
             await session.close()
+
+# Dependency for read-only endpoints; may lag the primary slightly when a replica is configured
+async def get_read_db() -> AsyncSession:
+    async with ReadAsyncSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -0,0 +1,192 @@
+"""
+Query timing and connection-pool telemetry.
+
+Engines created in ``app.core.database`` are instrumented here:
+
+- every statement is timed (``before/after_cursor_execute``) and recorded under
+  a fingerprint, i.e. the SQL with parameters, literals and IN-lists collapsed,
+  so ``WHERE id = $1`` for different ids is one entry. Each fingerprint keeps
+  its call count, total time and a window of recent durations from which
+  p50/p99 are computed on demand;
+- statements slower than DB_SLOW_QUERY_MS are logged with ``[DB]``;
+- pool checkouts are timed into a cumulative histogram, so waiting for a free
+  connection (pool too small) is visible separately from slow SQL.
+
+Stats are per process and kept in memory; ``query_stats.snapshot()`` is served
+by GET /admin/db-stats.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the pool-wait histogram buckets; +Inf is implicit
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_IN_LIST = re.compile(r"\(\s*(?:\$\d+|%s|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%s|%\(\w+\)s|\?))+\s*\)")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> Tuple[str, str]:
+    """Normalized SQL and a short id for it."""
+    normalized = _STRING.sub("?", statement)
+    normalized = _IN_LIST.sub("(?)", normalized)
+    normalized = _PARAM.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class _StatementStats:
+    __slots__ = ("engine", "sql", "calls", "total", "max", "samples")
+
+    def __init__(self, engine: str, sql: str):
+        self.engine = engine
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=settings.DB_QUERY_STATS_SAMPLES)
+
+
+class QueryStats:
+    """In-process registry of statement timings and pool waits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements: Dict[Tuple[str, str], _StatementStats] = {}
+        self._dropped = 0
+        self._pool_wait_counts = [0] * (len(POOL_WAIT_BUCKETS) + 1)
+        self._pool_wait_sum = 0.0
+        self._pool_timeouts = 0
+        self.started_at = time.time()
+
+    def record_query(self, engine: str, statement: str, seconds: float) -> None:
+        key_id, sql = fingerprint(statement)
+        key = (engine, key_id)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= settings.DB_QUERY_STATS_MAX_FINGERPRINTS:
+                    self._dropped += 1
+                    return
+                stats = self._statements[key] = _StatementStats(engine, sql)
+            stats.calls += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.samples.append(seconds)
+
+    def record_pool_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self._pool_timeouts += 1
+            for i, bound in enumerate(POOL_WAIT_BUCKETS):
+                if seconds <= bound:
+                    self._pool_wait_counts[i] += 1
+                    break
+            else:
+                self._pool_wait_counts[-1] += 1
+            self._pool_wait_sum += seconds
+
+    def statements(self) -> List[Dict]:
+        """Every fingerprint with count, total and p50/p99/max in milliseconds."""
+        with self._lock:
+            items = [(key, stats, sorted(stats.samples)) for key, stats in self._statements.items()]
+        result = []
+        for (engine, key_id), stats, ordered in items:
+            result.append({
+                "fingerprint": key_id,
+                "engine": engine,
+                "sql": stats.sql[:500],
+                "calls": stats.calls,
+                "total_ms": round(stats.total * 1000, 2),
+                "mean_ms": round(stats.total / stats.calls * 1000, 3) if stats.calls else None,
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3) if ordered else None,
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3) if ordered else None,
+                "max_ms": round(stats.max * 1000, 3),
+            })
+        return result
+
+    def pool_wait_histogram(self) -> Dict:
+        """Cumulative pool checkout wait histogram (Prometheus-style ``le`` buckets)."""
+        with self._lock:
+            counts = list(self._pool_wait_counts)
+            total = self._pool_wait_sum
+            timeouts = self._pool_timeouts
+        buckets, running = [], 0
+        for bound, count in zip(list(POOL_WAIT_BUCKETS) + [float("inf")], counts):
+            running += count
+            buckets.append({"le": "+Inf" if bound == float("inf") else bound, "count": running})
+        return {"buckets": buckets, "count": running, "sum_seconds": round(total, 6), "timeouts": timeouts}
+
+    def snapshot(self, limit: int = 25, order_by: str = "total_ms") -> Dict:
+        statements = sorted(self.statements(), key=lambda s: s.get(order_by) or 0, reverse=True)
+        with self._lock:
+            dropped = self._dropped
+        return {
+            "since": self.started_at,
+            "fingerprints": len(statements),
+            "untracked_statements": dropped,
+            "statements": statements[:limit],
+            "pool_wait": self.pool_wait_histogram(),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._dropped = 0
+            self._pool_wait_counts = [0] * (len(POOL_WAIT_BUCKETS) + 1)
+            self._pool_wait_sum = 0.0
+            self._pool_timeouts = 0
+            self.started_at = time.time()
+
+
+query_stats = QueryStats()
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Time every statement run through ``engine`` and log slow ones."""
+    if not settings.DB_QUERY_STATS_ENABLED:
+        return
+    sync_engine = engine.sync_engine
+    slow_seconds = settings.DB_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        query_stats.record_query(name, statement, elapsed)
+        if elapsed >= slow_seconds:
+            logger.warning(f"[DB] Slow query on {name} ({elapsed * 1000:.0f} ms): {_SPACE.sub(' ', statement)[:500]}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
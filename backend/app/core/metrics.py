@@ -0,0 +1,308 @@
+"""
+Prometheus metrics for the API, Celery workers and the JMP pipeline.
+
+Exposed on ``GET /metrics`` by the API and on ``WORKER_METRICS_PORT`` by each
+Celery worker (``start_worker_exporter``, started from the ``worker_init``
+signal). Celery's prefork children and multi-process uvicorn need
+PROMETHEUS_MULTIPROC_DIR pointing at an empty, writable directory so every
+process's samples are aggregated; without it each process only reports its
+own.
+
+What is measured:
+
+- ``http_request_duration_seconds``: latency per method, route template and status
+- ``celery_task_duration_seconds``: wall time per task and final state
+- ``celery_queue_depth``: messages waiting in each broker queue, plus the JMP
+  agent job queue (read from Redis at scrape time)
+- ``run_stage_duration_seconds``: a run split into file_prep, jmp_launch,
+  jmp_render, ocr, zip and db_finalize
+- ``jmp_slots_busy`` / ``jmp_slot_busy_seconds_total``: JMP slot utilization
+- ``jmp_images_rendered_total``: rate() gives images per second
+- ``storage_bytes_written_total``: bytes written per kind (uploads, task output)
+- ``db_pool_wait_seconds`` / ``db_query_seconds``: from ``app.core.db_metrics``
+- ``extension_job_queue_seconds`` / ``extension_job_duration_seconds`` /
+  ``extension_jobs_waiting``: extension work in the process pool
+  (``extensions.base.executor``)
+
+prometheus_client is optional: without it every metric is a no-op and
+/metrics answers 503.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Optional imports for metrics export
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess, start_http_server
+    )
+    from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    print("Warning: prometheus_client not available. Install with: pip install prometheus-client")
+
+RUN_STAGES = ("file_prep", "jmp_launch", "jmp_render", "ocr", "zip", "db_finalize")
+
+# Seconds; JMP stages run from seconds to tens of minutes
+_REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+_JOB_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class _NoopMetric:
+    """Stand-in when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+def _histogram(*args, **kwargs):
+    return Histogram(*args, **kwargs) if METRICS_AVAILABLE else _NoopMetric()
+
+
+def _counter(*args, **kwargs):
+    return Counter(*args, **kwargs) if METRICS_AVAILABLE else _NoopMetric()
+
+
+def _gauge(*args, **kwargs):
+    return Gauge(*args, **kwargs) if METRICS_AVAILABLE else _NoopMetric()
+
+
+HTTP_REQUEST_SECONDS = _histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency", ["method", "route", "status"], buckets=_REQUEST_BUCKETS
+)
+CELERY_TASK_SECONDS = _histogram(
+    "celery_task_duration_seconds",
+    "Celery task wall time", ["task", "state"], buckets=_STAGE_BUCKETS
+)
+RUN_STAGE_SECONDS = _histogram(
+    "run_stage_duration_seconds",
+    "Time spent per run pipeline stage", ["stage"], buckets=_STAGE_BUCKETS
+)
+JMP_SLOTS_BUSY = _gauge(
+    "jmp_slots_busy",
+    "JMP slots currently rendering", multiprocess_mode="livesum"
+)
+JMP_SLOT_BUSY_SECONDS = _counter(
+    "jmp_slot_busy_seconds",
+    "Seconds JMP slots spent rendering"
+)
+JMP_IMAGES_RENDERED = _counter(
+    "jmp_images_rendered",
+    "Images produced by JMP runs"
+)
+STORAGE_BYTES_WRITTEN = _counter(
+    "storage_bytes_written",
+    "Bytes written to file storage", ["kind"]
+)
+EXTENSION_QUEUE_SECONDS = _histogram(
+    "extension_job_queue_seconds",
+    "Time extension jobs waited for a process pool worker", ["extension"], buckets=_JOB_BUCKETS
+)
+EXTENSION_JOB_SECONDS = _histogram(
+    "extension_job_duration_seconds",
+    "Extension job run time (state: ok, error, timeout, cancelled, rejected)",
+    ["extension", "job", "state"], buckets=_JOB_BUCKETS
+)
+EXTENSION_JOBS_WAITING = _gauge(
+    "extension_jobs_waiting",
+    "Extension jobs waiting for their concurrency limit", ["extension"], multiprocess_mode="livesum"
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time a block as one run pipeline stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        RUN_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def record_stage(stage: str, seconds: Optional[float]) -> None:
+    """Record a stage timed elsewhere (e.g. the ``timings`` JMPRunner returns)."""
+    if seconds is not None:
+        RUN_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def jmp_slot():
+    """Mark a JMP slot busy for the duration of a block."""
+    started = time.perf_counter()
+    JMP_SLOTS_BUSY.inc()
+    try:
+        yield
+    finally:
+        JMP_SLOTS_BUSY.dec()
+        JMP_SLOT_BUSY_SECONDS.inc(time.perf_counter() - started)
+
+
+def record_bytes_written(kind: str, size: Optional[int]) -> None:
+    if size:
+        STORAGE_BYTES_WRITTEN.labels(kind=kind).inc(size)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests
+
+    Requests are labelled with the matched route template
+    (``/api/v1/runs/{run_id}``) rather than the raw path, so run and project
+    ids don't explode the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status["code"])
+            ).observe(time.perf_counter() - started)
+
+
+if METRICS_AVAILABLE:
+    class QueueDepthCollector:
+        """Broker queue lengths, read from Redis when scraped."""
+
+        def __init__(self, queues):
+            self.queues = queues
+            self._client = None
+
+        def describe(self):
+            # Nothing to check at registration; avoids a Redis round trip on import
+            return []
+
+        def collect(self):
+            import redis
+            from app.services.jmp_agents import PENDING_JOBS_KEY
+
+            family = GaugeMetricFamily("celery_queue_depth", "Messages waiting per queue", labels=["queue"])
+            try:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2)
+                for queue in self.queues:
+                    family.add_metric([queue], self._client.llen(queue))
+                family.add_metric(["jmp_agents"], self._client.llen(PENDING_JOBS_KEY))
+            except Exception as e:
+                logger.warning(f"[METRICS] Could not read queue depth: {e}")
+            yield family
+
+    class DatabaseStatsCollector:
+        """Pool waits and slowest statements from app.core.db_metrics (this process only)."""
+
+        def collect(self):
+            from app.core.db_metrics import query_stats
+
+            pool_wait = query_stats.pool_wait_histogram()
+            histogram = HistogramMetricFamily("db_pool_wait_seconds", "Time waiting for a pooled DB connection")
+            histogram.add_metric(
+                [],
+                buckets=[(str(bucket["le"]), bucket["count"]) for bucket in pool_wait["buckets"]],
+                sum_value=pool_wait["sum_seconds"]
+            )
+            yield histogram
+
+            timeouts = GaugeMetricFamily("db_pool_timeouts", "Pool checkouts that timed out")
+            timeouts.add_metric([], pool_wait["timeouts"])
+            yield timeouts
+
+            quantiles = GaugeMetricFamily(
+                "db_query_seconds", "Statement latency quantiles per fingerprint",
+                labels=["engine", "fingerprint", "quantile"]
+            )
+            statements = query_stats.snapshot(limit=settings.METRICS_DB_TOP_STATEMENTS)["statements"]
+            for statement in statements:
+                for quantile, key in (("0.5", "p50_ms"), ("0.99", "p99_ms")):
+                    if statement[key] is not None:
+                        quantiles.add_metric(
+                            [statement["engine"], statement["fingerprint"], quantile], statement[key] / 1000
+                        )
+            yield quantiles
+
+
+_collectors_registered = False
+
+
+def _scrape_registry(include_queue_depth: bool):
+    global _collectors_registered
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(DatabaseStatsCollector())
+        if include_queue_depth:
+            registry.register(QueueDepthCollector(settings.METRICS_CELERY_QUEUES))
+        return registry
+    if not _collectors_registered:
+        REGISTRY.register(DatabaseStatsCollector())
+        if include_queue_depth:
+            REGISTRY.register(QueueDepthCollector(settings.METRICS_CELERY_QUEUES))
+        _collectors_registered = True
+    return REGISTRY
+
+
+def render_metrics() -> bytes:
+    """Metrics in the Prometheus text format (blocking: reads Redis)."""
+    return generate_latest(_scrape_registry(include_queue_depth=True))
+
+
+def start_worker_exporter() -> None:
+    """Serve worker metrics on WORKER_METRICS_PORT (0 disables)."""
+    if not METRICS_AVAILABLE or not settings.WORKER_METRICS_PORT:
+        return
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        logger.warning(
+            "[METRICS] PROMETHEUS_MULTIPROC_DIR is not set; the worker exporter only sees the main "
+            "process, so prefork children's task metrics will be missing"
+        )
+    try:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=_scrape_registry(include_queue_depth=False))
+        logger.info(f"[METRICS] Worker metrics exporter listening on :{settings.WORKER_METRICS_PORT}")
+    except OSError as e:
+        logger.warning(f"[METRICS] Could not start worker metrics exporter: {e}")
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a finished process's live gauges from the multiprocess directory."""
+    if METRICS_AVAILABLE and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
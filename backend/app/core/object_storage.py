@@ -0,0 +1,604 @@
+"""
+Pluggable artifact storage backends
+
+``LocalFileStorage`` (app.core.storage) ties every host to one shared
+UPLOADS_DIR. The backends here put artifacts behind one async interface so
+the API, Celery workers and JMP hosts can share an object store instead:
+
+- ``local``: UPLOADS_DIR, as before. Presigned URLs are HMAC-signed links
+  to the API's own upload/download endpoints.
+- ``s3``: an S3-compatible bucket (S3_BUCKET / S3_ENDPOINT_URL; MinIO
+  locally). Large puts are multipart uploads. Presigned URLs go straight
+  to the bucket, and large client uploads get one presigned URL per part.
+- ``tiered``: ``s3`` for worker hosts that need files on disk (pandas,
+  openpyxl, DuckDB, JMP). Objects are kept in a bounded read-through cache
+  (STORAGE_CACHE_DIR, STORAGE_CACHE_MAX_MB) and revalidated against their
+  S3 ETag before use; keys not in S3 fall back to UPLOADS_DIR.
+
+Gets and puts stream in STORAGE_STREAM_CHUNK_SIZE chunks. ``local_path``
+returns a readable file for code that needs a path, so path-based callers
+can move over one by one. Use ``get_storage()`` for the configured backend.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlencode
+
+from app.core.config import settings
+from app.core.metrics import record_bytes_written
+from app.core.storage import LocalFileStorage, local_storage
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class StorageKeyError(ValueError):
+    """A storage key that is absolute or escapes the storage root"""
+
+
+def check_key(storage_key: str) -> str:
+    """Normalized relative key; raises StorageKeyError for absolute keys or '..' segments"""
+    key = storage_key.replace("\\", "/")
+    path = PurePosixPath(key)
+    if not key or path.is_absolute() or ".." in path.parts or (path.parts and ":" in path.parts[0]):
+        raise StorageKeyError(f"Invalid storage key: {storage_key}")
+    return str(path)
+
+
+async def _aiter_bytes(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def _stream_file(path: Path, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    chunk_size = chunk_size or settings.STORAGE_STREAM_CHUNK_SIZE
+    with open(path, "rb") as handle:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class StorageBackend(ABC):
+    """Async artifact store addressed by relative storage keys"""
+
+    name = "base"
+    supports_multipart = False
+
+    @abstractmethod
+    def stream(self, storage_key: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """The object's bytes in chunks; raises FileNotFoundError if it does not exist"""
+
+    @abstractmethod
+    async def put_stream(self, storage_key: str, chunks: AsyncIterable[bytes],
+                         content_type: Optional[str] = None) -> int:
+        """Store the chunks as one object; returns the number of bytes written"""
+
+    @abstractmethod
+    async def size(self, storage_key: str) -> Optional[int]:
+        """Object size in bytes, or None if it does not exist"""
+
+    @abstractmethod
+    async def delete(self, storage_key: str) -> bool:
+        """Delete the object; False if there was nothing to delete"""
+
+    @abstractmethod
+    def presign_upload(self, storage_key: str, content_type: str, expires_in: int,
+                       file_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        {"url", "method", "headers"} a client can upload the object with
+
+        Backends that hand out URLs straight to the bucket sign ``file_size``
+        into them, so the upload must be exactly that long.
+        """
+
+    @abstractmethod
+    def presign_download(self, storage_key: str, expires_in: int) -> str:
+        """A URL the object can be downloaded from until it expires"""
+
+    @abstractmethod
+    async def local_path(self, storage_key: str) -> Path:
+        """A local file with the object's content (for pandas, openpyxl, DuckDB, ...)"""
+
+    async def exists(self, storage_key: str) -> bool:
+        return await self.size(storage_key) is not None
+
+    async def get_bytes(self, storage_key: str) -> Optional[bytes]:
+        """The whole object, or None if it does not exist; prefer ``stream`` for large objects"""
+        try:
+            return b"".join([chunk async for chunk in self.stream(storage_key)])
+        except FileNotFoundError:
+            return None
+
+    async def put_bytes(self, storage_key: str, data: bytes, content_type: Optional[str] = None) -> int:
+        return await self.put_stream(storage_key, _aiter_bytes(data), content_type)
+
+    def presign_multipart(self, storage_key: str, content_type: str, file_size: int,
+                          expires_in: int) -> Optional[Dict[str, Any]]:
+        """{"upload_id", "part_size", "part_urls"} for a multipart client upload, if supported"""
+        return None
+
+    async def complete_multipart(self, storage_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError(f"{self.name} storage does not support multipart uploads")
+
+
+# Local ---------------------------------------------------------------------------------------
+
+
+def sign_request(method: str, storage_key: str, expires: int) -> str:
+    """HMAC of a local presigned request, keyed by SECRET_KEY"""
+    message = f"{method}\n{storage_key}\n{expires}".encode("utf-8")
+    digest = hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def verify_signature(method: str, storage_key: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_request(method, storage_key, expires), signature or "")
+
+
+class LocalStorageBackend(StorageBackend):
+    """Objects as files under UPLOADS_DIR (through LocalFileStorage)"""
+
+    name = "local"
+
+    def __init__(self, files: LocalFileStorage):
+        self.files = files
+
+    def _path(self, storage_key: str) -> Path:
+        return self.files.base_path / check_key(storage_key)
+
+    async def stream(self, storage_key: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        path = await self.local_path(storage_key)
+        async for chunk in _stream_file(path, chunk_size):
+            yield chunk
+
+    async def put_stream(self, storage_key: str, chunks: AsyncIterable[bytes],
+                         content_type: Optional[str] = None) -> int:
+        path = self._path(storage_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to the target and renamed, so readers never see a partial file
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.part")
+        written = 0
+        try:
+            with open(temp_path, "wb") as handle:
+                async for chunk in chunks:
+                    await asyncio.to_thread(handle.write, chunk)
+                    written += len(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        record_bytes_written("upload", written)
+        return written
+
+    async def size(self, storage_key: str) -> Optional[int]:
+        path = self._path(storage_key)
+        return path.stat().st_size if path.is_file() else None
+
+    async def delete(self, storage_key: str) -> bool:
+        return self.files.delete_file(check_key(storage_key))
+
+    def _signed_url(self, endpoint: str, method: str, storage_key: str, expires_in: int) -> str:
+        key = check_key(storage_key)
+        expires = int(time.time()) + expires_in
+        query = urlencode({"storage_key": key, "expires": expires, "signature": sign_request(method, key, expires)})
+        return f"{settings.API_V1_STR}/uploads/{endpoint}?{query}"
+
+    def presign_upload(self, storage_key: str, content_type: str, expires_in: int,
+                       file_size: Optional[int] = None) -> Dict[str, Any]:
+        # Multipart form POST (field "file") to the API's upload endpoint, which enforces the size limit
+        return {"url": self._signed_url("upload", "POST", storage_key, expires_in), "method": "POST", "headers": {}}
+
+    def presign_download(self, storage_key: str, expires_in: int) -> str:
+        return self._signed_url("object", "GET", storage_key, expires_in)
+
+    async def local_path(self, storage_key: str) -> Path:
+        path = self._path(storage_key)
+        if not path.is_file():
+            raise FileNotFoundError(f"Artifact not found: {storage_key}")
+        return path
+
+
+# S3 ------------------------------------------------------------------------------------------
+
+
+def s3_client():
+    """boto3 S3 client for the configured endpoint (MinIO when S3_ENDPOINT_URL is set)"""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=settings.S3_ENDPOINT_URL or None,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+        region_name=settings.AWS_REGION,
+        # Path-style addressing works for MinIO and AWS alike
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    )
+
+
+def _is_not_found(error: Exception) -> bool:
+    response = getattr(error, "response", None) or {}
+    code = str(response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3StorageBackend(StorageBackend):
+    """Objects in an S3-compatible bucket; boto3 calls run on worker threads"""
+
+    name = "s3"
+    supports_multipart = True
+
+    def __init__(self, bucket: Optional[str] = None, client=None):
+        self.bucket = bucket or settings.S3_BUCKET
+        self.client = client or s3_client()
+        self.part_size = max(settings.S3_MULTIPART_CHUNK_MB, 5) * MB  # S3's minimum part size is 5 MB
+        self.threshold = max(settings.S3_MULTIPART_THRESHOLD_MB * MB, self.part_size)
+
+    async def stream(self, storage_key: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        key = check_key(storage_key)
+        chunk_size = chunk_size or settings.STORAGE_STREAM_CHUNK_SIZE
+        try:
+            response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"Artifact not found: {storage_key}")
+            raise
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def put_stream(self, storage_key: str, chunks: AsyncIterable[bytes],
+                         content_type: Optional[str] = None) -> int:
+        return (await self.upload_stream(storage_key, chunks, content_type))["size"]
+
+    async def upload_stream(self, storage_key: str, chunks: AsyncIterable[bytes],
+                            content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        put_object for small objects; a multipart upload once the stream passes the threshold
+
+        Returns {"size", "etag"}, the ETag S3 gave this write (not a later HEAD,
+        which may already see another writer's object).
+        """
+        key = check_key(storage_key)
+        extra = {"ContentType": content_type} if content_type else {}
+        buffer = bytearray()
+        upload_id = None
+        parts: List[Dict[str, Any]] = []
+        written = 0
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                written += len(chunk)
+                if upload_id is None and len(buffer) < self.threshold:
+                    continue
+                if upload_id is None:
+                    created = await asyncio.to_thread(
+                        self.client.create_multipart_upload, Bucket=self.bucket, Key=key, **extra
+                    )
+                    upload_id = created["UploadId"]
+                while len(buffer) >= self.part_size:
+                    await self._upload_part(key, upload_id, parts, bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+
+            if upload_id is None:
+                response = await asyncio.to_thread(
+                    self.client.put_object, Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra
+                )
+            else:
+                if buffer or not parts:
+                    await self._upload_part(key, upload_id, parts, bytes(buffer))
+                response = await asyncio.to_thread(
+                    self.client.complete_multipart_upload, Bucket=self.bucket, Key=key,
+                    UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+                except Exception as e:
+                    logger.warning(f"[Storage] Failed to abort multipart upload of {key}: {e}")
+            raise
+        record_bytes_written("upload", written)
+        return {"size": written, "etag": response["ETag"]}
+
+    async def _upload_part(self, key: str, upload_id: str, parts: List[Dict[str, Any]], data: bytes) -> None:
+        number = len(parts) + 1
+        response = await asyncio.to_thread(
+            self.client.upload_part, Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data
+        )
+        parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def head(self, storage_key: str) -> Optional[Dict[str, Any]]:
+        """{"size", "etag"} of the object, or None if it does not exist"""
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=check_key(storage_key))
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return {"size": int(response["ContentLength"]), "etag": response["ETag"]}
+
+    async def size(self, storage_key: str) -> Optional[int]:
+        head = await self.head(storage_key)
+        return None if head is None else head["size"]
+
+    async def delete(self, storage_key: str) -> bool:
+        key = check_key(storage_key)
+        if await self.size(key) is None:
+            return False
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+        return True
+
+    def presign_upload(self, storage_key: str, content_type: str, expires_in: int,
+                       file_size: Optional[int] = None) -> Dict[str, Any]:
+        if file_size is None:
+            raise ValueError("file_size is required for uploads straight to the bucket")
+        # Content-Length is a signed header: S3 rejects a body of any other length
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket, "Key": check_key(storage_key),
+                "ContentType": content_type, "ContentLength": file_size,
+            },
+            ExpiresIn=expires_in,
+        )
+        return {"url": url, "method": "PUT", "headers": {"Content-Type": content_type}}
+
+    def presign_download(self, storage_key: str, expires_in: int) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": check_key(storage_key)}, ExpiresIn=expires_in
+        )
+
+    def presign_multipart(self, storage_key: str, content_type: str, file_size: int,
+                          expires_in: int) -> Optional[Dict[str, Any]]:
+        if file_size < self.threshold:
+            return None
+        key = check_key(storage_key)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)["UploadId"]
+        part_count = -(-file_size // self.part_size)
+        # Each part URL is signed for its exact length, so the parts add up to file_size
+        part_urls = [
+            self.client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": self.bucket, "Key": key, "UploadId": upload_id, "PartNumber": number,
+                    "ContentLength": min(self.part_size, file_size - (number - 1) * self.part_size),
+                },
+                ExpiresIn=expires_in,
+            )
+            for number in range(1, part_count + 1)
+        ]
+        return {"upload_id": upload_id, "part_size": self.part_size, "part_urls": part_urls}
+
+    async def complete_multipart(self, storage_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        ordered = sorted(
+            ({"PartNumber": int(part["part_number"]), "ETag": part["etag"]} for part in parts),
+            key=lambda part: part["PartNumber"],
+        )
+        await asyncio.to_thread(
+            self.client.complete_multipart_upload, Bucket=self.bucket, Key=check_key(storage_key),
+            UploadId=upload_id, MultipartUpload={"Parts": ordered}
+        )
+
+    async def download_to(self, storage_key: str, path: Path, etag: Optional[str] = None) -> None:
+        """
+        Download to a local file (boto3 fetches large objects in concurrent ranges)
+
+        With ``etag``, the download fails instead of mixing versions if the object changes meanwhile.
+        """
+        extra = {"IfMatch": etag} if etag else None
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, check_key(storage_key), str(path), ExtraArgs=extra
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"Artifact not found: {storage_key}")
+            raise
+
+    async def local_path(self, storage_key: str) -> Path:
+        raise NotImplementedError("s3 storage keeps no local files; use STORAGE_BACKEND=tiered on hosts that need them")
+
+
+# Tiered --------------------------------------------------------------------------------------
+
+
+class ReadThroughCache:
+    """
+    Files under a cache directory, evicted least recently used first beyond ``max_bytes``
+
+    Each file is stored with the ETag of the object it was copied from (in a
+    ``.<name>.etag`` file next to it), so a copy is only used while the
+    remote object is unchanged.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, storage_key: str) -> Path:
+        return self.directory / check_key(storage_key)
+
+    @staticmethod
+    def _etag_path(path: Path) -> Path:
+        return path.with_name(f".{path.name}.etag")
+
+    def get(self, storage_key: str, etag: str) -> Optional[Path]:
+        """The cached copy if it was taken from the object version ``etag``"""
+        path = self.path(storage_key)
+        try:
+            if self._etag_path(path).read_text() != etag or not path.is_file():
+                return None
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # recency for eviction
+        return path
+
+    def temp_path(self, storage_key: str) -> Path:
+        path = self.path(storage_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.part")
+
+    def commit(self, temp_path: Path, storage_key: str, etag: str) -> Path:
+        path = self.path(storage_key)
+        os.replace(temp_path, path)
+        self._etag_path(path).write_text(etag)
+        self.evict()
+        return path
+
+    def discard(self, storage_key: str) -> None:
+        path = self.path(storage_key)
+        self._etag_path(path).unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache is within max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.startswith(".") and name.endswith((".part", ".etag")):
+                        continue
+                    path = Path(root) / name
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                self._etag_path(path).unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            logger.info(f"[Storage] Cache evicted down to {total // MB} MB")
+
+
+class TieredStorageBackend(StorageBackend):
+    """
+    S3 as the store of record with a bounded local read-through cache
+
+    Writes go to S3 and into the cache; reads use the cached copy while its
+    ETag still matches the object's, and download it again otherwise. Keys
+    missing from S3 are looked up in UPLOADS_DIR, where path-based code
+    still writes through LocalFileStorage.
+    """
+
+    name = "tiered"
+    supports_multipart = True
+
+    def __init__(self, remote: S3StorageBackend, local: LocalStorageBackend, cache: ReadThroughCache):
+        self.remote = remote
+        self.local = local
+        self.cache = cache
+
+    async def stream(self, storage_key: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        path = await self.local_path(storage_key)
+        async for chunk in _stream_file(path, chunk_size):
+            yield chunk
+
+    async def put_stream(self, storage_key: str, chunks: AsyncIterable[bytes],
+                         content_type: Optional[str] = None) -> int:
+        """Upload to S3 while writing the cached copy, labelled with the ETag of this write"""
+        async def tee() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                yield chunk
+
+        self.cache.discard(storage_key)
+        temp_path = self.cache.temp_path(storage_key)
+        try:
+            with open(temp_path, "wb") as handle:
+                uploaded = await self.remote.upload_stream(storage_key, tee(), content_type)
+            self.cache.commit(temp_path, storage_key, uploaded["etag"])
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return uploaded["size"]
+
+    async def size(self, storage_key: str) -> Optional[int]:
+        size = await self.remote.size(storage_key)
+        if size is None:
+            size = await self.local.size(storage_key)
+        return size
+
+    async def delete(self, storage_key: str) -> bool:
+        self.cache.discard(storage_key)
+        deleted = await self.local.delete(storage_key)
+        return await self.remote.delete(storage_key) or deleted
+
+    def presign_upload(self, storage_key: str, content_type: str, expires_in: int,
+                       file_size: Optional[int] = None) -> Dict[str, Any]:
+        return self.remote.presign_upload(storage_key, content_type, expires_in, file_size)
+
+    def presign_download(self, storage_key: str, expires_in: int) -> str:
+        return self.remote.presign_download(storage_key, expires_in)
+
+    def presign_multipart(self, storage_key: str, content_type: str, file_size: int,
+                          expires_in: int) -> Optional[Dict[str, Any]]:
+        return self.remote.presign_multipart(storage_key, content_type, file_size, expires_in)
+
+    async def complete_multipart(self, storage_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        await self.remote.complete_multipart(storage_key, upload_id, parts)
+        self.cache.discard(storage_key)
+
+    async def local_path(self, storage_key: str) -> Path:
+        head = await self.remote.head(storage_key)
+        if head is None:
+            self.cache.discard(storage_key)
+            # Written through LocalFileStorage on this host and never uploaded
+            return await self.local.local_path(storage_key)
+        cached = self.cache.get(storage_key, head["etag"])
+        if cached is not None:
+            return cached
+        temp_path = self.cache.temp_path(storage_key)
+        try:
+            await self.remote.download_to(storage_key, temp_path, etag=head["etag"])
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        logger.info(f"[Storage] Cached {storage_key} from {self.remote.bucket}")
+        return self.cache.commit(temp_path, storage_key, head["etag"])
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> StorageBackend:
+    """The backend selected by STORAGE_BACKEND (local, s3 or tiered)"""
+    kind = settings.STORAGE_BACKEND.lower()
+    if kind == "local":
+        return LocalStorageBackend(local_storage)
+    if kind == "s3":
+        return S3StorageBackend()
+    if kind == "tiered":
+        cache_dir = Path(settings.STORAGE_CACHE_DIR or Path(tempfile.gettempdir()) / "auto-jmp-storage-cache")
+        cache = ReadThroughCache(cache_dir, settings.STORAGE_CACHE_MAX_MB * MB)
+        return TieredStorageBackend(S3StorageBackend(), LocalStorageBackend(local_storage), cache)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Lists ordered by ``created_at DESC, id DESC`` are paged with an opaque cursor
+holding the last row's (created_at, id). Each page is a bounded index range
+scan, so response time doesn't grow with the table like OFFSET (or loading
+everything) does. The cursor of the next page is returned in the
+``X-Next-Cursor`` response header, which keeps list responses plain JSON arrays.
+"""
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a cursor; raises HTTP 400 for malformed values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, created_at_column, id_column, cursor: Optional[str], limit: int):
+    """Order newest first, continue after ``cursor`` and fetch one extra row to detect a next page."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(or_(
+            created_at_column < created_at,
+            and_(created_at_column == created_at, id_column < row_id)
+        ))
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def finish_page(rows: Sequence[Any], limit: int, response: Response) -> List[Any]:
+    """Trim the look-ahead row and publish the next cursor (rows need ``created_at`` and ``id``)."""
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows
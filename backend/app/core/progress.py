@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import current_traceparent
+from app.core.websocket import get_redis, manager
+
+logger = logging.getLogger(__name__)
+
+
+def progress_stream_key(run_id: str) -> str:
+    """Redis Stream key holding the progress events of a run."""
+    return f"run:{run_id}:events"
+
+
+class RunProgressPublisher:
+    """Coalesces run progress updates and publishes them at a fixed rate.
+
+    Producers (the image monitor, JMPRunner log callbacks) call ``update()`` as
+    often as they like; it only records the latest state. A background flush
+    loop publishes that state at most once per ``PROGRESS_FLUSH_INTERVAL_MS``,
+    appending it to the run's Redis Stream and Pub/Sub channel in a single
+    pipeline round trip. Late subscribers replay the stream instead of polling
+    ``get_run_status``.
+    """
+
+    def __init__(self, run_id: str, images_expected: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 seconds_per_image: Optional[float] = None):
+        self.run_id = run_id
+        # Prior from the run timing model, used until the observed rate takes over
+        self.seconds_per_image = seconds_per_image
+        self.flush_interval = flush_interval if flush_interval is not None else settings.PROGRESS_FLUSH_INTERVAL_MS / 1000.0
+        self.state: Dict[str, Any] = {
+            "status": "running",
+            "message": None,
+            "images_done": 0,
+            "images_expected": images_expected,
+        }
+        self._dirty = False
+        self._started_at = time.monotonic()
+        self._first_image_at: Optional[float] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stopped = asyncio.Event()
+
+    def update(self, message: Optional[str] = None, images_done: Optional[int] = None,
+               images_expected: Optional[int] = None, **extra) -> None:
+        """Record the latest progress state. Cheap and safe to call from sync callbacks."""
+        if message is not None:
+            self.state["message"] = message
+        if images_expected is not None:
+            self.state["images_expected"] = images_expected
+        if images_done is not None and images_done != self.state["images_done"]:
+            if self._first_image_at is None and images_done > 0:
+                self._first_image_at = time.monotonic()
+            self.state["images_done"] = images_done
+        self.state.update(extra)
+        self._dirty = True
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimate remaining seconds from the observed image rate (or the prior before the first image)."""
+        done = self.state["images_done"]
+        expected = self.state["images_expected"]
+        if not expected:
+            return None
+        if done >= expected:
+            return 0.0
+        if not done or self._first_image_at is None:
+            if self.seconds_per_image is None:
+                return None
+            return round((expected - done) * self.seconds_per_image, 1)
+        elapsed = time.monotonic() - self._first_image_at
+        if elapsed <= 0:
+            return None
+        rate = done / elapsed
+        return round((expected - done) / rate, 1)
+
+    def snapshot(self, event_type: str = "run_progress") -> Dict[str, Any]:
+        """Build the structured payload for the current state."""
+        done = self.state["images_done"]
+        expected = self.state["images_expected"]
+        message = self.state["message"]
+        if message is None:
+            if done > 0:
+                message = f"Generated {done} image{'s' if done != 1 else ''} so far..."
+            else:
+                message = "Monitoring task folder for images..."
+        payload = dict(self.state)
+        payload.update({
+            "type": event_type,
+            "run_id": self.run_id,
+            "message": message,
+            # Kept for clients that only understand the legacy field
+            "image_count": done,
+            "eta_seconds": self.eta_seconds(),
+            "progress": round(min(done / expected, 1.0), 4) if expected else None,
+            "elapsed_seconds": round(time.monotonic() - self._started_at, 1),
+            "ts": time.time(),
+        })
+        return payload
+
+    async def start(self) -> None:
+        """Start the background flush loop."""
+        if self._flush_task is None:
+            self._stopped.clear()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and publish any pending state."""
+        self._stopped.set()
+        if self._flush_task is not None:
+            try:
+                await asyncio.wait_for(self._flush_task, timeout=self.flush_interval + 1.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Publish the latest state if anything changed since the last flush."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        await publish_progress_events(self.run_id, [self.snapshot()])
+
+    async def publish_now(self, event_type: str, **fields) -> None:
+        """Publish a lifecycle event (started, completed, failed) immediately."""
+        self.update(**fields)
+        self._dirty = False
+        await publish_progress_events(self.run_id, [self.snapshot(event_type)])
+
+    async def _flush_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"[PROGRESS] Failed to flush progress for run {self.run_id}: {e}")
+
+
+async def publish_progress_events(run_id: str, events: List[Dict[str, Any]]) -> None:
+    """Append events to the run stream and fan them out over Pub/Sub in one round trip."""
+    traceparent = current_traceparent()
+    if traceparent:
+        events = [event if "traceparent" in event else {**event, "traceparent": traceparent} for event in events]
+    for event in events:
+        await manager.send_to_run(run_id, event)
+        await manager.send_to_subscribers(run_id, event)
+
+    try:
+        redis_client = await get_redis()
+        stream_key = progress_stream_key(run_id)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                data = json.dumps(event)
+                pipe.xadd(stream_key, {"data": data}, maxlen=settings.PROGRESS_STREAM_MAXLEN, approximate=True)
+                pipe.publish(f"run:{run_id}", data)
+            pipe.expire(stream_key, settings.PROGRESS_STREAM_TTL)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"[PROGRESS] Failed to publish progress for run {run_id}: {e}")
+
+
+async def get_latest_progress(run_id: str) -> Optional[Dict[str, Any]]:
+    """Return the most recent progress event of a run, if any."""
+    try:
+        redis_client = await get_redis()
+        entries = await redis_client.xrevrange(progress_stream_key(run_id), count=1)
+    except Exception as e:
+        logger.warning(f"[PROGRESS] Failed to read progress for run {run_id}: {e}")
+        return None
+    if not entries:
+        return None
+    entry_id, fields = entries[0]
+    return _decode_entry(entry_id, fields)
+
+
+async def read_progress_events(run_id: str, after_id: str = "-", count: int = 100) -> List[Dict[str, Any]]:
+    """Replay progress events of a run recorded after ``after_id`` (exclusive)."""
+    start = "-" if after_id in ("-", "0", "") else f"({after_id}"
+    try:
+        redis_client = await get_redis()
+        entries = await redis_client.xrange(progress_stream_key(run_id), min=start, count=count)
+    except Exception as e:
+        logger.warning(f"[PROGRESS] Failed to replay progress for run {run_id}: {e}")
+        return []
+    return [_decode_entry(entry_id, fields) for entry_id, fields in entries]
+
+
+def _decode_entry(entry_id, fields) -> Dict[str, Any]:
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    raw = fields.get(b"data", fields.get("data", "{}"))
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    event = json.loads(raw)
+    event["event_id"] = entry_id
+    return event
@@ -6,6 +6,7 @@ from fastapi import HTTPException
 import shutil
 from pathlib import Path
 from app.core.config import settings
+from app.core.metrics import record_bytes_written
 
 class LocalFileStorage:
     """Simple local file storage implementation."""
@@ -140,6 +141,7 @@ class LocalFileStorage:
         
         with open(file_path, 'wb') as f:
             f.write(file_content)
+        record_bytes_written("upload", len(file_content))
         
         return str(file_path)
     
@@ -0,0 +1,387 @@
+"""
+Per-stage tracing of a run, from upload to the final artifact.
+
+A run's trace is minted in ``create_run`` and follows it through Celery and
+Redis:
+
+- spans carry W3C ``traceparent`` ids (32-hex trace id, 16-hex span id), so a
+  trace can be loaded into any OpenTelemetry backend;
+- ``celery_headers()`` is passed to ``send_task``/``apply_async`` and the task
+  continues the trace with ``celery_parent(self.request)``;
+- ``publish_run_update`` stamps the current ``traceparent`` on every Redis
+  message, and JMP agent jobs carry it in their spec;
+- the run's root span context is kept in Redis (``trace:run:{run_id}``) so a
+  run held back by queue mode and dispatched later by
+  ``_process_next_queued_task`` still joins its own trace.
+
+Finished spans are batched by a background thread and written as JSON lines to
+TRACE_FILE and/or posted as OTLP/HTTP JSON to TRACE_COLLECTOR_URL (e.g. an
+OpenTelemetry Collector on ``http://localhost:4318``). With TRACING_ENABLED
+off, spans are still created (ids propagate) but nothing is exported.
+
+``tools/trace_report.py`` summarizes a trace file into per-stage percentiles.
+"""
+import asyncio
+import atexit
+import functools
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RUN_TRACE_KEY = "trace:run:{run_id}"
+TRACEPARENT_HEADER = "traceparent"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, span_id) from a ``traceparent`` value, or None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+class Span:
+    """One timed operation; ended by ``span()`` or ``StageSpans``."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"[:500]
+        _exporter.export(self)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    active = _current_span.get()
+    return active.traceparent if active else None
+
+
+def start_span(name: str, parent: Optional[str] = None, **attributes) -> Span:
+    """
+    Start a span without making it current.
+
+    The parent is ``parent`` (a traceparent) when given, else the current span;
+    with neither, the span starts a new trace.
+    """
+    context = parse_traceparent(parent)
+    if context is None:
+        active = _current_span.get()
+        context = (active.trace_id, active.span_id) if active else None
+    trace_id, parent_id = context if context else (secrets.token_hex(16), None)
+    return Span(name, trace_id, parent_id, attributes)
+
+
+@contextmanager
+def span(name: str, parent: Optional[str] = None, **attributes):
+    """Run a block (sync or async) inside a span; exceptions mark it failed."""
+    active = start_span(name, parent=parent, **attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+def traced(name: Optional[str] = None, **attributes):
+    """Decorator form of ``span()`` for plain and async functions."""
+    def decorator(func):
+        span_name = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_stage_spans(stages: Sequence[Tuple[str, Optional[float]]], end_ns: Optional[int] = None) -> None:
+    """
+    Child spans for consecutive stages timed elsewhere
+
+    ``stages`` are (name, seconds) in the order they ran, back to back and
+    ending at ``end_ns`` (default: now), e.g. the ``timings`` JMPRunner returns.
+    """
+    cursor = end_ns or time.time_ns()
+    for name, seconds in reversed(stages):
+        if seconds is None:
+            continue
+        stage_span = start_span(name)
+        stage_span.start_ns = cursor - int(seconds * 1e9)
+        stage_span.end(end_ns=cursor)
+        cursor = stage_span.start_ns
+
+
+class StageSpans:
+    """
+    Consecutive stage spans under one parent
+
+    For long functions that already track a ``stage`` name: ``next()`` ends the
+    previous stage's span and starts the next one, so stages are timed without
+    re-indenting the code into ``with`` blocks. Stage spans become current
+    while open, so spans and messages inside a stage nest under it.
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._span: Optional[Span] = None
+
+    def next(self, stage: str, **attributes) -> str:
+        self.end()
+        self._span = start_span(f"{self.prefix}{stage}", **attributes)
+        self._span._token = _current_span.set(self._span)
+        return stage
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self._span is None:
+            return
+        finished, self._span = self._span, None
+        try:
+            _current_span.reset(finished._token)
+        except ValueError:
+            # Ended from another context (e.g. an exception handler in a different task)
+            pass
+        finished.end(error=error)
+
+
+# --- Propagation -------------------------------------------------------------
+
+def celery_headers() -> Dict[str, str]:
+    """Message headers carrying the current trace into a Celery task."""
+    traceparent = current_traceparent()
+    return {TRACEPARENT_HEADER: traceparent} if traceparent else {}
+
+
+def celery_parent(request) -> Optional[str]:
+    """The ``traceparent`` a task was sent with (Celery exposes custom headers on the request)."""
+    if request is None:
+        return None
+    value = getattr(request, TRACEPARENT_HEADER, None)
+    if not value:
+        value = (getattr(request, "headers", None) or {}).get(TRACEPARENT_HEADER)
+    return value
+
+
+async def remember_run_trace(run_id: str, traceparent: Optional[str] = None) -> None:
+    """Keep a run's root span context so later dispatches of the run join its trace."""
+    traceparent = traceparent or current_traceparent()
+    if not traceparent or not settings.TRACING_ENABLED:
+        return
+    from app.core.websocket import get_redis
+    try:
+        redis_client = await get_redis()
+        await redis_client.set(
+            RUN_TRACE_KEY.format(run_id=run_id), traceparent, ex=settings.TRACE_RUN_CONTEXT_TTL
+        )
+    except Exception as e:
+        logger.warning(f"[TRACE] Could not store trace context of run {run_id}: {e}")
+
+
+async def load_run_trace(run_id: str) -> Optional[str]:
+    if not settings.TRACING_ENABLED:
+        return None
+    from app.core.websocket import get_redis
+    try:
+        redis_client = await get_redis()
+        value = await redis_client.get(RUN_TRACE_KEY.format(run_id=run_id))
+    except Exception as e:
+        logger.warning(f"[TRACE] Could not load trace context of run {run_id}: {e}")
+        return None
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+# --- Export ------------------------------------------------------------------
+
+def _service_name() -> str:
+    if settings.TRACE_SERVICE_NAME:
+        return settings.TRACE_SERVICE_NAME
+    return "auto-jmp-worker" if any("celery" in arg.lower() for arg in sys.argv) else "auto-jmp-api"
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class _SpanExporter:
+    """Batches finished spans and writes them from a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer: List[Span] = []
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TRACING_ENABLED and bool(settings.TRACE_FILE or settings.TRACE_COLLECTOR_URL)
+
+    def export(self, finished: Span) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if len(self._buffer) >= settings.TRACE_MAX_QUEUE:
+                return
+            self._buffer.append(finished)
+            full = len(self._buffer) >= settings.TRACE_BATCH_SIZE
+            # Celery prefork children inherit the object but not the thread
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(settings.TRACE_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        if settings.TRACE_FILE:
+            try:
+                self._write_file(batch)
+            except Exception as e:
+                logger.warning(f"[TRACE] Could not write {len(batch)} spans to {settings.TRACE_FILE}: {e}")
+        if settings.TRACE_COLLECTOR_URL:
+            try:
+                self._post_otlp(batch)
+            except Exception as e:
+                logger.warning(f"[TRACE] Could not export {len(batch)} spans to {settings.TRACE_COLLECTOR_URL}: {e}")
+
+    def _write_file(self, batch: List[Span]) -> None:
+        lines = []
+        for finished in batch:
+            lines.append(json.dumps({
+                "trace_id": finished.trace_id,
+                "span_id": finished.span_id,
+                "parent_id": finished.parent_id,
+                "name": finished.name,
+                "service": _service_name(),
+                "pid": os.getpid(),
+                "start": finished.start_ns / 1e9,
+                "duration_ms": round((finished.end_ns - finished.start_ns) / 1e6, 3),
+                "attributes": finished.attributes,
+                "error": finished.error,
+            }, default=str))
+        with open(settings.TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _post_otlp(self, batch: List[Span]) -> None:
+        spans = []
+        for finished in batch:
+            entry = {
+                "traceId": finished.trace_id,
+                "spanId": finished.span_id,
+                "name": finished.name,
+                "kind": 1,
+                "startTimeUnixNano": str(finished.start_ns),
+                "endTimeUnixNano": str(finished.end_ns),
+                "attributes": _otlp_attributes(finished.attributes),
+                "status": {"code": 2, "message": finished.error} if finished.error else {"code": 1},
+            }
+            if finished.parent_id:
+                entry["parentSpanId"] = finished.parent_id
+            spans.append(entry)
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({
+                "service.name": _service_name(),
+                "process.pid": os.getpid(),
+            })},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]}
+        url = settings.TRACE_COLLECTOR_URL.rstrip("/")
+        if not url.endswith("/v1/traces"):
+            url += "/v1/traces"
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+_exporter = _SpanExporter()
+
+
+def flush_spans() -> None:
+    """Write out buffered spans now (process shutdown, tools)."""
+    _exporter.flush()
+
+
+atexit.register(flush_spans)
@@ -11,6 +11,7 @@ from datetime import datetime
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
 from app.core.config import settings
+from app.core.tracing import current_traceparent, span
 from app.models import Run, RunStatus, AppUser
 
 router = APIRouter()
@@ -96,7 +97,16 @@ class ConnectionManager:
                 if websocket not in self.subscriptions[run_id]:
                     self.subscriptions[run_id].append(websocket)
                 print(f"WebSocket subscribed to run: {run_id}")
-                
+
+                # Replay the latest progress state so late subscribers don't have to poll
+                from app.core.progress import get_latest_progress
+                latest = await get_latest_progress(run_id)
+                if latest:
+                    try:
+                        await websocket.send_text(json.dumps(latest))
+                    except Exception:
+                        pass
+
                 # Start Redis subscription if not already started
                 if run_id not in self.redis_subscriptions:
                     task = asyncio.create_task(self._subscribe_to_redis(run_id))
@@ -176,17 +186,23 @@ manager = ConnectionManager()
 
 async def publish_run_update(run_id: str, message: dict):
     """Publish run update to WebSocket room and Redis pub/sub."""
-    # Send to direct WebSocket connections
-    await manager.send_to_run(run_id, message)
-    await manager.send_to_subscribers(run_id, message)
+    # Carry the run's trace context so consumers can attach their work to it
+    traceparent = current_traceparent()
+    if traceparent and "traceparent" not in message:
+        message = {**message, "traceparent": traceparent}
     
-    # Also publish to Redis for real-time transient updates
-    try:
-        redis_client = await get_redis()
-        await redis_client.publish(f"run:{run_id}", json.dumps(message))
-        print(f"Published update to Redis run:{run_id}: {message}")
-    except Exception as e:
-        print(f"Failed to publish to Redis: {e}")
+    with span("publish_run_update", **{"run.id": run_id, "message.type": message.get("type")}):
+        # Send to direct WebSocket connections
+        await manager.send_to_run(run_id, message)
+        await manager.send_to_subscribers(run_id, message)
+        
+        # Also publish to Redis for real-time transient updates
+        try:
+            redis_client = await get_redis()
+            await redis_client.publish(f"run:{run_id}", json.dumps(message))
+            print(f"Published update to Redis run:{run_id}: {message}")
+        except Exception as e:
+            print(f"Failed to publish to Redis: {e}")
     
     print(f"Published update to run:{run_id}: {message}")
 
@@ -299,6 +315,25 @@ async def get_run_status(
         "finished_at": run.finished_at.isoformat() if run.finished_at else None,
     }
 
+@router.get("/runs/{run_id}/progress")
+async def get_run_progress(
+    run_id: str,
+    after: str = "-",
+    limit: int = 100,
+    current_user: AppUser = Depends(get_current_user_optional)
+):
+    """Replay progress events of a run recorded after the given stream id."""
+    from app.core.progress import read_progress_events, get_latest_progress
+
+    events = await read_progress_events(run_id, after_id=after, count=min(max(limit, 1), 500))
+    latest = events[-1] if events else await get_latest_progress(run_id)
+    return {
+        "run_id": run_id,
+        "latest": latest,
+        "events": events,
+        "last_event_id": events[-1]["event_id"] if events else after,
+    }
+
 @router.post("/runs/{run_id}/cancel")
 async def cancel_run(
     run_id: str,
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, BigInteger, ForeignKey, Enum as SQLEnum, JSON
+from sqlalchemy import Column, String, Boolean, DateTime, Text, BigInteger, ForeignKey, Enum as SQLEnum, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import uuid
 import enum
@@ -130,6 +130,11 @@ class Artifact(Base):
     sha256 = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # Run galleries (see alembic n8901o2345p6)
+    __table_args__ = (
+        Index("ix_artifact_run_id", "run_id"),
+    )
+    
     # Relationships
     project = relationship("Project", back_populates="artifacts")
     run = relationship("Run", back_populates="artifacts")
@@ -150,6 +155,14 @@ class Run(Base):
     started_at = Column(DateTime(timezone=True))
     finished_at = Column(DateTime(timezone=True))
     deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete timestamp
+    # Task folder files, recorded when the run finishes; deferred so run listings don't carry it
+    file_manifest = deferred(Column(JSON, nullable=True))
+    
+    # Keyset-paginated run listings (see alembic k5678l9012m3)
+    __table_args__ = (
+        Index("ix_run_project_deleted_created", "project_id", "deleted_at", "created_at"),
+        Index("ix_run_status_created", "status", "created_at"),
+    )
     
     # Relationships
     project = relationship("Project", back_populates="runs")
@@ -236,6 +249,14 @@ class ArtifactComment(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
     
+    # Comment counts and latest comment per artifact (see alembic n8901o2345p6)
+    __table_args__ = (
+        Index(
+            "ix_artifact_comment_artifact_live", "artifact_id", "created_at",
+            postgresql_where=deleted_at.is_(None)
+        ),
+    )
+    
     # Relationships
     artifact = relationship("Artifact", back_populates="comments")
     user = relationship("AppUser", back_populates="artifact_comments")
@@ -0,0 +1,133 @@
+"""
+Admin dashboard statistics backed by materialized views.
+
+The dashboard used to run a COUNT(*) over every large table per refresh and
+/admin/projects counted runs project by project. The aggregates now live in
+materialized views (alembic l6789m0123n4) refreshed concurrently by the
+``refresh_admin_stats`` beat task every ADMIN_STATS_REFRESH_SECONDS, so reads
+are a single indexed lookup:
+
+- ``admin_stats_totals``: platform totals (one row)
+- ``run_stats_hourly``: runs per hour, outcomes, median queue wait and JMP time
+- ``project_run_stats``: per-project run counts
+
+Active runs change too quickly to be materialized; they are counted live from
+the (status, created_at) index in the same statement as the totals.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Run, RunStatus
+
+logger = logging.getLogger(__name__)
+
+MATERIALIZED_VIEWS = ("admin_stats_totals", "run_stats_hourly", "project_run_stats")
+
+admin_stats_totals = table(
+    "admin_stats_totals",
+    column("total_users"),
+    column("total_projects"),
+    column("total_runs"),
+    column("total_artifacts"),
+    column("refreshed_at"),
+)
+
+run_stats_hourly = table(
+    "run_stats_hourly",
+    column("bucket"),
+    column("runs_created"),
+    column("succeeded"),
+    column("failed"),
+    column("canceled"),
+    column("median_queue_wait_seconds"),
+    column("median_jmp_seconds"),
+    column("images"),
+)
+
+project_run_stats = table(
+    "project_run_stats",
+    column("project_id"),
+    column("run_count"),
+    column("succeeded"),
+    column("failed"),
+    column("last_run_at"),
+)
+
+
+async def get_dashboard_totals(db: AsyncSession) -> Dict:
+    """Platform totals plus live active-run count, in one query."""
+    active_runs = (
+        select(func.count())
+        .select_from(Run)
+        .where(Run.status.in_([RunStatus.QUEUED, RunStatus.RUNNING]))
+        .scalar_subquery()
+    )
+    row = (await db.execute(
+        select(admin_stats_totals, active_runs.label("active_runs"))
+    )).mappings().first()
+    if row is None:
+        return {
+            "total_users": 0, "total_projects": 0, "total_runs": 0,
+            "total_artifacts": 0, "active_runs": 0, "refreshed_at": None
+        }
+    return dict(row)
+
+
+def _failure_rate(failed: int, succeeded: int):
+    finished = (failed or 0) + (succeeded or 0)
+    return round(failed / finished, 4) if finished else None
+
+
+async def get_run_throughput(db: AsyncSession, hours: int) -> List[Dict]:
+    """Hourly run buckets for the last ``hours`` hours, oldest first (empty hours omitted)."""
+    since = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    rows = (await db.execute(
+        select(run_stats_hourly)
+        .where(run_stats_hourly.c.bucket >= since)
+        .order_by(run_stats_hourly.c.bucket)
+    )).mappings().all()
+    buckets = []
+    for row in rows:
+        bucket = dict(row)
+        bucket["failure_rate"] = _failure_rate(bucket["failed"], bucket["succeeded"])
+        buckets.append(bucket)
+    return buckets
+
+
+def summarize_throughput(buckets: List[Dict], hours: int) -> Dict:
+    """Totals over a ``hours`` window; medians are the run-weighted mean of hourly medians."""
+    runs = sum(b["runs_created"] for b in buckets)
+    succeeded = sum(b["succeeded"] for b in buckets)
+    failed = sum(b["failed"] for b in buckets)
+
+    def weighted(key):
+        pairs = [(b[key], b["runs_created"]) for b in buckets if b[key] is not None]
+        weight = sum(w for _, w in pairs)
+        return round(sum(v * w for v, w in pairs) / weight, 2) if weight else None
+
+    return {
+        "runs": runs,
+        "succeeded": succeeded,
+        "failed": failed,
+        "failure_rate": _failure_rate(failed, succeeded),
+        "runs_per_hour": round(runs / hours, 2) if hours else 0.0,
+        "median_queue_wait_seconds": weighted("median_queue_wait_seconds"),
+        "median_jmp_seconds": weighted("median_jmp_seconds"),
+    }
+
+
+async def refresh_materialized_views(db: AsyncSession) -> Dict[str, float]:
+    """Refresh every stats view without blocking readers; returns seconds spent per view."""
+    timings = {}
+    for view in MATERIALIZED_VIEWS:
+        started = time.perf_counter()
+        await db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+        await db.commit()
+        timings[view] = round(time.perf_counter() - started, 3)
+    logger.info(f"[STATS] Refreshed admin stats views: {timings}")
+    return timings
@@ -0,0 +1,253 @@
+"""
+Job broker for remote JMP runner agents.
+
+Agents are small daemons (app/worker/jmp_agent.py) running next to a JMP seat.
+They register their capacity, pull jobs from a Redis queue over the agents API,
+download a bundle with the CSV and JSL, render locally and upload the images.
+
+Every claimed job holds a lease that the agent renews with its heartbeats. If an
+agent stops heartbeating, the lease expires and the next agent that asks for
+work steals the job, up to JMP_AGENT_MAX_ATTEMPTS times.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import current_traceparent
+from app.core.websocket import get_redis
+
+logger = logging.getLogger(__name__)
+
+AGENTS_KEY = "jmp:agents"
+PENDING_JOBS_KEY = "jmp:jobs:pending"
+ACTIVE_JOBS_KEY = "jmp:jobs:active"
+RESULT_TTL = 24 * 60 * 60
+
+# Renew a lease only while it still names the agent (a stolen job stays stolen)
+RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return false
+"""
+
+
+def _agent_key(agent_id: str) -> str:
+    return f"jmp:agent:{agent_id}"
+
+
+def _job_key(job_id: str) -> str:
+    return f"jmp:job:{job_id}"
+
+
+def _lease_key(job_id: str) -> str:
+    return f"jmp:job:{job_id}:lease"
+
+
+def _result_key(job_id: str) -> str:
+    return f"jmp:job:{job_id}:result"
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _decode_hash(raw: Dict) -> Dict[str, str]:
+    return {_decode(k): _decode(v) for k, v in raw.items()}
+
+
+def _agent_ttl() -> int:
+    return settings.JMP_AGENT_HEARTBEAT_INTERVAL * 3
+
+
+# Agents
+
+async def register_agent(agent_id: str, info: Dict[str, Any]) -> None:
+    """Record (or refresh) an agent and its advertised capacity."""
+    redis_client = await get_redis()
+    fields = {k: json.dumps(v) if isinstance(v, (dict, list)) else str(v) for k, v in info.items()}
+    fields.update({"agent_id": agent_id, "last_seen": str(time.time())})
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.sadd(AGENTS_KEY, agent_id)
+        pipe.hset(_agent_key(agent_id), mapping=fields)
+        pipe.expire(_agent_key(agent_id), _agent_ttl())
+        await pipe.execute()
+    logger.info(f"[AGENTS] Agent registered: {agent_id} ({info.get('hostname')}, capacity={info.get('capacity')})")
+
+
+async def heartbeat_agent(agent_id: str, running_jobs: List[str], busy: int) -> bool:
+    """
+    Refresh an agent and renew the leases of the jobs it is running
+
+    Returns:
+        False if the agent is unknown (expired) and must register again
+    """
+    redis_client = await get_redis()
+    if not await redis_client.exists(_agent_key(agent_id)):
+        return False
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(_agent_key(agent_id), mapping={"last_seen": str(time.time()), "busy": str(busy)})
+        pipe.expire(_agent_key(agent_id), _agent_ttl())
+        for job_id in running_jobs:
+            # Only renew leases this agent still owns; checked and set atomically in Redis
+            pipe.eval(RENEW_LEASE_SCRIPT, 1, _lease_key(job_id), agent_id, settings.JMP_AGENT_LEASE_SECONDS)
+        await pipe.execute()
+    return True
+
+
+async def list_agents() -> List[Dict[str, Any]]:
+    """Return live agents; expired ones are pruned from the registry."""
+    redis_client = await get_redis()
+    agents = []
+    for agent_id in await redis_client.smembers(AGENTS_KEY):
+        agent_id = _decode(agent_id)
+        raw = await redis_client.hgetall(_agent_key(agent_id))
+        if not raw:
+            await redis_client.srem(AGENTS_KEY, agent_id)
+            continue
+        agents.append(_decode_hash(raw))
+    return agents
+
+
+# Jobs
+
+async def enqueue_job(run_id: str, job_dir: Path, csv_name: str, jsl_name: str,
+                      expected_outputs: Optional[List[str]], max_wait_time: int) -> str:
+    """Queue a JMP job for the agents; returns the job id."""
+    job_id = uuid.uuid4().hex
+    spec = {
+        "job_id": job_id,
+        "run_id": run_id,
+        "csv_name": csv_name,
+        "jsl_name": jsl_name,
+        "expected_outputs": expected_outputs or [],
+        "max_wait_time": max_wait_time,
+        # Agents may continue the run's trace from here
+        "traceparent": current_traceparent(),
+    }
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(_job_key(job_id), mapping={
+            "spec": json.dumps(spec),
+            "job_dir": str(job_dir),
+            "status": "pending",
+            "attempts": "0",
+            "created_at": str(time.time()),
+        })
+        pipe.expire(_job_key(job_id), RESULT_TTL)
+        pipe.lpush(PENDING_JOBS_KEY, job_id)
+        await pipe.execute()
+    logger.info(f"[AGENTS] Queued job {job_id} for run {run_id} ({job_dir})")
+    return job_id
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return a job's stored fields, with the spec decoded."""
+    redis_client = await get_redis()
+    raw = await redis_client.hgetall(_job_key(job_id))
+    if not raw:
+        return None
+    job = _decode_hash(raw)
+    job["spec"] = json.loads(job["spec"])
+    return job
+
+
+async def _lease_job(job_id: str, agent_id: str) -> Optional[Dict[str, Any]]:
+    redis_client = await get_redis()
+    if not await redis_client.set(_lease_key(job_id), agent_id, nx=True, ex=settings.JMP_AGENT_LEASE_SECONDS):
+        return None
+    attempts = await redis_client.hincrby(_job_key(job_id), "attempts", 1)
+    if attempts > settings.JMP_AGENT_MAX_ATTEMPTS:
+        await complete_job(job_id, {"status": "failed", "error": f"Job abandoned by agents {attempts - 1} times"})
+        return None
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(_job_key(job_id), mapping={"status": "claimed", "agent_id": agent_id, "claimed_at": str(time.time())})
+        pipe.sadd(ACTIVE_JOBS_KEY, job_id)
+        await pipe.execute()
+    return await get_job(job_id)
+
+
+async def claim_job(agent_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Hand the next job to an agent
+
+    Takes the oldest pending job; when none is pending, steals an active job
+    whose lease expired because its agent stopped heartbeating.
+    """
+    redis_client = await get_redis()
+    while True:
+        job_id = await redis_client.rpop(PENDING_JOBS_KEY)
+        if job_id is None:
+            break
+        job = await _lease_job(_decode(job_id), agent_id)
+        if job:
+            return job
+
+    for job_id in await redis_client.smembers(ACTIVE_JOBS_KEY):
+        job_id = _decode(job_id)
+        if await redis_client.exists(_lease_key(job_id)):
+            continue
+        if await redis_client.exists(_result_key(job_id)) or not await redis_client.exists(_job_key(job_id)):
+            await redis_client.srem(ACTIVE_JOBS_KEY, job_id)
+            continue
+        job = await _lease_job(job_id, agent_id)
+        if job:
+            logger.warning(f"[AGENTS] Agent {agent_id} stole job {job_id} (lease expired)")
+            return job
+    return None
+
+
+async def owns_job(job_id: str, agent_id: str) -> bool:
+    """Whether the agent currently holds the job's lease."""
+    redis_client = await get_redis()
+    return _decode(await redis_client.get(_lease_key(job_id))) == agent_id
+
+
+async def complete_job(job_id: str, result: Dict[str, Any]) -> None:
+    """Store a job's result and release it."""
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(_result_key(job_id), json.dumps(result), ex=RESULT_TTL)
+        pipe.hset(_job_key(job_id), "status", result.get("status", "failed"))
+        pipe.srem(ACTIVE_JOBS_KEY, job_id)
+        pipe.delete(_lease_key(job_id))
+        await pipe.execute()
+
+
+async def get_job_result(job_id: str) -> Optional[Dict[str, Any]]:
+    redis_client = await get_redis()
+    raw = await redis_client.get(_result_key(job_id))
+    return json.loads(_decode(raw)) if raw is not None else None
+
+
+async def wait_for_jobs(job_ids: List[str], timeout: float, poll_interval: float = 2.0) -> Dict[str, Dict[str, Any]]:
+    """Wait until every job has a result or the timeout passes; missing results are reported as failed."""
+    results: Dict[str, Dict[str, Any]] = {}
+    deadline = time.monotonic() + timeout
+    while len(results) < len(job_ids) and time.monotonic() < deadline:
+        for job_id in job_ids:
+            if job_id not in results:
+                result = await get_job_result(job_id)
+                if result is not None:
+                    results[job_id] = result
+        if len(results) < len(job_ids):
+            await asyncio.sleep(poll_interval)
+
+    for job_id in job_ids:
+        if job_id not in results:
+            results[job_id] = {"status": "failed", "error": f"No JMP agent finished the job within {int(timeout)}s"}
+            await complete_job(job_id, results[job_id])
+    return results
+
+
+async def queue_depth() -> Dict[str, int]:
+    redis_client = await get_redis()
+    return {
+        "pending": await redis_client.llen(PENDING_JOBS_KEY),
+        "active": await redis_client.scard(ACTIVE_JOBS_KEY),
+    }
@@ -0,0 +1,229 @@
+"""
+Split large JSL scripts into shards that run on separate JMP slots.
+
+Generated scripts are a preamble (Open() header, column setup) followed by one
+block per FAI, each starting with a ``//! Start of`` or ``// Start for`` marker.
+A shard is the preamble plus a contiguous run of blocks. Every shard gets its
+own folder under ``task_<id>/shards/`` with the run's CSV hardlinked in, so any
+JMP worker that shares TASKS_DIRECTORY can pick it up. Outputs are moved back
+into the run's task folder once all shards finish.
+"""
+import json
+import logging
+import math
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.websocket import get_redis
+from extensions.base.jsl_manifest import MANIFEST_PREFIX, append_output_manifest, read_output_manifest
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MARKER_PATTERN = re.compile(r'^(?://!\s*Start of\b|//\s*Start for\b)', re.MULTILINE)
+OPEN_HEADER_PATTERN = re.compile(r'(?:^\s*//.*?\n)*\s*Open\(".*?"\);\s*\n?', re.MULTILINE)
+SHARDS_DIRNAME = "shards"
+
+
+@dataclass
+class JslShard:
+    """One slice of a run's JSL script."""
+    index: int
+    content: str
+    outputs: List[str] = field(default_factory=list)
+
+    @property
+    def task_id(self) -> str:
+        """Task id of the shard folder relative to the shards directory."""
+        return str(self.index)
+
+
+def split_jsl_blocks(jsl_content: str) -> Tuple[str, List[str]]:
+    """
+    Split a JSL script into its preamble and per-FAI blocks
+
+    Returns:
+        Tuple of (preamble, blocks). Blocks is empty when the script has no markers.
+    """
+    content = "\n".join(line for line in jsl_content.splitlines() if not line.startswith(MANIFEST_PREFIX))
+    starts = [match.start() for match in BLOCK_MARKER_PATTERN.finditer(content)]
+    if not starts:
+        return content, []
+    preamble = content[:starts[0]]
+    blocks = [content[start:end].rstrip() + "\n" for start, end in zip(starts, starts[1:] + [len(content)])]
+    return preamble, blocks
+
+
+def plan_jsl_shards(jsl_content: str, max_shards: int, min_blocks_per_shard: int) -> List[JslShard]:
+    """
+    Plan contiguous, evenly sized shards for a JSL script
+
+    Returns:
+        List of shards, or an empty list when the script is too small to be worth splitting
+    """
+    if max_shards <= 1:
+        return []
+    preamble, blocks = split_jsl_blocks(jsl_content)
+    shard_count = min(max_shards, len(blocks) // max(min_blocks_per_shard, 1))
+    if shard_count <= 1:
+        return []
+
+    manifest = read_output_manifest(jsl_content) or {}
+    generator = manifest.get("generator", "save_picture_scan")
+
+    shards = []
+    per_shard = math.ceil(len(blocks) / shard_count)
+    for index in range(shard_count):
+        shard_blocks = blocks[index * per_shard:(index + 1) * per_shard]
+        if not shard_blocks:
+            break
+        body = "\n".join(shard_blocks)
+        outputs = (read_output_manifest(body) or {}).get("outputs", [])
+        content = append_output_manifest(preamble + body, outputs, generator=generator)
+        shards.append(JslShard(index=index, content=content, outputs=outputs))
+    return shards
+
+
+def shards_root(task_dir: Path) -> Path:
+    """Directory holding the shard folders of a run's task folder."""
+    return task_dir / SHARDS_DIRNAME
+
+
+def shard_dir(task_dir: Path, index: int) -> Path:
+    """Folder of one shard (laid out the way JMPRunner expects: ``task_<id>``)."""
+    return shards_root(task_dir) / f"task_{index}"
+
+
+def prepare_shard_folders(task_dir: Path, csv_path: Path, jsl_path: Path, shards: List[JslShard]) -> List[Path]:
+    """
+    Create one folder per shard with the CSV hardlinked and the shard JSL written
+
+    The CSV is copied instead when hardlinking is not possible (e.g. another filesystem).
+    """
+    folders = []
+    for shard in shards:
+        folder = shard_dir(task_dir, shard.index)
+        if folder.exists():
+            shutil.rmtree(folder)
+        folder.mkdir(parents=True)
+
+        csv_dst = folder / csv_path.name
+        try:
+            os.link(csv_path, csv_dst)
+        except OSError:
+            shutil.copy2(csv_path, csv_dst)
+
+        header = f'// Shard {shard.index} of task folder {task_dir.name}\nOpen("{csv_dst.resolve()}");\n'
+        if OPEN_HEADER_PATTERN.search(shard.content):
+            content = OPEN_HEADER_PATTERN.sub(lambda _: header, shard.content, count=1)
+        else:
+            content = header + shard.content
+        jsl_dst = folder / jsl_path.name
+        jsl_dst.write_text(content, encoding="utf-8")
+        jsl_dst.chmod(0o644)
+
+        (folder / "output_manifest.json").write_text(json.dumps({"outputs": shard.outputs}, indent=2))
+        folders.append(folder)
+        logger.info(f"[SHARDS] Prepared shard {shard.index} with {len(shard.outputs)} outputs: {folder}")
+    return folders
+
+
+def count_shard_png_files(task_dir: Path) -> int:
+    """Count PNG files written so far across all shard folders of a task folder."""
+    root = shards_root(task_dir)
+    if not root.is_dir():
+        return 0
+    total = 0
+    with os.scandir(root) as folders:
+        for folder in folders:
+            if not folder.is_dir():
+                continue
+            with os.scandir(folder.path) as entries:
+                total += sum(
+                    1 for entry in entries
+                    if entry.name.lower().endswith(".png") and entry.name != "failure_error.png" and entry.is_file()
+                )
+    return total
+
+
+def merge_shard_outputs(task_dir: Path) -> List[str]:
+    """
+    Move shard images back into the run's task folder and remove the shard folders
+
+    The shard that rendered initial.png/final.png already ran OCR on them; its
+    ocr_results.json moves along. Helper tasks dequeued after this find no
+    shard folder and skip.
+
+    Returns:
+        Filenames of the merged images
+    """
+    merged = []
+    root = shards_root(task_dir)
+    if not root.is_dir():
+        return merged
+    for folder in sorted(root.iterdir()):
+        if not folder.is_dir():
+            continue
+        for image in sorted(folder.glob("*.png")):
+            if image.name == "failure_error.png":
+                continue
+            os.replace(image, task_dir / image.name)
+            merged.append(image.name)
+        ocr_file = folder / "ocr_results.json"
+        if ocr_file.is_file():
+            os.replace(ocr_file, task_dir / ocr_file.name)
+    shutil.rmtree(root, ignore_errors=True)
+    logger.info(f"[SHARDS] Merged {len(merged)} images into {task_dir}")
+    return merged
+
+
+# Shard coordination
+#
+# Each shard is claimed with SET NX before it runs, so the run's own worker and
+# helper tasks on other JMP slots never render the same shard twice. Results are
+# stored next to the claim; a claim that expires without a result (crashed
+# worker) can be claimed again.
+
+def _shard_key(run_id: str, index: int, suffix: str) -> str:
+    return f"run:{run_id}:shard:{index}:{suffix}"
+
+
+async def claim_shard(run_id: str, index: int, owner: str, ttl: int) -> bool:
+    """Claim a shard for execution; returns False if another worker holds it."""
+    redis_client = await get_redis()
+    return bool(await redis_client.set(_shard_key(run_id, index, "claim"), owner, nx=True, ex=ttl))
+
+
+async def store_shard_result(run_id: str, index: int, result: Dict[str, Any], ttl: int) -> None:
+    """Record a finished shard's status."""
+    redis_client = await get_redis()
+    summary = {
+        "status": result.get("status"),
+        "error": result.get("error"),
+        "image_count": result.get("image_count", 0),
+        # OCR already ran on the shard's initial/final images; the merge doesn't repeat it
+        "ocr_results": result.get("ocr_results") or {},
+    }
+    await redis_client.set(_shard_key(run_id, index, "result"), json.dumps(summary, default=str), ex=ttl)
+
+
+async def get_shard_result(run_id: str, index: int) -> Optional[Dict[str, Any]]:
+    """Return a shard's recorded result, if it has finished."""
+    redis_client = await get_redis()
+    raw = await redis_client.get(_shard_key(run_id, index, "result"))
+    if raw is None:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    return json.loads(raw)
+
+
+async def clear_shard_state(run_id: str, shard_count: int) -> None:
+    """Drop claims and results of a run's shards (before a fresh attempt)."""
+    redis_client = await get_redis()
+    keys = [_shard_key(run_id, i, suffix) for i in range(shard_count) for suffix in ("claim", "result")]
+    if keys:
+        await redis_client.delete(*keys)
@@ -1,8 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, func, literal, cast, false
 from typing import List, Optional
 import uuid
 
+from app.core.config import settings
 from app.models import Notification, NotificationType, AppUser, Project, ProjectMember
 
 class NotificationService:
@@ -32,6 +33,51 @@ class NotificationService:
         
         return notification
     
+    @staticmethod
+    async def create_notifications_for_all_users(
+        db: AsyncSession,
+        notification_type: NotificationType,
+        title: str,
+        message: str,
+        chunk_size: Optional[int] = None
+    ) -> int:
+        """
+        Create the same notification for every user without loading them.
+        
+        Rows are written server-side with INSERT ... SELECT over app_user in
+        id-ordered chunks, so each chunk is one round trip however many users
+        there are. Nothing is committed; the caller owns the transaction.
+        Returns the number of notifications created.
+        """
+        chunk_size = chunk_size or settings.NOTIFICATION_INSERT_CHUNK_SIZE
+        columns = Notification.__table__.c
+        created = 0
+        last_user_id = None
+        
+        while True:
+            users = select(AppUser.id).order_by(AppUser.id).limit(chunk_size)
+            if last_user_id is not None:
+                users = users.where(AppUser.id > last_user_id)
+            users = users.subquery()
+            
+            statement = insert(Notification).from_select(
+                ["id", "user_id", "type", "title", "message", "is_read"],
+                select(
+                    func.gen_random_uuid(),
+                    users.c.id,
+                    cast(literal(notification_type, columns.type.type), columns.type.type),
+                    literal(title, columns.title.type),
+                    literal(message, columns.message.type),
+                    false()
+                )
+            ).returning(Notification.user_id)
+            user_ids = (await db.execute(statement)).scalars().all()
+            
+            created += len(user_ids)
+            if len(user_ids) < chunk_size:
+                return created
+            last_user_id = max(user_ids)
+    
     @staticmethod
     async def notify_project_members(
         db: AsyncSession,
@@ -0,0 +1,186 @@
+"""
+File manifest of a run's task folder.
+
+Listing, serving and zipping endpoints used to walk the task directory and
+``stat()`` every file on each request. A finished run's folder never changes,
+so the worker records it once in ``Run.file_manifest``: every file's relative
+path, size, mtime, SHA-256, kind, MIME type and, for images, pixel dimensions.
+It is a deferred column: endpoints select it with ``with_manifest()`` on the
+run they already load for the access check, so reading it costs no extra query
+and no filesystem access.
+
+Runs finished before manifests existed get one built the first time they are
+read; it is stored by a background task with its own session, so read
+endpoints never commit. Runs still in progress get a cheap live listing (no
+hashes or dimensions) that is not stored.
+"""
+import asyncio
+import hashlib
+import logging
+import mimetypes
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import inspect, select, update
+from sqlalchemy.orm import undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import Run, RunStatus
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff"}
+FINISHED_STATUSES = {RunStatus.SUCCEEDED, RunStatus.FAILED, RunStatus.CANCELED}
+
+# Background manifest backfills by run id (keeps the tasks referenced, one per run)
+_backfills: Dict[str, asyncio.Task] = {}
+
+_KINDS = {
+    ".csv": "csv",
+    ".jsl": "jsl",
+    ".json": "json",
+    ".txt": "text",
+    ".log": "log",
+    ".zip": "archive",
+    ".xlsx": "excel",
+    ".xls": "excel",
+}
+
+
+def with_manifest():
+    """Loader option selecting the deferred ``Run.file_manifest`` together with the run."""
+    return undefer(Run.file_manifest)
+
+
+def run_task_dir(run: Run) -> Optional[Path]:
+    """Task folder of a run, or None before the worker has assigned one."""
+    if not run.jmp_task_id:
+        return None
+    return Path(settings.TASKS_DIRECTORY).expanduser().resolve() / f"task_{run.jmp_task_id}"
+
+
+def _file_kind(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in IMAGE_EXTENSIONS:
+        return "image"
+    return _KINDS.get(suffix, "other")
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _image_size(path: Path):
+    try:
+        from PIL import Image
+        # Only the header is read
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def build_file_manifest(task_dir: Path, full: bool = True) -> Dict:
+    """
+    Describe every file under ``task_dir``
+
+    ``full=False`` skips hashing and image decoding for live listings of runs
+    that are still writing files.
+    """
+    files = []
+    total_bytes = 0
+    for path in sorted(p for p in Path(task_dir).rglob("*") if p.is_file()):
+        stat = path.stat()
+        kind = _file_kind(path)
+        entry = {
+            "path": path.relative_to(task_dir).as_posix(),
+            "name": path.name,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "kind": kind,
+            "mime_type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        }
+        if full:
+            entry["sha256"] = _sha256(path)
+            if kind == "image":
+                entry["width"], entry["height"] = _image_size(path)
+        files.append(entry)
+        total_bytes += stat.st_size
+
+    return {
+        "version": MANIFEST_VERSION,
+        "task_dir": Path(task_dir).name,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "complete": full,
+        "file_count": len(files),
+        "total_bytes": total_bytes,
+        "files": files,
+    }
+
+
+async def get_run_manifest(db: AsyncSession, run: Run) -> Optional[Dict]:
+    """Manifest of a run's task folder; None if the folder doesn't exist."""
+    if "file_manifest" in inspect(run).unloaded:
+        # Callers that need it should select the run with with_manifest(); this is the fallback
+        stored = await db.scalar(select(Run.file_manifest).where(Run.id == run.id))
+    else:
+        stored = run.file_manifest
+    if stored:
+        return stored
+
+    task_dir = run_task_dir(run)
+    if task_dir is None or not task_dir.is_dir():
+        return None
+
+    if run.status not in FINISHED_STATUSES:
+        return await asyncio.to_thread(build_file_manifest, task_dir, False)
+
+    # Finished before manifests were recorded: build it and store it in the background
+    manifest = await asyncio.to_thread(build_file_manifest, task_dir)
+    run_id = str(run.id)
+    if run_id not in _backfills:
+        task = asyncio.create_task(_store_manifest(run_id, manifest))
+        _backfills[run_id] = task
+        task.add_done_callback(lambda _: _backfills.pop(run_id, None))
+    return manifest
+
+
+async def _store_manifest(run_id: str, manifest: Dict) -> None:
+    """Persist a backfilled manifest in its own session"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Run).where(Run.id == run_id).values(file_manifest=manifest))
+            await db.commit()
+        logger.info(f"[MANIFEST] Backfilled file manifest for run {run_id} ({manifest['file_count']} files)")
+    except Exception as e:
+        logger.warning(f"[MANIFEST] Could not store file manifest for run {run_id}: {e}")
+
+
+def iter_manifest_files(manifest: Optional[Dict], kind: Optional[str] = None, top_level: bool = False) -> Iterator[Dict]:
+    """Manifest entries, optionally only of one kind and/or directly in the task folder."""
+    for entry in (manifest or {}).get("files", []):
+        if kind and entry["kind"] != kind:
+            continue
+        if top_level and "/" in entry["path"]:
+            continue
+        yield entry
+
+
+def find_manifest_file(manifest: Optional[Dict], path: str) -> Optional[Dict]:
+    """Entry for a relative path in the manifest, or None."""
+    for entry in iter_manifest_files(manifest):
+        if entry["path"] == path:
+            return entry
+    return None
+
+
+def manifest_paths(manifest: Optional[Dict]) -> List[str]:
+    return [entry["path"] for entry in iter_manifest_files(manifest)]
@@ -0,0 +1,230 @@
+"""
+Run image gallery in one round trip.
+
+The gallery page used to fetch a run's artifacts, then POST their ids to
+/artifacts/comment-counts, and had no way to show OCR results or image sizes
+without more requests. ``get_run_gallery`` returns all of it from a single
+joined query:
+
+- per-artifact live comment count (grouped subquery),
+- the latest comment with its author (LATERAL, newest first),
+- the OCR text artifact produced for an image (``{stem}_ocr.txt``),
+
+topped up from the run's file manifest (pixel sizes, OCR text sizes) and the
+``ocr_summary.json`` written by the worker (OCR confidence).
+
+Galleries of finished runs are cached in Redis for GALLERY_CACHE_TTL seconds
+under ``gallery:{run_id}`` and dropped whenever a comment on one of the run's
+artifacts changes. Access checks stay with the endpoint; the cache only holds
+gallery data.
+"""
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, select, true
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import AppUser, Artifact, ArtifactComment, Run
+from app.services.run_files import (
+    FINISHED_STATUSES, find_manifest_file, get_run_manifest, run_task_dir
+)
+
+logger = logging.getLogger(__name__)
+
+GALLERY_KEY = "gallery:{run_id}"
+OCR_SUFFIX = "_ocr.txt"
+OCR_SUMMARY_FILE = "ocr_summary.json"
+
+
+def artifact_download_url(storage_key: Optional[str]) -> Optional[str]:
+    """Download URL for an artifact's storage key."""
+    if not storage_key:
+        return None
+    if storage_key.startswith("tasks/"):
+        # Task directory images - use a simple endpoint with base64 encoding
+        encoded_path = base64.b64encode(storage_key.encode()).decode()
+        return f"/api/v1/uploads/file-serve?path={encoded_path}"
+    # Upload directory files - use existing upload system
+    return f"/api/v1/uploads/download/{storage_key}"
+
+
+async def _get_cache():
+    if settings.GALLERY_CACHE_TTL <= 0:
+        return None
+    from app.core.websocket import get_redis
+    try:
+        return await get_redis()
+    except Exception as e:
+        logger.warning(f"[GALLERY] Redis unavailable, skipping gallery cache: {e}")
+        return None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _gallery_query(run_id):
+    ocr = aliased(Artifact)
+
+    comment_counts = (
+        select(ArtifactComment.artifact_id, func.count().label("comment_count"))
+        .where(
+            ArtifactComment.deleted_at.is_(None),
+            ArtifactComment.artifact_id.in_(select(Artifact.id).where(Artifact.run_id == run_id))
+        )
+        .group_by(ArtifactComment.artifact_id)
+        .subquery("comment_counts")
+    )
+
+    latest_comment = (
+        select(
+            ArtifactComment.id.label("comment_id"),
+            ArtifactComment.content,
+            ArtifactComment.created_at,
+            AppUser.email.label("user_email"),
+        )
+        .outerjoin(AppUser, AppUser.id == ArtifactComment.user_id)
+        .where(ArtifactComment.artifact_id == Artifact.id, ArtifactComment.deleted_at.is_(None))
+        .order_by(ArtifactComment.created_at.desc())
+        .limit(1)
+        .lateral("latest_comment")
+    )
+
+    # initial.png -> initial_ocr.txt
+    image_stem = func.regexp_replace(Artifact.filename, r"\.[^.]*$", "")
+
+    return (
+        select(
+            Artifact.id,
+            Artifact.kind,
+            Artifact.filename,
+            Artifact.storage_key,
+            Artifact.size_bytes,
+            Artifact.mime_type,
+            Artifact.created_at,
+            func.coalesce(comment_counts.c.comment_count, 0).label("comment_count"),
+            latest_comment.c.comment_id.label("latest_comment_id"),
+            latest_comment.c.content.label("latest_comment_content"),
+            latest_comment.c.created_at.label("latest_comment_at"),
+            latest_comment.c.user_email.label("latest_comment_user_email"),
+            ocr.id.label("ocr_artifact_id"),
+            ocr.filename.label("ocr_filename"),
+        )
+        .select_from(Artifact)
+        .outerjoin(comment_counts, comment_counts.c.artifact_id == Artifact.id)
+        .outerjoin(latest_comment, true())
+        .outerjoin(ocr, and_(
+            ocr.run_id == Artifact.run_id,
+            ocr.kind == "ocr_text",
+            Artifact.kind == "output_image",
+            ocr.filename == image_stem + OCR_SUFFIX,
+        ))
+        .where(Artifact.run_id == run_id)
+        .order_by(Artifact.created_at, Artifact.filename)
+    )
+
+
+def _read_ocr_summary(run: Run, manifest: Optional[Dict]) -> Dict:
+    task_dir = run_task_dir(run)
+    if task_dir is None:
+        return {}
+    # Manifests of runs finished before the OCR step preceded them don't list the summary
+    if find_manifest_file(manifest, OCR_SUMMARY_FILE) is None and not (task_dir / OCR_SUMMARY_FILE).is_file():
+        return {}
+    try:
+        return json.loads((task_dir / OCR_SUMMARY_FILE).read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.warning(f"[GALLERY] Could not read OCR summary of run {run.id}: {e}")
+        return {}
+
+
+async def build_run_gallery(db: AsyncSession, run: Run) -> List[Dict]:
+    """Every artifact of ``run`` with comment, OCR and image-size details."""
+    rows = (await db.execute(_gallery_query(run.id))).mappings().all()
+    manifest = await get_run_manifest(db, run) if rows else None
+    ocr_summary = await asyncio.to_thread(_read_ocr_summary, run, manifest) if any(
+        row["ocr_artifact_id"] for row in rows
+    ) else {}
+
+    items = []
+    for row in rows:
+        entry = find_manifest_file(manifest, row["filename"]) or {}
+        latest_comment = None
+        if row["latest_comment_id"]:
+            latest_comment = {
+                "id": str(row["latest_comment_id"]),
+                "content": row["latest_comment_content"],
+                "created_at": row["latest_comment_at"],
+                "user_email": row["latest_comment_user_email"],
+            }
+        ocr = None
+        if row["ocr_artifact_id"]:
+            stem = row["ocr_filename"][:-len(OCR_SUFFIX)]
+            ocr_entry = find_manifest_file(manifest, row["ocr_filename"]) or {}
+            ocr = {
+                "artifact_id": str(row["ocr_artifact_id"]),
+                "filename": row["ocr_filename"],
+                "success": ocr_summary.get(f"{stem}_success"),
+                "confidence": ocr_summary.get(f"{stem}_confidence"),
+                "text_length": ocr_summary.get(f"{stem}_text_length", ocr_entry.get("size")),
+            }
+        items.append({
+            "id": str(row["id"]),
+            "kind": row["kind"],
+            "filename": row["filename"],
+            "size_bytes": row["size_bytes"] if row["size_bytes"] is not None else entry.get("size"),
+            "mime_type": row["mime_type"],
+            "created_at": row["created_at"],
+            "download_url": artifact_download_url(row["storage_key"]),
+            "width": entry.get("width"),
+            "height": entry.get("height"),
+            "comment_count": row["comment_count"],
+            "latest_comment": latest_comment,
+            "ocr": ocr,
+        })
+    return items
+
+
+async def get_run_gallery(db: AsyncSession, run: Run) -> List[Dict]:
+    """``build_run_gallery`` behind the Redis cache (finished runs only; running runs still gain artifacts)."""
+    cacheable = run.status in FINISHED_STATUSES
+    client = await _get_cache() if cacheable else None
+    key = GALLERY_KEY.format(run_id=run.id)
+
+    if client is not None:
+        try:
+            cached = await client.get(key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"[GALLERY] Cache read failed for {key}: {e}")
+
+    items = await build_run_gallery(db, run)
+
+    if client is not None:
+        try:
+            await client.set(key, json.dumps(items, default=_json_default), ex=settings.GALLERY_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"[GALLERY] Cache write failed for {key}: {e}")
+    return items
+
+
+async def invalidate_run_gallery(run_id) -> None:
+    """Drop a cached gallery; call after a comment on one of the run's artifacts changes."""
+    if run_id is None:
+        return
+    client = await _get_cache()
+    if client is None:
+        return
+    try:
+        await client.delete(GALLERY_KEY.format(run_id=run_id))
+    except Exception as e:
+        logger.warning(f"[GALLERY] Cache invalidation failed for run {run_id}: {e}")
@@ -0,0 +1,108 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from dataclasses import dataclass
+from statistics import median
+from typing import Optional
+import time
+
+from app.core.config import settings
+from app.models import Run, RunStatus, Project
+
+
+@dataclass
+class RunTimeEstimate:
+    """Expected JMP time for a run and the timeout derived from it."""
+    expected_seconds: Optional[float]
+    timeout_seconds: int
+    seconds_per_image: Optional[float]
+    overhead_seconds: float
+    sample_size: int
+
+
+class RunTimingModel:
+    """Per-extension timing model learned from finished runs.
+
+    Fits ``duration = overhead + seconds_per_image * image_count`` over the most
+    recent succeeded runs of projects created by the same plugin, using medians
+    so a few stuck or manually-run tasks don't skew the estimate.
+    """
+
+    # plugin_name -> (computed_at, seconds_per_image, overhead_seconds, sample_size)
+    _cache: dict = {}
+
+    @classmethod
+    async def fit(cls, db: AsyncSession, plugin_name: Optional[str]):
+        key = plugin_name or ""
+        cached = cls._cache.get(key)
+        if cached and time.monotonic() - cached[0] < settings.RUN_TIMING_CACHE_SECONDS:
+            return cached[1:]
+
+        query = (
+            select(Run.started_at, Run.finished_at, Run.image_count)
+            .join(Project, Project.id == Run.project_id)
+            .where(
+                Run.status == RunStatus.SUCCEEDED,
+                Run.started_at.isnot(None),
+                Run.finished_at.isnot(None),
+                Run.image_count > 0,
+            )
+            .order_by(Run.finished_at.desc())
+            .limit(settings.RUN_TIMING_SAMPLE_SIZE)
+        )
+        if plugin_name:
+            query = query.where(Project.plugin_name == plugin_name)
+        rows = (await db.execute(query)).all()
+
+        samples = []
+        for started_at, finished_at, image_count in rows:
+            duration = (finished_at - started_at).total_seconds()
+            # Runs recorded before started_at was captured at task start have ~0s durations
+            if duration >= settings.RUN_TIMING_MIN_DURATION:
+                samples.append((duration, int(image_count)))
+
+        seconds_per_image = None
+        overhead = float(settings.JMP_START_DELAY + 10)
+        if len(samples) >= settings.RUN_TIMING_MIN_SAMPLES:
+            per_image = [max(duration - overhead, 0.0) / count for duration, count in samples]
+            seconds_per_image = median(per_image)
+            overhead = median(
+                max(duration - seconds_per_image * count, 0.0) for duration, count in samples
+            )
+
+        cls._cache[key] = (time.monotonic(), seconds_per_image, overhead, len(samples))
+        return seconds_per_image, overhead, len(samples)
+
+    @classmethod
+    async def estimate(
+        cls,
+        db: AsyncSession,
+        plugin_name: Optional[str],
+        images_expected: Optional[int],
+        fallback_timeout: int
+    ) -> RunTimeEstimate:
+        """Estimate JMP time and timeout for a run expected to produce ``images_expected`` images.
+
+        Falls back to ``fallback_timeout`` (the configured JMP max wait time) when
+        there is no history or no manifest to scale by.
+        """
+        seconds_per_image, overhead, sample_size = await cls.fit(db, plugin_name)
+
+        if seconds_per_image is None or not images_expected:
+            return RunTimeEstimate(
+                expected_seconds=None,
+                timeout_seconds=fallback_timeout,
+                seconds_per_image=seconds_per_image,
+                overhead_seconds=overhead,
+                sample_size=sample_size,
+            )
+
+        expected = overhead + seconds_per_image * images_expected
+        timeout = expected * settings.RUN_TIMING_SAFETY_FACTOR + settings.RUN_TIMING_SLACK_SECONDS
+        timeout = int(min(max(timeout, settings.RUN_TIMING_MIN_TIMEOUT), settings.RUN_TIMING_MAX_TIMEOUT))
+        return RunTimeEstimate(
+            expected_seconds=round(expected, 1),
+            timeout_seconds=timeout,
+            seconds_per_image=seconds_per_image,
+            overhead_seconds=overhead,
+            sample_size=sample_size,
+        )
@@ -0,0 +1,159 @@
+"""
+Concurrent webhook delivery for announcements.
+
+Webhooks used to be posted one after another, each through a fresh
+``httpx.AsyncClient``. Deliveries now share one pooled client per event loop,
+run concurrently (bounded by ``WEBHOOK_MAX_CONCURRENCY``) and retry transport
+errors, 429 and 5xx responses with exponential backoff.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import random
+import time
+import urllib.parse
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_dingtalk_sign_and_timestamp(secret: str) -> tuple:
+    """
+    Generate DingTalk webhook signature and timestamp.
+
+    DingTalk signing process:
+    1. Use timestamp and secret as signature string (timestamp\\nsecret)
+    2. Calculate signature using HmacSHA256 algorithm
+    3. Base64 encode the signature
+    4. URL encode the signature (using UTF-8 charset)
+
+    This matches the exact implementation from DingTalk documentation.
+    """
+    timestamp = str(round(time.time() * 1000))
+    # Step 1: Create signature string: timestamp\nsecret
+    string_to_sign = f"{timestamp}\n{secret}"
+
+    # Step 2: Calculate HMAC-SHA256 signature
+    hmac_code = hmac.new(
+        secret.encode('utf-8'),
+        string_to_sign.encode('utf-8'),
+        digestmod=hashlib.sha256
+    ).digest()
+
+    # Step 3: Base64 encode (returns bytes)
+    # Step 4: URL encode - quote_plus can accept bytes directly
+    # This exactly matches: urllib.parse.quote_plus(base64.b64encode(hmac_code))
+    sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))
+
+    return sign, timestamp
+
+
+def get_webhook_client() -> httpx.AsyncClient:
+    """Pooled HTTP client for the running event loop (clients can't be shared across loops)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.WEBHOOK_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.WEBHOOK_MAX_CONCURRENCY
+            )
+        )
+        _client_loop = loop
+    return _client
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+async def send_webhook(webhook_url: str, title: str, message: str, secret: Optional[str] = None) -> dict:
+    """Send message to a webhook (DingTalk format with optional signing), retrying transient failures."""
+    # DingTalk webhook format
+    payload = {
+        "msgtype": "text",
+        "text": {
+            "content": f"{title}\n\n{message}"
+        },
+        "at": {
+            "isAtAll": False
+        }
+    }
+    client = get_webhook_client()
+    attempts = settings.WEBHOOK_MAX_RETRIES + 1
+
+    for attempt in range(1, attempts + 1):
+        try:
+            # Signatures embed a timestamp, so each attempt is signed afresh
+            final_url = webhook_url
+            if secret:
+                sign, timestamp = get_dingtalk_sign_and_timestamp(secret)
+                # Format: original_url&timestamp=xxx&sign=xxx
+                separator = '&' if '?' in webhook_url else '?'
+                final_url = f"{webhook_url}{separator}timestamp={timestamp}&sign={sign}"
+
+            response = await client.post(final_url, json=payload, headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {"text": response.text, "status_code": response.status_code}
+
+            return {
+                "success": True,
+                "status_code": response.status_code,
+                "response": response_data,
+                "url": webhook_url,
+                "attempts": attempt
+            }
+        except Exception as e:
+            if attempt < attempts and _is_retryable(e):
+                delay = settings.WEBHOOK_RETRY_BACKOFF * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+                logger.warning(f"[WEBHOOK] Attempt {attempt}/{attempts} to {webhook_url} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            error_info = {
+                "success": False,
+                "error": str(e),
+                "url": webhook_url,
+                "attempts": attempt
+            }
+            # Try to get response if available
+            response = getattr(e, "response", None)
+            if response is not None:
+                try:
+                    error_info["status_code"] = response.status_code
+                    error_info["response"] = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+                except Exception:
+                    pass
+            logger.error(f"[WEBHOOK] Failed to send to webhook {webhook_url}: {e}")
+            return error_info
+
+
+async def deliver_webhooks(webhooks: List[Dict], title: str, message: str) -> List[dict]:
+    """Send one message to every webhook concurrently; results are in the order of ``webhooks``."""
+    semaphore = asyncio.Semaphore(settings.WEBHOOK_MAX_CONCURRENCY)
+
+    async def deliver(webhook: Dict) -> dict:
+        async with semaphore:
+            return await send_webhook(webhook["url"], title, message, secret=webhook.get("secret"))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(deliver(webhook) for webhook in webhooks))
+    delivered = sum(1 for result in results if result.get("success"))
+    logger.info(f"[WEBHOOK] Delivered {delivered}/{len(webhooks)} webhooks in {time.perf_counter() - started:.2f}s")
+    return list(results)
@@ -0,0 +1,345 @@
+"""
+Remote JMP runner agent.
+
+Runs next to a JMP seat (typically a Mac) and serves jobs for one backend:
+
+    python -m app.worker.jmp_agent --server http://backend:4700 --token $JMP_AGENT_TOKEN
+
+The agent registers its capacity, sends heartbeats (which keep its job leases
+alive), pulls jobs from /api/v1/agents, downloads each job bundle (CSV + JSL),
+renders it with JMPRunner in a local task folder and uploads the PNGs back.
+
+With --fake the agent uses FakeJMPRunner, which writes placeholder images for
+every output in the JSL manifest. It runs on Linux and is meant for exercising
+the agent protocol end to end without JMP.
+"""
+import argparse
+import io
+import logging
+import os
+import platform
+import re
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+# Add the backend directory to the Python path (for jmp_runner and extensions)
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, backend_dir)
+
+from jmp_runner import JMPRunner
+from extensions.base.jsl_manifest import read_output_manifest
+
+logger = logging.getLogger(__name__)
+
+AGENT_VERSION = "1"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+_OPEN_CALL = re.compile(r'Open\(\s*"([^"]*)"')
+
+
+def localize_open_paths(jsl_path: Path, csv_path: Path) -> int:
+    """
+    Point the JSL's Open("...") of the bundled CSV at the agent's copy
+
+    The server writes the CSV's path in its own TASKS_DIRECTORY into the
+    header, which doesn't exist on a JMP host without the shared filesystem.
+    Only Open() calls naming a file called like the CSV are rewritten.
+
+    Returns:
+        Number of Open() calls rewritten
+    """
+    text = jsl_path.read_text(encoding="utf-8", errors="surrogateescape")
+    local = csv_path.resolve().as_posix()
+    rewritten = 0
+
+    def replace(match):
+        nonlocal rewritten
+        if match.group(1).replace("\\", "/").rsplit("/", 1)[-1] != csv_path.name:
+            return match.group(0)
+        rewritten += 1
+        return f'Open("{local}"'
+
+    text = _OPEN_CALL.sub(replace, text)
+    if rewritten:
+        jsl_path.write_text(text, encoding="utf-8", errors="surrogateescape")
+    return rewritten
+
+
+class FakeJMPRunner:
+    """Stand-in for JMPRunner that renders placeholder PNGs instead of driving JMP."""
+
+    def __init__(self, base_task_dir: Path, seconds_per_image: float = 0.05):
+        self.base_task_dir = Path(base_task_dir)
+        self.seconds_per_image = seconds_per_image
+
+    def run_csv_jsl(self, csv_path: str, jsl_path: str, task_id: Optional[str] = None,
+                    on_task_ready: Optional[Callable[[str, str, str], None]] = None,
+                    on_progress: Optional[Callable[[str], None]] = None,
+                    expected_outputs: Optional[List[str]] = None) -> Dict[str, Any]:
+        from PIL import Image, ImageDraw
+
+        task_dir = self.base_task_dir / f"task_{task_id}"
+        if not expected_outputs:
+            manifest = read_output_manifest(Path(jsl_path).read_text(encoding="utf-8", errors="ignore"))
+            expected_outputs = (manifest or {}).get("outputs", [])
+
+        images = []
+        for name in expected_outputs:
+            image = Image.new("RGB", (640, 480), "white")
+            ImageDraw.Draw(image).text((20, 20), f"fake JMP output: {Path(name).stem}", fill="black")
+            image.save(task_dir / name, "PNG")
+            images.append(name)
+            time.sleep(self.seconds_per_image)
+            if on_progress:
+                on_progress(f"Generated {len(images)} images")
+
+        return {
+            "status": "completed" if images else "failed",
+            "error": None if images else "No images were generated by JMP",
+            "task_id": task_id,
+            "task_dir": str(task_dir),
+            "images": images,
+            "image_count": len(images),
+            "created_at": datetime.now().isoformat()
+        }
+
+
+class JMPAgent:
+    """Pulls JMP jobs from the backend and renders them on this host."""
+
+    def __init__(self, server_url: str, token: str, work_dir: Path, agent_id: Optional[str] = None,
+                 capacity: int = 1, fake: bool = False, poll_interval: float = 2.0,
+                 max_wait_time: Optional[int] = None):
+        self.api_url = server_url.rstrip("/") + "/api/v1/agents"
+        self.agent_id = agent_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.work_dir = Path(work_dir)
+        self.fake = fake
+        # A real JMP seat runs one script at a time (JMPRunner closes other JMP processes)
+        self.capacity = capacity if fake else 1
+        self.poll_interval = poll_interval
+        self.max_wait_time = max_wait_time
+        self.heartbeat_interval = 10
+
+        self.session = requests.Session()
+        self.session.headers["X-Agent-Token"] = token
+        self._running: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        if capacity > 1 and not fake:
+            logger.warning("[AGENT] JMP runs one script per host; capacity forced to 1")
+
+    # Protocol
+
+    def register(self) -> None:
+        response = self.session.post(f"{self.api_url}/register", json={
+            "agent_id": self.agent_id,
+            "hostname": socket.gethostname(),
+            "capacity": self.capacity,
+            "platform": platform.platform(),
+            "version": AGENT_VERSION,
+            "fake": self.fake
+        }, timeout=10)
+        response.raise_for_status()
+        self.heartbeat_interval = response.json().get("heartbeat_interval", self.heartbeat_interval)
+        logger.info(f"[AGENT] Registered as {self.agent_id} (capacity={self.capacity}, fake={self.fake})")
+
+    def heartbeat(self) -> None:
+        with self._lock:
+            running = list(self._running)
+        response = self.session.post(f"{self.api_url}/{self.agent_id}/heartbeat",
+                                     json={"running_jobs": running, "busy": len(running)}, timeout=10)
+        if response.status_code == 404:
+            # Server forgot us (e.g. Redis restarted or we were offline too long)
+            self.register()
+            return
+        response.raise_for_status()
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        response = self.session.post(f"{self.api_url}/{self.agent_id}/claim", timeout=15)
+        response.raise_for_status()
+        return response.json().get("job")
+
+    def report_progress(self, job_id: str, message: str, images_done: Optional[int] = None) -> None:
+        try:
+            self.session.post(f"{self.api_url}/jobs/{job_id}/progress", json={
+                "agent_id": self.agent_id, "message": message, "images_done": images_done
+            }, timeout=5)
+        except requests.RequestException as e:
+            logger.warning(f"[AGENT] Progress report failed for job {job_id}: {e}")
+
+    def download_bundle(self, job: Dict[str, Any], task_dir: Path) -> None:
+        with self.session.get(f"{self.api_url}/jobs/{job['job_id']}/bundle",
+                              params={"agent_id": self.agent_id}, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+        with zipfile.ZipFile(buffer) as bundle:
+            for member in bundle.infolist():
+                name = Path(member.filename).name
+                with bundle.open(member) as src, open(task_dir / name, "wb") as dst:
+                    shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+
+    def upload_result(self, job: Dict[str, Any], task_dir: Path, result: Dict[str, Any]) -> None:
+        images = [task_dir / Path(name).name for name in result.get("images", [])
+                  if not str(name).endswith("failure_error.png")]
+        data = {"agent_id": self.agent_id, "status": result.get("status", "failed")}
+        if result.get("error"):
+            data["error"] = result["error"]
+
+        bundle_path = task_dir.parent / f"results_{job['job_id']}.zip"
+        with zipfile.ZipFile(bundle_path, "w", compression=zipfile.ZIP_STORED) as bundle:
+            for image in images:
+                if image.exists():
+                    bundle.write(image, arcname=image.name)
+        try:
+            with open(bundle_path, "rb") as fh:
+                response = self.session.post(
+                    f"{self.api_url}/jobs/{job['job_id']}/result",
+                    data=data,
+                    files={"results": (bundle_path.name, fh, "application/zip")},
+                    timeout=300
+                )
+            if response.status_code == 409:
+                logger.warning(f"[AGENT] Job {job['job_id']} was reassigned before the result was uploaded")
+                return
+            response.raise_for_status()
+        finally:
+            bundle_path.unlink(missing_ok=True)
+
+    # Execution
+
+    def _make_runner(self, max_wait_time: int):
+        if self.fake:
+            return FakeJMPRunner(self.work_dir)
+        return JMPRunner(base_task_dir=self.work_dir, max_wait_time=max_wait_time, jmp_start_delay=6)
+
+    def process_job(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        task_dir = self.work_dir / f"task_{job_id}"
+        task_dir.mkdir(parents=True, exist_ok=True)
+        last_report = [0.0]
+
+        def on_progress(message: str):
+            # Throttle to one report per second; the server fans these out to the run's stream
+            now = time.monotonic()
+            if now - last_report[0] >= 1.0:
+                last_report[0] = now
+                images_done = sum(1 for path in task_dir.glob("*.png"))
+                self.report_progress(job_id, message, images_done)
+
+        try:
+            self.download_bundle(job, task_dir)
+            if not localize_open_paths(task_dir / job["jsl_name"], task_dir / job["csv_name"]):
+                logger.warning(f"[AGENT] Job {job_id}: no Open() of {job['csv_name']} found in {job['jsl_name']}")
+            runner = self._make_runner(self.max_wait_time or job.get("max_wait_time") or 300)
+            result = runner.run_csv_jsl(
+                csv_path=str(task_dir / job["csv_name"]),
+                jsl_path=str(task_dir / job["jsl_name"]),
+                task_id=job_id,
+                on_progress=on_progress,
+                expected_outputs=job.get("expected_outputs") or None
+            )
+        except Exception as e:
+            logger.error(f"[AGENT] Job {job_id} failed: {e}", exc_info=True)
+            result = {"status": "failed", "error": f"Agent {self.agent_id}: {e}", "images": []}
+
+        try:
+            self.upload_result(job, task_dir, result)
+            logger.info(f"[AGENT] Job {job_id} finished: {result.get('status')} ({len(result.get('images', []))} images)")
+        except requests.RequestException as e:
+            # The lease runs out and another agent (or this one) picks the job up again
+            logger.error(f"[AGENT] Could not upload result of job {job_id}: {e}")
+        finally:
+            shutil.rmtree(task_dir, ignore_errors=True)
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except requests.RequestException as e:
+                logger.warning(f"[AGENT] Heartbeat failed: {e}")
+
+    def run_forever(self) -> None:
+        """Register, then keep pulling jobs until interrupted."""
+        while True:
+            try:
+                self.register()
+                break
+            except requests.RequestException as e:
+                logger.warning(f"[AGENT] Registration failed, retrying: {e}")
+                time.sleep(self.poll_interval * 5)
+
+        threading.Thread(target=self._heartbeat_loop, name="jmp-agent-heartbeat", daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    free_slots = self.capacity - len(self._running)
+                if free_slots <= 0:
+                    time.sleep(self.poll_interval)
+                    continue
+                try:
+                    job = self.claim()
+                except requests.RequestException as e:
+                    logger.warning(f"[AGENT] Claim failed: {e}")
+                    time.sleep(self.poll_interval * 5)
+                    continue
+                if not job:
+                    time.sleep(self.poll_interval)
+                    continue
+
+                logger.info(f"[AGENT] Claimed job {job['job_id']} for run {job.get('run_id')}")
+                worker = threading.Thread(target=self.process_job, args=(job,), name=f"jmp-job-{job['job_id']}", daemon=True)
+                with self._lock:
+                    self._running[job["job_id"]] = worker
+                worker.start()
+        except KeyboardInterrupt:
+            logger.info("[AGENT] Shutting down")
+        finally:
+            self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remote JMP runner agent")
+    parser.add_argument("--server", default=os.getenv("JMP_AGENT_SERVER", "http://localhost:4700"),
+                        help="Backend base URL")
+    parser.add_argument("--token", default=os.getenv("JMP_AGENT_TOKEN", ""), help="Shared agent token")
+    parser.add_argument("--work-dir", default=os.getenv("JMP_AGENT_WORK_DIR", "/tmp/jmp_agent_tasks"),
+                        help="Local folder for job task folders")
+    parser.add_argument("--agent-id", default=None, help="Stable agent id (default: hostname + random suffix)")
+    parser.add_argument("--capacity", type=int, default=1, help="Concurrent jobs (fake mode only)")
+    parser.add_argument("--max-wait-time", type=int, default=None, help="Override the per-job JMP timeout")
+    parser.add_argument("--fake", action="store_true", help="Render placeholder images instead of running JMP")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if not args.token:
+        parser.error("--token (or JMP_AGENT_TOKEN) is required")
+
+    JMPAgent(
+        server_url=args.server,
+        token=args.token,
+        work_dir=Path(args.work_dir),
+        agent_id=args.agent_id,
+        capacity=args.capacity,
+        fake=args.fake,
+        max_wait_time=args.max_wait_time
+    ).run_forever()
+
+
+if __name__ == "__main__":
+    main()
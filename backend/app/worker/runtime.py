@@ -0,0 +1,128 @@
+"""
+Long-lived async runtime for Celery worker processes.
+
+Tasks used to call ``asyncio.run()``, which builds a new event loop per task;
+the async DB pool and Redis client are bound to the loop that opened their
+connections, so workers were restarted after every task
+(``worker_max_tasks_per_child=1``). Instead, each worker process keeps one
+event loop for its whole life and ``run_async`` drives task coroutines on it,
+so pooled DB/Redis connections and warm imports are reused across tasks.
+
+Per-task state is isolated explicitly: anything a task leaves scheduled on the
+loop is cancelled when it returns, and ``reset_task_state`` hooks clear module
+level caches that must not leak between runs. Processes are recycled by Celery
+once they exceed ``worker_max_memory_per_child`` instead of after every task.
+"""
+import asyncio
+import logging
+import os
+import resource
+import sys
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_task_count = 0
+_reset_hooks: List[Callable[[], None]] = []
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's persistent event loop, creating it after fork if needed."""
+    global _loop, _loop_pid
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def register_task_reset(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register a function clearing per-task module state; run after every task."""
+    _reset_hooks.append(hook)
+    return hook
+
+
+def _cancel_leftover_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    pending = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    if not pending:
+        return
+    logger.warning(f"[WORKER] Cancelling {len(pending)} background task(s) left behind by the previous task")
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+
+def reset_task_state() -> None:
+    """Run the registered per-task reset hooks."""
+    for hook in _reset_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.warning(f"[WORKER] Task state reset hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """Run a task coroutine on the worker's persistent loop and clean up after it."""
+    global _task_count
+    loop = get_worker_loop()
+    started = time.perf_counter()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        _cancel_leftover_tasks(loop)
+        reset_task_state()
+        _task_count += 1
+        logger.info(
+            f"[WORKER] Task #{_task_count} on pid {os.getpid()} finished in {time.perf_counter() - started:.2f}s "
+            f"(max RSS {max_rss_mb():.0f} MB)"
+        )
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def init_worker_process() -> None:
+    """
+    Prepare a freshly forked worker child
+
+    Connections inherited from the parent must not be shared with it: drop the
+    DB pool (without closing the parent's sockets) and the Redis client so they
+    are recreated lazily on this process's loop.
+    """
+    from app.core import database, websocket
+
+    for engine in database.all_engines():
+        engine.sync_engine.dispose(close=False)
+    websocket.redis_client = None
+    get_worker_loop()
+    logger.info(f"[WORKER] Worker process {os.getpid()} initialised with a persistent event loop")
+
+
+def shutdown_worker_process() -> None:
+    """Close pooled connections and the loop when a worker child exits."""
+    global _loop
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        return
+    from app.core import database, websocket
+
+    async def close_connections():
+        for engine in database.all_engines():
+            await engine.dispose()
+        if websocket.redis_client is not None:
+            await websocket.redis_client.aclose()
+            websocket.redis_client = None
+
+    try:
+        _loop.run_until_complete(close_connections())
+    except Exception as e:
+        logger.warning(f"[WORKER] Error closing connections on shutdown: {e}")
+    finally:
+        _loop.close()
+        _loop = None
@@ -4,8 +4,11 @@ import sys
 import uuid
 import logging
 import re
+import json
+import socket
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 from celery import current_task
@@ -19,9 +22,25 @@ sys.path.insert(0, backend_dir)
 from app.core.celery import celery_app
 from app.core.database import AsyncSessionLocal
 from app.core.websocket import publish_run_update
+from app.core.progress import RunProgressPublisher, publish_progress_events
 from app.core.storage import local_storage
 from app.core.config import settings, get_jmp_max_wait_time
-from app.models import Run, RunStatus, Artifact, AppSetting
+from app.core.metrics import (
+    JMP_IMAGES_RENDERED, jmp_slot, observe_stage, record_bytes_written, record_stage
+)
+from app.core.tracing import (
+    StageSpans, celery_headers, celery_parent, load_run_trace, record_stage_spans, span, traced
+)
+from app.models import Run, RunStatus, Artifact, AppSetting, Project
+from app.services.run_timing import RunTimingModel
+from app.services.run_files import build_file_manifest, find_manifest_file
+from app.services.jsl_sharding import (
+    JslShard, plan_jsl_shards, prepare_shard_folders, shard_dir, shards_root,
+    count_shard_png_files, merge_shard_outputs, claim_shard, store_shard_result,
+    get_shard_result, clear_shard_state
+)
+from app.services import jmp_agents
+from app.worker.runtime import run_async, register_task_reset
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +54,236 @@ except ImportError as e:
     print(f"Files in backend dir: {os.listdir(backend_dir)}")
     raise
 
+from extensions.base.jsl_manifest import read_output_manifest
+
+@register_task_reset
+def _restore_working_directory():
+    """Tasks run back to back in one process now; never let one task's cwd leak into the next."""
+    if os.getcwd() != backend_dir:
+        os.chdir(backend_dir)
+
+def _load_output_manifest(jsl_path: Path, task_dir: Path) -> Optional[Dict[str, Any]]:
+    """Read the JSL output manifest and keep a copy in the task folder."""
+    try:
+        manifest = read_output_manifest(jsl_path.read_text(encoding="utf-8", errors="ignore"))
+    except OSError as e:
+        logger.warning(f"[WORKER] Could not read JSL for output manifest: {e}")
+        return None
+    if manifest is None:
+        return None
+    try:
+        (task_dir / "output_manifest.json").write_text(json.dumps(manifest, indent=2))
+    except OSError as e:
+        logger.warning(f"[WORKER] Could not write output_manifest.json: {e}")
+    return manifest
+
+def _count_png_files(task_dir: Path) -> int:
+    """Count PNG files in a task folder with a single directory scan."""
+    with os.scandir(task_dir) as entries:
+        count = sum(1 for entry in entries if entry.name.lower().endswith(".png") and entry.is_file())
+    # Sharded runs write into task_<id>/shards/task_<n>/ until the outputs are merged
+    return count + count_shard_png_files(task_dir)
+
+def _record_jmp_timings(result: Optional[Dict[str, Any]]) -> None:
+    """Feed the per-stage timings JMPRunner returns into the run stage metrics and the trace."""
+    timings = (result or {}).get("timings") or {}
+    stages = ("jmp_launch", "jmp_render", "ocr")
+    for stage in stages:
+        record_stage(stage, timings.get(stage))
+    record_stage_spans([(stage, timings.get(stage)) for stage in stages])
+
+def _run_jmp_on_shard(task_dir: Path, index: int, csv_name: str, jsl_name: str, max_wait_time: int,
+                      on_progress=None) -> Dict[str, Any]:
+    """Run JMP on one shard folder. Blocking; call through asyncio.to_thread."""
+    folder = shard_dir(task_dir, index)
+    expected_outputs = None
+    try:
+        expected_outputs = json.loads((folder / "output_manifest.json").read_text()).get("outputs")
+    except (OSError, ValueError):
+        pass
+    runner = JMPRunner(base_task_dir=shards_root(task_dir), max_wait_time=max_wait_time, jmp_start_delay=6)
+    with jmp_slot():
+        result = runner.run_csv_jsl(
+            csv_path=str(folder / csv_name),
+            jsl_path=str(folder / jsl_name),
+            task_id=str(index),
+            on_progress=on_progress,
+            expected_outputs=expected_outputs
+        )
+    _record_jmp_timings(result)
+    return result
+
+def _combine_shard_ocr(shard_ocr: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """OCR results of a sharded run: initial/final from whichever shard read them (empty if none had them)"""
+    found = [ocr for ocr in shard_ocr if ocr]
+    if len(found) <= 1:
+        return found[0] if found else {}
+    combined: Dict[str, Any] = {"initial": None, "final": None}
+    for name in ("initial", "final"):
+        for ocr in found:
+            entry = ocr.get(name)
+            if entry and (combined[name] is None or entry.get("success")):
+                combined[name] = entry
+    combined["success"] = any((combined[name] or {}).get("success") for name in ("initial", "final"))
+    combined["error"] = None if combined["success"] else "Failed to process both initial.png and final.png"
+    return combined
+
+async def _run_shards(run_id: str, jmp_task_id: str, task_dir: Path, csv_path: Path, jsl_path: Path,
+                      shards: List[JslShard], max_wait_time: int, jmp_runner: JMPRunner,
+                      on_progress=None) -> Dict[str, Any]:
+    """
+    Render a sharded run and merge the outputs into the run's task folder.
+    
+    Shards 1..K-1 are offered to other JMP slots via run_jmp_shard; this worker
+    then claims and renders whatever is still unclaimed, and waits for the rest.
+    With a single JMP slot every shard simply runs here, one after another.
+    
+    Returns:
+        Result dict shaped like JMPRunner.run_csv_jsl's
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    claim_ttl = max_wait_time + 120
+    shard_count = len(shards)
+    await clear_shard_state(run_id, shard_count)
+    
+    helper_ids = []
+    for shard in shards[1:]:
+        try:
+            helper = run_jmp_shard.apply_async(
+                args=[run_id, str(task_dir), csv_path.name, jsl_path.name, shard.index, max_wait_time],
+                headers=celery_headers()
+            )
+            helper_ids.append(helper.id)
+        except Exception as e:
+            logger.warning(f"[SHARDS] Could not dispatch shard {shard.index}, will render locally: {e}")
+    
+    results: Dict[int, Dict[str, Any]] = {}
+    pending = {shard.index for shard in shards}
+    deadline = time.monotonic() + max_wait_time * shard_count + 300
+    while pending:
+        rendered = False
+        for index in sorted(pending):
+            result = await get_shard_result(run_id, index)
+            if result is None and await claim_shard(run_id, index, owner, claim_ttl):
+                logger.info(f"[SHARDS] Rendering shard {index + 1}/{shard_count} on {owner}")
+                if on_progress:
+                    on_progress(f"Rendering shard {index + 1} of {shard_count}...")
+                with span("render_shard", **{"shard.index": index, "shard.count": shard_count}):
+                    result = await asyncio.to_thread(
+                        _run_jmp_on_shard, task_dir, index, csv_path.name, jsl_path.name, max_wait_time
+                    )
+                await store_shard_result(run_id, index, result, claim_ttl)
+                rendered = True
+            if result is not None:
+                results[index] = result
+                pending.discard(index)
+        if pending and not rendered:
+            if time.monotonic() > deadline:
+                logger.error(f"[SHARDS] Timed out waiting for shards {sorted(pending)} of run {run_id}")
+                break
+            await asyncio.sleep(2)
+    
+    # Helpers still queued have nothing left to do; merging removes the shard folders as well
+    if helper_ids:
+        try:
+            celery_app.control.revoke(helper_ids)
+        except Exception as e:
+            logger.warning(f"[SHARDS] Could not revoke shard helpers of run {run_id}: {e}")
+    merged = await asyncio.to_thread(merge_shard_outputs, task_dir)
+    failed = [i for i in range(shard_count) if results.get(i, {}).get("status") != "completed"]
+    
+    if failed:
+        errors = "; ".join(
+            f"shard {i}: {results[i].get('error') or 'failed'}" if i in results else f"shard {i}: no result"
+            for i in failed
+        )
+        error_msg = f"{len(failed)} of {shard_count} shards failed ({errors})"
+        failure_image = jmp_runner.generate_failure_image(task_dir, error_msg)
+        return {
+            "status": "failed",
+            "error": error_msg,
+            "task_id": jmp_task_id,
+            "task_dir": str(task_dir),
+            "images": [failure_image],
+            "image_count": 1,
+            "shard_count": shard_count
+        }
+    
+    # Each shard ran OCR on its own images; combine those results instead of a second pass
+    processed_images = sorted(merged)
+    ocr_results = _combine_shard_ocr([results[i].get("ocr_results") for i in range(shard_count)])
+    logger.info(f"[SHARDS] Run {run_id}: {shard_count} shards merged, {len(merged)} images")
+    return {
+        "status": "completed" if processed_images else "failed",
+        "error": None if processed_images else "No images were generated by JMP",
+        "task_id": jmp_task_id,
+        "task_dir": str(task_dir),
+        "images": processed_images,
+        "image_count": len(processed_images),
+        "ocr_results": ocr_results,
+        "shard_count": shard_count
+    }
+
+async def _run_on_agents(run_id: str, jmp_task_id: str, task_dir: Path, csv_path: Path, jsl_path: Path,
+                         shards: List[JslShard], expected_outputs: Optional[List[str]], max_wait_time: int,
+                         jmp_runner: JMPRunner, on_progress=None) -> Dict[str, Any]:
+    """
+    Render a run on remote runner agents (JMP_EXECUTION_MODE=agent).
+    
+    Each shard (or the whole script when unsharded) becomes one agent job. Agents
+    upload their images into the job folder; shard outputs are then merged the
+    same way as for locally rendered shards.
+    
+    Returns:
+        Result dict shaped like JMPRunner.run_csv_jsl's
+    """
+    if shards:
+        jobs = [(shard_dir(task_dir, shard.index), shard.outputs) for shard in shards]
+    else:
+        jobs = [(task_dir, expected_outputs)]
+    
+    job_ids = []
+    for job_dir, outputs in jobs:
+        job_ids.append(await jmp_agents.enqueue_job(
+            run_id, job_dir, csv_path.name, jsl_path.name, outputs, max_wait_time
+        ))
+    if on_progress:
+        on_progress(f"Queued {len(job_ids)} job{'s' if len(job_ids) != 1 else ''} for remote JMP agents...")
+    
+    # Agents render jobs in parallel; allow for them to also be queued behind each other
+    timeout = max_wait_time * len(job_ids) + 300
+    results = await jmp_agents.wait_for_jobs(job_ids, timeout)
+    if shards:
+        await asyncio.to_thread(merge_shard_outputs, task_dir)
+    
+    failed = [results[job_id] for job_id in job_ids if results[job_id].get("status") != "completed"]
+    if failed:
+        error_msg = "; ".join(result.get("error") or "failed" for result in failed)
+        if len(job_ids) > 1:
+            error_msg = f"{len(failed)} of {len(job_ids)} agent jobs failed ({error_msg})"
+        failure_image = jmp_runner.generate_failure_image(task_dir, error_msg)
+        return {
+            "status": "failed",
+            "error": error_msg,
+            "task_id": jmp_task_id,
+            "task_dir": str(task_dir),
+            "images": [failure_image],
+            "image_count": 1
+        }
+    
+    with span("ocr"):
+        processed_images, ocr_results = await asyncio.to_thread(jmp_runner._process_images_with_ocr, task_dir)
+    return {
+        "status": "completed" if processed_images else "failed",
+        "error": None if processed_images else "No images were generated by JMP",
+        "task_id": jmp_task_id,
+        "task_dir": str(task_dir),
+        "images": processed_images,
+        "image_count": len(processed_images),
+        "ocr_results": ocr_results,
+        "agents": sorted({result.get("agent_id") for result in results.values() if result.get("agent_id")})
+    }
+
 @celery_app.task(bind=True, name="run_jmp_boxplot")
 def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
     """
@@ -74,9 +323,14 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
         final_message = None
         final_image_count = 0
         final_error = None
+        # Recorded now and written in the final commit, so durations reflect the real run time
+        task_started_at = datetime.utcnow()
+        prep_started = time.perf_counter()
+        stages = StageSpans()
         
         async with AsyncSessionLocal() as db:
             try:
+                stages.next("verify_task_folder")
                 # Get the run (read-only, no commit)
                 result = await db.execute(select(Run).where(Run.id == uuid.UUID(run_id)))
                 run = result.scalar_one_or_none()
@@ -84,13 +338,13 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                 if not run:
                     raise ValueError(f"Run {run_id} not found")
                 
-                # Publish status update (WebSocket only, no database write)
-                await publish_run_update(run_id, {
+                # Publish status update (WebSocket and progress stream, no database write)
+                await publish_progress_events(run_id, [{
                     "type": "run_started",
                     "run_id": run_id,
                     "status": "running",
                     "message": "Starting JMP analysis..."
-                })
+                }])
                 
                 # Get input artifacts (read-only, no commit)
                 artifacts_result = await db.execute(
@@ -181,46 +435,71 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     "message": "Processing files with JMP from task folder..."
                 })
                 
-                # Create background monitoring task to check image count every 3 seconds
+                stages.next("plan")
+                # The output manifest gives the exact image count; the timing model
+                # learned from past runs of this extension turns it into an ETA and timeout
+                manifest = _load_output_manifest(jsl_path, task_dir)
+                expected_outputs = manifest["outputs"] if manifest else None
+                images_expected = (manifest or {}).get("expected_images") or None
+                plugin_name = (await db.execute(
+                    select(Project.plugin_name).where(Project.id == run.project_id)
+                )).scalar_one_or_none()
+                # Get timeout from database setting, with fallback to config
+                configured_wait_time = await get_jmp_max_wait_time(db)
+                estimate = await RunTimingModel.estimate(
+                    db, plugin_name, images_expected, fallback_timeout=configured_wait_time
+                )
+                logger.info(
+                    f"[WORKER] Run timing estimate for {plugin_name or 'unknown plugin'}: "
+                    f"expected={estimate.expected_seconds}s, timeout={estimate.timeout_seconds}s, "
+                    f"samples={estimate.sample_size}"
+                )
+                
+                # Large scripts are split at their FAI block markers so several JMP slots can render them
+                shards = plan_jsl_shards(
+                    jsl_path.read_text(encoding="utf-8", errors="ignore"),
+                    settings.JMP_SHARD_MAX,
+                    settings.JMP_SHARD_MIN_BLOCKS
+                )
+                shard_wait_time = None
+                if shards:
+                    prepare_shard_folders(task_dir, csv_path, jsl_path, shards)
+                    shard_estimate = await RunTimingModel.estimate(
+                        db, plugin_name, max(len(shard.outputs) for shard in shards),
+                        fallback_timeout=configured_wait_time
+                    )
+                    shard_wait_time = shard_estimate.timeout_seconds
+                    logger.info(f"[WORKER] Split JSL into {len(shards)} shards (timeout per shard: {shard_wait_time}s)")
+                
+                # Coalesced progress pipeline: producers only record the latest state,
+                # the publisher flushes it to the run's Redis Stream every few hundred ms
+                progress = RunProgressPublisher(
+                    run_id,
+                    images_expected=images_expected,
+                    seconds_per_image=estimate.seconds_per_image
+                )
+                progress.update(expected_seconds=estimate.expected_seconds)
+                await progress.start()
+                
+                # JMP rendering; the image count monitor runs alongside it
+                stages.next("jmp", **{"shard.count": len(shards) if shards else None})
+                
+                # Create background monitoring task to track image count in the task folder
                 monitoring_active = asyncio.Event()
                 monitoring_active.set()  # Start active
                 
                 async def monitor_image_count():
-                    """Background task to monitor image count in task folder every 3 seconds."""
-                    last_count = -1  # Start at -1 to ensure first update (even if count is 0) is sent
+                    """Background task feeding the task folder image count into the progress publisher."""
+                    with span("monitor_image_count"):
+                        await _monitor_loop()
+                
+                async def _monitor_loop():
                     while monitoring_active.is_set():
                         try:
-                            # Count PNG files in task folder
-                            png_files = list(task_dir.glob("*.png"))
-                            current_count = len(png_files)
-                            
-                            # Send update if count changed (including initial update when last_count is -1)
-                            if current_count != last_count:
-                                last_count = current_count
-                                
-                                # Check if monitoring is still active
-                                if not monitoring_active.is_set():
-                                    break
-                                
-                                # Only send WebSocket update (no database updates to avoid concurrent access)
-                                # Database will be updated by the main process when it completes
-                                update_data = {
-                                    "type": "run_progress",
-                                    "run_id": run_id,
-                                    "status": "running",
-                                    "image_count": current_count
-                                }
-                                
-                                if current_count > 0:
-                                    update_data["message"] = f"Generated {current_count} image{'s' if current_count != 1 else ''} so far..."
-                                else:
-                                    update_data["message"] = "Monitoring task folder for images..."
-                                
-                                await publish_run_update(run_id, update_data)
-                                logger.info(f"[MONITOR] Task folder {task_dir}: {current_count} images found - WebSocket update sent")
+                            progress.update(images_done=_count_png_files(task_dir))
                             
-                            # Wait 3 seconds before next check (check flag during sleep)
-                            for _ in range(30):  # 30 * 0.1 = 3 seconds
+                            # Wait before next check (check flag during sleep)
+                            for _ in range(10):  # 10 * 0.1 = 1 second
                                 if not monitoring_active.is_set():
                                     break
                                 await asyncio.sleep(0.1)
@@ -237,12 +516,13 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                 
                 # Start background monitoring task
                 monitor_task = asyncio.create_task(monitor_image_count())
-                logger.info(f"[MONITOR] Started background image count monitoring for task folder: {task_dir}")
+                logger.info(f"[MONITOR] Started background image count monitoring for task folder: {task_dir} (expected images: {images_expected})")
+                
+                record_stage("file_prep", time.perf_counter() - prep_started)
                 
                 # Run JMP analysis - jmp_runner will use the task folder directly
                 # Pass the task_id so jmp_runner knows which task folder to use
-                # Get timeout from database setting, with fallback to config
-                max_wait_time = await get_jmp_max_wait_time(db)
+                max_wait_time = estimate.timeout_seconds
                 logger.info(f"[WORKER] Using timeout setting: {max_wait_time} seconds ({max_wait_time / 60:.1f} minutes)")
                 jmp_runner = JMPRunner(
                     base_task_dir=settings.TASKS_DIRECTORY,
@@ -251,7 +531,9 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                 )
                 
                 # Define callback to notify frontend when task folder is ready and CSV is found
-                # Since we're in an async context (process_run), we can schedule tasks directly
+                # JMPRunner runs in a worker thread, so hand the coroutine back to this loop
+                loop = asyncio.get_running_loop()
+                
                 def sync_callback(task_id: str, task_dir: str, csv_filename: str):
                     """Synchronous callback wrapper that schedules async notification."""
                     async def notify_frontend():
@@ -265,71 +547,69 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                             "csv_filename": csv_filename
                         })
                     
-                    # Schedule the coroutine in the current event loop
-                    # Since process_run() is async, the loop should be running
                     try:
-                        # Get the running event loop (preferred method for Python 3.7+)
-                        loop = asyncio.get_running_loop()
-                        # Schedule the coroutine without blocking
-                        asyncio.create_task(notify_frontend())
+                        asyncio.run_coroutine_threadsafe(notify_frontend(), loop)
                     except RuntimeError:
-                        # No running loop (shouldn't happen, but handle gracefully)
-                        # This should not occur since we're inside an async function
-                        logger.warning("Could not get running event loop for task_ready notification")
+                        logger.warning("Could not schedule task_ready notification on the worker event loop")
                 
-                # Define progress callback to notify frontend of detailed progress updates
+                # Define progress callback to record detailed progress updates
                 def progress_callback(message: str):
-                    """Synchronous callback wrapper that schedules async progress notification."""
-                    # Extract image count from progress message
+                    """Record a JMPRunner progress line; the publisher coalesces and sends it."""
                     image_count = None
                     # Look for patterns like "Found X images" or "Generated X images"
                     match = re.search(r'(?:Found|Generated)\s+(\d+)\s+images?', message, re.IGNORECASE)
                     if match:
                         image_count = int(match.group(1))
-                    
-                    # Only send WebSocket updates (no database updates to avoid concurrent access)
-                    # Database will be updated by the main process when it completes
-                    async def notify_frontend():
-                        update_data = {
-                            "type": "run_progress",
-                            "run_id": run_id,
-                            "status": "running",
-                            "message": message
-                        }
-                        if image_count is not None:
-                            update_data["image_count"] = image_count
-                            update_data["message"] = f"Generated {image_count} image{'s' if image_count != 1 else ''} so far..."
-                        await publish_run_update(run_id, update_data)
-                    
-                    # Schedule the coroutine in the current event loop
-                    try:
-                        loop = asyncio.get_running_loop()
-                        asyncio.create_task(notify_frontend())
-                    except RuntimeError:
-                        logger.warning("Could not get running event loop for progress notification")
+                        progress.update(
+                            images_done=image_count,
+                            message=f"Generated {image_count} image{'s' if image_count != 1 else ''} so far..."
+                        )
+                    else:
+                        progress.update(message=message)
                 
                 # Run the analysis with retry on transient 'file not found' failures
                 # Pass task_id so jmp_runner uses the task folder directly (files already there)
                 try:
                     last_result = None
-                    for attempt in range(3):
-                        result = jmp_runner.run_csv_jsl(
-                            csv_path=str(csv_path),
-                            jsl_path=str(jsl_path),
-                            task_id=run.jmp_task_id,  # Pass task_id so jmp_runner uses existing task folder
-                            on_task_ready=sync_callback,
-                            on_progress=progress_callback
+                    def run_jmp():
+                        # Called from this module so JMPRunner's Celery caller check passes
+                        with jmp_slot():
+                            jmp_result = jmp_runner.run_csv_jsl(
+                                csv_path=str(csv_path),
+                                jsl_path=str(jsl_path),
+                                task_id=run.jmp_task_id,  # Pass task_id so jmp_runner uses existing task folder
+                                on_task_ready=sync_callback,
+                                on_progress=progress_callback,
+                                expected_outputs=expected_outputs
+                            )
+                        _record_jmp_timings(jmp_result)
+                        return jmp_result
+                    
+                    if settings.JMP_EXECUTION_MODE == "agent":
+                        last_result = await _run_on_agents(
+                            run_id, run.jmp_task_id, task_dir, csv_path, jsl_path, shards, expected_outputs,
+                            shard_wait_time or max_wait_time, jmp_runner, on_progress=progress_callback
+                        )
+                    elif shards:
+                        # Shards are rendered by this and other JMP slots, then merged into task_dir
+                        last_result = await _run_shards(
+                            run_id, run.jmp_task_id, task_dir, csv_path, jsl_path, shards,
+                            shard_wait_time, jmp_runner, on_progress=progress_callback
                         )
-                        last_result = result
-                        err = (result or {}).get("error", "")
-                        # If success or non-file-not-found error, stop retrying
-                        if (result or {}).get("status") == "completed":
-                            break
-                        if "file not found" not in err.lower():
-                            break
-                        if attempt < 2:
-                            print(f"Retry {attempt+1}/3: file not found, retrying in 3s...")
-                            await asyncio.sleep(3)
+                    else:
+                        for attempt in range(3):
+                            # Run JMP off the event loop so monitoring and progress flushes keep running
+                            result = await asyncio.to_thread(run_jmp)
+                            last_result = result
+                            err = (result or {}).get("error", "")
+                            # If success or non-file-not-found error, stop retrying
+                            if (result or {}).get("status") == "completed":
+                                break
+                            if "file not found" not in err.lower():
+                                break
+                            if attempt < 2:
+                                print(f"Retry {attempt+1}/3: file not found, retrying in 3s...")
+                                await asyncio.sleep(3)
                     result = last_result or {"status": "failed", "error": "Unknown error"}
                 finally:
                     # Stop monitoring task when JMP execution completes (success or failure)
@@ -353,12 +633,20 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                             logger.warning(f"[MONITOR] Error stopping monitoring task: {e}")
                     
                     logger.info("[MONITOR] Monitoring task fully stopped")
+                    await progress.stop()
+                
+                stages.next("register_artifacts", **{"run.status": result.get("status")})
+                
+                # Image artifacts get their size/hash from the file manifest built below
+                image_artifacts = []
+                manifest_dir = task_dir
                 
                 # Determine final state based on result (no database writes yet)
                 if result.get("status") == "completed":
                     # Get final image count from task folder (more accurate than result)
                     final_png_files = list(task_dir.glob("*.png"))
                     final_image_count = len(final_png_files)
+                    JMP_IMAGES_RENDERED.inc(final_image_count)
                     
                     # Set final state variables (will be committed at the end)
                     final_status = RunStatus.SUCCEEDED
@@ -366,13 +654,12 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     final_image_count = final_image_count
                     
                     # Send WebSocket update immediately (no database write)
-                    await publish_run_update(run_id, {
-                        "type": "run_completed",
-                        "run_id": run_id,
-                        "status": "succeeded",
-                        "message": "Analysis completed successfully",
-                        "image_count": final_image_count
-                    })
+                    await progress.publish_now(
+                        "run_completed",
+                        status="succeeded",
+                        message="Analysis completed successfully",
+                        images_done=final_image_count
+                    )
                 
                 if result.get("status") == "completed":
                     
@@ -417,6 +704,7 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                                 mime_type="image/png"
                             )
                             db.add(artifact)
+                            image_artifacts.append(artifact)
                             artifact_msg = f"Created artifact for {filename}"
                             logger.info(artifact_msg)
                             
@@ -484,12 +772,7 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                         logger.error("Failed to register failure image artifact: %s", artifact_err)
                     
                     # Publish failure update (WebSocket only, no database write)
-                    await publish_run_update(run_id, {
-                        "type": "run_failed",
-                        "run_id": run_id,
-                        "status": "failed",
-                        "message": final_message
-                    })
+                    await progress.publish_now("run_failed", status="failed", message=final_message)
                 
                 # CRITICAL: Single final database commit with all final state
                 # This happens once at the end, avoiding all intermediate database conflicts
@@ -499,6 +782,21 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     final_status = RunStatus.FAILED
                     final_message = final_message or "Task status unknown"
                 
+                # Record the finished task folder once, after OCR has written its files;
+                # listing, serving and zipping endpoints read it instead of the disk
+                file_manifest = None
+                try:
+                    file_manifest = await asyncio.to_thread(build_file_manifest, manifest_dir)
+                    record_bytes_written("task_output", file_manifest.get("total_bytes"))
+                except Exception as e:
+                    logger.warning(f"[MANIFEST] Could not build file manifest for run {run_id}: {e}")
+                for artifact in image_artifacts:
+                    manifest_entry = find_manifest_file(file_manifest, artifact.filename) or {}
+                    artifact.size_bytes = manifest_entry.get("size")
+                    artifact.sha256 = manifest_entry.get("sha256")
+                
+                stages.next("db_finalize")
+                finalize_started = time.perf_counter()
                 try:
                     # Prepare update values for final commit
                     # Only commit final summary: status, finished_at, message, image_count
@@ -510,12 +808,14 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     
                     # Set started_at if not already set (should be set by API, but ensure it's there)
                     if not run.started_at:
-                        update_values["started_at"] = datetime.utcnow()
+                        update_values["started_at"] = task_started_at
                     
                     if final_status == RunStatus.SUCCEEDED:
                         update_values["image_count"] = final_image_count
                     elif final_status == RunStatus.FAILED:
                         update_values["jmp_task_id"] = result.get("task_id", "")
+                    if file_manifest is not None:
+                        update_values["file_manifest"] = file_manifest
                     
                     # Single database update and commit
                     await db.execute(
@@ -539,6 +839,8 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                             update_values["image_count"] = final_image_count
                         elif final_status == RunStatus.FAILED:
                             update_values["jmp_task_id"] = result.get("task_id", "")
+                        if file_manifest is not None:
+                            update_values["file_manifest"] = file_manifest
                         
                         await db.execute(
                             update(Run)
@@ -550,6 +852,8 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     except Exception as retry_err:
                         logger.error(f"❌ Final database commit failed even after retry: {retry_err}")
                         # Continue anyway - WebSocket updates were already sent
+                record_stage("db_finalize", time.perf_counter() - finalize_started)
+                stages.end()
                 
                 # Check if queue mode is enabled and process next queued task
                 await asyncio.sleep(1)
@@ -571,6 +875,7 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     }
                     
             except Exception as e:
+                stages.end(error=e)
                 # Set final state for exception case
                 final_status = RunStatus.FAILED
                 final_message = f"Task failed: {str(e)}"
@@ -613,13 +918,13 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                     except Exception as retry_err:
                         logger.error(f"❌ Final database commit failed even after retry (exception): {retry_err}")
                 
-                # Publish failure update (WebSocket only)
-                await publish_run_update(run_id, {
+                # Publish failure update (WebSocket and progress stream)
+                await publish_progress_events(run_id, [{
                     "type": "run_failed",
                     "run_id": run_id,
                     "status": "failed",
                     "message": final_message
-                })
+                }])
                 
                 # Check if queue mode is enabled and process next queued task
                 await asyncio.sleep(1)
@@ -767,9 +1072,16 @@ def run_jmp_boxplot(self, run_id: str) -> Dict[str, Any]:
                 logger.error(f"Error processing OCR results: {e}")
                 # Don't raise the exception to avoid failing the entire task
     
+    async def traced_run():
+        """process_run inside the run's trace: the one it was dispatched with, else the one create_run stored."""
+        parent = celery_parent(self.request) or await load_run_trace(run_id)
+        with span("run_jmp_boxplot", parent=parent, **{"run.id": run_id, "celery.task_id": task_id}):
+            return await process_run()
+    
     # Run the async function
-    return asyncio.run(process_run())
+    return run_async(traced_run())
 
+@traced("process_next_queued_task")
 async def _process_next_queued_task(db: AsyncSession):
     """Process the next queued task if queue mode is enabled."""
     try:
@@ -821,8 +1133,13 @@ async def _process_next_queued_task(db: AsyncSession):
                 try:
                     # Small pre-delay before scheduling, give DB and filesystem time to settle
                     await asyncio.sleep(2)
-                    # Schedule with additional countdown to avoid immediate overlap
-                    celery_app.send_task("run_jmp_boxplot", args=[str(next_task.id)], countdown=5)
+                    # Schedule with additional countdown to avoid immediate overlap;
+                    # the dispatch belongs to the queued run's own trace, started by create_run
+                    next_parent = await load_run_trace(str(next_task.id))
+                    with span("dispatch_queued_run", parent=next_parent, **{"run.id": str(next_task.id)}):
+                        celery_app.send_task(
+                            "run_jmp_boxplot", args=[str(next_task.id)], countdown=5, headers=celery_headers()
+                        )
                     logger.info(f"Scheduled next queued task in 5s: {next_task.id}")
                 except Exception as e:
                     logger.error(f"Failed to schedule next queued task {next_task.id}: {e}")
@@ -833,95 +1150,122 @@ async def _process_next_queued_task(db: AsyncSession):
         logger.error(f"Error processing next queued task: {e}")
         # Don't raise the exception to avoid failing the current task
 
+@celery_app.task(bind=True, name="run_jmp_shard")
+def run_jmp_shard(self, run_id: str, task_dir: str, csv_name: str, jsl_name: str,
+                  shard_index: int, max_wait_time: int) -> Dict[str, Any]:
+    """
+    Celery task rendering one shard of a sharded run on a free JMP slot.
+    
+    The shard folder lives under the run's task folder, so this worker must share
+    TASKS_DIRECTORY with the worker that owns the run. If the owning worker (or
+    another helper) already claimed the shard, or the run's shards were already
+    merged (which removes the shard folders), this task does nothing.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    claim_ttl = max_wait_time + 120
+    logger.info(f"[SHARDS] Celery task 'run_jmp_shard' received: run={run_id} shard={shard_index} worker={owner}")
+    
+    async def process_shard():
+        if not shard_dir(Path(task_dir), shard_index).is_dir():
+            return {"status": "skipped", "reason": "shard folder not found (run finished or task folder removed)"}
+        if await get_shard_result(run_id, shard_index) is not None:
+            return {"status": "skipped", "reason": "already rendered"}
+        if not await claim_shard(run_id, shard_index, owner, claim_ttl):
+            return {"status": "skipped", "reason": "claimed by another worker"}
+        
+        result = await asyncio.to_thread(
+            _run_jmp_on_shard, Path(task_dir), shard_index, csv_name, jsl_name, max_wait_time
+        )
+        await store_shard_result(run_id, shard_index, result, claim_ttl)
+        logger.info(f"[SHARDS] Shard {shard_index} of run {run_id} finished: {result.get('status')}")
+        return {"status": result.get("status"), "run_id": run_id, "shard_index": shard_index,
+                "image_count": result.get("image_count", 0)}
+    
+    async def traced_shard():
+        attributes = {"run.id": run_id, "shard.index": shard_index, "celery.task_id": self.request.id}
+        with span("run_jmp_shard", parent=celery_parent(self.request), **attributes):
+            return await process_shard()
+    
+    return run_async(traced_shard())
+
 @celery_app.task(name="health_check")
 def health_check():
     """Simple health check task."""
     return {"status": "ok"}
 
+@celery_app.task(name="refresh_admin_stats")
+def refresh_admin_stats():
+    """Refresh the materialized views behind the admin dashboard."""
+    from app.services.admin_stats import refresh_materialized_views
+    
+    async def refresh():
+        async with AsyncSessionLocal() as db:
+            return await refresh_materialized_views(db)
+    
+    return run_async(refresh())
+
 @celery_app.task(name="send_scheduled_notifications")
 def send_scheduled_notifications():
     """Check and send scheduled daily notifications."""
-    import asyncio
     from datetime import datetime, timezone
-    from app.models import ScheduledNotification, AppUser, NotificationType
+    from sqlalchemy import or_
+    from app.models import ScheduledNotification, NotificationType
     from app.services.notification_service import NotificationService
+    from app.services.webhook_delivery import deliver_webhooks
     
     async def process_scheduled_notifications():
         async with AsyncSessionLocal() as db:
             # Get current time in UTC
             now_utc = datetime.now(timezone.utc)
             current_time_str = now_utc.strftime("%H:%M")
+            start_of_day = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
             
-            # Get all active scheduled notifications
+            # Claim schedules due now and not yet sent today. The row locks are held
+            # until commit and other beat/worker processes skip locked rows, so
+            # each schedule is sent exactly once per day.
             result = await db.execute(
                 select(ScheduledNotification).where(
-                    ScheduledNotification.is_active == True
-                )
+                    ScheduledNotification.is_active == True,
+                    ScheduledNotification.scheduled_time == current_time_str,
+                    or_(
+                        ScheduledNotification.last_sent_at.is_(None),
+                        ScheduledNotification.last_sent_at < start_of_day
+                    )
+                ).with_for_update(skip_locked=True)
             )
-            scheduled_notifications = result.scalars().all()
+            claimed = result.scalars().all()
             
-            sent_count = 0
-            for scheduled in scheduled_notifications:
+            sent = []
+            for scheduled in claimed:
                 try:
-                    # Check if it's time to send (compare HH:MM)
-                    if scheduled.scheduled_time == current_time_str:
-                        # Check if we already sent today (compare dates, not times)
-                        if scheduled.last_sent_at:
-                            last_sent_date = scheduled.last_sent_at.date()
-                            today = now_utc.date()
-                            if last_sent_date == today:
-                                # Already sent today, skip
-                                continue
-                        
-                        # Get all users
-                        users_result = await db.execute(select(AppUser))
-                        users = users_result.scalars().all()
-                        
-                        # Send notifications to all users
-                        for user in users:
-                            try:
-                                await NotificationService.create_notification(
-                                    db=db,
-                                    user_id=user.id,
-                                    notification_type=NotificationType.ANNOUNCEMENT,
-                                    title=scheduled.title,
-                                    message=scheduled.message
-                                )
-                            except Exception as e:
-                                logger.error(f"Failed to create notification for user {user.id}: {e}")
-                                continue
-                        
-                        # Send to webhooks
-                        try:
-                            from app.api.v1.endpoints.admin import get_webhooks_from_settings, send_to_webhook, ensure_default_webhook
-                            await ensure_default_webhook(db)
-                            webhooks = await get_webhooks_from_settings(db)
-                            
-                            for webhook in webhooks:
-                                try:
-                                    await send_to_webhook(
-                                        webhook["url"],
-                                        scheduled.title,
-                                        scheduled.message,
-                                        secret=webhook.get("secret")
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Failed to send to webhook {webhook.get('url')}: {e}")
-                                    continue
-                        except Exception as e:
-                            logger.error(f"Error sending to webhooks: {e}")
-                            # Continue even if webhook sending fails
-                        
-                        # Update last_sent_at
+                    # Notifications and last_sent_at are committed together below
+                    async with db.begin_nested():
+                        user_count = await NotificationService.create_notifications_for_all_users(
+                            db=db,
+                            notification_type=NotificationType.ANNOUNCEMENT,
+                            title=scheduled.title,
+                            message=scheduled.message
+                        )
                         scheduled.last_sent_at = now_utc
-                        await db.commit()
-                        sent_count += 1
-                        logger.info(f"Sent scheduled notification: {scheduled.title} at {current_time_str}")
-                        
+                    sent.append((scheduled.title, scheduled.message))
+                    logger.info(f"[NOTIFY] Scheduled notification '{scheduled.title}' created for {user_count} users at {current_time_str}")
                 except Exception as e:
-                    logger.error(f"Error processing scheduled notification {scheduled.id}: {e}")
+                    logger.error(f"[NOTIFY] Error processing scheduled notification {scheduled.id}: {e}")
                     continue
+            await db.commit()
+            
+            # Webhooks go out after the claim is committed so a slow endpoint never holds the locks
+            if sent:
+                try:
+                    from app.api.v1.endpoints.admin import get_webhooks_from_settings, ensure_default_webhook
+                    await ensure_default_webhook(db)
+                    webhooks = await get_webhooks_from_settings(db)
+                    for title, message in sent:
+                        await deliver_webhooks(webhooks, title, message)
+                except Exception as e:
+                    logger.error(f"[NOTIFY] Error sending to webhooks: {e}")
+                    # Continue even if webhook sending fails
             
-            return {"sent_count": sent_count, "checked_at": current_time_str}
+            return {"sent_count": len(sent), "checked_at": current_time_str}
     
-    return asyncio.run(process_scheduled_notifications())
\ No newline at end of file
+    return run_async(process_scheduled_notifications())
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional
 from pathlib import Path
 from app.workspaces.engine.node_base import IOManager
 from app.core.storage import LocalFileStorage
+from app.core.object_storage import StorageBackend, get_storage
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.workspace import WorkflowArtifact
@@ -13,9 +14,11 @@ import uuid
 class WorkflowIOManager(IOManager):
     """IOManager implementation for workflow artifacts"""
     
-    def __init__(self, db: AsyncSession, storage: LocalFileStorage):
+    def __init__(self, db: AsyncSession, storage: LocalFileStorage, backend: Optional[StorageBackend] = None):
         self.db = db
         self.storage = storage
+        # Artifacts are read and written through the configured backend (local, s3 or tiered)
+        self.backend = backend or get_storage()
     
     async def get_workspace_path(self, workspace_id: str) -> str:
         """Get the file system path for a workspace"""
@@ -49,7 +52,7 @@ class WorkflowIOManager(IOManager):
             content = str(data).encode('utf-8')
         
         # Save file
-        file_path = self.storage.save_file(content, storage_key)
+        await self.backend.put_bytes(storage_key, content)
         
         # Create artifact record
         artifact = WorkflowArtifact(
@@ -73,15 +76,11 @@ class WorkflowIOManager(IOManager):
     async def load_artifact(self, storage_key: str) -> Any:
         """Load an artifact by storage key"""
         # Load from storage
-        file_path = self.storage.base_path / storage_key
+        content = await self.backend.get_bytes(storage_key)
         
-        if not file_path.exists():
+        if content is None:
             raise FileNotFoundError(f"Artifact not found: {storage_key}")
         
-        # Read file
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        
         # Try to parse as JSON if it looks like JSON
         try:
             return json.loads(content.decode('utf-8'))
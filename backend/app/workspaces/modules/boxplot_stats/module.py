@@ -1,17 +1,19 @@
 import duckdb
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 from typing import Dict, Any, List, Optional
 from app.workspaces.engine.node_base import BaseNode, NodeResult, Port, PortType
+from app.workspaces.modules.boxplot_stats.stats import boxplot_statistics, is_numeric, table_columns
 import io
-import base64
-import json
+import math
 import uuid
 
 
+def _group_label(value: Any) -> str:
+    return "NULL" if value is None else str(value)
+
+
 class BoxplotStatsNode(BaseNode):
-    """Loads DuckDB table, selects a column, and generates box plot with statistics"""
+    """Loads DuckDB table, selects columns, and generates box plots with statistics computed in DuckDB"""
     
     @property
     def module_type(self) -> str:
@@ -23,7 +25,7 @@ class BoxplotStatsNode(BaseNode):
     
     @property
     def description(self) -> str:
-        return "Load DuckDB table, select column, and generate box plot with statistics"
+        return "Load DuckDB table, select columns, and generate box plots with statistics"
     
     @property
     def inputs(self) -> List[Port]:
@@ -57,14 +59,63 @@ class BoxplotStatsNode(BaseNode):
                 name="statistics",
                 type=PortType.JSON,
                 label="Statistics",
-                description="Statistical summary of the column"
+                description="Statistical summary of the column (per column and group when several are analyzed)"
             )
         ]
     
+    def _columns(self) -> List[str]:
+        """Columns to analyze: column_names, or the single column_name"""
+        columns = self.config.get("column_names") or []
+        if not columns and self.config.get("column_name"):
+            columns = [self.config.get("column_name")]
+        return list(dict.fromkeys(columns))
+    
+    def _render_plot(self, groups: List[Dict[str, Any]], columns: List[str], group_by: Optional[str]) -> bytes:
+        """One figure with a subplot per column, drawn from the box statistics (no raw data)"""
+        ncols = min(len(columns), 4)
+        nrows = math.ceil(len(columns) / ncols)
+        figsize = (8, 6) if len(columns) == 1 else (5 * ncols, 4.5 * nrows)
+        fig, axes = plt.subplots(nrows, ncols, figsize=figsize, squeeze=False)
+        try:
+            for ax, column in zip(axes.flat, columns):
+                boxes = []
+                for group in groups:
+                    stats = group["columns"][column]
+                    if not stats["count"]:
+                        continue
+                    boxes.append({
+                        "label": _group_label(group["group"]) if group_by else column,
+                        "med": stats["median"],
+                        "q1": stats["q25"],
+                        "q3": stats["q75"],
+                        "whislo": stats["whisker_low"],
+                        "whishi": stats["whisker_high"],
+                        "fliers": stats["outliers"],
+                    })
+                if boxes:
+                    ax.bxp(boxes)
+                ax.set_ylabel(column)
+                ax.set_title(f"Box Plot: {column}")
+                if group_by:
+                    ax.set_xlabel(group_by)
+                    ax.tick_params(axis="x", labelrotation=45 if len(boxes) > 6 else 0)
+                ax.grid(True, alpha=0.3)
+            for ax in list(axes.flat)[len(columns):]:
+                ax.set_visible(False)
+            
+            # Save plot to bytes
+            plot_buffer = io.BytesIO()
+            fig.savefig(plot_buffer, format='png', dpi=100, bbox_inches='tight')
+            return plot_buffer.getvalue()
+        finally:
+            plt.close(fig)
+    
     async def execute(self, inputs: Dict[str, Any], io_manager) -> NodeResult:
         duckdb_path = inputs.get("duckdb_path")
         table_name = inputs.get("table_name")
-        column_name = self.config.get("column_name")
+        columns = self._columns()
+        group_by = self.config.get("group_by") or None
+        max_outliers = int(self.config.get("max_outliers", 1000))
         
         if not duckdb_path or not table_name:
             return NodeResult(
@@ -73,7 +124,7 @@ class BoxplotStatsNode(BaseNode):
                 error="DuckDB path and table name are required"
             )
         
-        if not column_name:
+        if not columns:
             return NodeResult(
                 success=False,
                 outputs={},
@@ -82,79 +133,80 @@ class BoxplotStatsNode(BaseNode):
         
         try:
             # Connect to DuckDB
-            conn = duckdb.connect(duckdb_path)
-            
-            # Load column data
-            query = f"SELECT {column_name} FROM {table_name} WHERE {column_name} IS NOT NULL"
-            df = conn.execute(query).df()
-            
-            if df.empty:
+            conn = duckdb.connect(duckdb_path, read_only=True)
+            try:
+                # Check names and types up front; identifiers are quoted in the query
+                available = table_columns(conn, table_name)
+                for column in columns + ([group_by] if group_by else []):
+                    if column not in available:
+                        return NodeResult(
+                            success=False,
+                            outputs={},
+                            error=f"Column '{column}' is empty or doesn't exist"
+                        )
+                non_numeric = [f"{column} ({available[column]})" for column in columns if not is_numeric(available[column])]
+                if non_numeric:
+                    return NodeResult(
+                        success=False,
+                        outputs={},
+                        error=f"Columns must be numeric: {', '.join(non_numeric)}"
+                    )
+                
+                # All columns (and groups) in one statement; only the aggregates come back
+                groups = boxplot_statistics(conn, table_name, columns, group_by, max_outliers)
+            finally:
                 conn.close()
+            
+            empty = [column for column in columns if not any(g["columns"][column]["count"] for g in groups)]
+            if len(empty) == len(columns):
                 return NodeResult(
                     success=False,
                     outputs={},
-                    error=f"Column '{column_name}' is empty or doesn't exist"
+                    error=f"Column '{empty[0]}' is empty or doesn't exist"
                 )
             
-            data = df[column_name].values
-            
-            # Calculate statistics
-            stats = {
-                "count": len(data),
-                "mean": float(np.mean(data)),
-                "median": float(np.median(data)),
-                "std": float(np.std(data)),
-                "min": float(np.min(data)),
-                "max": float(np.max(data)),
-                "q25": float(np.percentile(data, 25)),
-                "q75": float(np.percentile(data, 75)),
-                "iqr": float(np.percentile(data, 75) - np.percentile(data, 25))
-            }
-            
-            # Generate box plot
-            fig, ax = plt.subplots(figsize=(8, 6))
-            ax.boxplot(data, vert=True)
-            ax.set_ylabel(column_name)
-            ax.set_title(f"Box Plot: {column_name}")
-            ax.grid(True, alpha=0.3)
+            # Single ungrouped column: the flat statistics dict, as before
+            if group_by:
+                stats = {
+                    column: {_group_label(g["group"]): g["columns"][column] for g in groups}
+                    for column in columns
+                }
+            elif len(columns) == 1:
+                stats = groups[0]["columns"][columns[0]]
+            else:
+                stats = groups[0]["columns"]
             
-            # Save plot to bytes
-            plot_buffer = io.BytesIO()
-            plt.savefig(plot_buffer, format='png', dpi=100, bbox_inches='tight')
-            plt.close()
-            plot_buffer.seek(0)
+            plot_bytes = self._render_plot(groups, columns, group_by)
             
             # Save plot as artifact
             workspace_id = self.config.get("workspace_id")
             workflow_id = self.config.get("workflow_id")
             execution_id = self.config.get("execution_id")
             node_id = self.config.get("node_id")
+            plot_label = columns[0] if len(columns) == 1 else f"{len(columns)}_columns"
+            plot_filename = f"boxplot_{plot_label}_{uuid.uuid4().hex[:8]}.png"
             
             if all([workspace_id, workflow_id, execution_id, node_id]):
-                plot_filename = f"boxplot_{column_name}_{uuid.uuid4().hex[:8]}.png"
                 plot_storage_key = await io_manager.save_artifact(
                     workspace_id=workspace_id,
                     workflow_id=workflow_id,
                     execution_id=execution_id,
                     node_id=node_id,
                     kind="plot",
-                    data=plot_buffer.getvalue(),
+                    data=plot_bytes,
                     filename=plot_filename,
-                    metadata={"column": column_name, "statistics": stats}
+                    metadata={"column": columns[0], "columns": columns, "group_by": group_by, "statistics": stats}
                 )
             else:
                 # Fallback: save to temp location
                 import tempfile
                 import os
                 temp_dir = tempfile.gettempdir()
-                plot_filename = f"boxplot_{column_name}_{uuid.uuid4().hex[:8]}.png"
                 plot_path = os.path.join(temp_dir, plot_filename)
                 with open(plot_path, 'wb') as f:
-                    f.write(plot_buffer.getvalue())
+                    f.write(plot_bytes)
                 plot_storage_key = plot_path
             
-            conn.close()
-            
             return NodeResult(
                 success=True,
                 outputs={
@@ -162,7 +214,11 @@ class BoxplotStatsNode(BaseNode):
                     "statistics": stats
                 },
                 metadata={
-                    "column": column_name,
+                    "column": columns[0],
+                    "columns": columns,
+                    "group_by": group_by,
+                    "groups": len(groups) if group_by else None,
+                    "empty_columns": empty,
                     "plot_filename": plot_filename
                 }
             )
@@ -182,8 +238,25 @@ class BoxplotStatsNode(BaseNode):
                     "type": "string",
                     "title": "Column Name",
                     "description": "Name of the column to analyze"
+                },
+                "column_names": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "title": "Column Names",
+                    "description": "Several columns to analyze in one pass (used instead of column_name)",
+                    "default": []
+                },
+                "group_by": {
+                    "type": "string",
+                    "title": "Group By",
+                    "description": "Optional category column; one box per category"
+                },
+                "max_outliers": {
+                    "type": "integer",
+                    "title": "Max Outliers",
+                    "description": "Outlier values returned and drawn per box (the count is always exact)",
+                    "default": 1000
                 }
             },
-            "required": ["column_name"]
+            "required": []
         }
-
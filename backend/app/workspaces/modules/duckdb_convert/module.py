@@ -1,16 +1,25 @@
-import pandas as pd
+import asyncio
+import logging
+import multiprocessing
 import duckdb
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple
+from app.core.config import settings
+from app.core.object_storage import StorageKeyError, get_storage
 from app.workspaces.engine.node_base import BaseNode, NodeResult, Port, PortType
+from app.workspaces.modules.duckdb_convert.streaming import (
+    convert_sheet_part, convert_worksheet, copy_part, load_native, open_workbook, source_format
+)
 from pathlib import Path
 from datetime import datetime
 import re
 import tempfile
-import os
+
+logger = logging.getLogger(__name__)
 
 
 class DuckDBConvertNode(BaseNode):
-    """Converts Excel files to DuckDB database with all sheets as tables"""
+    """Converts Excel files to DuckDB database with all sheets as tables (CSV/Parquet files become one table)"""
     
     @property
     def module_type(self) -> str:
@@ -22,7 +31,7 @@ class DuckDBConvertNode(BaseNode):
     
     @property
     def description(self) -> str:
-        return "Convert Excel files to DuckDB database. Each sheet becomes a separate table."
+        return "Convert Excel files to DuckDB database. Each sheet becomes a separate table. CSV and Parquet files are also accepted."
     
     @property
     def inputs(self) -> List[Port]:
@@ -31,7 +40,7 @@ class DuckDBConvertNode(BaseNode):
                 name="file",
                 type=PortType.FILE,
                 label="Excel File",
-                description="Excel file to convert (all sheets will be converted to tables)",
+                description="Excel file to convert (all sheets will be converted to tables), or a CSV/Parquet file",
                 required=False
             )
         ]
@@ -71,6 +80,74 @@ class DuckDBConvertNode(BaseNode):
             table_name = 'sheet'
         return table_name
     
+    def _unique_table_name(self, sheet_name: str, table_names: List[str]) -> str:
+        """Sanitized sheet name, suffixed until it is not taken"""
+        table_name = self._sanitize_table_name(sheet_name)
+        original_table_name = table_name
+        counter = 1
+        while table_name in table_names:
+            table_name = f"{original_table_name}_{counter}"
+            counter += 1
+        return table_name
+    
+    async def _convert_workbook(self, conn, path: Path, work_dir: Path) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Stream every sheet of a workbook into its own table
+        
+        Large workbooks are converted by worker processes, one sheet each,
+        and the results copied into ``conn`` in sheet order. Empty sheets are
+        skipped; a sheet that fails is logged and skipped.
+        
+        Returns:
+            (converted table entries, number of sheets in the workbook)
+        """
+        batch_rows = settings.DUCKDB_CONVERT_BATCH_ROWS
+        workbook = open_workbook(path)
+        try:
+            sheet_names = workbook.sheetnames
+            workers = min(settings.DUCKDB_CONVERT_WORKERS, len(sheet_names))
+            parallel = workers > 1 and path.stat().st_size >= settings.DUCKDB_CONVERT_PARALLEL_MIN_BYTES
+            if not parallel:
+                converted_tables = []
+                for sheet_name in sheet_names:
+                    table_name = self._unique_table_name(sheet_name, [t["table_name"] for t in converted_tables])
+                    try:
+                        info = convert_worksheet(conn, workbook[sheet_name], table_name, batch_rows)
+                    except Exception as e:
+                        # Log error but continue with other sheets
+                        logger.warning(f"[DuckDBConvert] Error processing sheet '{sheet_name}': {e}")
+                        continue
+                    if info is None:
+                        logger.info(f"[DuckDBConvert] Skipping empty sheet '{sheet_name}'")
+                        continue
+                    converted_tables.append({"sheet_name": sheet_name, "table_name": table_name, **info})
+                return converted_tables, len(sheet_names)
+        finally:
+            workbook.close()
+        
+        logger.info(f"[DuckDBConvert] Converting {len(sheet_names)} sheets of {path.name} with {workers} workers")
+        converted_tables = []
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory(prefix=".duckdb-parts-", dir=work_dir) as part_dir, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            part_paths = [str(Path(part_dir) / f"sheet_{i}.duckdb") for i in range(len(sheet_names))]
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, convert_sheet_part, str(path), sheet_name, part_path, batch_rows)
+                for sheet_name, part_path in zip(sheet_names, part_paths)
+            ], return_exceptions=True)
+            
+            for sheet_name, part_path, result in zip(sheet_names, part_paths, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"[DuckDBConvert] Error processing sheet '{sheet_name}': {result}")
+                    continue
+                if result is None:
+                    logger.info(f"[DuckDBConvert] Skipping empty sheet '{sheet_name}'")
+                    continue
+                table_name = self._unique_table_name(sheet_name, [t["table_name"] for t in converted_tables])
+                info = copy_part(conn, part_path, table_name)
+                converted_tables.append({"sheet_name": sheet_name, "table_name": table_name, **info})
+        return converted_tables, len(sheet_names)
+    
     async def execute(self, inputs: Dict[str, Any], io_manager) -> NodeResult:
         """Execute the DuckDB converter node"""
         # Get file from inputs or config
@@ -84,19 +161,24 @@ class DuckDBConvertNode(BaseNode):
             )
         
         try:
-            # Load the file from storage
-            file_content = await io_manager.load_artifact(file_key)
+            # Read the file where it is stored instead of loading it into memory
+            # (on tiered storage, a file from another host is fetched into the local cache first)
+            from app.core.storage import local_storage
+            try:
+                source_path = await get_storage().local_path(file_key)
+            except StorageKeyError:
+                # Absolute paths from older workflows
+                source_path = local_storage.get_file_path(file_key)
+            except FileNotFoundError:
+                source_path = None
             
-            if not isinstance(file_content, bytes):
+            if source_path is None or not source_path.is_file():
                 return NodeResult(
                     success=False,
                     outputs={},
-                    error="Failed to load file content"
+                    error=f"Artifact not found: {file_key}"
                 )
             
-            # Get workflow and node paths from io_manager
-            from app.core.storage import local_storage
-            
             # Extract workflow_id and node_id from file_key or use graph_context
             # file_key format: workflows/{workflow_id}/nodes/{node_id}/input/{filename}
             workflow_id = None
@@ -127,88 +209,39 @@ class DuckDBConvertNode(BaseNode):
             db_filename = f"excel2duckdb_{timestamp}.duckdb"
             db_path = output_path / db_filename
             
-            # Create temporary file to read Excel
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_input:
-                temp_input.write(file_content)
-                temp_input_path = temp_input.name
-            
+            source = source_format(source_path)
+            conn = duckdb.connect(str(db_path))
             try:
-                # Connect to DuckDB
-                conn = duckdb.connect(str(db_path))
-                
-                # Read Excel file (all sheets)
-                excel_file = pd.ExcelFile(temp_input_path, engine='openpyxl')
-                sheet_names = excel_file.sheet_names
-                
-                converted_tables = []
-                table_names = []
-                
-                for sheet_name in sheet_names:
-                    try:
-                        # Read sheet
-                        df = excel_file.parse(sheet_name)
-                        
-                        # Skip empty DataFrames
-                        if df.empty:
-                            print(f"Skipping empty sheet '{sheet_name}'")
-                            continue
-                        
-                        # Convert sheet name to valid SQL table name
-                        table_name = self._sanitize_table_name(sheet_name)
-                        
-                        # Ensure unique table name
-                        original_table_name = table_name
-                        counter = 1
-                        while table_name in table_names:
-                            table_name = f"{original_table_name}_{counter}"
-                            counter += 1
-                        
-                        # Register DataFrame with DuckDB and create table
-                        # DuckDB can work with pandas DataFrames directly
-                        conn.register('temp_df', df)
-                        conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM temp_df")
-                        conn.unregister('temp_df')
-                        
-                        converted_tables.append({
-                            "sheet_name": sheet_name,
-                            "table_name": table_name,
-                            "rows": len(df),
-                            "columns": list(df.columns)
-                        })
-                        table_names.append(table_name)
-                        
-                    except Exception as e:
-                        # Log error but continue with other sheets
-                        print(f"Error processing sheet '{sheet_name}': {str(e)}")
-                        continue
-                
+                if source == "excel":
+                    converted_tables, sheets_processed = await self._convert_workbook(conn, source_path, output_path)
+                else:
+                    # CSV/Parquet: one table, loaded by DuckDB's own reader
+                    table_name = self._sanitize_table_name(source_path.stem)
+                    info = load_native(conn, source_path, source, table_name)
+                    converted_tables = [{"sheet_name": source_path.name, "table_name": table_name, **info}]
+                    sheets_processed = 1
+            finally:
                 conn.close()
-                
-                # Clean up temp file
-                os.unlink(temp_input_path)
-                
-                # Get relative path for storage key
-                storage_key = f"workflows/{workflow_id}/nodes/{node_id}/output/{db_filename}"
-                
-                return NodeResult(
-                    success=True,
-                    outputs={
-                        "duckdb_path": storage_key,
-                        "table_names": table_names
-                    },
-                    metadata={
-                        "db_path": str(db_path),
-                        "tables_created": len(converted_tables),
-                        "sheets_processed": len(sheet_names),
-                        "converted_tables": converted_tables
-                    }
-                )
-                
-            except Exception as e:
-                # Clean up temp file on error
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
-                raise
+            
+            table_names = [table["table_name"] for table in converted_tables]
+            
+            # Get relative path for storage key
+            storage_key = f"workflows/{workflow_id}/nodes/{node_id}/output/{db_filename}"
+            
+            return NodeResult(
+                success=True,
+                outputs={
+                    "duckdb_path": storage_key,
+                    "table_names": table_names
+                },
+                metadata={
+                    "db_path": str(db_path),
+                    "source_format": source,
+                    "tables_created": len(converted_tables),
+                    "sheets_processed": sheets_processed,
+                    "converted_tables": converted_tables
+                }
+            )
         
         except Exception as e:
             return NodeResult(
@@ -224,7 +257,7 @@ class DuckDBConvertNode(BaseNode):
                 "file_key": {
                     "type": "string",
                     "title": "File Key",
-                    "description": "Storage key of the Excel file to convert"
+                    "description": "Storage key of the Excel, CSV or Parquet file to convert"
                 }
             },
             "required": []
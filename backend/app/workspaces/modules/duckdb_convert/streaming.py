@@ -0,0 +1,294 @@
+"""
+Streaming sources for DuckDBConvertNode
+
+Workbooks are read with openpyxl in read-only mode and appended to DuckDB
+DUCKDB_CONVERT_BATCH_ROWS rows at a time, so memory holds one batch per
+sheet instead of whole sheets as DataFrames:
+
+- column types are inferred from the first batch (the sample) and widened
+  in place (BIGINT -> DOUBLE -> VARCHAR, ...) when a later batch does not
+  fit, so a stray text cell far down a numeric column still converts;
+  integer columns with any empty cell are DOUBLE, as pandas makes them
+  float64;
+- cells are read the way ``pd.read_excel`` reads them (integral floats as
+  ints, "NA"/"#N/A"/... as NULL, blank rows kept except trailing ones,
+  "Unnamed: n" and "a.1" headers), so tables match the previous converter;
+- CSV and Parquet files skip Python entirely and go through DuckDB's own
+  ``read_csv_auto``/``read_parquet``.
+
+Large workbooks have their sheets converted in parallel by worker processes,
+each into its own part database, which the node then copies into the output
+database (see ``convert_sheet_part``).
+"""
+import datetime
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+import numpy as np
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+
+logger = logging.getLogger(__name__)
+
+CSV_SUFFIXES = (".csv", ".tsv", ".txt")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+PART_TABLE = "sheet_data"
+
+# Widening order for numeric-like columns; anything else mixed becomes VARCHAR
+_NUMERIC = ("BOOLEAN", "BIGINT", "DOUBLE")
+
+
+def source_format(path: Path) -> str:
+    """"csv", "parquet" or "excel", from the file name"""
+    suffix = path.suffix.lower()
+    if suffix in CSV_SUFFIXES:
+        return "csv"
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    return "excel"
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def quote_literal(text: str) -> str:
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def load_native(conn: duckdb.DuckDBPyConnection, path: Path, fmt: str, table: str) -> Dict[str, Any]:
+    """Create ``table`` from a CSV or Parquet file with DuckDB's reader"""
+    reader = "read_parquet" if fmt == "parquet" else "read_csv_auto"
+    conn.execute(
+        f"CREATE OR REPLACE TABLE {quote_identifier(table)} AS SELECT * FROM {reader}({quote_literal(path)})"
+    )
+    return _table_info(conn, table)
+
+
+def _table_info(conn: duckdb.DuckDBPyConnection, table: str, schema: Optional[str] = None) -> Dict[str, Any]:
+    qualified = f"{quote_identifier(schema)}.{quote_identifier(table)}" if schema else quote_identifier(table)
+    rows = conn.execute(f"SELECT count(*) FROM {qualified}").fetchone()[0]
+    columns = [row[0] for row in conn.execute(f"DESCRIBE {qualified}").fetchall()]
+    return {"rows": int(rows), "columns": columns}
+
+
+def _normalize(value: Any) -> Any:
+    """A cell as pandas' openpyxl reader returns it"""
+    if value.__class__ is float:
+        return int(value) if value.is_integer() else value
+    if value.__class__ is str and value in STR_NA_VALUES:
+        return None
+    return value
+
+
+def _sql_type(kinds: Iterable[type]) -> Optional[str]:
+    """DuckDB type for the Python types seen in a column; None if every cell was empty"""
+    kinds = set(kinds)
+    if not kinds:
+        return None
+    if kinds <= {bool}:
+        return "BOOLEAN"
+    if kinds <= {int}:
+        return "BIGINT"
+    if kinds <= {bool, int, float}:
+        return "DOUBLE"
+    if kinds <= {datetime.datetime, datetime.date}:
+        return "TIMESTAMP"
+    return "VARCHAR"
+
+
+def _widen(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    if current is None or current == new:
+        return new if current is None else current
+    if new is None:
+        return current
+    if current in _NUMERIC and new in _NUMERIC:
+        return _NUMERIC[max(_NUMERIC.index(current), _NUMERIC.index(new))]
+    return "VARCHAR"
+
+
+def _column_array(values: Sequence[Any], sql_type: str):
+    """``values`` as an array DuckDB scans as ``sql_type`` (None -> NULL)"""
+    if sql_type == "BOOLEAN":
+        return pd.array(values, dtype="boolean")
+    if sql_type == "BIGINT":
+        return pd.array(values, dtype="Int64")
+    if sql_type == "DOUBLE":
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+    if sql_type == "TIMESTAMP":
+        return np.array([np.datetime64("NaT") if v is None else v for v in values], dtype="datetime64[us]")
+    return np.array([None if v is None else str(v) for v in values], dtype=object)
+
+
+def _unique_name(name: str, seen: set) -> str:
+    """pandas' header mangling: a, a.1, a.2, ..."""
+    candidate, n = name, 0
+    while candidate in seen:
+        n += 1
+        candidate = f"{name}.{n}"
+    seen.add(candidate)
+    return candidate
+
+
+def _trim(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    """Drop trailing empty cells (read-only sheets pad rows to the sheet dimension)"""
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end] if end < len(row) else row
+
+
+class SheetTable:
+    """Appends batches of worksheet rows to one DuckDB table, creating and widening its columns"""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, table: str, header: Tuple[Any, ...]):
+        self.conn = conn
+        self.table = table
+        self.created = False
+        self.rows = 0
+        self._seen: set = set()
+        self.columns: List[str] = []
+        self.types: List[Optional[str]] = []
+        # Whether a column has had an empty cell so far
+        self.nullable: List[bool] = []
+        for value in header:
+            self._add_column(value)
+
+    def _add_column(self, header_value: Any) -> None:
+        name = f"Unnamed: {len(self.columns)}" if header_value is None else str(header_value)
+        self.columns.append(_unique_name(name, self._seen))
+        self.types.append(None)
+        # A column first seen after rows were written is empty in those rows
+        self.nullable.append(self.rows > 0)
+
+    def append(self, batch: List[Tuple[Any, ...]]) -> None:
+        width = max(len(self.columns), max(map(len, batch)))
+        while len(self.columns) < width:
+            self._add_column(None)
+        padded = [row + (None,) * (width - len(row)) if len(row) < width else row for row in batch]
+
+        data = []
+        new_types = []
+        for i, values in enumerate(zip(*padded)):
+            values = [_normalize(v) for v in values]
+            data.append(values)
+            present = [v for v in values if v is not None]
+            self.nullable[i] = self.nullable[i] or len(present) < len(values)
+            new_type = _sql_type(type(v) for v in present)
+            if self.nullable[i] and _widen(self.types[i], new_type) == "BIGINT":
+                # Integers with blanks: pandas reads them as float64
+                new_type = "DOUBLE"
+            new_types.append(new_type)
+        self._ensure_columns(new_types)
+
+        frame = pd.DataFrame({
+            f"c{i}": _column_array(values, self.types[i] or "DOUBLE") for i, values in enumerate(data)
+        })
+        self.conn.register("batch_frame", frame)
+        try:
+            self.conn.execute(f"INSERT INTO {quote_identifier(self.table)} SELECT * FROM batch_frame")
+        finally:
+            self.conn.unregister("batch_frame")
+        self.rows += len(batch)
+
+    def _ensure_columns(self, batch_types: List[Optional[str]]) -> None:
+        table = quote_identifier(self.table)
+        if not self.created:
+            # Types from the first batch; all-empty columns start as DOUBLE (pandas' all-NaN float)
+            self.types = [_widen(current, new) for current, new in zip(self.types, batch_types)]
+            definition = ", ".join(
+                f"{quote_identifier(name)} {sql_type or 'DOUBLE'}" for name, sql_type in zip(self.columns, self.types)
+            )
+            self.conn.execute(f"CREATE OR REPLACE TABLE {table} ({definition})")
+            self.created = True
+            return
+        existing = len(self.conn.execute(f"DESCRIBE {table}").fetchall())
+        for i, (name, new) in enumerate(zip(self.columns, batch_types)):
+            current = self.types[i]
+            widened = _widen(current, new)
+            if i >= existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {quote_identifier(name)} {widened or 'DOUBLE'}")
+            elif widened != current and (current is not None or widened != "DOUBLE"):
+                self.conn.execute(f"ALTER TABLE {table} ALTER {quote_identifier(name)} TYPE {widened}")
+                logger.info(f"[DuckDBConvert] Widened {self.table}.{name} from {current or 'DOUBLE'} to {widened}")
+            self.types[i] = widened
+
+
+def _batches(rows: Iterator[Tuple[Any, ...]], batch_rows: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """Non-empty batches of trimmed rows; blank rows are kept unless trailing"""
+    batch: List[Tuple[Any, ...]] = []
+    blank_run = 0
+    for row in rows:
+        row = _trim(row)
+        if not row:
+            blank_run += 1
+            continue
+        if blank_run:
+            batch.extend([()] * blank_run)
+            blank_run = 0
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_worksheet(conn: duckdb.DuckDBPyConnection, worksheet, table: str, batch_rows: int) -> Optional[Dict[str, Any]]:
+    """
+    Stream one read-only worksheet into ``table``
+
+    Returns:
+        {"rows", "columns"}, or None for a sheet without data rows (no table is left behind)
+    """
+    if hasattr(worksheet, "reset_dimensions"):
+        # Saved dimensions can be wrong; read up to the last cell actually present
+        worksheet.reset_dimensions()
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return None
+
+    sheet_table = SheetTable(conn, table, _trim(header))
+    try:
+        for batch in _batches(rows, batch_rows):
+            sheet_table.append(batch)
+    except Exception:
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+        raise
+    if not sheet_table.rows:
+        return None
+    return {"rows": sheet_table.rows, "columns": list(sheet_table.columns)}
+
+
+def open_workbook(path: Path):
+    import openpyxl
+    return openpyxl.load_workbook(str(path), read_only=True, data_only=True)
+
+
+def convert_sheet_part(workbook_path: str, sheet_name: str, part_path: str, batch_rows: int) -> Optional[Dict[str, Any]]:
+    """Worker process entry: convert one sheet into PART_TABLE of its own database file"""
+    workbook = open_workbook(Path(workbook_path))
+    try:
+        conn = duckdb.connect(part_path)
+        try:
+            return convert_worksheet(conn, workbook[sheet_name], PART_TABLE, batch_rows)
+        finally:
+            conn.close()
+    finally:
+        workbook.close()
+
+
+def copy_part(conn: duckdb.DuckDBPyConnection, part_path: str, table: str) -> Dict[str, Any]:
+    """Copy a worker's sheet table into ``table`` of the output database"""
+    conn.execute(f"ATTACH {quote_literal(part_path)} AS part (READ_ONLY)")
+    try:
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {quote_identifier(table)} AS SELECT * FROM part.{quote_identifier(PART_TABLE)}"
+        )
+    finally:
+        conn.execute("DETACH part")
+    return _table_info(conn, table)
@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from typing import Dict, Any, Optional
 import tempfile
 import os
+import shutil
 import logging
 import httpx
 import pandas as pd
@@ -20,7 +21,7 @@ from app.core.storage import local_storage
 from ..base.zip_utils import ZipFileGenerator
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
-from app.models import ProjectAttachment, AppUser
+from app.models import AppUser
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -174,6 +175,7 @@ async def run_analysis_modular(
         from app.core.celery import celery_app
         from app.core.database import AsyncSessionLocal
         from app.core.websocket import publish_run_update
+        from app.core.tracing import celery_headers, remember_run_trace, span
         from app.models import Run, RunStatus, Artifact, ProjectAttachment
         from sqlalchemy import select
         
@@ -248,6 +250,17 @@ async def run_analysis_modular(
                 if not process_result.get("success"):
                     return JSONResponse(status_code=400, content={"success": False, "error": process_result.get("error", "Process failed"), "stage": stage, "details": process_result})
                 
+                ts_files = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+                short_uid = str(uuid.uuid4())[:8]
+                csv_filename = f"data_{ts_files}_{short_uid}.csv"
+                jsl_filename = f"analysis_{ts_files}_{short_uid}.jsl"
+                
+                csv_storage_key = f"{run_dir_key}/{csv_filename}"
+                jsl_storage_key = f"{run_dir_key}/{jsl_filename}"
+                csv_storage_path = local_storage.get_file_path(csv_storage_key)
+                jsl_storage_path = local_storage.get_file_path(jsl_storage_key)
+                
+                # The CSV is streamed straight into the run folder
                 stage = "generate_files"
                 file_result = file_processor.generate_files(
                     df_meta,
@@ -256,26 +269,15 @@ async def run_analysis_modular(
                     cat_var,
                     fai_columns,
                     color_by,
+                    csv_path=str(csv_storage_path),
                 )
                 if not file_result.get("success"):
+                    csv_storage_path.unlink(missing_ok=True)
                     return JSONResponse(status_code=400, content={"success": False, "error": file_result.get("error", "File generation failed"), "stage": stage, "details": file_result})
                 
-                # STEP 5: Save processed files (CSV, JSL) directly to run folder
+                # STEP 5: Save the JSL next to the CSV in the run folder
                 stage = "persist_files"
-                csv_bytes = file_result["files"]["csv_content"].encode("utf-8")
                 jsl_bytes = file_result["files"]["jsl_content"].encode("utf-8")
-                
-                ts_files = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                short_uid = str(uuid.uuid4())[:8]
-                csv_filename = f"data_{ts_files}_{short_uid}.csv"
-                jsl_filename = f"analysis_{ts_files}_{short_uid}.jsl"
-                
-                csv_storage_key = f"{run_dir_key}/{csv_filename}"
-                jsl_storage_key = f"{run_dir_key}/{jsl_filename}"
-                csv_storage_path = local_storage.get_file_path(csv_storage_key)
-                jsl_storage_path = local_storage.get_file_path(jsl_storage_key)
-                
-                csv_storage_path.write_bytes(csv_bytes)
                 jsl_storage_path.write_bytes(jsl_bytes)
                 
                 # CRITICAL: Set JSL file permissions to prevent macOS auto-opening
@@ -290,9 +292,10 @@ async def run_analysis_modular(
                 zip_result = ZipFileGenerator.create_analysis_zip(
                     excel_content=content,
                     excel_filename=file.filename,
-                    csv_content=file_result["files"]["csv_content"],
+                    csv_content=None,
                     jsl_content=file_result["files"]["jsl_content"],
-                    analysis_type="boxplot"
+                    analysis_type="boxplot",
+                    csv_path=str(csv_storage_path)
                 )
                 
                 zip_key = None
@@ -360,7 +363,7 @@ async def run_analysis_modular(
                 jsl_dst = task_dir / jsl_storage_path.name
                 
                 # Copy CSV file as-is
-                csv_dst.write_bytes(csv_storage_path.read_bytes())
+                shutil.copyfile(csv_storage_path, csv_dst)
                 
                 # Read JSL file and ensure header Open() points to absolute CSV path in task folder
                 jsl_content = jsl_storage_path.read_text(encoding='utf-8')
@@ -414,7 +417,9 @@ Open("{absolute_csv_path}");
                 
                 # STEP 8: Queue Celery task directly (only after task folder is prepared)
                 logger.info(f"[V2] Queuing Celery task 'run_jmp_boxplot' for run {run.id}")
-                celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                with span("dispatch_run", **{"run.id": str(run.id)}):
+                    await remember_run_trace(str(run.id))
+                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                 
                 # Publish initial status
                 await publish_run_update(str(run.id), {
@@ -9,6 +9,7 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
@@ -79,10 +80,16 @@ class DataProcessor:
         """
         df_numeric = df_data.copy()
         
+        converted = 0
         for col in fai_columns:
             if col in df_numeric.columns:
-                df_numeric[col] = self.to_num_series(df_numeric[col])
-                logger.info(f"Converted {col} to numeric")
+                # to_numeric returns numeric columns unchanged; skip re-assigning them
+                column = df_numeric[col]
+                if isinstance(column, pd.Series) and pd.api.types.is_numeric_dtype(column):
+                    continue
+                df_numeric[col] = self.to_num_series(column)
+                converted += 1
+        logger.info(f"Converted {converted} of {len(fai_columns)} FAI columns to numeric")
         
         return df_numeric
     
@@ -117,6 +124,11 @@ class DataProcessor:
         usl = self.to_num_series(lvl_meta.get("usl", pd.Series([np.nan]))).max(skipna=True)
         lsl = self.to_num_series(lvl_meta.get("lsl", pd.Series([np.nan]))).min(skipna=True)
         
+        return self._axis_params(group_min, group_max, usl, lsl, y_vars)
+    
+    def _axis_params(self, group_min: float, group_max: float, usl: float, lsl: float,
+                     y_vars: List[str]) -> Dict[str, Any]:
+        """Axis min/max/increment for one main level from its data range and spec limits"""
         # Calculate final min/max
         final_max = np.nanmax([group_max, usl]) if not np.isnan(usl) else group_max
         final_min = np.nanmin([group_min, lsl]) if not np.isnan(lsl) else group_min
@@ -187,11 +199,23 @@ class DataProcessor:
         main_levels = df_meta["main_level"].dropna().unique()
         boundaries = {}
         
+        level_stats = {}
+        # Duplicate column names select several columns per FAI; those keep the per-level path
+        if df_data_num.columns.is_unique:
+            try:
+                level_stats = self._level_stats(df_meta, df_data_num, fai_columns)
+            except Exception as e:
+                logger.warning(f"Vectorized boundary pass failed, computing per level: {str(e)}")
+        
         for main_level in main_levels:
             try:
-                params = self.compute_axis_params(df_meta, df_data_num, fai_columns, str(main_level))
+                stats = level_stats.get(str(main_level))
+                if stats is None:
+                    params = self.compute_axis_params(df_meta, df_data_num, fai_columns, str(main_level))
+                else:
+                    params = self._axis_params(*stats)
                 boundaries[str(main_level)] = params
-                logger.info(f"Calculated boundaries for {main_level}: {params}")
+                logger.debug(f"Calculated boundaries for {main_level}: {params}")
             except Exception as e:
                 logger.error(f"Error calculating boundaries for {main_level}: {str(e)}")
                 boundaries[str(main_level)] = {
@@ -203,9 +227,76 @@ class DataProcessor:
                     "error": str(e)
                 }
         
+        logger.info(f"Calculated boundaries for {len(boundaries)} main levels")
         self.boundaries = boundaries
         return boundaries
     
+    def _level_stats(self, df_meta: pd.DataFrame, df_data_num: pd.DataFrame,
+                     fai_cols: List[str]) -> Dict[str, Tuple[float, float, float, float, List[str]]]:
+        """
+        (group_min, group_max, usl, lsl, y_vars) for every main level in one pass
+        
+        Same result as compute_axis_params level by level: the FAI matrix is
+        reduced once per column, and column minima/maxima are folded into
+        their levels through a column -> level index. Levels referencing a
+        test_name missing from the data are left out, so the caller falls
+        back to compute_axis_params (which reports the error).
+        """
+        # compute_axis_params compares main_level to str(level), so only rows
+        # holding string levels belong to a level
+        is_str = df_meta["main_level"].map(lambda v: isinstance(v, str))
+        meta = df_meta[is_str]
+        level_names = pd.unique(meta["main_level"])
+        level_pos = {name: i for i, name in enumerate(level_names)}
+        
+        # y variables per level, in meta order
+        fai_set = set(fai_cols)
+        tests = meta[["main_level", "test_name"]].dropna(subset=["test_name"])
+        tests = tests.assign(test_name=tests["test_name"].astype(str)).drop_duplicates()
+        tests = tests[tests["test_name"].isin(fai_set)]
+        y_vars = {name: [] for name in level_names}
+        for level, test in zip(tests["main_level"], tests["test_name"]):
+            y_vars[level].append(test)
+        
+        missing = set(tests["test_name"]) - set(df_data_num.columns)
+        incomplete = set(tests.loc[tests["test_name"].isin(missing), "main_level"])
+        
+        # Per-column min/max over the numeric FAI matrix
+        columns = [c for c in pd.unique(tests["test_name"]) if c not in missing]
+        col_pos = {c: i for i, c in enumerate(columns)}
+        values = df_data_num[columns].to_numpy(dtype=float) if columns else np.empty((0, 0))
+        if values.shape[0]:
+            with np.errstate(invalid="ignore"), warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN columns
+                col_min = np.nanmin(values, axis=0)
+                col_max = np.nanmax(values, axis=0)
+        else:
+            col_min = col_max = np.full(len(columns), np.nan)
+        
+        # Fold columns into levels; fmin/fmax skip NaN like nanmin/nanmax
+        pairs = tests[tests["test_name"].isin(col_pos)]
+        level_idx = pairs["main_level"].map(level_pos).to_numpy(dtype=np.intp)
+        column_idx = pairs["test_name"].map(col_pos).to_numpy(dtype=np.intp)
+        group_min = np.full(len(level_names), np.nan)
+        group_max = np.full(len(level_names), np.nan)
+        np.fmin.at(group_min, level_idx, col_min[column_idx])
+        np.fmax.at(group_max, level_idx, col_max[column_idx])
+        
+        def limit(column: str, how: str) -> pd.Series:
+            if column not in meta.columns:
+                return pd.Series(np.nan, index=level_names)
+            grouped = self.to_num_series(meta[column]).groupby(meta["main_level"], sort=False)
+            return getattr(grouped, how)().reindex(level_names)
+        
+        usl = limit("usl", "max")
+        lsl = limit("lsl", "min")
+        
+        return {
+            str(name): (group_min[i], group_max[i], usl.iloc[i], lsl.iloc[i], y_vars[name])
+            for i, name in enumerate(level_names)
+            if name not in incomplete
+        }
+    
     def prepare_metadata(self, df_meta: pd.DataFrame) -> pd.DataFrame:
         """
         Prepare and clean metadata
@@ -5,14 +5,51 @@ Generates the actual files (CSV + JSL).
 Handles file generation.
 """
 
+import io
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import logging
 
+from extensions.base.jsl_render import JSLTemplate, JSLWriter
+from extensions.base.long_csv import write_long_csv
+
 logger = logging.getLogger(__name__)
 
+# Graph Builder box plot of one main level; group/color roles and caption boxes are bound per run
+LEVEL_BLOCK = JSLTemplate('''gb = Graph Builder(
+\tSize( 1080, 768 ),
+\tShow Control Panel( 0 ),
+\tVariables( X( :FAI ), Y( :Data ), {group_x}{color_clause} ),
+\tElements(
+\t\tPoints( X, Y, Legend( 7 ) ),
+\t\tBox Plot( X, Y, Legend( 8 ) ),
+{caption_box_block}
+\t),
+\tLocal Data Filter(
+\t\tAdd Filter(
+\t\t\tcolumns( :FAI ),
+\t\t\tWhere( :FAI == {{ {y_vars_quoted} }} ),
+\t\t)
+\t),
+\tSendToReport(
+\t\tDispatch({{}}, "Data", ScaleBox,
+\t\t\t{{Format( "Fixed Dec", 12, 4 ),
+\t\t\tMin( {min} ), Max( {max} ), Inc( {inc} ), Minor Ticks( {tick} ){ref_block}
+\t\t}}
+\t\t),
+\t\tDispatch({{}}, "graph title", TextEditBox, {{Set Text( "      {label} vs. Build" )}})
+\t)
+);
+Wait(0.3);
+If( Is Scriptable( gb ),
+\tgb << Set Control Panel( 0 );
+\tWait( 0.2 );
+\tgb << Save Picture( "{label}.png", PNG );
+\tgb << Close Window;
+);''', name="excel2jmp.graph_builder")
+
 class FileProcessor:
     """Generates CSV and JSL files from processed data"""
     
@@ -56,25 +93,13 @@ class FileProcessor:
             CSV content as string
         """
         try:
-            # Select only the columns we need
-            df_csv = df_data[[cat_var] + fai_columns].copy()
-            
-            # Melt the data to long format
-            stacked = df_csv.melt(
-                id_vars=[cat_var], 
-                value_vars=fai_columns, 
-                var_name="FAI", 
-                value_name="Data"
-            )
-            
-            # Remove rows with NaN values
-            stacked = stacked.dropna()
-            
-            # Generate CSV content
-            csv_content = stacked.to_csv(index=False)
+            # Long format (cat_var, FAI, Data) without NaN values, melted in column batches
+            buffer = io.StringIO()
+            rows = write_long_csv(df_data, cat_var, fai_columns, buffer)
+            csv_content = buffer.getvalue()
             
             self.csv_content = csv_content
-            logger.info(f"Generated CSV with {len(stacked)} rows")
+            logger.info(f"Generated CSV with {rows} rows")
             
             return csv_content
             
@@ -82,6 +107,28 @@ class FileProcessor:
             logger.error(f"Error generating CSV: {str(e)}")
             raise e
     
+    def write_csv(self, df_data: pd.DataFrame, cat_var: str, fai_columns: List[str], csv_path: str) -> int:
+        """
+        Stream the generate_csv content to a file without building it in memory
+        
+        Args:
+            df_data: Processed data DataFrame
+            cat_var: Categorical variable
+            fai_columns: List of FAI columns
+            csv_path: Destination file
+            
+        Returns:
+            Number of data rows written
+        """
+        try:
+            rows = write_long_csv(df_data, cat_var, fai_columns, csv_path)
+            logger.info(f"Wrote CSV with {rows} rows to {csv_path}")
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Error writing CSV: {str(e)}")
+            raise e
+    
     def generate_jsl(self, df_meta: pd.DataFrame, boundaries: Dict[str, Dict[str, Any]], 
                     cat_var: str, color_by: Optional[str] = None,
                     list_check_values: Optional[List[str]] = None,
@@ -100,7 +147,8 @@ class FileProcessor:
             JSL script content as string
         """
         try:
-            script_rows = []
+            writer = JSLWriter("excel2jmp")
+            charts = 0
             
             # Add categorical variable settings after Open() header (will be inserted by caller)
             cat_var_settings = []
@@ -139,11 +187,44 @@ class FileProcessor:
                 
                 cat_var_settings.append("Wait(0.2);")
                 cat_var_settings.append("")
+                
+                # Settings go first, before the chart scripts
+                writer.add("\n".join(cat_var_settings))
             
             # Default color_by to cat_var if not provided
             if not color_by:
                 color_by = cat_var
             
+            # Generate caption box elements based on user selection
+            # Default statistics if none provided
+            default_stats = ["Mean", "Min", "Median", "Max", "Std Dev", "N"]
+            selected_stats = caption_box_statistics if caption_box_statistics else default_stats
+            
+            # Map statistics to their legend numbers
+            legend_map = {
+                "Mean": 12,
+                "Min": 12,
+                "Median": 12,
+                "Max": 12,
+                "Std Dev": 13,
+                "N": 12
+            }
+            
+            # Generate caption box lines
+            caption_box_lines = []
+            for stat in selected_stats:
+                legend_num = legend_map.get(stat, 12)
+                caption_box_lines.append(f'\t\tCaption Box( X, Y, Legend( {legend_num} ), Summary Statistic( "{stat}" ) )')
+            
+            caption_box_block = ',\n'.join(caption_box_lines) if caption_box_lines else ''
+            
+            # Group and color clauses and caption boxes are the same for every level
+            block = LEVEL_BLOCK.bind(
+                group_x=f"Group X( :{cat_var} )",
+                color_clause=f", Color( :{color_by} )" if color_by else "",
+                caption_box_block=caption_box_block,
+            )
+            
             # Group by main_level
             by_main = df_meta.groupby("main_level", dropna=True).first().reset_index()
             total_levels = max(len(by_main), 1)
@@ -174,79 +255,20 @@ class FileProcessor:
                 
                 ref_block = ',\n\t\t\t' + ',\n\t\t\t'.join(ref_lines) if ref_lines else ""
                 
-                # Generate group and color clauses
-                group_x = f"Group X( :{cat_var} )"
-                color_clause = f", Color( :{color_by} )" if color_by else ""
-                
-                # Generate caption box elements based on user selection
-                # Default statistics if none provided
-                default_stats = ["Mean", "Min", "Median", "Max", "Std Dev", "N"]
-                selected_stats = caption_box_statistics if caption_box_statistics else default_stats
-                
-                # Map statistics to their legend numbers
-                legend_map = {
-                    "Mean": 12,
-                    "Min": 12,
-                    "Median": 12,
-                    "Max": 12,
-                    "Std Dev": 13,
-                    "N": 12
-                }
-                
-                # Generate caption box lines
-                caption_box_lines = []
-                for stat in selected_stats:
-                    legend_num = legend_map.get(stat, 12)
-                    caption_box_lines.append(f'\t\tCaption Box( X, Y, Legend( {legend_num} ), Summary Statistic( "{stat}" ) )')
-                
-                caption_box_block = ',\n'.join(caption_box_lines) if caption_box_lines else ''
-                
                 # Generate JSL script for this level
-                script_content = f'''
-gb = Graph Builder(
-\tSize( 1080, 768 ),
-\tShow Control Panel( 0 ),
-\tVariables( X( :FAI ), Y( :Data ), {group_x}{color_clause} ),
-\tElements(
-\t\tPoints( X, Y, Legend( 7 ) ),
-\t\tBox Plot( X, Y, Legend( 8 ) ),
-{caption_box_block}
-\t),
-\tLocal Data Filter(
-\t\tAdd Filter(
-\t\t\tcolumns( :FAI ),
-\t\t\tWhere( :FAI == {{ {y_vars_quoted} }} ),
-\t\t)
-\t),
-\tSendToReport(
-\t\tDispatch({{}}, "Data", ScaleBox,
-\t\t\t{{Format( "Fixed Dec", 12, 4 ),
-\t\t\tMin( {params["min"]} ), Max( {params["max"]} ), Inc( {params["inc"]} ), Minor Ticks( {params["tick"]} ){ref_block}
-\t\t}}
-\t\t),
-\t\tDispatch({{}}, "graph title", TextEditBox, {{Set Text( "      {label} vs. Build" )}})
-\t)
-);
-Wait(0.3);
-If( Is Scriptable( gb ),
-\tgb << Set Control Panel( 0 );
-\tWait( 0.2 );
-\tgb << Save Picture( "{label}.png", PNG );
-\tgb << Close Window;
-);
-'''.strip()
-                
-                script_rows.append(script_content)
+                writer.add(block.render(
+                    label=label, y_vars_quoted=y_vars_quoted, ref_block=ref_block,
+                    min=params["min"], max=params["max"], inc=params["inc"], tick=params["tick"]
+                ), f"{label}.png")
+                charts += 1
                 logger.info(f"Generated JSL for level: {label}")
             
-            # Combine categorical variable settings with chart scripts
-            if cat_var_settings:
-                jsl_content = "\n".join(cat_var_settings) + "\n\n" + ("\n\n".join(script_rows) if script_rows else "// No charts generated")
-            else:
-                jsl_content = "\n\n".join(script_rows) if script_rows else "// No charts generated"
+            if not charts:
+                writer.add("// No charts generated")
+            jsl_content = writer.finish()
             self.jsl_content = jsl_content
             
-            logger.info(f"Generated JSL with {len(script_rows)} chart scripts")
+            logger.info(f"Generated JSL with {charts} chart scripts")
             return jsl_content
             
         except Exception as e:
@@ -258,7 +280,8 @@ If( Is Scriptable( gb ),
                       fai_columns: List[str], color_by: Optional[str] = None,
                       list_check_values: Optional[List[str]] = None,
                       value_order: Optional[List[str]] = None,
-                      caption_box_statistics: Optional[List[str]] = None) -> Dict[str, Any]:
+                      caption_box_statistics: Optional[List[str]] = None,
+                      csv_path: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate all files (CSV, JSL)
         
@@ -269,13 +292,19 @@ If( Is Scriptable( gb ),
             cat_var: Categorical variable
             fai_columns: List of FAI columns
             color_by: Optional color variable
+            csv_path: Write the CSV to this file instead of returning its content
             
         Returns:
             Dict with file generation results
         """
         try:
             # Generate CSV
-            csv_content = self.generate_csv(df_data, cat_var, fai_columns)
+            csv_content = None
+            if csv_path:
+                csv_rows = self.write_csv(df_data, cat_var, fai_columns, csv_path)
+            else:
+                csv_content = self.generate_csv(df_data, cat_var, fai_columns)
+                csv_rows = csv_content.count('\n') - 1  # Subtract header
             
             # Generate JSL
             jsl_content = self.generate_jsl(df_meta, boundaries, cat_var, color_by,
@@ -283,15 +312,18 @@ If( Is Scriptable( gb ),
                                           value_order=value_order,
                                           caption_box_statistics=caption_box_statistics)
             
+            files = {"jsl_content": jsl_content}
+            if csv_path:
+                files["csv_path"] = csv_path
+            else:
+                files["csv_content"] = csv_content
+            
             return {
                 "success": True,
                 "message": "Files generated successfully",
-                "files": {
-                    "csv_content": csv_content,
-                    "jsl_content": jsl_content
-                },
+                "files": files,
                 "details": {
-                    "csv_rows": len(csv_content.split('\n')) - 1,  # Subtract header
+                    "csv_rows": csv_rows,
                     "jsl_length": len(jsl_content)
                 }
             }
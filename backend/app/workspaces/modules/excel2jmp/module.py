@@ -6,6 +6,7 @@ from datetime import datetime
 import uuid
 import json
 import logging
+import shutil
 
 # Import processors from local module files
 from .file_handler import FileHandler
@@ -160,7 +161,19 @@ class Excel2JMPNode(BaseNode):
                         error=f"Data processing failed: {process_result.get('error', 'Unknown error')}"
                     )
                 
-                # Generate files
+                # Create timestamped pair folder
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                pair_id = str(uuid.uuid4())[:8]
+                pair_folder = output_path / f"pair_{timestamp}_{pair_id}"
+                pair_folder.mkdir(parents=True, exist_ok=True)
+                
+                csv_filename = f"data_{timestamp}_{pair_id}.csv"
+                jsl_filename = f"script_{timestamp}_{pair_id}.jsl"
+                
+                csv_path = pair_folder / csv_filename
+                jsl_path = pair_folder / jsl_filename
+                
+                # Generate files (the CSV is streamed into the pair folder)
                 file_result = file_processor.generate_files(
                     df_meta,
                     process_result["processed_data"],
@@ -168,32 +181,19 @@ class Excel2JMPNode(BaseNode):
                     cat_var,
                     fai_columns,
                     color_by,
+                    csv_path=str(csv_path),
                 )
                 
                 if not file_result.get("success"):
+                    shutil.rmtree(pair_folder, ignore_errors=True)
                     return NodeResult(
                         success=False,
                         outputs={},
                         error=f"File generation failed: {file_result.get('error', 'Unknown error')}"
                     )
                 
-                # Create timestamped pair folder
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                pair_id = str(uuid.uuid4())[:8]
-                pair_folder = output_path / f"pair_{timestamp}_{pair_id}"
-                pair_folder.mkdir(parents=True, exist_ok=True)
-                
-                # Save CSV and JSL files
-                csv_content = file_result["files"]["csv_content"]
+                # Save JSL file
                 jsl_content = file_result["files"]["jsl_content"]
-                
-                csv_filename = f"data_{timestamp}_{pair_id}.csv"
-                jsl_filename = f"script_{timestamp}_{pair_id}.jsl"
-                
-                csv_path = pair_folder / csv_filename
-                jsl_path = pair_folder / jsl_filename
-                
-                csv_path.write_text(csv_content, encoding='utf-8')
                 jsl_path.write_text(jsl_content, encoding='utf-8')
                 
                 # Set JSL file permissions
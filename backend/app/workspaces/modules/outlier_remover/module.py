@@ -2,9 +2,48 @@ import pandas as pd
 from typing import Dict, Any, List, Optional
 from app.workspaces.engine.node_base import BaseNode, NodeResult, Port, PortType
 from pathlib import Path
-import numpy as np
+import logging
+import re
 from datetime import datetime
 
+import duckdb
+
+from app.workspaces.modules.outlier_remover.rules import compile_rules, apply_rules
+
+logger = logging.getLogger(__name__)
+
+
+def _write_parquet(sheets: Dict[str, pd.DataFrame], base_key: str, storage) -> Dict[str, str]:
+    """Write each sheet to ``<base_key>/<sheet>.parquet`` through DuckDB; returns {sheet: storage key}"""
+    keys = {}
+    used = set()
+    conn = duckdb.connect()
+    try:
+        for sheet_name, df in sheets.items():
+            stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", sheet_name).strip("._") or "sheet"
+            candidate, n = stem, 1
+            while candidate.lower() in used:
+                n += 1
+                candidate = f"{stem}_{n}"
+            used.add(candidate.lower())
+            
+            key = f"{base_key}/{candidate}.parquet"
+            path = storage.get_file_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Parquet column names are text (Excel headers can be numbers)
+            frame = df.set_axis([str(col) for col in df.columns], axis=1, copy=False)
+            target = str(path).replace("'", "''")
+            conn.register("sheet_frame", frame)
+            try:
+                conn.execute(f"COPY sheet_frame TO '{target}' (FORMAT PARQUET)")
+            finally:
+                conn.unregister("sheet_frame")
+            keys[sheet_name] = key
+    finally:
+        conn.close()
+    logger.info(f"[OutlierRemover] Wrote {len(keys)} sheet(s) to Parquet under {base_key}")
+    return keys
+
 
 class OutlierRemoverNode(BaseNode):
     """Removes outliers from Excel files based on rules and generates summary sheet"""
@@ -40,7 +79,13 @@ class OutlierRemoverNode(BaseNode):
                 name="file",
                 type=PortType.FILE,
                 label="Processed Excel File",
-                description="Processed Excel file with outliers removed and summary sheet"
+                description="Processed Excel file with outliers removed and summary sheet (when export_excel is on)"
+            ),
+            Port(
+                name="parquet_files",
+                type=PortType.JSON,
+                label="Parquet Files",
+                description="Storage key of the Parquet file of each processed sheet, including the summary"
             )
         ]
     
@@ -71,6 +116,9 @@ class OutlierRemoverNode(BaseNode):
             outlier_rules = self.config.get("outlier_rules", [])
             selected_columns = self.config.get("selected_columns", {})  # {sheet_name: [column_names]}
             
+            export_excel = self.config.get("export_excel", True)
+            rules = compile_rules(outlier_rules)
+            
             # Process Excel file
             from app.core.storage import local_storage
             import tempfile
@@ -90,120 +138,18 @@ class OutlierRemoverNode(BaseNode):
                 
                 for sheet_name in excel_file.sheet_names:
                     df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    original_df = df.copy()
-                    
-                    # Get columns to process for this sheet
-                    sheet_columns = selected_columns.get(sheet_name, [])
-                    if not sheet_columns:
-                        # If no columns selected, process all columns
-                        sheet_columns = list(df.columns)
-                    
-                    # Apply outlier removal rules to selected columns
-                    for rule in outlier_rules:
-                        column = rule.get("column")  # Optional: if None, applies to all selected columns
-                        condition = rule.get("condition")
-                        value = rule.get("value")
-                        rule_sheet = rule.get("sheet")  # Optional: rule can be sheet-specific
-                        action = rule.get("action", "clear_cell")  # Default to clear_cell if not specified
-                        
-                        # Skip if rule is for different sheet
-                        if rule_sheet and rule_sheet != sheet_name:
-                            continue
-                        
-                        # Determine which columns to apply the rule to
-                        columns_to_process = []
-                        if column:
-                            # Apply to specific column if it's in selected columns
-                            if column in sheet_columns and column in df.columns:
-                                columns_to_process = [column]
-                        else:
-                            # Apply to all selected columns
-                            columns_to_process = [col for col in sheet_columns if col in df.columns]
-                        
-                        # Collect all rows to remove (for remove_row action)
-                        all_rows_to_remove = set()
-                        
-                        # Apply rule to each column
-                        for col in columns_to_process:
-                            try:
-                                removed_count = 0
-                                rows_to_remove = set()
-                                
-                                if condition == "greater_than":
-                                    try:
-                                        num_value = float(value)
-                                        mask = df[col] > num_value
-                                        removed_count = mask.sum()
-                                        if action == "remove_row":
-                                            rows_to_remove.update(df[mask].index.tolist())
-                                        else:
-                                            df.loc[mask, col] = np.nan
-                                    except (ValueError, TypeError):
-                                        pass
-                                
-                                elif condition == "less_than":
-                                    try:
-                                        num_value = float(value)
-                                        mask = df[col] < num_value
-                                        removed_count = mask.sum()
-                                        if action == "remove_row":
-                                            rows_to_remove.update(df[mask].index.tolist())
-                                        else:
-                                            df.loc[mask, col] = np.nan
-                                    except (ValueError, TypeError):
-                                        pass
-                                
-                                elif condition == "equals":
-                                    mask = df[col] == value
-                                    removed_count = mask.sum()
-                                    if action == "remove_row":
-                                        rows_to_remove.update(df[mask].index.tolist())
-                                    else:
-                                        df.loc[mask, col] = np.nan
-                                
-                                elif condition == "contains":
-                                    if isinstance(value, str):
-                                        mask = df[col].astype(str).str.contains(value, na=False)
-                                        removed_count = mask.sum()
-                                        if action == "remove_row":
-                                            rows_to_remove.update(df[mask].index.tolist())
-                                        else:
-                                            df.loc[mask, col] = np.nan
-                                
-                                # Collect rows to remove
-                                if action == "remove_row":
-                                    all_rows_to_remove.update(rows_to_remove)
-                                
-                                # Record removal in summary
-                                if removed_count > 0:
-                                    removal_summary.append({
-                                        "sheet": sheet_name,
-                                        "column": col,
-                                        "condition": condition,
-                                        "value": str(value),
-                                        "action": action,
-                                        "removed_count": int(removed_count),
-                                        "timestamp": datetime.now().isoformat()
-                                    })
-                            
-                            except Exception as e:
-                                print(f"Error applying rule to column {col} in sheet {sheet_name}: {str(e)}")
-                                continue
-                        
-                        # Remove rows if action is remove_row
-                        if action == "remove_row" and all_rows_to_remove:
-                            df = df.drop(index=list(all_rows_to_remove))
-                            df = df.reset_index(drop=True)
                     
+                    # Columns to process for this sheet (all columns if none selected)
+                    df, sheet_summary = apply_rules(df, rules, sheet_name, selected_columns.get(sheet_name, []))
+                    removal_summary.extend(sheet_summary)
                     processed_sheets[sheet_name] = df
                 
                 excel_file.close()
+                Path(temp_input_path).unlink(missing_ok=True)
                 
                 # Create summary sheet
                 if removal_summary:
                     summary_df = pd.DataFrame(removal_summary)
-                    summary_sheet_name = f"Removal_Summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    processed_sheets[summary_sheet_name] = summary_df
                 else:
                     # Create empty summary if no removals
                     summary_df = pd.DataFrame({
@@ -214,49 +160,57 @@ class OutlierRemoverNode(BaseNode):
                         "removed_count": [],
                         "timestamp": []
                     })
-                    summary_sheet_name = f"Removal_Summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    processed_sheets[summary_sheet_name] = summary_df
+                summary_sheet_name = f"Removal_Summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                processed_sheets[summary_sheet_name] = summary_df
                 
-                # Save processed Excel to output folder
+                # Save processed sheets to output folder
                 # Extract workflow_id and node_id from file_key
                 parts = file_key.split('/')
                 if len(parts) >= 5 and parts[0] == 'workflows' and parts[2] == 'nodes':
                     workflow_id = parts[1]
                     node_id = parts[3]
                     filename = self.config.get("filename", "processed_excel.xlsx")
+                    output_dir = f"workflows/{workflow_id}/nodes/{node_id}/output"
                     
-                    # Construct output storage key
-                    output_key = f"workflows/{workflow_id}/nodes/{node_id}/output/{filename}"
-                    
-                    # Save processed Excel to temporary file first
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_output:
-                        temp_output_path = temp_output.name
-                    
-                    # Write processed Excel
-                    with pd.ExcelWriter(temp_output_path, engine='openpyxl') as writer:
-                        for sheet_name, df in processed_sheets.items():
-                            df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    
-                    # Read processed file and save to storage
-                    with open(temp_output_path, 'rb') as f:
-                        processed_content = f.read()
-                    
-                    local_storage.save_file(processed_content, output_key)
+                    # One Parquet file per sheet
+                    parquet_files = _write_parquet(
+                        processed_sheets, f"{output_dir}/{Path(filename).stem}_parquet", local_storage
+                    )
+                    outputs = {"parquet_files": parquet_files}
                     
-                    # Clean up temp files
-                    Path(temp_input_path).unlink(missing_ok=True)
-                    Path(temp_output_path).unlink(missing_ok=True)
+                    if export_excel:
+                        # Construct output storage key
+                        output_key = f"{output_dir}/{filename}"
+                        
+                        # Save processed Excel to temporary file first
+                        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_output:
+                            temp_output_path = temp_output.name
+                        
+                        try:
+                            # Write processed Excel
+                            with pd.ExcelWriter(temp_output_path, engine='openpyxl') as writer:
+                                for sheet_name, df in processed_sheets.items():
+                                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+                            
+                            # Read processed file and save to storage
+                            with open(temp_output_path, 'rb') as f:
+                                processed_content = f.read()
+                            
+                            local_storage.save_file(processed_content, output_key)
+                        finally:
+                            Path(temp_output_path).unlink(missing_ok=True)
+                        outputs["file"] = output_key
                     
                     return NodeResult(
                         success=True,
-                        outputs={
-                            "file": output_key
-                        },
+                        outputs=outputs,
                         metadata={
-                            "filename": filename,
+                            "filename": filename if export_excel else None,
                             "sheets_processed": list(processed_sheets.keys()),
                             "summary_sheet": summary_sheet_name,
                             "total_removals": len(removal_summary),
+                            "removed_cells": int(sum(entry["removed_count"] for entry in removal_summary)),
+                            "parquet_files": parquet_files,
                             "original_file": file_key
                         }
                     )
@@ -317,6 +271,12 @@ class OutlierRemoverNode(BaseNode):
                     "title": "Selected Columns",
                     "description": "Columns to process per sheet",
                     "default": {}
+                },
+                "export_excel": {
+                    "type": "boolean",
+                    "title": "Export Excel",
+                    "description": "Also write the processed sheets as an Excel file (Parquet is always written)",
+                    "default": True
                 }
             },
             "required": []
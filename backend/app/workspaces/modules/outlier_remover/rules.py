@@ -0,0 +1,241 @@
+"""
+Compiled outlier rules for OutlierRemoverNode
+
+Rules are parsed once (``compile_rules``) and resolved per sheet into a plan
+of (rule, columns). ``apply_rules`` then evaluates each rule as a NumPy mask
+per column instead of editing the frame rule by rule:
+
+- cleared cells are tracked as one boolean mask per column and removed rows
+  as one row mask, so nothing is dropped, re-indexed or copied until the
+  end, where every mask is applied to the frame once;
+- removal counts are popcounts of the masks;
+- ``contains`` runs the regex on the distinct values of a column, not on
+  every cell.
+
+Rules still see the result of the rules before them, as before: a later rule
+is evaluated on the surviving rows with earlier cleared cells empty (and the
+column upcast the way ``df.loc[mask, col] = np.nan`` upcasts it), so the
+output and the summary are the same as applying the rules one by one.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class OutlierRule:
+    condition: str
+    value: Any
+    column: Optional[str] = None
+    sheet: Optional[str] = None
+    action: str = "clear_cell"
+    # float(value) for greater_than/less_than; None when the value is not a number
+    number: Optional[float] = None
+
+    @property
+    def applicable(self) -> bool:
+        """False for rules that can never match (non-numeric bound, non-text pattern)"""
+        if self.condition in ("greater_than", "less_than"):
+            return self.number is not None
+        if self.condition == "contains":
+            return isinstance(self.value, str)
+        return self.condition == "equals"
+
+    def columns_for(self, sheet_name: str, sheet_columns: List[Any], df_columns: pd.Index) -> List[Any]:
+        if self.sheet and self.sheet != sheet_name:
+            return []
+        if self.column:
+            return [self.column] if self.column in sheet_columns and self.column in df_columns else []
+        return [col for col in sheet_columns if col in df_columns]
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> List[OutlierRule]:
+    """Parse the node's outlier_rules config once for all sheets"""
+    compiled = []
+    for rule in rules:
+        condition = rule.get("condition")
+        value = rule.get("value")
+        number = None
+        if condition in ("greater_than", "less_than"):
+            try:
+                number = float(value)
+            except (ValueError, TypeError):
+                number = None
+        compiled.append(OutlierRule(
+            condition=condition,
+            value=value,
+            column=rule.get("column"),
+            sheet=rule.get("sheet"),
+            action=rule.get("action", "clear_cell"),
+            number=number,
+        ))
+    return compiled
+
+
+def _distinct_strings(series: pd.Series, uniques: pd.Index) -> bool:
+    """Whether equal values of ``series`` always print the same (so each distinct value is matched once)"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return True
+    if pd.api.types.is_float_dtype(dtype):
+        # 0.0 and -0.0 are one value but two strings
+        return not np.any(uniques == 0)
+    # Text columns only: in mixed columns 1, 1.0 and True are one value but three strings
+    return dtype == object and pd.api.types.infer_dtype(uniques, skipna=True) == "string"
+
+
+def _contains(series: pd.Series, pattern: str) -> np.ndarray:
+    """``series.astype(str).str.contains(pattern, na=False)``, matching each distinct value once"""
+    codes, uniques = pd.factorize(series)
+    if not _distinct_strings(series, uniques):
+        return series.astype(str).str.contains(pattern, na=False).to_numpy(dtype=bool)
+    hits = np.zeros(len(series), dtype=bool)
+    if len(uniques):
+        unique_hits = pd.Series(uniques).astype(str).str.contains(pattern, na=False).to_numpy(dtype=bool)
+        known = codes >= 0
+        hits[known] = unique_hits[codes[known]]
+    missing = codes < 0
+    if missing.any():
+        # NaN / None / NaT keep their own spelling ("nan", "None", ...)
+        hits[missing] = series[missing].astype(str).str.contains(pattern, na=False).to_numpy(dtype=bool)
+    return hits
+
+
+def evaluate(rule: OutlierRule, series: pd.Series) -> np.ndarray:
+    """Boolean mask of the cells of ``series`` that match ``rule``; may raise for incomparable data"""
+    if rule.condition == "greater_than":
+        return (series > rule.number).to_numpy(dtype=bool)
+    if rule.condition == "less_than":
+        return (series < rule.number).to_numpy(dtype=bool)
+    if rule.condition == "equals":
+        return (series == rule.value).to_numpy(dtype=bool)
+    return _contains(series, rule.value)
+
+
+class _SheetState:
+    """Surviving rows and cleared cells of one sheet while its rules are evaluated"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.alive = np.ones(len(df), dtype=bool)
+        self.alive_positions: Optional[np.ndarray] = None  # None while no row is removed
+        self.cleared: Dict[Any, np.ndarray] = {}  # columns nulled at least once (even with no hits)
+        self.dtypes: Dict[Any, np.dtype] = {}
+        self._views: Dict[Any, pd.Series] = {}
+
+    def view(self, col: Any) -> pd.Series:
+        """The column as the rule-by-rule frame would hold it at this point"""
+        series = self._views.get(col)
+        if series is None:
+            series = self.df[col]
+            if self.alive_positions is not None:
+                series = series.iloc[self.alive_positions].reset_index(drop=True)
+            if col in self.cleared:
+                series = _null_cells(series, self.cleared[col] if self.alive_positions is None
+                                     else self.cleared[col][self.alive_positions])
+            self._views[col] = series
+        return series
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        """Frame positions of a mask over the surviving rows"""
+        hits = np.flatnonzero(mask)
+        return hits if self.alive_positions is None else self.alive_positions[hits]
+
+    def clear(self, col: Any, mask: np.ndarray) -> None:
+        """Null the cells of ``mask`` (over the surviving rows) in ``col``"""
+        cleared = self.cleared.setdefault(col, np.zeros(len(self.df), dtype=bool))
+        cleared[self.positions(mask)] = True
+        series = _null_cells(self.view(col), mask)
+        self._views[col] = series
+        # The dtype after the clear sticks even if all rows are removed later
+        self.dtypes[col] = series.dtype
+
+    def remove_rows(self, positions: np.ndarray) -> None:
+        self.alive[positions] = False
+        self.alive_positions = np.flatnonzero(self.alive)
+        self._views.clear()
+
+    def result(self) -> pd.DataFrame:
+        """Apply every mask once: drop removed rows, then null cleared cells"""
+        df = self.df
+        if self.alive_positions is not None:
+            df = df.iloc[self.alive_positions].reset_index(drop=True)
+        elif self.cleared:
+            df = df.copy()
+        for col, cleared in self.cleared.items():
+            if self.alive_positions is not None:
+                cleared = cleared[self.alive_positions]
+            df.loc[cleared, col] = np.nan
+            if df[col].dtype != self.dtypes[col]:
+                df[col] = df[col].astype(self.dtypes[col])
+        return df
+
+
+def _null_cells(series: pd.Series, mask: np.ndarray) -> pd.Series:
+    # Same upcasting as df.loc[mask, col] = np.nan (int -> float, bool -> object), even for an empty mask
+    frame = series.to_frame()
+    frame.loc[mask, series.name] = np.nan
+    return frame[series.name]
+
+
+def apply_rules(df: pd.DataFrame, rules: List[OutlierRule], sheet_name: str,
+                sheet_columns: Optional[List[Any]] = None) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Apply ``rules`` in order to one sheet
+
+    Args:
+        df: The sheet; it is not modified
+        rules: Compiled rules (rules for other sheets are skipped)
+        sheet_name: Name of the sheet
+        sheet_columns: Columns the rules may touch (all columns when empty)
+
+    Returns:
+        (processed frame, removal summary rows)
+    """
+    sheet_columns = sheet_columns or list(df.columns)
+    state = _SheetState(df)
+    summary: List[Dict[str, Any]] = []
+
+    for rule in rules:
+        columns = rule.columns_for(sheet_name, sheet_columns, df.columns)
+        if not columns:
+            continue
+        remove_row = rule.action == "remove_row"
+        rows_hit = np.zeros(len(df), dtype=bool) if remove_row else None
+
+        for col in columns:
+            if not rule.applicable:
+                continue
+            try:
+                mask = evaluate(rule, state.view(col))
+            except Exception as e:
+                # Incomparable data (e.g. text vs. a numeric bound) or an invalid pattern
+                logger.warning(f"[OutlierRemover] Rule {rule.condition} skipped for column {col} in sheet {sheet_name}: {e}")
+                continue
+
+            if remove_row:
+                rows_hit[state.positions(mask)] = True
+            else:
+                state.clear(col, mask)
+
+            removed_count = int(np.count_nonzero(mask))
+            if removed_count > 0:
+                summary.append({
+                    "sheet": sheet_name,
+                    "column": col,
+                    "condition": rule.condition,
+                    "value": str(rule.value),
+                    "action": rule.action,
+                    "removed_count": removed_count,
+                    "timestamp": datetime.now().isoformat()
+                })
+
+        if remove_row and rows_hit.any():
+            state.remove_rows(np.flatnonzero(rows_hit))
+
+    return state.result(), summary
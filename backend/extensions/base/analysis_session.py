@@ -0,0 +1,379 @@
+"""
+Upload-once sessions for multi-step extension wizards
+
+The first wizard step uploads the workbook; the response carries a
+``session_id`` that later steps send instead of the file. Each session owns a
+directory under ANALYSIS_SESSION_DIR holding the upload, so every temp file a
+session creates is removed with it (on ``close``, or when it has been idle
+for ANALYSIS_SESSION_TTL seconds).
+
+Parsed DataFrames stay in memory in this process, bounded by
+ANALYSIS_SESSION_MAX_ENTRIES and ANALYSIS_SESSION_MAX_MEMORY_MB. The least
+recently used sessions beyond those limits are spilled to a pickle in their
+directory and read back on the next step. API workers share the directory,
+so a step served by another worker re-reads the spill (or re-parses the
+stored upload) instead of asking for the file again. Spills are unpickled,
+so the root must only be writable by the API's user: it is created with mode
+0700, and a root owned by another user (or writable by others) is refused.
+
+Endpoints parse through ``load_frames``, which runs the loader in the
+extension process pool (``extensions.base.executor``); loaders must
+therefore be module-level functions.
+"""
+import json
+import logging
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException, Request, UploadFile
+
+from app.core.config import settings
+from .executor import executor
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE = "session.json"
+SPILL_FILE = "frames.pkl"
+UPLOAD_STEM = "upload"
+SWEEP_INTERVAL = 60  # seconds between scans of the session directory
+
+# (frames, attrs) parsed from the stored upload
+Loader = Callable[[str], Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]]
+
+
+class SessionLoadError(ValueError):
+    """The uploaded workbook could not be parsed by the extension's loader."""
+
+
+class AnalysisSession:
+    """One uploaded workbook and whatever has been parsed from it."""
+
+    def __init__(self, session_id: str, kind: str, directory: Path, filename: str, created_at: float):
+        self.id = session_id
+        self.kind = kind
+        self.directory = directory
+        self.filename = filename
+        self.created_at = created_at
+        self.frames: Optional[Dict[str, pd.DataFrame]] = None
+        self.attrs: Dict[str, Any] = {}
+        self.results: Dict[Any, Any] = {}
+        self.nbytes = 0
+        self.spilled = False
+        self.lock = threading.RLock()
+
+    @property
+    def path(self) -> str:
+        """The stored upload, for analyzers that take a file path."""
+        return str(self.directory / f"{UPLOAD_STEM}{Path(self.filename).suffix.lower() or '.xlsx'}")
+
+    def read_bytes(self) -> bytes:
+        return Path(self.path).read_bytes()
+
+    def memo(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Cache a result derived from the workbook for the rest of the session
+
+        Callers must treat the returned object as read-only.
+        """
+        with self.lock:
+            if key not in self.results:
+                self.results[key] = compute()
+            return self.results[key]
+
+    async def memo_async(self, key: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """``memo`` for results computed off the event loop (e.g. in the process pool)"""
+        if key in self.results:
+            return self.results[key]
+        value = await compute()
+        with self.lock:
+            return self.results.setdefault(key, value)
+
+
+class AnalysisSessionStore:
+    """Bounded, TTL-evicted session cache with spill to disk"""
+
+    def __init__(self, root: Optional[str] = None, ttl: Optional[int] = None,
+                 max_entries: Optional[int] = None, max_memory_mb: Optional[int] = None):
+        self.root = Path(
+            root or settings.ANALYSIS_SESSION_DIR or Path(tempfile.gettempdir()) / _default_root_name()
+        ).expanduser()
+        self.ttl = ttl if ttl is not None else settings.ANALYSIS_SESSION_TTL
+        self.max_entries = max_entries if max_entries is not None else settings.ANALYSIS_SESSION_MAX_ENTRIES
+        max_memory_mb = max_memory_mb if max_memory_mb is not None else settings.ANALYSIS_SESSION_MAX_MEMORY_MB
+        self.max_bytes = max_memory_mb * 1024 * 1024
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+        self._root_checked = False
+
+    def _ensure_root(self) -> None:
+        """
+        Create the root (mode 0700) and check nobody else can write to it
+
+        Raises PermissionError when the root is a symlink, belongs to another
+        user or is group/world writable; set ANALYSIS_SESSION_DIR to a
+        private directory in that case.
+        """
+        if self._root_checked:
+            return
+        self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = self.root.lstat()
+        if stat.S_ISLNK(st.st_mode) or not stat.S_ISDIR(st.st_mode):
+            raise PermissionError(f"Analysis session root {self.root} is not a directory")
+        if hasattr(os, "getuid"):
+            if st.st_uid != os.getuid():
+                raise PermissionError(
+                    f"Analysis session root {self.root} is owned by uid {st.st_uid}; "
+                    "set ANALYSIS_SESSION_DIR to a directory owned by the API user"
+                )
+            if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                os.chmod(self.root, 0o700)
+        self._root_checked = True
+
+    # Lifecycle
+
+    def create(self, kind: str, filename: str, content: bytes) -> AnalysisSession:
+        """Store an upload as a new session (nothing is parsed yet)"""
+        self._ensure_root()
+        self.sweep()
+        session_id = uuid.uuid4().hex
+        directory = self.root / session_id
+        directory.mkdir(mode=0o700, exist_ok=False)
+        session = AnalysisSession(session_id, kind, directory, filename or "upload.xlsx", time.time())
+        try:
+            Path(session.path).write_bytes(content)
+            (directory / SESSION_FILE).write_text(json.dumps({
+                "kind": kind, "filename": session.filename, "created_at": session.created_at
+            }))
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        with self._lock:
+            self._sessions[session_id] = session
+        logger.info(f"[SESSION] Created {kind} session {session_id} ({len(content)} bytes)")
+        return session
+
+    def get(self, session_id: str, kind: str) -> Optional[AnalysisSession]:
+        """The live session, or None if it is unknown, expired or belongs to another extension"""
+        self.sweep()
+        if not session_id or not session_id.isalnum():
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+        if session is not None and not (session.directory / SESSION_FILE).exists():
+            # Expired and removed by another worker's sweep
+            self.close(session_id)
+            return None
+        if session is None:
+            session = self._adopt(session_id)
+            if session is None:
+                return None
+        if session.kind != kind:
+            return None
+        self._touch(session)
+        return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        directory = self.root / session_id
+        if session_id.isalnum() and directory.is_dir():
+            shutil.rmtree(directory, ignore_errors=True)
+            logger.info(f"[SESSION] Closed session {session_id}")
+            return True
+        return False
+
+    def _adopt(self, session_id: str) -> Optional[AnalysisSession]:
+        """Pick up a session created by another API worker from its directory"""
+        directory = self.root / session_id
+        try:
+            self._ensure_root()
+        except OSError as e:
+            logger.error(f"[SESSION] Not reading session {session_id}: {e}")
+            return None
+        try:
+            info = json.loads((directory / SESSION_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        if self._expired(directory):
+            self.close(session_id)
+            return None
+        session = AnalysisSession(session_id, info["kind"], directory, info["filename"], info["created_at"])
+        session.spilled = (directory / SPILL_FILE).exists()
+        with self._lock:
+            session = self._sessions.setdefault(session_id, session)
+        return session
+
+    # Parsed data
+
+    def frames(self, session: AnalysisSession, loader: Loader,
+               parsed: Optional[Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]] = None
+               ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+        """
+        The session's DataFrames and loader attributes, parsing the upload at most once
+
+        ``parsed`` is the loader's result when it already ran elsewhere (see
+        ``load_frames``). Raises SessionLoadError if the loader rejects the
+        workbook.
+        """
+        with session.lock:
+            if session.frames is None:
+                if session.spilled:
+                    with open(session.directory / SPILL_FILE, "rb") as f:
+                        session.frames, session.attrs = pickle.load(f)
+                elif parsed is not None:
+                    session.frames, session.attrs = parsed
+                else:
+                    started = time.perf_counter()
+                    session.frames, session.attrs = loader(session.path)
+                    logger.info(
+                        f"[SESSION] Parsed session {session.id} in {time.perf_counter() - started:.2f}s"
+                    )
+                session.nbytes = sum(
+                    int(frame.memory_usage(deep=True).sum()) for frame in session.frames.values()
+                )
+            frames, attrs = session.frames, session.attrs
+        self._enforce_limits(keep=session.id)
+        return frames, attrs
+
+    def _enforce_limits(self, keep: str) -> None:
+        """Spill least recently used sessions until the in-memory bounds hold"""
+        victims = []
+        with self._lock:
+            loaded = [s for s in self._sessions.values() if s.frames is not None]
+            count, total = len(loaded), sum(s.nbytes for s in loaded)
+            for session in loaded:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                if session.id == keep:
+                    continue
+                victims.append(session)
+                count -= 1
+                total -= session.nbytes
+        for session in victims:
+            self._spill(session)
+
+    def _spill(self, session: AnalysisSession) -> None:
+        with session.lock:
+            if session.frames is None:
+                return
+            if not session.spilled:
+                spill_path = session.directory / SPILL_FILE
+                tmp_path = spill_path.with_suffix(".tmp")
+                try:
+                    with open(tmp_path, "wb") as f:
+                        pickle.dump((session.frames, session.attrs), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    tmp_path.replace(spill_path)
+                    session.spilled = True
+                except OSError as e:
+                    # The upload is still there; the next step re-parses it
+                    logger.warning(f"[SESSION] Could not spill session {session.id}: {e}")
+                    tmp_path.unlink(missing_ok=True)
+            session.frames = None
+            session.results.clear()
+            logger.info(f"[SESSION] Spilled session {session.id} ({session.nbytes / 1e6:.1f} MB) to disk")
+
+    # Expiry
+
+    def _touch(self, session: AnalysisSession) -> None:
+        try:
+            os.utime(session.directory / SESSION_FILE)
+        except OSError:
+            pass
+
+    def _expired(self, directory: Path) -> bool:
+        try:
+            return time.time() - (directory / SESSION_FILE).stat().st_mtime > self.ttl
+        except OSError:
+            # No session file: a half-created directory, expire it by its own age
+            try:
+                return time.time() - directory.stat().st_mtime > self.ttl
+            except OSError:
+                return True
+
+    def sweep(self, force: bool = False) -> int:
+        """Remove sessions idle for longer than the TTL (including other workers')"""
+        now = time.time()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL:
+            return 0
+        self._last_sweep = now
+        if not self.root.is_dir():
+            return 0
+        removed = 0
+        for directory in self.root.iterdir():
+            if directory.is_dir() and self._expired(directory):
+                self.close(directory.name)
+                removed += 1
+        if removed:
+            logger.info(f"[SESSION] Expired {removed} idle session(s)")
+        return removed
+
+
+def _default_root_name() -> str:
+    """Per-user name under the shared temp dir, so users can't squat on each other's root"""
+    return f"auto-jmp-sessions-{os.getuid()}" if hasattr(os, "getuid") else "auto-jmp-sessions"
+
+
+session_store = AnalysisSessionStore()
+
+
+async def open_session(kind: str, file: Optional[UploadFile], session_id: Optional[str]) -> AnalysisSession:
+    """
+    Resolve a wizard step's workbook: a new upload starts a session, otherwise
+    ``session_id`` must name a live one
+
+    Raises HTTPException 410 when the session has expired, so the client can
+    upload the file again.
+    """
+    if session_id:
+        session = session_store.get(session_id, kind)
+        if session is None:
+            raise HTTPException(status_code=410, detail="Analysis session expired; upload the file again")
+        return session
+    if file is None:
+        raise HTTPException(status_code=400, detail="Either file or session_id is required")
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return session_store.create(kind, file.filename, content)
+
+
+async def load_frames(session: AnalysisSession, loader: Loader,
+                      request: Optional[Request] = None) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+    """``session_store.frames`` with the upload parsed in the extension process pool"""
+    parsed = None
+    if session.frames is None and not session.spilled:
+        started = time.perf_counter()
+        parsed = await executor.run(session.kind, loader, session.path, request=request)
+        logger.info(f"[SESSION] Parsed session {session.id} in {time.perf_counter() - started:.2f}s")
+    return session_store.frames(session, loader, parsed=parsed)
+
+
+def with_session(result: Any, session: AnalysisSession) -> Any:
+    """Add the session id to a step's response dict"""
+    if isinstance(result, dict):
+        return {**result, "session_id": session.id}
+    return result
+
+
+def add_session_routes(router, kind: str) -> None:
+    """``DELETE {prefix}/session/{session_id}``: drop a wizard session once the run is queued"""
+
+    @router.delete("/session/{session_id}")
+    async def close_analysis_session(session_id: str):
+        if session_store.get(session_id, kind) is None:
+            raise HTTPException(status_code=404, detail="Analysis session not found")
+        session_store.close(session_id)
+        return {"success": True}
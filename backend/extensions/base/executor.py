@@ -0,0 +1,256 @@
+"""
+Process pool for the CPU-heavy parts of extension endpoints
+
+Extension routes are ``async def`` but parse workbooks, validate, melt and
+render CSV/JSL with pandas/openpyxl. Run inline, one large workbook held the
+event loop and stalled every other request. That work runs here instead:
+
+    @cpu_bound("excel2cpkv1")
+    def _validate_workbook(path: str) -> Dict[str, Any]:
+        ...
+
+    result = await _validate_workbook(path, request=request)
+
+Decorated functions must be module-level, and their arguments and return
+value picklable; pool workers import the function's module by name. Plain
+picklable callables can be submitted with ``executor.run`` directly.
+
+- At most EXTENSION_POOL_PER_EXTENSION jobs of one extension run at once, so
+  a burst on one plugin can't take every worker. Beyond that, jobs wait;
+  more than EXTENSION_POOL_MAX_QUEUE waiting is answered with 503.
+- A job still waiting when its client disconnects is dropped (499). One
+  already running in a worker can't be interrupted; it finishes and its
+  result is discarded, and it holds its slot of the extension's limit until
+  then. The same applies after EXTENSION_POOL_TIMEOUT (504).
+- Queue and run times are exported as ``extension_job_queue_seconds`` and
+  ``extension_job_duration_seconds`` (see app.core.metrics).
+
+EXTENSION_POOL_WORKERS=0 runs jobs on threads instead, which keeps the event
+loop free but shares the GIL; useful where worker processes are unavailable.
+"""
+import asyncio
+import functools
+import importlib
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.metrics import EXTENSION_JOB_SECONDS, EXTENSION_JOBS_WAITING, EXTENSION_QUEUE_SECONDS
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+DISCONNECT_POLL_INTERVAL = 0.5  # seconds between client disconnect checks
+
+
+class ClientDisconnected(Exception):
+    """The client went away while its job was waiting or running."""
+
+
+def _resolve(module: str, qualname: str) -> Callable:
+    """The undecorated function behind a @cpu_bound reference"""
+    target: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return getattr(target, "__wrapped__", target)
+
+
+def _invoke(target, args: Tuple, kwargs: Dict[str, Any]):
+    """Runs in the worker: (started, finished, result), wall clock, for queue-time metrics"""
+    fn = _resolve(*target) if isinstance(target, tuple) else target
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class ExtensionExecutor:
+    """Shared process pool with per-extension concurrency limits"""
+
+    def __init__(self, workers: Optional[int] = None, per_extension: Optional[int] = None,
+                 max_queue: Optional[int] = None, timeout: Optional[float] = None):
+        self.workers = workers if workers is not None else settings.EXTENSION_POOL_WORKERS
+        self.per_extension = per_extension if per_extension is not None else settings.EXTENSION_POOL_PER_EXTENSION
+        self.max_queue = max_queue if max_queue is not None else settings.EXTENSION_POOL_MAX_QUEUE
+        self.timeout = timeout if timeout is not None else settings.EXTENSION_POOL_TIMEOUT
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+
+    # Pool lifecycle
+
+    def _get_pool(self) -> Executor:
+        with self._pool_lock:
+            if self._pool is None and self.workers <= 0:
+                self._pool = ThreadPoolExecutor(thread_name_prefix="extension")
+                logger.info("[EXECUTOR] Started extension thread pool")
+            elif self._pool is None:
+                options = {"max_workers": self.workers}
+                # Workers import the extension modules themselves; forking the API process
+                # (event loop, Redis and exporter threads) is not safe
+                options["mp_context"] = multiprocessing.get_context(settings.EXTENSION_POOL_START_METHOD)
+                if settings.EXTENSION_POOL_MAX_TASKS_PER_CHILD:
+                    # Recycle workers so pandas/openpyxl memory doesn't accumulate
+                    options["max_tasks_per_child"] = settings.EXTENSION_POOL_MAX_TASKS_PER_CHILD
+                self._pool = ProcessPoolExecutor(**options)
+                logger.info(f"[EXECUTOR] Started extension process pool with {self.workers} workers")
+            return self._pool
+
+    def _discard_pool(self, pool: Executor) -> None:
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            logger.info("[EXECUTOR] Extension pool shut down")
+
+    # Jobs
+
+    def _limit(self, extension: str) -> asyncio.Semaphore:
+        limit = self._limits.get(extension)
+        if limit is None:
+            limit = self._limits[extension] = asyncio.Semaphore(self.per_extension)
+        return limit
+
+    @staticmethod
+    def _release_when_done(job: Future, limit: asyncio.Semaphore) -> None:
+        """
+        Release ``limit`` once ``job`` has finished in the pool
+
+        Cancelling the awaiting side (timeout, disconnect) doesn't stop a job
+        that is already running, so its slot is only freed when it ends.
+        """
+        loop = asyncio.get_running_loop()
+
+        def release(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(limit.release)
+            except RuntimeError:
+                pass  # event loop already closed (shutdown)
+
+        job.add_done_callback(release)
+
+    async def _until_done(self, awaitable, request: Optional[Request]):
+        """Await ``awaitable``, cancelling it if the client disconnects first"""
+        work = asyncio.ensure_future(awaitable)
+        if request is None:
+            return await work
+        watcher = asyncio.ensure_future(self._disconnected(request))
+        try:
+            done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        finally:
+            watcher.cancel()
+        if work in done:
+            return work.result()
+        work.cancel()
+        raise ClientDisconnected()
+
+    @staticmethod
+    async def _disconnected(request: Request) -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    async def run(self, extension: str, fn: Callable, *args, request: Optional[Request] = None, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` in the pool under the extension's concurrency limit
+
+        Raises HTTPException 503 when too many of the extension's jobs are
+        waiting, 504 on timeout and 499 when ``request``'s client disconnects.
+        Exceptions raised by ``fn`` propagate unchanged.
+        """
+        job = getattr(fn, "__name__", type(fn).__name__).lstrip("_")
+        target = getattr(fn, "__cpu_bound_ref__", None) or fn
+
+        if self._waiting.get(extension, 0) >= self.max_queue:
+            EXTENSION_JOB_SECONDS.labels(extension=extension, job=job, state="rejected").observe(0)
+            logger.warning(f"[EXECUTOR] {extension} queue full, rejecting {job}")
+            raise HTTPException(status_code=503, detail=f"{extension} is busy; please retry shortly")
+
+        limit = self._limit(extension)
+        submitted = time.time()
+        state = "error"
+        self._waiting[extension] = self._waiting.get(extension, 0) + 1
+        EXTENSION_JOBS_WAITING.labels(extension=extension).inc()
+        waiting = True
+        acquired = False
+        with span(f"extension.{job}", extension=extension, job=job) as active:
+            try:
+                await self._until_done(limit.acquire(), request)
+                acquired = True
+                pool = self._get_pool()
+                submitted_job = pool.submit(_invoke, target, args, kwargs)
+                self._release_when_done(submitted_job, limit)
+                acquired = False  # released by the job's done-callback from here on
+                future = asyncio.wrap_future(submitted_job)
+                self._waiting[extension] -= 1
+                EXTENSION_JOBS_WAITING.labels(extension=extension).dec()
+                waiting = False
+
+                started, finished, result = await asyncio.wait_for(
+                    self._until_done(future, request), timeout=self.timeout
+                )
+                state = "ok"
+                queued = max(0.0, started - submitted)
+                EXTENSION_QUEUE_SECONDS.labels(extension=extension).observe(queued)
+                active.attributes["queue_ms"] = round(queued * 1000, 1)
+                EXTENSION_JOB_SECONDS.labels(extension=extension, job=job, state=state).observe(finished - started)
+                return result
+            except ClientDisconnected:
+                state = "cancelled"
+                logger.info(f"[EXECUTOR] Client disconnected, dropped {extension} {job}")
+                raise HTTPException(status_code=499, detail="Client closed request")
+            except asyncio.TimeoutError:
+                state = "timeout"
+                logger.error(f"[EXECUTOR] {extension} {job} exceeded {self.timeout}s")
+                raise HTTPException(status_code=504, detail=f"{extension} {job} timed out")
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool for the next job
+                self._discard_pool(pool)
+                logger.error(f"[EXECUTOR] Worker crashed running {extension} {job}")
+                raise RuntimeError("The analysis worker stopped unexpectedly; please retry")
+            finally:
+                if waiting:
+                    self._waiting[extension] -= 1
+                    EXTENSION_JOBS_WAITING.labels(extension=extension).dec()
+                if acquired:
+                    limit.release()
+                if state != "ok":
+                    EXTENSION_JOB_SECONDS.labels(extension=extension, job=job, state=state).observe(
+                        time.time() - submitted
+                    )
+
+
+executor = ExtensionExecutor()
+
+
+def cpu_bound(extension: str):
+    """
+    Run a module-level function in the extension process pool
+
+    The decorated function becomes a coroutine function taking the same
+    arguments plus an optional keyword-only ``request`` (for cancellation).
+    """
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        async def wrapper(*args, request: Optional[Request] = None, **kwargs):
+            return await executor.run(extension, wrapper, *args, request=request, **kwargs)
+
+        wrapper.__cpu_bound_ref__ = (fn.__module__, fn.__qualname__)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,80 @@
+"""
+Output manifest for generated JSL scripts
+
+JSL generators append a single comment line listing the images the script will
+save, so the worker knows exactly how many PNGs a run produces. JMP ignores the
+line; the run/task folder copy steps preserve it because they only rewrite the
+leading Open() header.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_PREFIX = "//@output-manifest "
+MANIFEST_VERSION = 1
+
+SAVE_PICTURE_PATTERN = re.compile(r'Save\s+Picture\(\s*"([^"]+)"', re.IGNORECASE)
+
+
+def build_output_manifest(outputs: List[str], generator: str) -> Dict[str, Any]:
+    """
+    Build a manifest describing the files a JSL script will save
+
+    Args:
+        outputs: Output filenames in script order (e.g. ["FAI1.png", "FAI2.png"])
+        generator: Name of the extension/module that generated the script
+
+    Returns:
+        Manifest dict
+    """
+    unique_outputs = list(dict.fromkeys(_basename(name) for name in outputs))
+    return {
+        "version": MANIFEST_VERSION,
+        "generator": generator,
+        "outputs": unique_outputs,
+        "expected_images": sum(1 for name in unique_outputs if name.lower().endswith(".png")),
+    }
+
+
+def _basename(name: str) -> str:
+    # Path() only for real paths; plain filenames (the common case) are returned as is
+    if "/" in name or "\\" in name or name in ("", "."):
+        return Path(name).name
+    return name
+
+
+def append_output_manifest(jsl_content: str, outputs: List[str], generator: str) -> str:
+    """Append the output manifest comment line to generated JSL content."""
+    manifest = build_output_manifest(outputs, generator)
+    return f"{jsl_content.rstrip()}\n\n{MANIFEST_PREFIX}{json.dumps(manifest, ensure_ascii=False)}\n"
+
+
+def read_output_manifest(jsl_content: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the output manifest of a JSL script
+
+    Uses the embedded manifest line when present, otherwise derives one from the
+    script's Save Picture statements (scripts uploaded directly by users).
+
+    Returns:
+        Manifest dict, or None if the script saves no pictures
+    """
+    for line in reversed(jsl_content.splitlines()):
+        if line.startswith(MANIFEST_PREFIX):
+            try:
+                manifest = json.loads(line[len(MANIFEST_PREFIX):])
+            except json.JSONDecodeError:
+                break
+            if isinstance(manifest, dict) and isinstance(manifest.get("outputs"), list):
+                return manifest
+            break
+
+    outputs = SAVE_PICTURE_PATTERN.findall(_strip_comment_lines(jsl_content))
+    if not outputs:
+        return None
+    return build_output_manifest(outputs, generator="save_picture_scan")
+
+
+def _strip_comment_lines(jsl_content: str) -> str:
+    return "\n".join(line for line in jsl_content.splitlines() if not line.lstrip().startswith("//"))
@@ -0,0 +1,190 @@
+"""
+Shared JSL rendering engine
+
+Every generator emits one block per chart (FAI, level, ...) from a fixed
+JSL skeleton. ``JSLTemplate`` holds such a skeleton as a ``str.format``
+pattern (``{name}`` fields, literal JSL braces doubled), parsed and checked
+once at import. ``bind`` fills the fields that are the same for every block
+of a run (X variables, elements, size) so only the per-chart fields are
+formatted in the loop.
+
+Rendered blocks are memoized per process, keyed by the template's hash and
+the block's field values, so re-running an analysis with the same specs
+(or charts repeated across runs) reuses the text. JSL_BLOCK_CACHE_SIZE
+bounds the cache; 0 disables it.
+
+``JSLWriter`` joins blocks and appends the output manifest
+(``jsl_manifest``) while writing them to a file or stream, so a script with
+tens of thousands of blocks never has to exist as one string. Its output is
+the same as ``append_output_manifest("\\n\\n".join(blocks), outputs, ...)``.
+"""
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+from string import Formatter
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
+
+from app.core.config import settings
+from .jsl_manifest import MANIFEST_PREFIX, build_output_manifest
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SEPARATOR = "\n\n"
+
+_formatter = Formatter()
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class JSLTemplate:
+    """A JSL block skeleton with ``{field}`` placeholders"""
+
+    def __init__(self, text: str, name: str = "jsl"):
+        self.name = name
+        self.text = text
+        # Parsing here rejects malformed templates at import instead of at render time
+        self.fields = tuple(dict.fromkeys(
+            field_name for _, field_name, _, _ in _formatter.parse(text) if field_name is not None
+        ))
+        self.key = f"{name}:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+
+    def bind(self, **fields: Any) -> "JSLTemplate":
+        """A template with ``fields`` filled in and the other placeholders left open"""
+        parts = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(self.text):
+            parts.append(_escape(literal))
+            if field_name is None:
+                continue
+            if field_name in fields:
+                value = _formatter.convert_field(fields[field_name], conversion)
+                parts.append(_escape(format(value, format_spec)))
+            else:
+                parts.append(
+                    "{" + field_name + (f"!{conversion}" if conversion else "") + (f":{format_spec}" if format_spec else "") + "}"
+                )
+        return JSLTemplate("".join(parts), name=self.name)
+
+    def render(self, **fields: Any) -> str:
+        """The block for ``fields`` (memoized); raises KeyError for a missing field"""
+        return block_cache.render(self, fields)
+
+    def __repr__(self) -> str:
+        return f"JSLTemplate({self.key!r}, fields={list(self.fields)})"
+
+
+class BlockCache:
+    """Bounded cache of rendered blocks shared by all templates; the oldest entries are evicted first"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.JSL_BLOCK_CACHE_SIZE
+        self._blocks: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template: JSLTemplate, fields: Dict[str, Any]) -> str:
+        if self.max_entries <= 0:
+            return template.text.format_map(fields)
+        # Values in the template's field order; extra fields do not change the block.
+        # Each value is keyed with its type: 0, 0.0 and False are equal but format differently
+        key = (template.key, *((type(value), value) for value in map(fields.__getitem__, template.fields)))
+        with self._lock:
+            try:
+                block = self._blocks.get(key)
+            except TypeError:
+                # Unhashable field value (e.g. a list): render without caching
+                return template.text.format_map(fields)
+            if block is not None:
+                self.hits += 1
+                return block
+            self.misses += 1
+        block = template.text.format_map(fields)
+        with self._lock:
+            self._blocks[key] = block
+            if len(self._blocks) > self.max_entries:
+                del self._blocks[next(iter(self._blocks))]
+        return block
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> Dict[str, int]:
+        return {"entries": len(self._blocks), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+block_cache = BlockCache()
+
+
+class JSLWriter:
+    """
+    Write JSL blocks, separated by a blank line, followed by the output manifest
+
+    ``dest`` is a file path, an open text file, or None to collect the script
+    and return it from ``finish``. Without ``generator`` no manifest is
+    written and the blocks are joined as they are.
+    """
+
+    def __init__(self, generator: Optional[str] = None, dest: Union[str, Path, TextIO, None] = None):
+        self.generator = generator
+        self.outputs: List[str] = []
+        self.blocks = 0
+        self._parts: Optional[List[str]] = None
+        self._file: Optional[TextIO] = None
+        self._owns_file = False
+        if dest is None:
+            self._parts = []
+        elif isinstance(dest, (str, Path)):
+            self._file = open(dest, "w", encoding="utf-8", newline="")
+            self._owns_file = True
+        else:
+            self._file = dest
+        # Trailing whitespace held back: the manifest follows the script with it stripped
+        self._pending = ""
+
+    def _write(self, text: str) -> None:
+        if self.generator is not None:
+            text = self._pending + text
+            stripped = text.rstrip()
+            self._pending = text[len(stripped):]
+            text = stripped
+        if text:
+            self._write_raw(text)
+
+    def add(self, block: str, output: Optional[str] = None) -> None:
+        """Append a block; ``output`` is the file it saves (e.g. "FAI1.png"), if any"""
+        self._write(BLOCK_SEPARATOR + block if self.blocks else block)
+        self.blocks += 1
+        if output:
+            self.outputs.append(output)
+
+    def finish(self) -> Optional[str]:
+        """Write the manifest and close; returns the script when no ``dest`` was given"""
+        try:
+            if self.generator is not None:
+                manifest = build_output_manifest(self.outputs, self.generator)
+                self._pending = ""
+                self._write_raw(f"\n\n{MANIFEST_PREFIX}{json.dumps(manifest, ensure_ascii=False)}\n")
+        finally:
+            if self._owns_file:
+                self._file.close()
+        if self._parts is not None:
+            return "".join(self._parts)
+        return None
+
+    def _write_raw(self, text: str) -> None:
+        if self._parts is not None:
+            self._parts.append(text)
+        else:
+            self._file.write(text)
+
+    def close(self) -> None:
+        """Close an owned file without writing the manifest (on errors)"""
+        if self._owns_file and not self._file.closed:
+            self._file.close()
+
@@ -0,0 +1,78 @@
+"""
+Streaming wide -> long CSV writer for JMP inputs
+
+The boxplot generators feed JMP a long table (category, FAI name, value)
+built with ``DataFrame.melt``. Melting the whole frame and rendering it with
+``to_csv()`` holds the long frame and the full CSV string in memory at once;
+for a million rows by a few hundred FAIs that is several gigabytes.
+
+``write_long_csv`` melts a batch of FAI columns at a time (about
+CSV_BATCH_CELLS input cells) and appends each batch to the destination, so
+memory stays bounded by the batch, not by the output. The bytes are the
+same as ``df.melt(...).dropna().to_csv(index=False)``: melt stacks column by
+column, so batches in column order give the same row order. The full melt
+concatenates all FAI columns into one value column, and concat converts
+values by the mix of dtypes involved (bool with int columns print as 1/0,
+any float column makes ints print as "1.0", datetimes with numbers keep
+both as is). To get the same conversion, each batch is melted together with
+one column of every dtype in ``value_vars``; the rows of those witness
+columns are sliced off before writing.
+"""
+import logging
+from pathlib import Path
+from typing import List, TextIO, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CSV_BATCH_CELLS = 2_000_000  # input cells melted per batch
+
+
+def dtype_witnesses(df: pd.DataFrame, value_vars: List[str]) -> List[str]:
+    """
+    One column of every dtype in ``value_vars``, preferring columns with data
+
+    concat picks the value conversion from the dtypes of the columns that
+    have data (empty and all-NA inputs are ignored), so one such column per
+    dtype stands in for the rest of the frame.
+    """
+    witnesses = []  # (dtype, column, has_data)
+    for column in value_vars:
+        dtype = df[column].dtype
+        found = next((i for i, (other, _, _) in enumerate(witnesses) if dtype == other), None)
+        if found is None:
+            witnesses.append((dtype, column, bool(df[column].notna().any())))
+        elif not witnesses[found][2] and df[column].notna().any():
+            witnesses[found] = (dtype, column, True)
+    return [column for _, column, _ in witnesses]
+
+
+def write_long_csv(df: pd.DataFrame, id_var: str, value_vars: List[str], dest: Union[str, Path, TextIO],
+                   var_name: str = "FAI", value_name: str = "Data",
+                   batch_cells: int = CSV_BATCH_CELLS) -> int:
+    """
+    Write ``df`` melted on ``value_vars`` (rows with NaN dropped) as CSV
+
+    ``dest`` is a file path or an open text file. Returns the number of data
+    rows written.
+    """
+    if isinstance(dest, (str, Path)):
+        with open(dest, "w", encoding="utf-8", newline="") as f:
+            return write_long_csv(df, id_var, value_vars, f, var_name, value_name, batch_cells)
+
+    witnesses = dtype_witnesses(df, value_vars)
+    per_batch = max(1, batch_cells // max(len(df), 1))
+    rows = 0
+    header = True
+    for start in range(0, max(len(value_vars), 1), per_batch):
+        batch = list(value_vars[start:start + per_batch])
+        extra = [column for column in witnesses if column not in batch]
+        stacked = df[[id_var] + batch + extra].melt(
+            id_vars=[id_var], value_vars=batch + extra, var_name=var_name, value_name=value_name
+        ).iloc[:len(df) * len(batch)].dropna()
+        stacked.to_csv(dest, index=False, header=header)
+        header = False
+        rows += len(stacked)
+    return rows
+
@@ -0,0 +1,200 @@
+"""
+Columnar spec-limit validation
+
+Spec and meta sheets hold one test_name per row with its USL, LSL and
+Target. ``validate_spec_frame`` evaluates each rule over the whole frame as a
+boolean mask and returns a compact issue table with one row per (spec row,
+rule) hit, ordered by spec row and then by rule. Each extension picks the
+rules it enforces and turns rule codes into its own messages, so CPK, the
+boxplot validators and the commonality meta analyzers share the checks
+without sharing wording.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ERROR = "error"
+WARNING = "warning"
+
+NAME_PATTERN = r"^[A-Za-z0-9_]+$"
+
+# What astype(str) leaves of an empty test_name cell
+NULL_NAMES = ("nan", "none", "<na>")
+
+ISSUE_COLUMNS = ["position", "row", "test_name", "rule", "severity", "usl", "lsl", "target"]
+
+
+@dataclass(frozen=True)
+class SpecColumns:
+    """The spec frame as arrays: stripped names, numeric limits and their NaN masks"""
+    names: pd.Series
+    usl: pd.Series
+    lsl: pd.Series
+    target: pd.Series
+    u: np.ndarray
+    l: np.ndarray
+    t: np.ndarray
+    usl_na: np.ndarray
+    lsl_na: np.ndarray
+    target_na: np.ndarray
+    data_columns: Optional[pd.Index] = None
+
+    @property
+    def unnamed(self) -> np.ndarray:
+        """Rows whose name is empty or a stringified null ("nan", "None", "<NA>")"""
+        return (self.names.eq("") | self.names.str.lower().isin(NULL_NAMES)).to_numpy()
+
+    @property
+    def blank(self) -> np.ndarray:
+        """Rows without a name and without any limit"""
+        blank = self.usl_na & self.lsl_na & self.target_na
+        if blank.any():
+            # Only rows without limits need their name checked
+            names = self.names[blank]
+            blank[blank] = (names.eq("") | names.str.lower().eq("nan")).to_numpy()
+        return blank
+
+
+@dataclass(frozen=True)
+class SpecRule:
+    code: str
+    severity: str
+    mask: Callable[[SpecColumns], np.ndarray]
+
+
+def _both(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return ~a & ~b
+
+
+def _missing_in_data(cols: SpecColumns) -> np.ndarray:
+    if cols.data_columns is None:
+        return np.zeros(len(cols.names), dtype=bool)
+    return ~cols.names.isin(cols.data_columns).to_numpy()
+
+
+def _duplicate_names(cols: SpecColumns) -> np.ndarray:
+    # Unnamed rows aren't duplicates of each other
+    named = ~cols.unnamed
+    duplicated = np.zeros(len(cols.names), dtype=bool)
+    duplicated[named] = cols.names[named].duplicated(keep="first").to_numpy()
+    return duplicated
+
+
+RULES: Dict[str, SpecRule] = {rule.code: rule for rule in [
+    SpecRule("name_format", ERROR,
+             lambda c: ~c.names.str.match(NAME_PATTERN).fillna(False).to_numpy(dtype=bool)),
+    SpecRule("limits_missing", ERROR, lambda c: c.usl_na & c.lsl_na),
+    SpecRule("usl_not_above_lsl", ERROR, lambda c: _both(c.usl_na, c.lsl_na) & (c.u <= c.l)),
+    SpecRule("usl_equals_lsl", ERROR, lambda c: _both(c.usl_na, c.lsl_na) & (c.u == c.l)),
+    SpecRule("lsl_not_below_target", ERROR, lambda c: _both(c.lsl_na, c.target_na) & (c.l >= c.t)),
+    SpecRule("usl_not_above_target", ERROR, lambda c: _both(c.usl_na, c.target_na) & (c.u <= c.t)),
+    SpecRule("target_equals_usl", WARNING, lambda c: _both(c.target_na, c.usl_na) & (c.t == c.u)),
+    SpecRule("target_equals_lsl", WARNING, lambda c: _both(c.target_na, c.lsl_na) & (c.t == c.l)),
+    SpecRule("duplicate_test_name", WARNING, _duplicate_names),
+    SpecRule("missing_in_data", ERROR, _missing_in_data),
+]}
+
+
+def spec_columns(spec_df: pd.DataFrame, data_columns: Optional[Iterable[Any]] = None) -> SpecColumns:
+    """Arrays for the rules; missing limit columns count as empty"""
+    def numeric(col: str) -> pd.Series:
+        if col not in spec_df.columns:
+            return pd.Series(np.nan, index=spec_df.index, dtype=float)
+        return pd.to_numeric(spec_df[col], errors="coerce")
+
+    if "test_name" in spec_df.columns:
+        names = spec_df["test_name"].astype(str).str.strip()
+    else:
+        names = pd.Series("", index=spec_df.index, dtype=object)
+    usl, lsl, target = numeric("usl"), numeric("lsl"), numeric("target")
+    return SpecColumns(
+        names=names,
+        usl=usl,
+        lsl=lsl,
+        target=target,
+        u=usl.to_numpy(dtype=float, na_value=np.nan),
+        l=lsl.to_numpy(dtype=float, na_value=np.nan),
+        t=target.to_numpy(dtype=float, na_value=np.nan),
+        usl_na=usl.isna().to_numpy(),
+        lsl_na=lsl.isna().to_numpy(),
+        target_na=target.isna().to_numpy(),
+        data_columns=pd.Index([str(c) for c in data_columns]) if data_columns is not None else None,
+    )
+
+
+def validate_spec_frame(spec_df: pd.DataFrame, rules: Sequence[str],
+                        data_columns: Optional[Iterable[Any]] = None,
+                        skip_blank: bool = True, first_row: int = 2) -> pd.DataFrame:
+    """
+    Evaluate ``rules`` (codes from RULES) over every row of ``spec_df``
+
+    Args:
+        spec_df: Frame with test_name, usl, lsl and target columns
+        rules: Rule codes to check, in the order issues of one row are listed
+        data_columns: Data sheet columns, for the missing_in_data rule
+        skip_blank: Ignore rows without a name and without limits
+        first_row: Sheet row number of the first spec row (2 below a header row)
+
+    Returns:
+        Issue table with ISSUE_COLUMNS; usl/lsl/target are the numeric limits
+    """
+    cols = spec_columns(spec_df, data_columns)
+    keep = ~cols.blank if skip_blank else np.ones(len(cols.names), dtype=bool)
+
+    positions, orders = [], []
+    with np.errstate(invalid="ignore"):
+        for order, code in enumerate(rules):
+            hits = np.flatnonzero(RULES[code].mask(cols) & keep)
+            positions.append(hits)
+            orders.append(np.full(len(hits), order))
+    position = np.concatenate(positions) if positions else np.empty(0, dtype=int)
+    order = np.concatenate(orders) if orders else np.empty(0, dtype=int)
+    sort = np.lexsort((order, position))
+    position, order = position[sort], order[sort]
+
+    codes = np.asarray(list(rules), dtype=object)
+    return pd.DataFrame({
+        "position": position,
+        "row": position + first_row,
+        "test_name": cols.names.to_numpy(dtype=object)[position],
+        "rule": codes[order] if len(codes) else np.empty(0, dtype=object),
+        "severity": [RULES[code].severity for code in codes[order]] if len(codes) else [],
+        "usl": cols.usl.iloc[position].to_numpy(),
+        "lsl": cols.lsl.iloc[position].to_numpy(),
+        "target": cols.target.iloc[position].to_numpy(),
+    }, columns=ISSUE_COLUMNS)
+
+
+def issue_summary(issues: pd.DataFrame) -> Dict[str, Any]:
+    """Counts per rule and the affected sheet rows, for logs and API details"""
+    return {
+        "total": int(len(issues)),
+        "by_rule": {rule: int(n) for rule, n in issues["rule"].value_counts(sort=False).items()},
+        "rows": sorted(set(issues["row"].tolist())),
+    }
+
+
+def summarize_failed_rows(row_errors: List[Dict[str, Any]], row_warnings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Errors and warnings grouped by sheet row, each row keyed once in first-seen order"""
+    summary: Dict[Any, Dict[str, Any]] = {}
+    for kind, entries in (("errors", row_errors), ("warnings", row_warnings)):
+        for entry in entries:
+            row_num = entry.get("row", "unknown")
+            if row_num not in summary:
+                summary[row_num] = {
+                    "row": row_num,
+                    "test_name": entry.get("test_name", "unknown"),
+                    "errors": [],
+                    "warnings": []
+                }
+            summary[row_num][kind].append({
+                "issue": entry.get("issue"),
+                "details": entry.get("details", ""),
+                "values": {k: v for k, v in entry.items() if k in ["usl", "lsl", "target"]}
+            })
+    return list(summary.values())
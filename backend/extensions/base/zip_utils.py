@@ -17,10 +17,11 @@ class ZipFileGenerator:
     def create_analysis_zip(
         excel_content: bytes,
         excel_filename: str,
-        csv_content: str,
+        csv_content: Optional[str],
         jsl_content: str,
         analysis_type: str,
-        output_dir: str = "/tmp"
+        output_dir: str = "/tmp",
+        csv_path: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a ZIP file containing original Excel, CSV, and JSL files
@@ -28,10 +29,11 @@ class ZipFileGenerator:
         Args:
             excel_content: Original Excel file content as bytes
             excel_filename: Original Excel filename
-            csv_content: Generated CSV content as string
+            csv_content: Generated CSV content as string (None when csv_path is given)
             jsl_content: Generated JSL content as string
             analysis_type: Type of analysis (e.g., "boxplot", "cpk", "commonality")
             output_dir: Output directory for ZIP file
+            csv_path: Generated CSV file, added without reading it into memory
             
         Returns:
             Dict with ZIP file path and metadata
@@ -49,7 +51,10 @@ class ZipFileGenerator:
                 zipf.writestr(excel_filename, excel_content)
                 
                 # Add generated CSV file
-                zipf.writestr("data.csv", csv_content)
+                if csv_path:
+                    zipf.write(csv_path, "data.csv")
+                else:
+                    zipf.writestr("data.csv", csv_content)
                 
                 # Add generated JSL file
                 zipf.writestr("script.jsl", jsl_content)
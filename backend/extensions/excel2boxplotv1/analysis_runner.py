@@ -19,8 +19,11 @@ logger = logging.getLogger(__name__)
 class AnalysisRunner:
     """Runs analysis using the JMP runner system"""
     
-    def __init__(self, jmp_runner_url: str = "http://10.5.216.11:4700"):
-        self.jmp_runner_url = jmp_runner_url
+    def __init__(self, jmp_runner_url: Optional[str] = None):
+        if jmp_runner_url is None:
+            from app.core.config import settings
+            jmp_runner_url = settings.JMP_RUNNER_URL
+        self.jmp_runner_url = jmp_runner_url.rstrip("/")
         self.project_id: Optional[str] = None
         self.run_id: Optional[str] = None
     
@@ -5,6 +5,7 @@ Generates the actual files (CSV + JSL) and provides a ZIP for download.
 Handles file generation and packaging.
 """
 
+import io
 import pandas as pd
 import numpy as np
 import zipfile
@@ -14,8 +15,48 @@ from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import logging
 
+from ..base.jsl_render import JSLTemplate, JSLWriter
+from ..base.long_csv import write_long_csv
+
 logger = logging.getLogger(__name__)
 
+# Graph Builder box plot of one main level; group/color roles are bound per run
+LEVEL_BLOCK = JSLTemplate('''gb = Graph Builder(
+\tSize( 1080, 768 ),
+\tShow Control Panel( 0 ),
+\tVariables( X( :FAI ), Y( :Data ), {group_x}{color_clause} ),
+\tElements(
+\t\tPoints( X, Y, Legend( 7 ) ),
+\t\tBox Plot( X, Y, Legend( 8 ) ),
+\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Mean" ) ),
+\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Min" ) ),
+\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Median" ) ),
+\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Max" ) ),
+\t\tCaption Box( X, Y, Legend( 13 ), Summary Statistic( "Std Dev" ) )
+\t),
+\tLocal Data Filter(
+\t\tAdd Filter(
+\t\t\tcolumns( :FAI ),
+\t\t\tWhere( :FAI == {{ {y_vars_quoted} }} ),
+\t\t)
+\t),
+\tSendToReport(
+\t\tDispatch({{}}, "Data", ScaleBox,
+\t\t\t{{Format( "Fixed Dec", 12, 4 ),
+\t\t\tMin( {min} ), Max( {max} ), Inc( {inc} ), Minor Ticks( {tick} ){ref_block}
+\t\t}}
+\t\t),
+\t\tDispatch({{}}, "graph title", TextEditBox, {{Set Text( "      {label} vs. Build" )}})
+\t)
+);
+Wait(0.3);
+If( Is Scriptable( gb ),
+\tgb << Set Control Panel( 0 );
+\tWait( 0.2 );
+\tgb << Save Picture( "{label}.png", PNG );
+\tgb << Close Window;
+);''', name="excel2boxplot.graph_builder")
+
 class FileProcessor:
     """Generates CSV and JSL files from processed data"""
     
@@ -60,25 +101,13 @@ class FileProcessor:
             CSV content as string
         """
         try:
-            # Select only the columns we need
-            df_csv = df_data[[cat_var] + fai_columns].copy()
-            
-            # Melt the data to long format
-            stacked = df_csv.melt(
-                id_vars=[cat_var], 
-                value_vars=fai_columns, 
-                var_name="FAI", 
-                value_name="Data"
-            )
-            
-            # Remove rows with NaN values
-            stacked = stacked.dropna()
-            
-            # Generate CSV content
-            csv_content = stacked.to_csv(index=False)
+            # Long format (cat_var, FAI, Data) without NaN values, melted in column batches
+            buffer = io.StringIO()
+            rows = write_long_csv(df_data, cat_var, fai_columns, buffer)
+            csv_content = buffer.getvalue()
             
             self.csv_content = csv_content
-            logger.info(f"Generated CSV with {len(stacked)} rows")
+            logger.info(f"Generated CSV with {rows} rows")
             
             return csv_content
             
@@ -86,6 +115,28 @@ class FileProcessor:
             logger.error(f"Error generating CSV: {str(e)}")
             raise e
     
+    def write_csv(self, df_data: pd.DataFrame, cat_var: str, fai_columns: List[str], csv_path: str) -> int:
+        """
+        Stream the generate_csv content to a file without building it in memory
+        
+        Args:
+            df_data: Processed data DataFrame
+            cat_var: Categorical variable
+            fai_columns: List of FAI columns
+            csv_path: Destination file
+            
+        Returns:
+            Number of data rows written
+        """
+        try:
+            rows = write_long_csv(df_data, cat_var, fai_columns, csv_path)
+            logger.info(f"Wrote CSV with {rows} rows to {csv_path}")
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Error writing CSV: {str(e)}")
+            raise e
+    
     def generate_jsl(self, df_meta: pd.DataFrame, boundaries: Dict[str, Dict[str, Any]], 
                     cat_var: str, color_by: Optional[str] = None) -> str:
         """
@@ -101,12 +152,19 @@ class FileProcessor:
             JSL script content as string
         """
         try:
-            script_rows = []
+            writer = JSLWriter("excel2boxplot")
+            charts = 0
 
             # Default color_by to cat_var if not provided
             if not color_by:
                 color_by = cat_var
             
+            # Group and color clauses are the same for every level
+            block = LEVEL_BLOCK.bind(
+                group_x=f"Group X( :{cat_var} )",
+                color_clause=f", Color( :{color_by} )" if color_by else "",
+            )
+            
             # Group by main_level
             by_main = df_meta.groupby("main_level", dropna=True).first().reset_index()
             total_levels = max(len(by_main), 1)
@@ -137,71 +195,36 @@ class FileProcessor:
                 
                 ref_block = ',\n\t\t\t' + ',\n\t\t\t'.join(ref_lines) if ref_lines else ""
                 
-                # Generate group and color clauses
-                group_x = f"Group X( :{cat_var} )"
-                color_clause = f", Color( :{color_by} )" if color_by else ""
-                
                 # Generate JSL script for this level
-                script_content = f'''
-gb = Graph Builder(
-\tSize( 1080, 768 ),
-\tShow Control Panel( 0 ),
-\tVariables( X( :FAI ), Y( :Data ), {group_x}{color_clause} ),
-\tElements(
-\t\tPoints( X, Y, Legend( 7 ) ),
-\t\tBox Plot( X, Y, Legend( 8 ) ),
-\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Mean" ) ),
-\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Min" ) ),
-\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Median" ) ),
-\t\tCaption Box( X, Y, Legend( 12 ), Summary Statistic( "Max" ) ),
-\t\tCaption Box( X, Y, Legend( 13 ), Summary Statistic( "Std Dev" ) )
-\t),
-\tLocal Data Filter(
-\t\tAdd Filter(
-\t\t\tcolumns( :FAI ),
-\t\t\tWhere( :FAI == {{ {y_vars_quoted} }} ),
-\t\t)
-\t),
-\tSendToReport(
-\t\tDispatch({{}}, "Data", ScaleBox,
-\t\t\t{{Format( "Fixed Dec", 12, 4 ),
-\t\t\tMin( {params["min"]} ), Max( {params["max"]} ), Inc( {params["inc"]} ), Minor Ticks( {params["tick"]} ){ref_block}
-\t\t}}
-\t\t),
-\t\tDispatch({{}}, "graph title", TextEditBox, {{Set Text( "      {label} vs. Build" )}})
-\t)
-);
-Wait(0.3);
-If( Is Scriptable( gb ),
-\tgb << Set Control Panel( 0 );
-\tWait( 0.2 );
-\tgb << Save Picture( "{label}.png", PNG );
-\tgb << Close Window;
-);
-'''.strip()
-                
-                script_rows.append(script_content)
+                writer.add(block.render(
+                    label=label, y_vars_quoted=y_vars_quoted, ref_block=ref_block,
+                    min=params["min"], max=params["max"], inc=params["inc"], tick=params["tick"]
+                ), f"{label}.png")
+                charts += 1
                 logger.info(f"Generated JSL for level: {label}")
             
-            jsl_content = "\n\n".join(script_rows) if script_rows else "// No charts generated"
+            if not charts:
+                writer.add("// No charts generated")
+            jsl_content = writer.finish()
             self.jsl_content = jsl_content
             
-            logger.info(f"Generated JSL with {len(script_rows)} chart scripts")
+            logger.info(f"Generated JSL with {charts} chart scripts")
             return jsl_content
             
         except Exception as e:
             logger.error(f"Error generating JSL: {str(e)}")
             raise e
     
-    def create_zip_file(self, csv_content: str, jsl_content: str, 
-                       output_dir: str = "/tmp") -> str:
+    def create_zip_file(self, csv_content: Optional[str], jsl_content: str, 
+                       output_dir: str = "/tmp", csv_path: Optional[str] = None) -> str:
         """
         Create ZIP file with CSV and JSL content
         
         Args:
-            csv_content: CSV content
+            csv_content: CSV content (None when csv_path is given)
             jsl_content: JSL content
             output_dir: Output directory for ZIP file
+            csv_path: CSV file to add instead of csv_content
             
         Returns:
             Path to created ZIP file
@@ -213,7 +236,10 @@ If( Is Scriptable( gb ),
             
             with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                 # Add CSV file
-                zipf.writestr("data.csv", csv_content)
+                if csv_path:
+                    zipf.write(csv_path, "data.csv")
+                else:
+                    zipf.writestr("data.csv", csv_content)
                 
                 # Add JSL file
                 zipf.writestr("script.jsl", jsl_content)
@@ -255,7 +281,7 @@ The JSL script will generate boxplot charts for each main level in your data.
     def generate_files(self, df_meta: pd.DataFrame, df_data: pd.DataFrame, 
                       boundaries: Dict[str, Dict[str, Any]], cat_var: str, 
                       fai_columns: List[str], color_by: Optional[str] = None,
-                      output_dir: str = "/tmp") -> Dict[str, Any]:
+                      output_dir: str = "/tmp", csv_path: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate all files (CSV, JSL, ZIP)
         
@@ -267,34 +293,45 @@ The JSL script will generate boxplot charts for each main level in your data.
             fai_columns: List of FAI columns
             color_by: Optional color variable
             output_dir: Output directory
+            csv_path: Write the CSV to this file instead of returning its content
             
         Returns:
             Dict with file generation results
         """
         try:
             # Generate CSV
-            csv_content = self.generate_csv(df_data, cat_var, fai_columns)
+            csv_content = None
+            if csv_path:
+                csv_rows = self.write_csv(df_data, cat_var, fai_columns, csv_path)
+            else:
+                csv_content = self.generate_csv(df_data, cat_var, fai_columns)
+                csv_rows = csv_content.count('\n') - 1  # Subtract header
             
             # Generate JSL
             jsl_content = self.generate_jsl(df_meta, boundaries, cat_var, color_by)
             
             # Create ZIP file
-            zip_path = self.create_zip_file(csv_content, jsl_content, output_dir)
+            zip_path = self.create_zip_file(csv_content, jsl_content, output_dir, csv_path=csv_path)
             
             # Get file sizes
             zip_size = os.path.getsize(zip_path)
             
+            files = {
+                "jsl_content": jsl_content,
+                "zip_path": zip_path,
+                "zip_size": zip_size
+            }
+            if csv_path:
+                files["csv_path"] = csv_path
+            else:
+                files["csv_content"] = csv_content
+            
             return {
                 "success": True,
                 "message": "Files generated successfully",
-                "files": {
-                    "csv_content": csv_content,
-                    "jsl_content": jsl_content,
-                    "zip_path": zip_path,
-                    "zip_size": zip_size
-                },
+                "files": files,
                 "details": {
-                    "csv_rows": len(csv_content.split('\n')) - 1,  # Subtract header
+                    "csv_rows": csv_rows,
                     "jsl_length": len(jsl_content),
                     "zip_size_mb": round(zip_size / (1024 * 1024), 2)
                 }
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Request
 from fastapi.responses import JSONResponse
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import tempfile
 import os
+import shutil
 import logging
 import httpx
 import pandas as pd
@@ -18,9 +19,10 @@ from .file_processor import FileProcessor
 from .analysis_runner import AnalysisRunner
 from app.core.storage import local_storage
 from ..base.zip_utils import ZipFileGenerator
+from ..base.executor import cpu_bound
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
-from app.models import ProjectAttachment, AppUser
+from app.models import AppUser
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -30,7 +32,6 @@ router = APIRouter(prefix="/excel2boxplotv2", tags=["excel2boxplotv2"])
 
 # Initialize processors
 try:
-    file_handler = FileHandlerV2()
     validator = DataValidator()
     data_processor = DataProcessor()
     file_processor = FileProcessor()
@@ -41,77 +42,115 @@ except Exception as e:
     raise e
 
 
-@router.post("/load-file")
-async def load_excel_file(file: UploadFile = File(...)):
+def _load(path: str) -> FileHandlerV2:
+    """A handler per job: FileHandlerV2 keeps the loaded workbook on the instance"""
+    handler = FileHandlerV2()
+    handler.load_result = handler.load_excel_file(path)
+    return handler
+
+
+@cpu_bound("excel2boxplotv2")
+def _load_file(path: str) -> Dict[str, Any]:
+    return _load(path).load_result
+
+
+@cpu_bound("excel2boxplotv2")
+def _set_categorical(path: str, cat_var: str) -> Dict[str, Any]:
+    handler = _load(path)
+    if not handler.load_result.get("success"):
+        return handler.load_result
+    return handler.set_categorical_variable(cat_var)
+
+
+@cpu_bound("excel2boxplotv2")
+def _validate(path: str, cat_var: str) -> Dict[str, Any]:
+    handler = _load(path)
+    if not handler.load_result.get("success"):
+        return handler.load_result
+    return validator.run_full_validation(handler.df_meta, handler.df_data_raw, cat_var)
+
+
+@cpu_bound("excel2boxplotv2")
+def _process(path: str, cat_var: str) -> Dict[str, Any]:
+    handler = _load(path)
+    if not handler.load_result.get("success"):
+        return handler.load_result
+    result = data_processor.process_data(handler.df_meta, handler.df_data_raw, handler.fai_columns, cat_var)
+    if result.get("success"):
+        result.pop("processed_data", None)
+    return result
+
+
+@cpu_bound("excel2boxplotv2")
+def _generate(path: str, cat_var: str, color_by: Optional[str] = None,
+              csv_path: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Load, process and generate CSV/JSL; returns the last stage reached and its result"""
+    handler = _load(path)
+    if not handler.load_result.get("success"):
+        return "load_file", handler.load_result
+    process_result = data_processor.process_data(handler.df_meta, handler.df_data_raw, handler.fai_columns, cat_var)
+    if not process_result.get("success"):
+        return "process_data", process_result
+    return "generate_files", file_processor.generate_files(
+        handler.df_meta,
+        process_result["processed_data"],
+        process_result["boundaries"],
+        cat_var,
+        handler.fai_columns,
+        color_by,
+        csv_path=csv_path,
+    )
+
+
+async def _with_upload(file: UploadFile, job, *args, request: Optional[Request] = None):
+    """Run ``job`` on the upload saved to a temp file"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
+        tmp_file.write(await file.read())
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            result = file_handler.load_excel_file(tmp_file.name)
+        return await job(tmp_file.name, *args, request=request)
+    finally:
         os.unlink(tmp_file.name)
-        return result
+
+
+@router.post("/load-file")
+async def load_excel_file(request: Request, file: UploadFile = File(...)):
+    try:
+        return await _with_upload(file, _load_file, request=request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error loading Excel: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
 
 
 @router.post("/set-categorical")
-async def set_categorical_variable(file: UploadFile = File(...), cat_var: str = Form(...)):
+async def set_categorical_variable(request: Request, file: UploadFile = File(...), cat_var: str = Form(...)):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            load_result = file_handler.load_excel_file(tmp_file.name)
-            if not load_result.get("success"):
-                return load_result
-            result = file_handler.set_categorical_variable(cat_var)
-        os.unlink(tmp_file.name)
-        return result
+        return await _with_upload(file, _set_categorical, cat_var, request=request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error setting categorical: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
 
 
 @router.post("/validate-data")
-async def validate_data_modular(file: UploadFile = File(...), cat_var: str = Form(...)):
+async def validate_data_modular(request: Request, file: UploadFile = File(...), cat_var: str = Form(...)):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            load_result = file_handler.load_excel_file(tmp_file.name)
-            if not load_result.get("success"):
-                return load_result
-            df_meta = file_handler.df_meta
-            df_data = file_handler.df_data_raw
-            result = validator.run_full_validation(df_meta, df_data, cat_var)
-        os.unlink(tmp_file.name)
-        return result
+        return await _with_upload(file, _validate, cat_var, request=request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error validating data: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
 
 
 @router.post("/process-data")
-async def process_data_modular(file: UploadFile = File(...), cat_var: str = Form(...)):
+async def process_data_modular(request: Request, file: UploadFile = File(...), cat_var: str = Form(...)):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            load_result = file_handler.load_excel_file(tmp_file.name)
-            if not load_result.get("success"):
-                return load_result
-            df_meta = file_handler.df_meta
-            df_data = file_handler.df_data_raw
-            fai_columns = file_handler.fai_columns
-            result = data_processor.process_data(df_meta, df_data, fai_columns, cat_var)
-            if result.get("success"):
-                result.pop("processed_data", None)
-        os.unlink(tmp_file.name)
-        return result
+        return await _with_upload(file, _process, cat_var, request=request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error processing data: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
@@ -119,34 +158,16 @@ async def process_data_modular(file: UploadFile = File(...), cat_var: str = Form
 
 @router.post("/generate-files")
 async def generate_files_modular(
+    request: Request,
     file: UploadFile = File(...),
     cat_var: str = Form(...),
     color_by: str = Form(None),
 ):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            load_result = file_handler.load_excel_file(tmp_file.name)
-            if not load_result.get("success"):
-                return load_result
-            df_meta = file_handler.df_meta
-            df_data = file_handler.df_data_raw
-            fai_columns = file_handler.fai_columns
-            process_result = data_processor.process_data(df_meta, df_data, fai_columns, cat_var)
-            if not process_result.get("success"):
-                return process_result
-            result = file_processor.generate_files(
-                df_meta,
-                process_result["processed_data"],
-                process_result["boundaries"],
-                cat_var,
-                fai_columns,
-                color_by,
-            )
-        os.unlink(tmp_file.name)
+        _, result = await _with_upload(file, _generate, cat_var, color_by, request=request)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error generating files: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
@@ -154,6 +175,7 @@ async def generate_files_modular(
 
 @router.post("/run-analysis")
 async def run_analysis_modular(
+    request: Request,
     file: UploadFile = File(...),
     cat_var: str = Form(...),
     project_id: str = Form(...),
@@ -172,6 +194,7 @@ async def run_analysis_modular(
         # Use direct Celery call instead of HTTP to ensure proper queueing
         stage = "create_run"
         from app.core.celery import celery_app
+        from app.core.tracing import celery_headers
         from app.core.database import AsyncSessionLocal
         from app.core.websocket import publish_run_update
         from app.models import Run, RunStatus, Artifact, ProjectAttachment
@@ -233,38 +256,6 @@ async def run_analysis_modular(
                 create_db.add(excel_artifact)
                 await create_db.commit()
                 
-                # STEP 4: Process Excel file from run folder
-                stage = "load_file"
-                load_result = file_handler.load_excel_file(str(excel_storage_path))
-                if not load_result.get("success"):
-                    return JSONResponse(status_code=400, content={"success": False, "error": load_result.get("error", "Load failed"), "stage": stage, "details": load_result})
-                
-                df_meta = file_handler.df_meta
-                df_data = file_handler.df_data_raw
-                fai_columns = file_handler.fai_columns
-                
-                stage = "process_data"
-                process_result = data_processor.process_data(df_meta, df_data, fai_columns, cat_var)
-                if not process_result.get("success"):
-                    return JSONResponse(status_code=400, content={"success": False, "error": process_result.get("error", "Process failed"), "stage": stage, "details": process_result})
-                
-                stage = "generate_files"
-                file_result = file_processor.generate_files(
-                    df_meta,
-                    process_result["processed_data"],
-                    process_result["boundaries"],
-                    cat_var,
-                    fai_columns,
-                    color_by,
-                )
-                if not file_result.get("success"):
-                    return JSONResponse(status_code=400, content={"success": False, "error": file_result.get("error", "File generation failed"), "stage": stage, "details": file_result})
-                
-                # STEP 5: Save processed files (CSV, JSL) directly to run folder
-                stage = "persist_files"
-                csv_bytes = file_result["files"]["csv_content"].encode("utf-8")
-                jsl_bytes = file_result["files"]["jsl_content"].encode("utf-8")
-                
                 ts_files = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
                 short_uid = str(uuid.uuid4())[:8]
                 csv_filename = f"data_{ts_files}_{short_uid}.csv"
@@ -275,7 +266,18 @@ async def run_analysis_modular(
                 csv_storage_path = local_storage.get_file_path(csv_storage_key)
                 jsl_storage_path = local_storage.get_file_path(jsl_storage_key)
                 
-                csv_storage_path.write_bytes(csv_bytes)
+                # STEP 4: Process Excel file from run folder; the CSV is streamed into the run folder
+                stage, file_result = await _generate(
+                    str(excel_storage_path), cat_var, color_by, str(csv_storage_path), request=request
+                )
+                if not file_result.get("success"):
+                    csv_storage_path.unlink(missing_ok=True)
+                    default_error = {"load_file": "Load failed", "process_data": "Process failed"}.get(stage, "File generation failed")
+                    return JSONResponse(status_code=400, content={"success": False, "error": file_result.get("error", default_error), "stage": stage, "details": file_result})
+                
+                # STEP 5: Save the JSL next to the CSV in the run folder
+                stage = "persist_files"
+                jsl_bytes = file_result["files"]["jsl_content"].encode("utf-8")
                 jsl_storage_path.write_bytes(jsl_bytes)
                 
                 # CRITICAL: Set JSL file permissions to prevent macOS auto-opening
@@ -290,9 +292,10 @@ async def run_analysis_modular(
                 zip_result = ZipFileGenerator.create_analysis_zip(
                     excel_content=content,
                     excel_filename=file.filename,
-                    csv_content=file_result["files"]["csv_content"],
+                    csv_content=None,
                     jsl_content=file_result["files"]["jsl_content"],
-                    analysis_type="boxplot"
+                    analysis_type="boxplot",
+                    csv_path=str(csv_storage_path)
                 )
                 
                 zip_key = None
@@ -360,7 +363,7 @@ async def run_analysis_modular(
                 jsl_dst = task_dir / jsl_storage_path.name
                 
                 # Copy CSV file as-is
-                csv_dst.write_bytes(csv_storage_path.read_bytes())
+                shutil.copyfile(csv_storage_path, csv_dst)
                 
                 # Read JSL file and ensure header Open() points to absolute CSV path in task folder
                 jsl_content = jsl_storage_path.read_text(encoding='utf-8')
@@ -414,7 +417,7 @@ Open("{absolute_csv_path}");
                 
                 # STEP 8: Queue Celery task directly (only after task folder is prepared)
                 logger.info(f"[V2] Queuing Celery task 'run_jmp_boxplot' for run {run.id}")
-                celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                 
                 # Publish initial status
                 await publish_run_update(str(run.id), {
@@ -437,6 +440,8 @@ Open("{absolute_csv_path}");
                     "jmp_task_id": run.jmp_task_id
                 }
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 last_error = str(e)
                 logger.error(f"[V2] Failed to create run directly: {e}", exc_info=True)
@@ -482,6 +487,8 @@ Open("{absolute_csv_path}");
             "storage": {"csv_key": csv_storage_key, "jsl_key": jsl_storage_key, "zip_key": zip_key},
             "zip_info": zip_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[V2] Error running analysis: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e), "stage": locals().get("stage", "unknown")})
@@ -14,8 +14,13 @@ import numpy as np
 from typing import Dict, List, Any
 import logging
 
+from ..base.spec_validation import issue_summary, validate_spec_frame
+
 logger = logging.getLogger(__name__)
 
+# Limit checks shared with the CPK validator (extensions/base/spec_validation.py)
+SPEC_RULES = ["usl_not_above_lsl", "lsl_not_below_target", "usl_not_above_target", "duplicate_test_name"]
+
 
 class DataValidator:
     """Validates Excel data structure and content (V2)"""
@@ -171,6 +176,15 @@ class DataValidator:
                 }
             })
 
+        # Contradicting limits and repeated test names, checked over the whole meta sheet
+        spec_issues = validate_spec_frame(df_meta, SPEC_RULES)
+        if len(spec_issues):
+            warnings.append({
+                "type": "spec_limit_issues",
+                "message": f"Found {len(spec_issues)} spec limit issues in meta sheet",
+                "details": issue_summary(spec_issues)
+            })
+
         # V2 categorical variable preference: 'Stage'
         preferred_cat = "Stage"
         if cat_var not in df_data.columns:
@@ -378,6 +378,7 @@ async def run_analysis(
             # Use direct Celery call instead of HTTP to ensure proper queueing
             stage = "create_run"
             from app.core.celery import celery_app
+            from app.core.tracing import celery_headers
             from app.core.database import AsyncSessionLocal
             from app.core.websocket import publish_run_update
             from app.models import Run, RunStatus, Artifact
@@ -577,7 +578,7 @@ Open("{absolute_csv_path}");
                     
                     # STEP 6: Queue Celery task directly (only after task folder is prepared)
                     logger.info(f"[Commonality-Generic] Queuing Celery task 'run_jmp_boxplot' for run {run.id}")
-                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                     
                     # Publish initial status
                     await publish_run_update(str(run.id), {
@@ -14,9 +14,60 @@ from typing import Dict, List, Any, Tuple, Optional
 from pathlib import Path
 import logging
 from .analyzer_meta import MetaAnalyzer
+from ..base.jsl_render import JSLTemplate, JSLWriter
 
 logger = logging.getLogger(__name__)
 
+# Graph Builder chart of one FAI against the five fixture/time columns
+COMMONALITY_BLOCK = JSLTemplate("""//!  Start of {fai}                           // auto-run flag
+gb = Graph Builder(
+    Size( 1080, 768 ),
+    Show Control Panel( 0 ),
+    Variables(
+        X( :测试时间 ),
+        X( :EGL铆接治具号 ),
+        X( :EGL焊接治具号 ),
+        X( :镍片放料工位 ),
+        X( :AFMT治具 ),
+        Y( :{fai} )
+    ),
+    Elements( Position( 1, 1 ), Points( X, Y, Legend( 64 ) ) ),
+    Elements(
+        Position( 2, 1 ),
+        Points( X, Y, Legend( 32 ) ),
+        Smoother( X, Y, Legend( 33 ) ),
+        Box Plot( X, Y, Legend( 34 ) )
+    ),
+    Elements(
+        Position( 3, 1 ),
+        Points( X, Y, Legend( 37 ) ),
+        Smoother( X, Y, Legend( 38 ) ),
+        Box Plot( X, Y, Legend( 39 ) )
+    ),
+    Elements(
+        Position( 4, 1 ),
+        Points( X, Y, Legend( 48 ) ),
+        Smoother( X, Y, Legend( 49 ) ),
+        Box Plot( X, Y, Legend( 50 ) )
+    ),
+    Elements(
+        Position( 5, 1 ),
+        Points( X, Y, Legend( 61 ) ),
+        Smoother( X, Y, Legend( 62 ) ),
+        Box Plot( X, Y, Legend( 63 ) )
+    )
+);
+Wait(0.3);
+If( Is Scriptable( gb ),
+    gb << Set Control Panel( 0 );
+    Wait( 0.2 );
+    gb << Save Picture( "{fai}.png", PNG  );
+    gb << Close Window;
+);
+//!  End of {fai}
+""", name="excel2commonality.graph_builder")
+
+
 class CommonalityAnalyzer:
     """Analyzer for Commonality analysis"""
     
@@ -142,57 +193,10 @@ Try( dt:{cat_var} << Set Data Type("{data_type}"); dt:{cat_var} << Set Modeling
     def generate_jsl(self, fai_columns: List[str], csv_filename: str, 
                     variable_data_type: Optional[str] = None, cat_var: Optional[str] = None) -> str:
         """Generate JSL script for all FAI columns."""
-        blocks = []
+        writer = JSLWriter("excel2commonality")
         for fai in fai_columns:
-            block = f"""//!  Start of {fai}                           // auto-run flag
-gb = Graph Builder(
-    Size( 1080, 768 ),
-    Show Control Panel( 0 ),
-    Variables(
-        X( :测试时间 ),
-        X( :EGL铆接治具号 ),
-        X( :EGL焊接治具号 ),
-        X( :镍片放料工位 ),
-        X( :AFMT治具 ),
-        Y( :{fai} )
-    ),
-    Elements( Position( 1, 1 ), Points( X, Y, Legend( 64 ) ) ),
-    Elements(
-        Position( 2, 1 ),
-        Points( X, Y, Legend( 32 ) ),
-        Smoother( X, Y, Legend( 33 ) ),
-        Box Plot( X, Y, Legend( 34 ) )
-    ),
-    Elements(
-        Position( 3, 1 ),
-        Points( X, Y, Legend( 37 ) ),
-        Smoother( X, Y, Legend( 38 ) ),
-        Box Plot( X, Y, Legend( 39 ) )
-    ),
-    Elements(
-        Position( 4, 1 ),
-        Points( X, Y, Legend( 48 ) ),
-        Smoother( X, Y, Legend( 49 ) ),
-        Box Plot( X, Y, Legend( 50 ) )
-    ),
-    Elements(
-        Position( 5, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) )
-    )
-);
-Wait(0.3);
-If( Is Scriptable( gb ),
-    gb << Set Control Panel( 0 );
-    Wait( 0.2 );
-    gb << Save Picture( "{fai}.png", PNG  );
-    gb << Close Window;
-);
-//!  End of {fai}
-"""
-            blocks.append(block)
-        return "\n\n".join(blocks)
+            writer.add(COMMONALITY_BLOCK.render(fai=fai), f"{fai}.png")
+        return writer.finish()
     
     def validate_excel_structure(self, file_path: str) -> Dict[str, Any]:
         """
@@ -334,10 +338,12 @@ If( Is Scriptable( gb ),
                 meta_analyzer = MetaAnalyzer()
                 meta_result = meta_analyzer.analyze_with_meta(file_path, data_sheet, engine)
                 jsl_content = meta_result["jsl_content"]
+                spec_issues = meta_result["spec_issues"]
                 analysis_mode = "meta"
             else:
                 logger.info("Using standard analyzer for JSL generation")
                 jsl_content = self.generate_jsl(fai_cols, csv_filename, variable_data_type=variable_data_type, cat_var=cat_var)
+                spec_issues = None
                 analysis_mode = "standard"
             
             # 9) Add data type/modeling type header if needed (for both meta and standard modes)
@@ -357,6 +363,7 @@ If( Is Scriptable( gb ),
                 "data_sheet": data_sheet,
                 "has_meta_sheet": has_meta_sheet,
                 "analysis_mode": analysis_mode,
+                "spec_issues": spec_issues,
                 "fai_columns_found": len(fai_cols),
                 "fai_columns": fai_cols,
                 "csv_content": df.to_csv(index=False, encoding="utf-8-sig"),
@@ -9,8 +9,76 @@ import os
 from typing import Dict, List, Any
 import logging
 
+from ..base.jsl_render import JSLTemplate, JSLWriter
+from ..base.spec_validation import issue_summary, validate_spec_frame
+
 logger = logging.getLogger(__name__)
 
+# Meta rows whose ref lines would be misleading, or that name no FAI column of the data
+SPEC_RULES = ["usl_not_above_lsl", "lsl_not_below_target", "usl_not_above_target",
+              "duplicate_test_name", "missing_in_data"]
+
+# Graph Builder chart of one FAI with its axis range and, when the meta sheet has them, spec ref lines
+META_BLOCK = JSLTemplate("""// Block for {fai}
+gb = Graph Builder(
+    Size( 1151, 832 ),
+    Show Control Panel( 0 ),
+    Variables(
+        X( :测试时间 ),
+        X( :EGL铆接治具号 ),
+        X( :EGL焊接治具号 ),
+        X( :镍片放料工位 ),
+        X( :AFMT治具 ),
+        Y( :{fai} )
+    ),
+    Elements( Position( 1, 1 ), Points( X, Y, Legend( 64 ) ) ),
+    Elements(
+        Position( 2, 1 ),
+        Points( X, Y, Legend( 32 ) ),
+        Smoother( X, Y, Legend( 33 ) ),
+        Box Plot( X, Y, Legend( 34 ) )
+    ),
+    Elements(
+        Position( 3, 1 ),
+        Points( X, Y, Legend( 37 ) ),
+        Smoother( X, Y, Legend( 38 ) ),
+        Box Plot( X, Y, Legend( 39 ) )
+    ),
+    Elements(
+        Position( 4, 1 ),
+        Points( X, Y, Legend( 48 ) ),
+        Smoother( X, Y, Legend( 49 ) ),
+        Box Plot( X, Y, Legend( 50 ) )
+    ),
+    Elements(
+        Position( 5, 1 ),
+        Points( X, Y, Legend( 61 ) ),
+        Smoother( X, Y, Legend( 62 ) ),
+        Box Plot( X, Y, Legend( 63 ) ),
+        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Mean" ) ),
+        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Min" ) ),
+        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Median" ) ),
+        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Max" ) ),
+        Caption Box( X, Y, Legend( 13 ), Summary Statistic( "Std Dev" ) )
+    ),
+    SendToReport(
+        Dispatch(
+            {{}}, "{fai}", ScaleBox,
+            {{Format( "Fixed Dec", 12, 4 ),
+            Min( {new_min:.4f} ), Max( {new_max:.4f} ){ref_lines}
+            }}
+        ),
+    )
+);
+Wait(0.3);
+If( Is Scriptable( gb ),
+    gb << Set Control Panel( 0 );
+    Wait( 0.2 );
+    gb << Save Picture( "{fai}.png", PNG  );
+    gb << Close Window;
+);
+""", name="excel2commonality.meta_graph_builder")
+
 
 class MetaAnalyzer:
     """Analyze Excel files with meta sheet and generate JSL scripts with specifications"""
@@ -57,32 +125,45 @@ class MetaAnalyzer:
         """
         Generate JSL with limits and reference lines using meta specs.
         """
-        df_data = self.data_df.copy()
+        df_data = self.data_df
         df_meta = self.meta_df.copy()
         fai_cols = [c for c in df_data.columns if "FAI" in str(c)]
 
-        all_jsl_blocks = []
-        df_meta[["data_min", "data_max", "final_min", "final_max"]] = np.nan
+        # Spec problems over the whole meta sheet; the charts are still drawn as before
+        spec_issues = issue_summary(validate_spec_frame(df_meta, SPEC_RULES, data_columns=fai_cols))
+        if spec_issues["total"]:
+            logger.warning(f"[Commonality] Meta sheet spec issues: {spec_issues['by_rule']}")
+
+        range_cols = ["data_min", "data_max", "final_min", "final_max"]
+        df_meta[range_cols] = np.nan
+        ranges: Dict[Any, tuple] = {}
 
+        # Data range of every FAI column in one pass
+        values = df_data[fai_cols].apply(pd.to_numeric, errors="coerce")
+        counts, mins, maxs = values.count(), values.min(), values.max()
+        # First meta row of each test_name
+        first = df_meta.drop_duplicates("test_name")
+        specs = dict(zip(first["test_name"], zip(first["target"], first["usl"], first["lsl"])))
+
+        writer = JSLWriter()
         for fai in fai_cols:
             # Check if this FAI has meta specifications
-            row = df_meta[df_meta["test_name"] == fai]
-            has_meta_specs = not row.empty
+            spec = specs.get(fai)
+            has_meta_specs = spec is not None
             
-            # Get data for scaling
-            g = pd.to_numeric(df_data[fai], errors="coerce").dropna()
-            if g.empty:
+            # Skip FAIs without numeric data
+            if not counts[fai]:
                 continue
 
             # 1️⃣ Data range
-            group_min = np.nanmin(g.values)
-            group_max = np.nanmax(g.values)
+            group_min = mins[fai]
+            group_max = maxs[fai]
 
             if has_meta_specs:
                 try:
-                    target = float(row["target"].values[0])
-                    usl = float(row["usl"].values[0])
-                    lsl = float(row["lsl"].values[0])
+                    target = float(spec[0])
+                    usl = float(spec[1])
+                    lsl = float(spec[2])
                     
                     # 2️⃣ Combine data/spec ranges
                     final_min = min(group_min, lsl)
@@ -96,10 +177,8 @@ class MetaAnalyzer:
                     new_min = final_min - margin
                     new_max = final_max + margin
                     
-                    # Update meta table
-                    df_meta.loc[df_meta["test_name"] == fai, ["data_min", "data_max", "final_min", "final_max"]] = [
-                        group_min, group_max, new_min, new_max
-                    ]
+                    # Meta table columns, filled in after the loop
+                    ranges[fai] = (group_min, group_max, new_min, new_max)
                     
                     # Generate JSL with reference lines
                     ref_lines = f"""            Add Ref Line( {lsl:.4f}, "Solid", "Dark Blue", "LSL {lsl:.4f}", 1 ),
@@ -120,74 +199,22 @@ class MetaAnalyzer:
                 ref_lines = ""
 
             # 4️⃣ JSL generation block
-            jsl = f"""// Block for {fai}
-gb = Graph Builder(
-    Size( 1151, 832 ),
-    Show Control Panel( 0 ),
-    Variables(
-        X( :测试时间 ),
-        X( :EGL铆接治具号 ),
-        X( :EGL焊接治具号 ),
-        X( :镍片放料工位 ),
-        X( :AFMT治具 ),
-        Y( :{fai} )
-    ),
-    Elements( Position( 1, 1 ), Points( X, Y, Legend( 64 ) ) ),
-    Elements(
-        Position( 2, 1 ),
-        Points( X, Y, Legend( 32 ) ),
-        Smoother( X, Y, Legend( 33 ) ),
-        Box Plot( X, Y, Legend( 34 ) )
-    ),
-    Elements(
-        Position( 3, 1 ),
-        Points( X, Y, Legend( 37 ) ),
-        Smoother( X, Y, Legend( 38 ) ),
-        Box Plot( X, Y, Legend( 39 ) )
-    ),
-    Elements(
-        Position( 4, 1 ),
-        Points( X, Y, Legend( 48 ) ),
-        Smoother( X, Y, Legend( 49 ) ),
-        Box Plot( X, Y, Legend( 50 ) )
-    ),
-    Elements(
-        Position( 5, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) ),
-        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Mean" ) ),
-        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Min" ) ),
-        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Median" ) ),
-        Caption Box( X, Y, Legend( 12 ), Summary Statistic( "Max" ) ),
-        Caption Box( X, Y, Legend( 13 ), Summary Statistic( "Std Dev" ) )
-    ),
-    SendToReport(
-        Dispatch(
-            {{}}, "{fai}", ScaleBox,
-            {{Format( "Fixed Dec", 12, 4 ),
-            Min( {new_min:.4f} ), Max( {new_max:.4f} ){"," + ref_lines if ref_lines else ""}
-            }}
-        ),
-    )
-);
-Wait(0.3);
-If( Is Scriptable( gb ),
-    gb << Set Control Panel( 0 );
-    Wait( 0.2 );
-    gb << Save Picture( "{fai}.png", PNG  );
-    gb << Close Window;
-);
-"""
-            all_jsl_blocks.append(jsl)
+            writer.add(META_BLOCK.render(
+                fai=fai, new_min=new_min, new_max=new_max, ref_lines="," + ref_lines if ref_lines else ""
+            ))
+
+        # Update meta table
+        for i, col in enumerate(range_cols):
+            df_meta[col] = df_meta["test_name"].map({fai: r[i] for fai, r in ranges.items()}).astype(float)
 
         # Return JSL content and metadata
-        jsl_content = "\n\n".join(all_jsl_blocks)
+        jsl_content = writer.finish()
         
         return {
             "jsl_content": jsl_content,
             "meta_df": df_meta,
             "fai_columns": fai_cols,
+            "spec_issues": spec_issues,
             "mode": "meta"
         }
 
@@ -204,6 +204,7 @@ class ExcelToCommonalityProcessor:
                     "data_sheet": analysis_result["data_sheet"],
                     "fai_columns_found": analysis_result["fai_columns_found"],
                     "fai_columns": analysis_result["fai_columns"],
+                    "spec_issues": analysis_result.get("spec_issues"),
                     "timestamp": analysis_result["timestamp"]
                 }
             }
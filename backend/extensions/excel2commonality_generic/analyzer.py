@@ -14,6 +14,8 @@ from typing import Dict, List, Any, Tuple, Optional
 from pathlib import Path
 import logging
 from .analyzer_meta import MetaAnalyzer
+from ..base.jsl_render import JSLWriter
+from . import jsl_blocks
 
 logger = logging.getLogger(__name__)
 
@@ -145,139 +147,18 @@ class CommonalityGenericAnalyzer:
             color_by_variable: Optional variable name to use for coloring
             caption_boxes_enabled: Optional dict mapping variable names to boolean (enable caption boxes)
         """
-        blocks = []
-        
-        # Generate X variables string from categorical columns
-        x_vars = ",\n        ".join([f"X( :{col} )" for col in categorical_columns])
-        
-        # Generate color variable string if color_by_variable is set
-        color_var_str = ""
         if color_by_variable and color_by_variable in categorical_columns:
-            color_var_str = f",\n        Color( :{color_by_variable} )"
             logger.info(f"[Commonality-Generic] Using color by variable: {color_by_variable}")
         
-        # Helper function to generate caption boxes string
-        def generate_caption_boxes() -> str:
-            """Generate caption boxes JSL code with Location and X Position"""
-            return """        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Mean" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Min" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Median" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Max" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 13 ),
-            Summary Statistic( "Std Dev" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        )"""
-        
+        # Layout shared by every chart; only the FAI changes per block
+        block = jsl_blocks.bind_layout(
+            jsl_blocks.GRAPH_BLOCK, categorical_columns, color_by_variable,
+            caption_boxes_enabled, graph_width, graph_height
+        )
+        writer = JSLWriter("excel2commonality-generic")
         for fai in fai_columns:
-            # Calculate number of positions based on categorical columns
-            num_positions = len(categorical_columns)
-            
-            # Generate Elements blocks for each categorical variable
-            elements_blocks = []
-            for pos_idx, cat_col in enumerate(categorical_columns, start=1):
-                has_caption_boxes = caption_boxes_enabled and caption_boxes_enabled.get(cat_col, False)
-                
-                if pos_idx == 1:
-                    # First position: points, optionally with caption boxes
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 64 ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements( Position( {pos_idx}, 1 ), Points( X, Y, Legend( 64 ) ) )""")
-                elif pos_idx == num_positions:
-                    # Last position: points, smoother, box plot, and optionally caption boxes
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) )
-    )""")
-                else:
-                    # Middle positions: points, smoother, box plot, and optionally caption boxes
-                    legend_base = 30 + (pos_idx - 1) * 5
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( {legend_base + 2} ) ),
-        Smoother( X, Y, Legend( {legend_base + 3} ) ),
-        Box Plot( X, Y, Legend( {legend_base + 4} ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( {legend_base + 2} ) ),
-        Smoother( X, Y, Legend( {legend_base + 3} ) ),
-        Box Plot( X, Y, Legend( {legend_base + 4} ) )
-    )""")
-            
-            elements_str = ",\n".join(elements_blocks)
-            
-            block = f"""//!  Start of {fai}                           // auto-run flag
-gb = Graph Builder(
-    Size( {graph_width}, {graph_height} ),
-    Show Control Panel( 0 ),
-    Variables(
-        {x_vars},
-        Y( :{fai} ){color_var_str}
-    ),
-    {elements_str}
-);
-Wait(0.1);
-If( Is Scriptable( gb ),
-    gb << Set Control Panel( 0 );
-    Wait( 0.1 );
-    gb << Save Picture( "{fai}.png", PNG  );
-    gb << Close Window;
-);
-//!  End of {fai}
-"""
-            blocks.append(block)
-        return "\n\n".join(blocks)
+            writer.add(block.render(fai=fai), f"{fai}.png")
+        return writer.finish()
     
     def validate_excel_structure(self, file_path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -505,6 +386,7 @@ If( Is Scriptable( gb ),
                     graph_width=graph_width, graph_height=graph_height
                 )
                 jsl_content = meta_result["jsl_content"]
+                spec_issues = meta_result["spec_issues"]
                 analysis_mode = "meta"
             else:
                 logger.info("Using standard analyzer for JSL generation")
@@ -512,6 +394,7 @@ If( Is Scriptable( gb ),
                                                 color_by_variable=color_by_variable,
                                                 caption_boxes_enabled=caption_boxes_enabled,
                                                 graph_width=graph_width, graph_height=graph_height)
+                spec_issues = None
                 analysis_mode = "standard"
             
             # 12) Add data type/modeling type header if needed
@@ -535,6 +418,7 @@ If( Is Scriptable( gb ),
                 "data_sheet": data_sheet,
                 "has_meta_sheet": has_meta_sheet,
                 "analysis_mode": analysis_mode,
+                "spec_issues": spec_issues,
                 "fai_columns_found": len(fai_cols),
                 "fai_columns": fai_cols,
                 "categorical_columns": categorical_columns,
@@ -9,8 +9,16 @@ import os
 from typing import Dict, List, Any, Optional
 import logging
 
+from ..base.jsl_render import JSLWriter
+from ..base.spec_validation import issue_summary, validate_spec_frame
+from . import jsl_blocks
+
 logger = logging.getLogger(__name__)
 
+# Meta rows whose ref lines would be misleading, or that name no FAI column of the data
+SPEC_RULES = ["usl_not_above_lsl", "lsl_not_below_target", "usl_not_above_target",
+              "duplicate_test_name", "missing_in_data"]
+
 
 class MetaAnalyzer:
     """Analyze Excel files with meta sheet and generate JSL scripts with specifications"""
@@ -81,44 +89,55 @@ class MetaAnalyzer:
         Args:
             categorical_columns: List of user-selected categorical column names
         """
-        df_data = self.data_df.copy()
+        df_data = self.data_df
         df_meta = self.meta_df.copy()
         fai_cols = [c for c in df_data.columns if "FAI" in str(c)]
 
-        all_jsl_blocks = []
-        df_meta[["data_min", "data_max", "final_min", "final_max"]] = np.nan
+        # Spec problems over the whole meta sheet; the charts are still drawn as before
+        spec_issues = issue_summary(validate_spec_frame(df_meta, SPEC_RULES, data_columns=fai_cols))
+        if spec_issues["total"]:
+            logger.warning(f"[Meta-Analyzer] Meta sheet spec issues: {spec_issues['by_rule']}")
+
+        range_cols = ["data_min", "data_max", "final_min", "final_max"]
+        df_meta[range_cols] = np.nan
+        ranges: Dict[Any, tuple] = {}
 
-        # Generate X variables string from categorical columns
-        x_vars = ",\n        ".join([f"X( :{col} )" for col in categorical_columns])
-        num_positions = len(categorical_columns)
-        
-        # Generate color variable string if color_by_variable is set
-        color_var_str = ""
         if self.color_by_variable and self.color_by_variable in categorical_columns:
-            color_var_str = f",\n        Color( :{self.color_by_variable} )"
             logger.info(f"[Meta-Analyzer] Using color by variable: {self.color_by_variable}")
-
+        # Layout shared by every chart; the FAI, its range and ref lines change per block
+        block = jsl_blocks.bind_layout(
+            jsl_blocks.META_GRAPH_BLOCK, categorical_columns, self.color_by_variable,
+            self.caption_boxes_enabled, self.graph_width, self.graph_height
+        )
+
+        # Data range of every FAI column in one pass
+        values = df_data[fai_cols].apply(pd.to_numeric, errors="coerce")
+        counts, mins, maxs = values.count(), values.min(), values.max()
+        # First meta row of each test_name
+        first = df_meta.drop_duplicates("test_name")
+        specs = dict(zip(first["test_name"], zip(first["target"], first["usl"], first["lsl"])))
+
+        writer = JSLWriter()
         for fai in fai_cols:
             # Check if this FAI has meta specifications - match each FAI to its row in meta sheet
-            row = df_meta[df_meta["test_name"] == fai]
-            has_meta_specs = not row.empty
+            spec = specs.get(fai)
+            has_meta_specs = spec is not None
             
-            # Get data for scaling
-            g = pd.to_numeric(df_data[fai], errors="coerce").dropna()
-            if g.empty:
+            # Skip FAIs without numeric data
+            if not counts[fai]:
                 logger.warning(f"[Meta-Analyzer] Skipping {fai} - no valid data")
                 continue
 
             # 1️⃣ Data range
-            group_min = np.nanmin(g.values)
-            group_max = np.nanmax(g.values)
+            group_min = mins[fai]
+            group_max = maxs[fai]
 
             if has_meta_specs:
                 try:
                     # Get values from meta sheet for THIS specific FAI column
-                    target_val = float(row["target"].values[0])
-                    usl_val = float(row["usl"].values[0])
-                    lsl_val = float(row["lsl"].values[0])
+                    target_val = float(spec[0])
+                    usl_val = float(spec[1])
+                    lsl_val = float(spec[2])
                     
                     # Use ref_line_config colors if provided, otherwise default to "Dark Blue"
                     # Note: ref_line_config values are global overrides, but we use per-FAI meta sheet values
@@ -149,10 +168,8 @@ class MetaAnalyzer:
                     new_min = final_min - margin
                     new_max = final_max + margin
                     
-                    # Update meta table
-                    df_meta.loc[df_meta["test_name"] == fai, ["data_min", "data_max", "final_min", "final_max"]] = [
-                        group_min, group_max, new_min, new_max
-                    ]
+                    # Meta table columns, filled in after the loop
+                    ranges[fai] = (group_min, group_max, new_min, new_max)
                     
                     # Generate JSL with reference lines using custom colors
                     ref_lines = f"""            Add Ref Line( {lsl:.4f}, "Solid", "{lsl_color}", "LSL {lsl:.4f}", 1 ),
@@ -176,104 +193,6 @@ class MetaAnalyzer:
                 ref_lines = f"""            // ⚠️ No matching row found in meta sheet for {fai} (test_name column) - reference lines skipped"""
                 logger.warning(f"[Meta-Analyzer] No matching meta row found for {fai} - skipping reference lines")
 
-            # Generate Elements blocks for each categorical variable
-            elements_blocks = []
-            
-            # Helper function to generate caption boxes string
-            def generate_caption_boxes() -> str:
-                """Generate caption boxes JSL code with Location and X Position"""
-                return """        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Mean" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Min" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Median" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 12 ),
-            Summary Statistic( "Max" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        ),
-        Caption Box(
-            X,
-            Y,
-            Legend( 13 ),
-            Summary Statistic( "Std Dev" ),
-            Location( "Graph per factor" ),
-            X Position( "Left" )
-        )"""
-            
-            for pos_idx, cat_col in enumerate(categorical_columns, start=1):
-                has_caption_boxes = self.caption_boxes_enabled.get(cat_col, False)
-                
-                if pos_idx == 1:
-                    # First position: points, optionally with caption boxes
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 64 ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements( Position( {pos_idx}, 1 ), Points( X, Y, Legend( 64 ) ) )""")
-                elif pos_idx == num_positions:
-                    # Last position: points, smoother, box plot, and optionally caption boxes
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( 61 ) ),
-        Smoother( X, Y, Legend( 62 ) ),
-        Box Plot( X, Y, Legend( 63 ) )
-    )""")
-                else:
-                    # Middle positions: points, smoother, box plot, and optionally caption boxes
-                    legend_base = 30 + (pos_idx - 1) * 5
-                    if has_caption_boxes:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( {legend_base + 2} ) ),
-        Smoother( X, Y, Legend( {legend_base + 3} ) ),
-        Box Plot( X, Y, Legend( {legend_base + 4} ) ),
-{generate_caption_boxes()}
-    )""")
-                    else:
-                        elements_blocks.append(f"""    Elements(
-        Position( {pos_idx}, 1 ),
-        Points( X, Y, Legend( {legend_base + 2} ) ),
-        Smoother( X, Y, Legend( {legend_base + 3} ) ),
-        Box Plot( X, Y, Legend( {legend_base + 4} ) )
-    )""")
-            
-            elements_str = ",\n".join(elements_blocks)
-
             # 4️⃣ JSL generation block
             # Format ref_lines properly - if it's a comment, add it on a new line without comma
             if ref_lines and ref_lines.strip().startswith("//"):
@@ -283,41 +202,20 @@ class MetaAnalyzer:
             else:
                 ref_lines_formatted = ""
             
-            jsl = f"""// Block for {fai}
-gb = Graph Builder(
-    Size( {self.graph_width}, {self.graph_height} ),
-    Show Control Panel( 0 ),
-    Variables(
-        {x_vars},
-        Y( :{fai} ){color_var_str}
-    ),
-    {elements_str},
-    SendToReport(
-        Dispatch(
-            {{}}, "{fai}", ScaleBox,
-            {{Format( "Fixed Dec", 12, 4 ),
-            Min( {new_min:.4f} ), Max( {new_max:.4f} ){ref_lines_formatted}
-            }}
-        ),
-    )
-);
-Wait(0.3);
-If( Is Scriptable( gb ),
-    gb << Set Control Panel( 0 );
-    Wait( 0.1 );
-    gb << Save Picture( "{fai}.png", PNG  );
-    gb << Close Window;
-);
-"""
-            all_jsl_blocks.append(jsl)
+            writer.add(block.render(fai=fai, new_min=new_min, new_max=new_max, ref_lines=ref_lines_formatted))
+
+        # Update meta table
+        for i, col in enumerate(range_cols):
+            df_meta[col] = df_meta["test_name"].map({fai: r[i] for fai, r in ranges.items()}).astype(float)
 
         # Return JSL content and metadata
-        jsl_content = "\n\n".join(all_jsl_blocks)
+        jsl_content = writer.finish()
         
         return {
             "jsl_content": jsl_content,
             "meta_df": df_meta,
             "fai_columns": fai_cols,
+            "spec_issues": spec_issues,
             "mode": "meta"
         }
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Any, List, Optional
 import pandas as pd
@@ -10,6 +10,7 @@ from .processor import ExcelToCommonalityGenericProcessor
 import json
 from app.core.storage import local_storage
 from ..base.zip_utils import ZipFileGenerator
+from ..base.executor import cpu_bound
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
 from app.models import ProjectAttachment, AppUser
@@ -29,6 +30,50 @@ except Exception as e:
     logger.error(f"Failed to initialize Commonality-Generic processor: {e}")
     raise e
 
+@cpu_bound("excel2commonality_generic")
+def _validate_structure(path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    return processor.validate_excel_structure(path, sheet_name)
+
+
+@cpu_bound("excel2commonality_generic")
+def _inspect_data(path: str, sheet_name: Optional[str] = None):
+    """(validate_data_content result, has_meta, meta_specs) for the process-data step"""
+    # Get engine for meta sheet check
+    engine = processor.analyzer.get_excel_engine(path)
+
+    # Check if meta sheet exists
+    has_meta = processor.analyzer.check_meta_sheet(path, engine)
+
+    # Run data content validation
+    result = processor.validate_data_content(path, sheet_name)
+
+    # Extract meta specs if meta sheet exists
+    meta_specs = None
+    if has_meta:
+        try:
+            meta_df = pd.read_excel(path, sheet_name="meta", engine=engine, nrows=1)
+            if not meta_df.empty and {"test_name", "target", "usl", "lsl"}.issubset(meta_df.columns):
+                meta_specs = {
+                    "target": float(meta_df["target"].values[0]) if pd.notna(meta_df["target"].values[0]) else None,
+                    "usl": float(meta_df["usl"].values[0]) if pd.notna(meta_df["usl"].values[0]) else None,
+                    "lsl": float(meta_df["lsl"].values[0]) if pd.notna(meta_df["lsl"].values[0]) else None
+                }
+        except Exception as e:
+            logger.warning(f"Failed to extract meta specs: {e}")
+    return result, has_meta, meta_specs
+
+
+@cpu_bound("excel2commonality_generic")
+def _process_file(path: str, cat_cols: List[str], project_name: str, project_description: str = "",
+                  sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    return processor.process_excel_file(path, cat_cols, project_name, project_description, sheet_name)
+
+
+@cpu_bound("excel2commonality_generic")
+def _analyze_file(path: str, cat_cols: List[str], **options) -> Dict[str, Any]:
+    return processor.analyzer.analyze_excel_file(path, cat_cols, **options)
+
+
 @router.get("/test")
 async def test_endpoint():
     """Test endpoint to debug processor initialization"""
@@ -39,6 +84,7 @@ async def test_endpoint():
 
 @router.post("/load-file")
 async def load_file(
+    request: Request,
     file: UploadFile = File(...),
     sheet_name: Optional[str] = Form(None)
 ):
@@ -58,10 +104,11 @@ async def load_file(
             tmp_file.flush()
             
             # Run structure validation
-            result = processor.validate_excel_structure(tmp_file.name, sheet_name)
-            
-            # Clean up
-            os.unlink(tmp_file.name)
+            try:
+                result = await _validate_structure(tmp_file.name, sheet_name, request=request)
+            finally:
+                # Clean up
+                os.unlink(tmp_file.name)
             
             # Add wizard-specific fields
             if result.get("valid", False):
@@ -102,6 +149,8 @@ async def load_file(
                     "error": result.get("error", "Unknown error")
                 }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in load_file: {str(e)}")
         return JSONResponse(
@@ -111,6 +160,7 @@ async def load_file(
 
 @router.post("/process-data")
 async def process_data(
+    request: Request,
     file: UploadFile = File(...),
     sheet_name: Optional[str] = Form(None)
 ):
@@ -129,32 +179,11 @@ async def process_data(
             tmp_file.write(content)
             tmp_file.flush()
             
-            # Get engine for meta sheet check
-            engine = processor.analyzer.get_excel_engine(tmp_file.name)
-            
-            # Check if meta sheet exists before cleanup
-            has_meta = processor.analyzer.check_meta_sheet(tmp_file.name, engine)
-            
-            # Run data content validation
-            result = processor.validate_data_content(tmp_file.name, sheet_name)
-            
-            # Extract meta specs if meta sheet exists
-            meta_specs = None
-            if has_meta:
-                try:
-                    import pandas as pd
-                    meta_df = pd.read_excel(tmp_file.name, sheet_name="meta", engine=engine, nrows=1)
-                    if not meta_df.empty and {"test_name", "target", "usl", "lsl"}.issubset(meta_df.columns):
-                        meta_specs = {
-                            "target": float(meta_df["target"].values[0]) if pd.notna(meta_df["target"].values[0]) else None,
-                            "usl": float(meta_df["usl"].values[0]) if pd.notna(meta_df["usl"].values[0]) else None,
-                            "lsl": float(meta_df["lsl"].values[0]) if pd.notna(meta_df["lsl"].values[0]) else None
-                        }
-                except Exception as e:
-                    logger.warning(f"Failed to extract meta specs: {e}")
-            
-            # Clean up
-            os.unlink(tmp_file.name)
+            try:
+                result, has_meta, meta_specs = await _inspect_data(tmp_file.name, sheet_name, request=request)
+            finally:
+                # Clean up
+                os.unlink(tmp_file.name)
             
             # Add wizard-specific fields
             if result.get("valid", False):
@@ -217,6 +246,8 @@ async def process_data(
                     "error": result.get("error", "Unknown error")
                 }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in process_data: {str(e)}")
         return JSONResponse(
@@ -226,6 +257,7 @@ async def process_data(
 
 @router.post("/generate-files")
 async def generate_files(
+    request: Request,
     file: UploadFile = File(...),
     categorical_columns: str = Form(...),  # JSON string of selected categorical columns
     project_name: str = Form("Commonality Analysis"),
@@ -265,16 +297,18 @@ async def generate_files(
             tmp_file.flush()
             
             # Process the file
-            result = processor.process_excel_file(
-                tmp_file.name,
-                cat_cols,
-                project_name,
-                project_description,
-                sheet_name
-            )
-            
-            # Clean up
-            os.unlink(tmp_file.name)
+            try:
+                result = await _process_file(
+                    tmp_file.name,
+                    cat_cols,
+                    project_name,
+                    project_description,
+                    sheet_name,
+                    request=request
+                )
+            finally:
+                # Clean up
+                os.unlink(tmp_file.name)
             
             if result["success"]:
                 return result
@@ -284,6 +318,8 @@ async def generate_files(
                     content={"error": result.get("error", "File generation failed")}
                 )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in generate_files: {str(e)}")
         return JSONResponse(
@@ -293,6 +329,7 @@ async def generate_files(
 
 @router.post("/run-analysis")
 async def run_analysis(
+    request: Request,
     file: UploadFile = File(...),
     project_id: str = Form(...),
     categorical_columns: str = Form(...),  # JSON string of selected categorical columns
@@ -378,11 +415,11 @@ async def run_analysis(
             if color_by_variable:
                 logger.info(f"[Commonality-Generic] Color by variable: {color_by_variable}")
             logger.info(f"[Commonality-Generic] Graph size: {graph_width}x{graph_height}")
-            result = processor.analyzer.analyze_excel_file(
+            result = await _analyze_file(
                 tmp_file_path, cat_cols, sheet_name=sheet_name, 
                 ref_line_config=ref_line_config_dict, variable_data_types=variable_data_types_dict,
                 color_by_variable=color_by_variable, caption_boxes_enabled=caption_boxes_enabled_dict,
-                graph_width=graph_width, graph_height=graph_height
+                graph_width=graph_width, graph_height=graph_height, request=request
             )
             
             if not result["success"]:
@@ -463,6 +500,7 @@ async def run_analysis(
             # Use direct Celery call instead of HTTP to ensure proper queueing
             stage = "create_run"
             from app.core.celery import celery_app
+            from app.core.tracing import celery_headers
             from app.core.database import AsyncSessionLocal
             from app.core.websocket import publish_run_update
             from app.models import Run, RunStatus, Artifact
@@ -679,7 +717,7 @@ Open("{absolute_csv_path}");
                     
                     # STEP 6: Queue Celery task directly (only after task folder is prepared)
                     logger.info(f"[Commonality-Generic] Queuing Celery task 'run_jmp_boxplot' for run {run.id}")
-                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                    celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                     
                     # Publish initial status
                     await publish_run_update(str(run.id), {
@@ -795,6 +833,8 @@ Open("{absolute_csv_path}");
                     pass
             raise
             
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
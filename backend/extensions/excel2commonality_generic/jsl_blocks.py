@@ -0,0 +1,185 @@
+"""
+JSL templates for Excel2Commonality-Generic
+
+The standard (CommonalityGenericAnalyzer) and meta (MetaAnalyzer) generators
+draw the same Graph Builder layout for the user-selected categorical columns;
+only the ScaleBox dispatch differs. The layout parts are built once per run
+and bound into the template, leaving the per-FAI fields.
+"""
+
+from typing import Dict, List, Optional
+
+from ..base.jsl_render import JSLTemplate
+
+# Caption boxes added to an Elements position when enabled for its column
+CAPTION_BOXES = """        Caption Box(
+            X,
+            Y,
+            Legend( 12 ),
+            Summary Statistic( "Mean" ),
+            Location( "Graph per factor" ),
+            X Position( "Left" )
+        ),
+        Caption Box(
+            X,
+            Y,
+            Legend( 12 ),
+            Summary Statistic( "Min" ),
+            Location( "Graph per factor" ),
+            X Position( "Left" )
+        ),
+        Caption Box(
+            X,
+            Y,
+            Legend( 12 ),
+            Summary Statistic( "Median" ),
+            Location( "Graph per factor" ),
+            X Position( "Left" )
+        ),
+        Caption Box(
+            X,
+            Y,
+            Legend( 12 ),
+            Summary Statistic( "Max" ),
+            Location( "Graph per factor" ),
+            X Position( "Left" )
+        ),
+        Caption Box(
+            X,
+            Y,
+            Legend( 13 ),
+            Summary Statistic( "Std Dev" ),
+            Location( "Graph per factor" ),
+            X Position( "Left" )
+        )"""
+
+# Standard mode: one chart per FAI
+GRAPH_BLOCK = JSLTemplate("""//!  Start of {fai}                           // auto-run flag
+gb = Graph Builder(
+    Size( {graph_width}, {graph_height} ),
+    Show Control Panel( 0 ),
+    Variables(
+        {x_vars},
+        Y( :{fai} ){color_var}
+    ),
+    {elements}
+);
+Wait(0.1);
+If( Is Scriptable( gb ),
+    gb << Set Control Panel( 0 );
+    Wait( 0.1 );
+    gb << Save Picture( "{fai}.png", PNG  );
+    gb << Close Window;
+);
+//!  End of {fai}
+""", name="excel2commonality-generic.graph_builder")
+
+# Meta mode: the chart with its axis range and spec ref lines (or a comment why they are missing)
+META_GRAPH_BLOCK = JSLTemplate("""// Block for {fai}
+gb = Graph Builder(
+    Size( {graph_width}, {graph_height} ),
+    Show Control Panel( 0 ),
+    Variables(
+        {x_vars},
+        Y( :{fai} ){color_var}
+    ),
+    {elements},
+    SendToReport(
+        Dispatch(
+            {{}}, "{fai}", ScaleBox,
+            {{Format( "Fixed Dec", 12, 4 ),
+            Min( {new_min:.4f} ), Max( {new_max:.4f} ){ref_lines}
+            }}
+        ),
+    )
+);
+Wait(0.3);
+If( Is Scriptable( gb ),
+    gb << Set Control Panel( 0 );
+    Wait( 0.1 );
+    gb << Save Picture( "{fai}.png", PNG  );
+    gb << Close Window;
+);
+""", name="excel2commonality-generic.meta_graph_builder")
+
+
+def x_variables(categorical_columns: List[str]) -> str:
+    return ",\n        ".join([f"X( :{col} )" for col in categorical_columns])
+
+
+def color_variable(color_by_variable: Optional[str], categorical_columns: List[str]) -> str:
+    """The Color() role, only when coloring by one of the selected columns"""
+    if color_by_variable and color_by_variable in categorical_columns:
+        return f",\n        Color( :{color_by_variable} )"
+    return ""
+
+
+def elements(categorical_columns: List[str], caption_boxes_enabled: Optional[Dict[str, bool]] = None) -> str:
+    """
+    One Elements position per categorical column: points first, then points,
+    smoother and box plot; caption boxes where enabled
+    """
+    num_positions = len(categorical_columns)
+    elements_blocks = []
+    for pos_idx, cat_col in enumerate(categorical_columns, start=1):
+        has_caption_boxes = caption_boxes_enabled and caption_boxes_enabled.get(cat_col, False)
+
+        if pos_idx == 1:
+            # First position: points, optionally with caption boxes
+            if has_caption_boxes:
+                elements_blocks.append(f"""    Elements(
+        Position( {pos_idx}, 1 ),
+        Points( X, Y, Legend( 64 ) ),
+{CAPTION_BOXES}
+    )""")
+            else:
+                elements_blocks.append(f"""    Elements( Position( {pos_idx}, 1 ), Points( X, Y, Legend( 64 ) ) )""")
+        elif pos_idx == num_positions:
+            # Last position: points, smoother, box plot, and optionally caption boxes
+            if has_caption_boxes:
+                elements_blocks.append(f"""    Elements(
+        Position( {pos_idx}, 1 ),
+        Points( X, Y, Legend( 61 ) ),
+        Smoother( X, Y, Legend( 62 ) ),
+        Box Plot( X, Y, Legend( 63 ) ),
+{CAPTION_BOXES}
+    )""")
+            else:
+                elements_blocks.append(f"""    Elements(
+        Position( {pos_idx}, 1 ),
+        Points( X, Y, Legend( 61 ) ),
+        Smoother( X, Y, Legend( 62 ) ),
+        Box Plot( X, Y, Legend( 63 ) )
+    )""")
+        else:
+            # Middle positions: points, smoother, box plot, and optionally caption boxes
+            legend_base = 30 + (pos_idx - 1) * 5
+            if has_caption_boxes:
+                elements_blocks.append(f"""    Elements(
+        Position( {pos_idx}, 1 ),
+        Points( X, Y, Legend( {legend_base + 2} ) ),
+        Smoother( X, Y, Legend( {legend_base + 3} ) ),
+        Box Plot( X, Y, Legend( {legend_base + 4} ) ),
+{CAPTION_BOXES}
+    )""")
+            else:
+                elements_blocks.append(f"""    Elements(
+        Position( {pos_idx}, 1 ),
+        Points( X, Y, Legend( {legend_base + 2} ) ),
+        Smoother( X, Y, Legend( {legend_base + 3} ) ),
+        Box Plot( X, Y, Legend( {legend_base + 4} ) )
+    )""")
+
+    return ",\n".join(elements_blocks)
+
+
+def bind_layout(template: JSLTemplate, categorical_columns: List[str], color_by_variable: Optional[str],
+                caption_boxes_enabled: Optional[Dict[str, bool]], graph_width: int, graph_height: int) -> JSLTemplate:
+    """``template`` with the run's layout filled in; the FAI fields stay open"""
+    return template.bind(
+        graph_width=graph_width,
+        graph_height=graph_height,
+        x_vars=x_variables(categorical_columns),
+        color_var=color_variable(color_by_variable, categorical_columns),
+        elements=elements(categorical_columns, caption_boxes_enabled),
+    )
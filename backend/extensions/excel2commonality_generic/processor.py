@@ -211,6 +211,7 @@ class ExcelToCommonalityGenericProcessor:
                     "data_sheet": analysis_result["data_sheet"],
                     "fai_columns_found": analysis_result["fai_columns_found"],
                     "fai_columns": analysis_result["fai_columns"],
+                    "spec_issues": analysis_result.get("spec_issues"),
                     "categorical_columns": analysis_result["categorical_columns"],
                     "categorical_count": analysis_result["categorical_count"],
                     "timestamp": analysis_result["timestamp"]
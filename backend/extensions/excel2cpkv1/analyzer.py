@@ -7,13 +7,90 @@ Handles Excel validation, normalization, and JSL generation for CPK analysis.
 
 import pandas as pd
 import numpy as np
-import re
 from datetime import datetime
 from typing import Dict, List, Any, Tuple, Optional
 import logging
 
+from ..base.jsl_render import JSLTemplate, JSLWriter
+from ..base.spec_validation import ERROR, validate_spec_frame
+
 logger = logging.getLogger(__name__)
 
+# Process Capability chart for one test_name
+CPK_BLOCK = JSLTemplate("""// Start for {test_name}
+Column("{test_name}") << Set Property(
+    "Spec Limits",
+    {{{spec_line}}}
+);
+gb = Process Capability(
+    Process Variables( :{test_name} ),
+    Moving Range Method( Average of Moving Ranges ),
+    Individual Detail Reports( 1 ),
+    Capability Box Plots( 0 ),
+    Goal Plot( 0 ),
+    Capability Index Plot( 0 ),
+    Process Performance Plot( 0 )
+);
+Wait(0.5);
+If( Is Scriptable( gb ),
+    gb << Set Control Panel( 0 );
+    Wait( 0.3 );
+    gb << Save Picture( "{test_name}.png", png );
+    gb << Close Window;
+);
+// End for {test_name}
+""", name="excel2cpkv1.process_capability")
+
+# Comment block for a test_name whose limits fail validate_jsl_spec
+CPK_SKIPPED_BLOCK = JSLTemplate("""// SKIPPED: {test_name} - Validation failed
+// Reason: {reasons}
+// USL: {usl}, LSL: {lsl}, Target: {target}
+// This variable was bypassed due to invalid specification limits
+""", name="excel2cpkv1.skipped")
+
+# Row-check wording per spec_validation rule: (issue, limit values reported, details)
+CHECKPOINT1_RULES = {
+    "name_format": ("Invalid test_name format", (),
+                    "Test name must contain only letters, numbers, and underscores"),
+    "limits_missing": ("Both USL and LSL are empty", (),
+                       "At least one limit (USL or LSL) must have a value"),
+    "usl_not_above_lsl": ("USL must be larger than LSL", ("usl", "lsl"),
+                          "USL ({usl}) must be greater than LSL ({lsl})"),
+    "lsl_not_below_target": ("LSL must be smaller than Target", ("lsl", "target"),
+                             "LSL ({lsl}) must be less than Target ({target})"),
+    "usl_not_above_target": ("USL must be larger than Target", ("usl", "target"),
+                             "USL ({usl}) must be greater than Target ({target})"),
+    "target_equals_usl": ("Target equals USL", ("target", "usl"), "Target value equals USL value"),
+    "target_equals_lsl": ("Target equals LSL", ("target", "lsl"), "Target value equals LSL value"),
+    "duplicate_test_name": ("Duplicate test_name", (), "test_name is defined on more than one row"),
+}
+
+SPEC_CHECK_RULES = {
+    "name_format": ("Invalid test_name format", (), None),
+    "limits_missing": ("Both usl and lsl are empty", (), None),
+    "usl_equals_lsl": ("usl equals lsl", ("usl", "lsl"), None),
+    "target_equals_usl": ("target equals usl", ("target", "usl"), None),
+    "target_equals_lsl": ("target equals lsl", ("target", "lsl"), None),
+    "duplicate_test_name": ("duplicate test_name", (), None),
+}
+
+# validate_jsl_spec messages, in the order they are listed for a row
+JSL_SPEC_RULES = {
+    "limits_missing": "Both USL and LSL are empty - at least one limit must have a value",
+    "usl_not_above_lsl": "USL ({usl}) must be greater than LSL ({lsl})",
+    "lsl_not_below_target": "LSL ({lsl}) must be less than Target ({target})",
+    "usl_not_above_target": "USL ({usl}) must be greater than Target ({target})",
+}
+
+def _missing(value: Any) -> bool:
+    """pd.isna for a scalar, without its overhead for plain floats and ints"""
+    if isinstance(value, float):
+        return value != value
+    if isinstance(value, (int, str)):
+        return False
+    return value is None or bool(pd.isna(value))
+
+
 class CPKAnalyzer:
     """Analyzer for CPK (Process Capability) analysis"""
     
@@ -147,100 +224,9 @@ class CPKAnalyzer:
             results["details"]["spec_columns"] = spec_df.columns.tolist()
             return results
 
-        # Ensure all required columns exist (fill with NaN if missing)
-        for c in required:
-            if c not in spec_df.columns:
-                spec_df[c] = np.nan
-
-        # Coerce numeric for validation
-        usl_num = self.coerce_numeric(spec_df["usl"])
-        lsl_num = self.coerce_numeric(spec_df["lsl"])
-        tgt_num = self.coerce_numeric(spec_df["target"])
-        name_series = spec_df["test_name"].astype(str).str.strip()
-
-        row_errors = []
-        row_warnings = []
-
-        name_pattern = re.compile(r"^[A-Za-z0-9_]+$")
-
-        for idx, (name, usl, lsl, tgt) in enumerate(zip(name_series, usl_num, lsl_num, tgt_num)):
-            # Skip fully empty rows (name and limits absent)
-            if (name == "" or name.lower() == "nan") and pd.isna(usl) and pd.isna(lsl) and pd.isna(tgt):
-                continue
-
-            # Name format validation
-            if not (isinstance(name, str) and name_pattern.match(name)):
-                row_errors.append({
-                    "row": idx + 2,
-                    "issue": "Invalid test_name format",
-                    "test_name": name,
-                    "details": "Test name must contain only letters, numbers, and underscores"
-                })
-
-            # At least one limit present (USL or LSL)
-            if pd.isna(usl) and pd.isna(lsl):
-                row_errors.append({
-                    "row": idx + 2,
-                    "issue": "Both USL and LSL are empty",
-                    "test_name": name,
-                    "details": "At least one limit (USL or LSL) must have a value"
-                })
-
-            # USL must be larger than LSL (if both exist)
-            if not pd.isna(usl) and not pd.isna(lsl):
-                if float(usl) <= float(lsl):
-                    row_errors.append({
-                        "row": idx + 2,
-                        "issue": "USL must be larger than LSL",
-                        "test_name": name,
-                        "usl": usl,
-                        "lsl": lsl,
-                        "details": f"USL ({usl}) must be greater than LSL ({lsl})"
-                    })
-
-            # LSL must be smaller than Target (if both exist)
-            if not pd.isna(lsl) and not pd.isna(tgt):
-                if float(lsl) >= float(tgt):
-                    row_errors.append({
-                        "row": idx + 2,
-                        "issue": "LSL must be smaller than Target",
-                        "test_name": name,
-                        "lsl": lsl,
-                        "target": tgt,
-                        "details": f"LSL ({lsl}) must be less than Target ({tgt})"
-                    })
-
-            # USL must be larger than Target (if both exist)
-            if not pd.isna(usl) and not pd.isna(tgt):
-                if float(usl) <= float(tgt):
-                    row_errors.append({
-                        "row": idx + 2,
-                        "issue": "USL must be larger than Target",
-                        "test_name": name,
-                        "usl": usl,
-                        "target": tgt,
-                        "details": f"USL ({usl}) must be greater than Target ({tgt})"
-                    })
-
-            # Target conflicts (warning only)
-            if not pd.isna(tgt) and not pd.isna(usl) and float(tgt) == float(usl):
-                row_warnings.append({
-                    "row": idx + 2,
-                    "issue": "Target equals USL",
-                    "test_name": name,
-                    "target": tgt,
-                    "usl": usl,
-                    "details": "Target value equals USL value"
-                })
-            if not pd.isna(tgt) and not pd.isna(lsl) and float(tgt) == float(lsl):
-                row_warnings.append({
-                    "row": idx + 2,
-                    "issue": "Target equals LSL",
-                    "test_name": name,
-                    "target": tgt,
-                    "lsl": lsl,
-                    "details": "Target value equals LSL value"
-                })
+        # Every rule over the whole frame at once; fully empty rows are skipped
+        issues = validate_spec_frame(spec_df, list(CHECKPOINT1_RULES))
+        row_errors, row_warnings = self._row_issues(issues, CHECKPOINT1_RULES)
 
         # Update results based on validation findings
         results["row_errors"] = row_errors
@@ -289,49 +275,8 @@ class CPKAnalyzer:
                 {"column": required, "status": ["OK"] * len(required)}
             )
 
-        # Coerce numeric for validation
-        usl_num = self.coerce_numeric(spec_df["usl"])
-        lsl_num = self.coerce_numeric(spec_df["lsl"])
-        tgt_num = self.coerce_numeric(spec_df["target"])
-        name_series = spec_df["test_name"].astype(str).str.strip()
-
-        row_errors = []
-        row_warnings = []
-
-        name_pattern = re.compile(r"^[A-Za-z0-9_]+$")
-
-        for idx, (name, usl, lsl, tgt) in enumerate(zip(name_series, usl_num, lsl_num, tgt_num)):
-            # Skip fully empty rows (name and limits absent)
-            if (name == "" or name.lower() == "nan") and pd.isna(usl) and pd.isna(lsl) and pd.isna(tgt):
-                continue
-
-            # Name format
-            if not (isinstance(name, str) and name_pattern.match(name)):
-                row_errors.append(
-                    {"row": idx + 2, "issue": "Invalid test_name format", "test_name": name}
-                )
-
-            # At least one limit present
-            if pd.isna(usl) and pd.isna(lsl):
-                row_errors.append(
-                    {"row": idx + 2, "issue": "Both usl and lsl are empty", "test_name": name}
-                )
-
-            # USL != LSL (only if both present)
-            if not pd.isna(usl) and not pd.isna(lsl) and float(usl) == float(lsl):
-                row_errors.append(
-                    {"row": idx + 2, "issue": "usl equals lsl", "test_name": name, "usl": usl, "lsl": lsl}
-                )
-
-            # Target conflicts (warning only)
-            if not pd.isna(tgt) and not pd.isna(usl) and float(tgt) == float(usl):
-                row_warnings.append(
-                    {"row": idx + 2, "issue": "target equals usl", "test_name": name, "target": tgt, "usl": usl}
-                )
-            if not pd.isna(tgt) and not pd.isna(lsl) and float(tgt) == float(lsl):
-                row_warnings.append(
-                    {"row": idx + 2, "issue": "target equals lsl", "test_name": name, "target": tgt, "lsl": lsl}
-                )
+        issues = validate_spec_frame(spec_df, list(SPEC_CHECK_RULES))
+        row_errors, row_warnings = self._row_issues(issues, SPEC_CHECK_RULES)
 
         if row_errors:
             results["Error_Row Checks"] = pd.DataFrame(row_errors)
@@ -345,6 +290,23 @@ class CPKAnalyzer:
 
         return results
     
+    def _row_issues(self, issues: pd.DataFrame, wording: Dict[str, Tuple[str, Tuple[str, ...], Optional[str]]]
+                    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Split a spec_validation issue table into (row_errors, row_warnings) entries."""
+        row_errors, row_warnings = [], []
+        for row, name, rule, severity, usl, lsl, tgt in zip(
+            issues["row"].tolist(), issues["test_name"].tolist(), issues["rule"].tolist(),
+            issues["severity"].tolist(), issues["usl"].tolist(), issues["lsl"].tolist(), issues["target"].tolist()
+        ):
+            issue, fields, details = wording[rule]
+            values = {"usl": usl, "lsl": lsl, "target": tgt}
+            entry = {"row": row, "issue": issue, "test_name": name}
+            entry.update((field, values[field]) for field in fields)
+            if details is not None:
+                entry["details"] = details.format(**values)
+            (row_errors if severity == ERROR else row_warnings).append(entry)
+        return row_errors, row_warnings
+
     def find_fai_columns(self, data_df: pd.DataFrame) -> List[str]:
         """Return all column names containing 'FAI' (case-sensitive to match JMP naming style)."""
         return [c for c in data_df.columns if "FAI" in str(c)]
@@ -388,95 +350,95 @@ class CPKAnalyzer:
         
         return len(errors) == 0, errors
 
-    def make_jsl_block(self, test_name: str, usl: float, lsl: float, target: float, imgdir: str) -> str:
+    def validate_jsl_spec_frame(self, usl: pd.Series, lsl: pd.Series, target: pd.Series) -> List[List[str]]:
         """
-        Construct a JSL block for one variable, including validation checks.
-        If validation fails, returns a comment block explaining why it was bypassed.
+        ``validate_jsl_spec`` for whole numeric limit columns at once.
+        
+        Returns:
+            The error messages of each row (empty for valid rows), in the same order
         """
-        # Validate the specification limits
-        is_valid, errors = self.validate_jsl_spec(test_name, usl, lsl, target)
+        limits = pd.DataFrame({
+            "usl": usl.reset_index(drop=True),
+            "lsl": lsl.reset_index(drop=True),
+            "target": target.reset_index(drop=True),
+        })
+        issues = validate_spec_frame(limits, list(JSL_SPEC_RULES), skip_blank=False)
         
-        if not is_valid:
-            # Create comment block for failed validation
-            error_reasons = "; ".join(errors)
-            return f"""// SKIPPED: {test_name} - Validation failed
-// Reason: {error_reasons}
-// USL: {usl if not pd.isna(usl) else 'Not specified'}, LSL: {lsl if not pd.isna(lsl) else 'Not specified'}, Target: {target if not pd.isna(target) else 'Not specified'}
-// This variable was bypassed due to invalid specification limits
-"""
+        errors: List[List[str]] = [[] for _ in range(len(limits))]
+        for pos, rule, u, l, t in zip(issues["position"].tolist(), issues["rule"].tolist(),
+                                      issues["usl"].tolist(), issues["lsl"].tolist(), issues["target"].tolist()):
+            errors[pos].append(JSL_SPEC_RULES[rule].format(usl=u, lsl=l, target=t))
+        return errors
+
+    def _jsl_block(self, test_name: str, usl: float, lsl: float, target: float, errors: List[str]) -> str:
+        """The chart block for one row, or the SKIPPED comment block when it has errors."""
+        if errors:
+            return CPK_SKIPPED_BLOCK.render(
+                test_name=test_name,
+                reasons="; ".join(errors),
+                usl=usl if not _missing(usl) else 'Not specified',
+                lsl=lsl if not _missing(lsl) else 'Not specified',
+                target=target if not _missing(target) else 'Not specified',
+            )
         
-        # If validation passes, generate normal JSL block
         entries = []
-        if not pd.isna(lsl):
+        if not _missing(lsl):
             entries.append(f"LSL({lsl})")
-        if not pd.isna(usl):
+        if not _missing(usl):
             entries.append(f"USL({usl})")
-        if not pd.isna(target):
+        if not _missing(target):
             entries.append(f"Target({target})")
+        return CPK_BLOCK.render(test_name=test_name, spec_line=", ".join(entries))
 
-        spec_line = ", ".join(entries)
-
-        # Guarantee trailing slash on imgdir
-        if imgdir and not imgdir.endswith("/"):
-            imgdir += "/"
-
-        return f"""// Start for {test_name}
-Column("{test_name}") << Set Property(
-    "Spec Limits",
-    {{{spec_line}}}
-);
-gb = Process Capability(
-    Process Variables( :{test_name} ),
-    Moving Range Method( Average of Moving Ranges ),
-    Individual Detail Reports( 1 ),
-    Capability Box Plots( 0 ),
-    Goal Plot( 0 ),
-    Capability Index Plot( 0 ),
-    Process Performance Plot( 0 )
-);
-Wait(0.5);
-If( Is Scriptable( gb ),
-    gb << Set Control Panel( 0 );
-    Wait( 0.3 );
-    gb << Save Picture( "{test_name}.png", png );
-    gb << Close Window;
-);
-// End for {test_name}
-"""
+    def make_jsl_block(self, test_name: str, usl: float, lsl: float, target: float, imgdir: str) -> str:
+        """
+        Construct a JSL block for one variable, including validation checks.
+        If validation fails, returns a comment block explaining why it was bypassed.
+        """
+        _, errors = self.validate_jsl_spec(test_name, usl, lsl, target)
+        return self._jsl_block(test_name, usl, lsl, target, errors)
     
-    def generate_jsl(self, matched_spec: pd.DataFrame, imgdir: str) -> str:
+    def generate_jsl(self, matched_spec: pd.DataFrame, imgdir: str, dest: Optional[str] = None) -> Optional[str]:
         """
         Build the full JSL content by concatenating blocks for all rows.
         Valid rows get JSL blocks, invalid rows get comment blocks explaining why they were skipped.
+        
+        With ``dest`` the script is written to that file and None is returned.
         """
-        blocks = []
         # Ensure numeric for limits
         usl_num = self.coerce_numeric(matched_spec["usl"])
         lsl_num = self.coerce_numeric(matched_spec["lsl"])
         tgt_num = self.coerce_numeric(matched_spec["target"])
         names = matched_spec["test_name"].astype(str).str.strip()
+        row_errors = self.validate_jsl_spec_frame(usl_num, lsl_num, tgt_num)
 
-        for name, usl, lsl, tgt in zip(names, usl_num, lsl_num, tgt_num):
-            # Generate block for all rows (valid or invalid)
-            # make_jsl_block will handle validation and return appropriate block
-            blocks.append(self.make_jsl_block(name, usl, lsl, tgt, imgdir))
-
-        return "\n\n".join(blocks)
+        writer = JSLWriter("excel2cpkv1", dest)
+        try:
+            for name, usl, lsl, tgt, errors in zip(names, usl_num.tolist(), lsl_num.tolist(), tgt_num.tolist(), row_errors):
+                # Valid rows get a chart block, invalid rows a comment block
+                writer.add(self._jsl_block(name, usl, lsl, tgt, errors), None if errors else f"{name}.png")
+        except Exception:
+            writer.close()
+            raise
+        return writer.finish()
     
-    def analyze_excel_file(self, file_path: str, imgdir: str = "/tmp/") -> Dict[str, Any]:
+    def analyze_excel_file(self, file_path: str, imgdir: str = "/tmp/",
+                           loaded: Optional[Tuple[pd.DataFrame, pd.DataFrame, str]] = None) -> Dict[str, Any]:
         """
         Main analysis function that processes Excel file and generates CSV + JSL
         
         Args:
             file_path: Path to Excel file
             imgdir: Directory for saving images (used in JSL)
+            loaded: (spec_df, data_df, route) already returned by load_excel for
+                this file, to skip reading it again
             
         Returns:
             Dict with analysis results
         """
         try:
             # 1) Load sheets and detect route
-            spec_raw, data_df, route = self.load_excel(file_path)
+            spec_raw, data_df, route = loaded or self.load_excel(file_path)
 
             # 2) Normalize columns to (test_name, usl, lsl, target)
             spec_norm = self.normalize_spec_columns(spec_raw, route=route)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Any, List, Optional
 import pandas as pd
@@ -13,6 +13,11 @@ import os
 import asyncio
 from app.core.storage import local_storage
 from ..base.zip_utils import ZipFileGenerator
+from ..base.analysis_session import (
+    SessionLoadError, add_session_routes, load_frames, open_session, session_store, with_session
+)
+from ..base.executor import cpu_bound
+from ..base.spec_validation import summarize_failed_rows
 from app.core.database import get_db
 from app.core.auth import get_current_user_optional
 from app.models import ProjectAttachment, AppUser
@@ -24,44 +29,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/excel2cpkv1", tags=["excel2cpkv1"])
 
-def _create_failed_rows_summary(row_errors, row_warnings):
-    """Create a summary of failed rows grouped by row number"""
-    failed_rows_summary = {}
-    
-    # Process errors
-    for error in row_errors:
-        row_num = error.get("row", "unknown")
-        if row_num not in failed_rows_summary:
-            failed_rows_summary[row_num] = {
-                "row": row_num,
-                "test_name": error.get("test_name", "unknown"),
-                "errors": [],
-                "warnings": []
-            }
-        failed_rows_summary[row_num]["errors"].append({
-            "issue": error.get("issue"),
-            "details": error.get("details", ""),
-            "values": {k: v for k, v in error.items() if k in ["usl", "lsl", "target"]}
-        })
-    
-    # Process warnings
-    for warning in row_warnings:
-        row_num = warning.get("row", "unknown")
-        if row_num not in failed_rows_summary:
-            failed_rows_summary[row_num] = {
-                "row": row_num,
-                "test_name": warning.get("test_name", "unknown"),
-                "errors": [],
-                "warnings": []
-            }
-        failed_rows_summary[row_num]["warnings"].append({
-            "issue": warning.get("issue"),
-            "details": warning.get("details", ""),
-            "values": {k: v for k, v in warning.items() if k in ["usl", "lsl", "target"]}
-        })
-    
-    return list(failed_rows_summary.values())
-
 # Initialize processor
 try:
     processor = ExcelToCPKProcessor()
@@ -70,6 +37,39 @@ except Exception as e:
     logger.error(f"Failed to initialize CPK processor: {e}")
     raise e
 
+SESSION_KIND = "excel2cpkv1"
+add_session_routes(router, SESSION_KIND)
+
+
+def _load_workbook(path: str):
+    """Session loader: read the spec/meta and data sheets once"""
+    try:
+        spec_df, data_df, route = processor.analyzer.load_excel(path)
+    except Exception as e:
+        raise SessionLoadError(str(e)) from e
+    return {"spec": spec_df, "data": data_df}, {"route": route}
+
+
+async def _loaded(session, request: Request = None):
+    """(spec_df, data_df, route) for the session, as returned by analyzer.load_excel"""
+    frames, attrs = await load_frames(session, _load_workbook, request)
+    return frames["spec"], frames["data"], attrs["route"]
+
+
+@cpu_bound(SESSION_KIND)
+def _process_file(path: str, project_name: str, project_description: str = "", imgdir: str = "/tmp/",
+                  loaded=None) -> Dict[str, Any]:
+    return processor.process_excel_file(path, project_name, project_description, imgdir, loaded=loaded)
+
+
+@cpu_bound(SESSION_KIND)
+def _match_frames(spec_df: pd.DataFrame, data_df: pd.DataFrame, route: str):
+    """(fai_cols, matched_spec, missing_in_data) for the process-data step"""
+    spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
+    fai_cols = processor.analyzer.find_fai_columns(data_df)
+    matched_spec, missing_in_data = processor.analyzer.match_spec_to_data(spec_norm, fai_cols)
+    return fai_cols, matched_spec, missing_in_data
+
 @router.get("/test")
 async def test_endpoint():
     """Test endpoint to debug processor initialization"""
@@ -97,8 +97,61 @@ async def test_processor():
             "status": "error"
         }
 
+@cpu_bound(SESSION_KIND)
+def _validate_upload(path: str):
+    """The three /validate checkpoints (checkpoint 1 with row-level validation)"""
+    # Run validation checkpoints
+    logger.info("Running checkpoint 1: Excel structure validation")
+    checkpoint1 = processor.validate_excel_structure(path)
+    logger.info(f"Checkpoint 1 result: {checkpoint1}")
+
+    # If file was fixed, use the fixed file for subsequent validations
+    file_to_validate = path
+    if checkpoint1.get("fix_applied", False):
+        file_to_validate = checkpoint1["fixed_file"]
+        logger.info(f"Using fixed file: {file_to_validate}")
+
+    # Run enhanced row-level validation for checkpoint 1
+    logger.info("Running enhanced checkpoint 1: Row-level validation")
+    spec_df, data_df, route = processor.analyzer.load_excel(file_to_validate)
+    spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
+    enhanced_checkpoint1 = processor.analyzer.validate_checkpoint1_enhanced(spec_norm)
+    logger.info(f"Enhanced checkpoint 1 result: {enhanced_checkpoint1}")
+
+    # Merge enhanced validation results into checkpoint1
+    checkpoint1["enhanced_validation"] = {
+        "valid": enhanced_checkpoint1["valid"],
+        "message": enhanced_checkpoint1["message"],
+        "row_errors": enhanced_checkpoint1["row_errors"],
+        "row_warnings": enhanced_checkpoint1["row_warnings"],
+        "total_errors": len(enhanced_checkpoint1["row_errors"]),
+        "total_warnings": len(enhanced_checkpoint1["row_warnings"])
+    }
+
+    # Update checkpoint1 details with enhanced validation info
+    if "details" not in checkpoint1:
+        checkpoint1["details"] = {}
+    checkpoint1["details"].update({
+        "enhanced_validation": enhanced_checkpoint1["details"],
+        "failed_rows": summarize_failed_rows(enhanced_checkpoint1["row_errors"], enhanced_checkpoint1["row_warnings"]),
+        "failed_rows_count": len(set(error.get("row", "unknown") for error in enhanced_checkpoint1["row_errors"] + enhanced_checkpoint1["row_warnings"]))
+    })
+
+    logger.info("Running checkpoint 2: Spec data validation")
+    checkpoint2 = processor.validate_spec_data(file_to_validate)
+    logger.info(f"Checkpoint 2 result: {checkpoint2}")
+
+    logger.info("Running checkpoint 3: Data matching validation")
+    checkpoint3 = processor.validate_data_matching(file_to_validate)
+    logger.info(f"Checkpoint 3 result: {checkpoint3}")
+
+    # Clean up the fixed copy; the caller removes the upload
+    if checkpoint1.get("fix_applied", False):
+        os.unlink(file_to_validate)
+    return checkpoint1, checkpoint2, checkpoint3
+
 @router.post("/validate")
-async def validate_excel_file(file: UploadFile = File(...)):
+async def validate_excel_file(request: Request, file: UploadFile = File(...)):
     """Validate Excel file structure and metadata"""
     try:
         logger.info(f"Starting CPK validation for file: {file.filename}")
@@ -111,54 +164,10 @@ async def validate_excel_file(file: UploadFile = File(...)):
             logger.info(f"Saved temporary file: {tmp_file.name}")
             
             # Run validation checkpoints
-            logger.info("Running checkpoint 1: Excel structure validation")
-            checkpoint1 = processor.validate_excel_structure(tmp_file.name)
-            logger.info(f"Checkpoint 1 result: {checkpoint1}")
-            
-            # If file was fixed, use the fixed file for subsequent validations
-            file_to_validate = tmp_file.name
-            if checkpoint1.get("fix_applied", False):
-                file_to_validate = checkpoint1["fixed_file"]
-                logger.info(f"Using fixed file: {file_to_validate}")
-            
-            # Run enhanced row-level validation for checkpoint 1
-            logger.info("Running enhanced checkpoint 1: Row-level validation")
-            spec_df, data_df, route = processor.analyzer.load_excel(file_to_validate)
-            spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
-            enhanced_checkpoint1 = processor.analyzer.validate_checkpoint1_enhanced(spec_norm)
-            logger.info(f"Enhanced checkpoint 1 result: {enhanced_checkpoint1}")
-            
-            # Merge enhanced validation results into checkpoint1
-            checkpoint1["enhanced_validation"] = {
-                "valid": enhanced_checkpoint1["valid"],
-                "message": enhanced_checkpoint1["message"],
-                "row_errors": enhanced_checkpoint1["row_errors"],
-                "row_warnings": enhanced_checkpoint1["row_warnings"],
-                "total_errors": len(enhanced_checkpoint1["row_errors"]),
-                "total_warnings": len(enhanced_checkpoint1["row_warnings"])
-            }
-            
-            # Update checkpoint1 details with enhanced validation info
-            if "details" not in checkpoint1:
-                checkpoint1["details"] = {}
-            checkpoint1["details"].update({
-                "enhanced_validation": enhanced_checkpoint1["details"],
-                "failed_rows": _create_failed_rows_summary(enhanced_checkpoint1["row_errors"], enhanced_checkpoint1["row_warnings"]),
-                "failed_rows_count": len(set(error.get("row", "unknown") for error in enhanced_checkpoint1["row_errors"] + enhanced_checkpoint1["row_warnings"]))
-            })
-            
-            logger.info("Running checkpoint 2: Spec data validation")
-            checkpoint2 = processor.validate_spec_data(file_to_validate)
-            logger.info(f"Checkpoint 2 result: {checkpoint2}")
-            
-            logger.info("Running checkpoint 3: Data matching validation")
-            checkpoint3 = processor.validate_data_matching(file_to_validate)
-            logger.info(f"Checkpoint 3 result: {checkpoint3}")
-            
-            # Clean up temp files
-            os.unlink(tmp_file.name)
-            if checkpoint1.get("fix_applied", False):
-                os.unlink(file_to_validate)
+            try:
+                checkpoint1, checkpoint2, checkpoint3 = await _validate_upload(tmp_file.name, request=request)
+            finally:
+                os.unlink(tmp_file.name)
             
             # Prepare response - simplify checkpoint details to avoid large responses
             simplified_checkpoints = []
@@ -191,6 +200,8 @@ async def validate_excel_file(file: UploadFile = File(...)):
             logger.info("CPK validation completed successfully")
             return response
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"CPK validation failed: {str(e)}", exc_info=True)
         import traceback
@@ -207,6 +218,7 @@ async def validate_excel_file(file: UploadFile = File(...)):
 
 @router.post("/process")
 async def process_excel_file(
+    request: Request,
     file: UploadFile = File(...),
     project_name: str = Form(...),
     project_description: str = Form(""),
@@ -224,17 +236,15 @@ async def process_excel_file(
             
             # Process the file
             logger.info("Starting CPK Excel processing...")
-            result = processor.process_excel_file(
-                tmp_file.name, 
-                project_name, 
-                project_description,
-                imgdir
-            )
+            try:
+                result = await _process_file(
+                    tmp_file.name, project_name, project_description, imgdir, request=request
+                )
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_file.name)
             logger.info(f"Processing result: {result}")
             
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
             if not result["success"]:
                 error_msg = result.get("error", "Processing failed")
                 logger.error(f"CPK processing failed: {error_msg}")
@@ -252,12 +262,17 @@ async def process_excel_file(
                 "missing_in_data": result["missing_in_data"]
             }
             
+    except HTTPException as e:
+        if e.status_code != 400:
+            raise
+        raise HTTPException(status_code=400, detail=f"CPK processing failed: {e.detail}")
     except Exception as e:
         logger.error(f"Exception in process_excel_file: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"CPK processing failed: {str(e)}")
 
 @router.post("/create-project")
 async def create_project_with_excel(
+    request: Request,
     file: UploadFile = File(...),
     project_name: str = Form(...),
     project_description: str = Form(""),
@@ -272,15 +287,13 @@ async def create_project_with_excel(
             tmp_file.flush()
             
             # Process the file
-            result = processor.process_excel_file(
-                tmp_file.name, 
-                project_name, 
-                project_description,
-                imgdir
-            )
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
+            try:
+                result = await _process_file(
+                    tmp_file.name, project_name, project_description, imgdir, request=request
+                )
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_file.name)
             
             if not result["success"]:
                 raise HTTPException(status_code=400, detail=result["error"])
@@ -297,31 +310,39 @@ async def create_project_with_excel(
                 "missing_in_data": result["missing_in_data"]
             }
             
+    except HTTPException as e:
+        if e.status_code != 400:
+            raise
+        raise HTTPException(status_code=400, detail=f"CPK project creation failed: {e.detail}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"CPK project creation failed: {str(e)}")
 
 @router.post("/run-analysis")
 async def run_analysis_modular(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
     project_id: str = Form(...),
     project_name: str = Form(...),
     project_description: str = Form(""),
     imgdir: str = Form("/tmp/"),
     cat_var: str = Form(None),  # Accept but ignore categorical variable for CPK
+    session_id: str = Form(None),
     db: AsyncSession = Depends(get_db),
     current_user: Optional[AppUser] = Depends(get_current_user_optional)
 ):
     """Run complete CPK analysis using modular approach"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
         logger.info(f"Running CPK analysis for project: {project_name}")
         stage = "init"
         
-        # Read uploaded file content
-        content = await file.read()
+        # Uploaded file content (stored with the wizard session)
+        content = session.read_bytes()
         
         # Use direct Celery call instead of HTTP to ensure proper queueing
         stage = "create_run"
         from app.core.celery import celery_app
+        from app.core.tracing import celery_headers
         from app.core.database import AsyncSessionLocal
         from app.core.websocket import publish_run_update
         from app.models import Run, RunStatus, Artifact
@@ -353,7 +374,7 @@ async def run_analysis_modular(
                 logger.info(f"[CPK] Run folder created: {run_dir_path}")
                 
                 # STEP 3: Save uploaded Excel to run folder
-                original_filename = file.filename or "original.xlsx"
+                original_filename = session.filename or "original.xlsx"
                 base = Path(original_filename).stem or "original"
                 ext = Path(original_filename).suffix or ".xlsx"
                 ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -379,11 +400,13 @@ async def run_analysis_modular(
                 
                 # STEP 4: Process Excel file from run folder
                 stage = "process_excel"
-                result = processor.process_excel_file(
+                result = await _process_file(
                     str(excel_storage_path), 
                     project_name, 
                     project_description,
-                    imgdir
+                    imgdir,
+                    loaded=await _loaded(session, request),
+                    request=request
                 )
                 
                 if not result["success"]:
@@ -426,7 +449,7 @@ async def run_analysis_modular(
                 stage = "create_zip"
                 zip_result = ZipFileGenerator.create_analysis_zip(
                     excel_content=content,
-                    excel_filename=file.filename,
+                    excel_filename=session.filename,
                     csv_content=result["files"]["csv_content"],
                     jsl_content=result["files"]["jsl_content"],
                     analysis_type="cpk"
@@ -436,7 +459,7 @@ async def run_analysis_modular(
                 zip_info = None
                 if zip_result and zip_result.get("success"):
                     # Save ZIP file to storage
-                    zip_key = local_storage.generate_project_attachment_key(project_id, f"analysis_{file.filename}.zip")
+                    zip_key = local_storage.generate_project_attachment_key(project_id, f"analysis_{session.filename}.zip")
                     with open(zip_result["zip_path"], 'rb') as zip_file:
                         zip_content = zip_file.read()
                     local_storage.save_file(zip_content, zip_key)
@@ -551,7 +574,7 @@ Open("{absolute_csv_path}");
                 
                 # STEP 8: Queue Celery task directly (only after task folder is prepared)
                 logger.info(f"[CPK] Queuing Celery task 'run_jmp_boxplot' for run {run.id}")
-                celery_app.send_task("run_jmp_boxplot", args=[str(run.id)])
+                celery_app.send_task("run_jmp_boxplot", args=[str(run.id)], headers=celery_headers())
                 
                 # Publish initial status
                 await publish_run_update(str(run.id), {
@@ -574,6 +597,8 @@ Open("{absolute_csv_path}");
                     "jmp_task_id": run.jmp_task_id
                 }
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 last_error = str(e)
                 logger.error(f"[CPK] Failed to create run directly: {e}", exc_info=True)
@@ -586,6 +611,10 @@ Open("{absolute_csv_path}");
                     },
                 )
         
+        # The run has its own copy of the workbook; the wizard session is done
+        stage = "cleanup"
+        session_store.close(session.id)
+        
         return {
             "success": True, 
             "message": "Run created and queued", 
@@ -593,46 +622,46 @@ Open("{absolute_csv_path}");
             "storage": {"csv_key": csv_storage_key, "jsl_key": jsl_storage_key, "zip_key": zip_key},
             "zip_info": zip_info
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[CPK] Error running analysis: {e}", exc_info=True)
         return JSONResponse(status_code=400, content={"success": False, "error": str(e), "stage": locals().get("stage", "unknown")})
 
 @router.post("/load-file")
-async def load_excel_file(file: UploadFile = File(...)):
+async def load_excel_file(request: Request, file: UploadFile = File(None), session_id: str = Form(None)):
     """Load Excel file and analyze structure"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
-        logger.info(f"Loading CPK Excel file: {file.filename}")
+        logger.info(f"Loading CPK Excel file: {session.filename} (session {session.id})")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            # Load file using analyzer
-            spec_df, data_df, route = processor.analyzer.load_excel(tmp_file.name)
-            fai_columns = processor.analyzer.find_fai_columns(data_df)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
-            return {
-                "success": True,
-                "message": "Excel file loaded successfully",
-                "route": route,
-                "spec_shape": spec_df.shape,
-                "data_shape": data_df.shape,
-                "fai_columns": fai_columns,
-                "fai_columns_count": len(fai_columns),
-                "sheets": ["spec", "data"],  # CPK uses spec/data sheets
-                "meta_shape": spec_df.shape,
-                "data_shape": data_df.shape,
-                "meta_columns": spec_df.columns.tolist(),
-                "data_columns": data_df.columns.tolist(),
-                "categorical_columns": ["CPK_Analysis"],  # Dummy categorical variable for CPK
-                "missing_required_columns": []  # No missing columns for CPK
-            }
-            
+        # Parse once; later steps reuse the DataFrames through session_id
+        spec_df, data_df, route = await _loaded(session, request)
+        fai_columns = processor.analyzer.find_fai_columns(data_df)
+        
+        return with_session({
+            "success": True,
+            "message": "Excel file loaded successfully",
+            "route": route,
+            "spec_shape": spec_df.shape,
+            "data_shape": data_df.shape,
+            "fai_columns": fai_columns,
+            "fai_columns_count": len(fai_columns),
+            "sheets": ["spec", "data"],  # CPK uses spec/data sheets
+            "meta_shape": spec_df.shape,
+            "data_shape": data_df.shape,
+            "meta_columns": spec_df.columns.tolist(),
+            "data_columns": data_df.columns.tolist(),
+            "categorical_columns": ["CPK_Analysis"],  # Dummy categorical variable for CPK
+            "missing_required_columns": []  # No missing columns for CPK
+        }, session)
+        
+    except SessionLoadError as e:
+        session_store.close(session.id)
+        logger.error(f"Error loading CPK Excel file: {str(e)}")
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error loading CPK Excel file: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -645,37 +674,33 @@ async def load_excel_file(file: UploadFile = File(...)):
 
 @router.post("/set-categorical")
 async def set_categorical_variable(
-    file: UploadFile = File(...),
-    cat_var: str = Form("dummy")
+    request: Request,
+    file: UploadFile = File(None),
+    cat_var: str = Form("dummy"),
+    session_id: str = Form(None)
 ):
     """Set categorical variable for analysis - CPK doesn't require categorical grouping"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
         logger.info(f"Setting categorical variable for CPK: {cat_var}")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            # Load file first
-            spec_df, data_df, route = processor.analyzer.load_excel(tmp_file.name)
-            
-            # For CPK analysis, we don't actually need categorical grouping
-            # Just return success with dummy values
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
-            return {
-                "success": True,
-                "message": "CPK analysis doesn't require categorical grouping - proceeding with process capability analysis",
-                "categorical_variable": "CPK_Analysis",
-                "unique_values": 1,
-                "total_values": len(data_df),
-                "note": "Process Capability analysis works on individual variables without grouping",
-                "available_categorical_columns": ["CPK_Analysis"]
-            }
-            
+        # Load file first
+        spec_df, data_df, route = await _loaded(session, request)
+        
+        # For CPK analysis, we don't actually need categorical grouping
+        # Just return success with dummy values
+        return {
+            "success": True,
+            "message": "CPK analysis doesn't require categorical grouping - proceeding with process capability analysis",
+            "categorical_variable": "CPK_Analysis",
+            "unique_values": 1,
+            "total_values": len(data_df),
+            "note": "Process Capability analysis works on individual variables without grouping",
+            "available_categorical_columns": ["CPK_Analysis"]
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error setting categorical variable for CPK: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -686,199 +711,204 @@ async def set_categorical_variable(
             }
         )
 
+@cpu_bound(SESSION_KIND)
+def _validate_frames(spec_df: pd.DataFrame, data_df: pd.DataFrame, route: str) -> Dict[str, Any]:
+    """The validate-data checkpoints on the loaded spec/data sheets"""
+    # The mappings below modify the spec sheet; copy it so the session's frame is
+    # untouched when jobs run on threads (EXTENSION_POOL_WORKERS=0)
+    spec_df = spec_df.copy()
+
+    # Convert column names to lowercase
+    spec_df.columns = spec_df.columns.str.lower()
+
+    # Handle column name mappings as per CPK logic
+    if "y variable" in spec_df.columns:
+        spec_df["test_name"] = spec_df["y variable"]
+    if "usl" in spec_df.columns:
+        spec_df["usl"] = spec_df["usl"]
+    if "lsl" in spec_df.columns:
+        spec_df["lsl"] = spec_df["lsl"]
+    if "target" in spec_df.columns:
+        spec_df["target"] = spec_df["target"]
+
+    # Perform additional validations
+    spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
+    fai_cols = processor.analyzer.find_fai_columns(data_df)
+    matched_spec, missing_in_data = processor.analyzer.match_spec_to_data(spec_norm, fai_cols)
+
+    # Prepare validation results in the format expected by frontend
+    checkpoints = []
+
+    # Checkpoint 1: Enhanced validation with row-level checks
+    checkpoint1_result = processor.analyzer.validate_checkpoint1_enhanced(spec_norm)
+    checkpoints.append({
+        "valid": checkpoint1_result["valid"],
+        "checkpoint": 1,
+        "message": checkpoint1_result["message"],
+        "details": checkpoint1_result["details"],
+        "row_errors": checkpoint1_result["row_errors"],
+        "row_warnings": checkpoint1_result["row_warnings"]
+    })
+
+    # Checkpoint 2: Column mappings validation
+    column_mappings = {
+        "y_variable_mapped": "y variable" in spec_df.columns,
+        "usl_mapped": "usl" in spec_df.columns,
+        "lsl_mapped": "lsl" in spec_df.columns,
+        "target_mapped": "target" in spec_df.columns
+    }
+    checkpoint2_valid = all(column_mappings.values())
+    checkpoint2_message = "All column mappings successful" if checkpoint2_valid else "Some column mappings failed"
+    checkpoints.append({
+        "valid": checkpoint2_valid,
+        "checkpoint": 2,
+        "message": checkpoint2_message,
+        "details": {
+            "column_mappings": column_mappings,
+            "route": route,
+            "sheets": ["spec", "data"] if route == "spec" else ["meta", "data"]
+        }
+    })
+
+    # Checkpoint 3: FAI columns and data matching validation
+    checkpoint3_valid = len(fai_cols) > 0 and len(missing_in_data) == 0
+    checkpoint3_message = f"Found {len(fai_cols)} FAI columns, {len(matched_spec)} spec rows matched" if checkpoint3_valid else f"FAI columns: {len(fai_cols)}, Missing in data: {len(missing_in_data)}"
+    checkpoints.append({
+        "valid": checkpoint3_valid,
+        "checkpoint": 3,
+        "message": checkpoint3_message,
+        "details": {
+            "fai_columns_found": len(fai_cols),
+            "matched_spec_rows": len(matched_spec),
+            "missing_in_data_rows": len(missing_in_data),
+            "fai_columns": fai_cols,
+            "data_columns": data_df.columns.tolist()
+        }
+    })
+
+    # Overall validation result
+    overall_valid = all(checkpoint["valid"] for checkpoint in checkpoints)
+
+    # Get additional validations for compatibility
+    validations = processor.analyzer.validate_spec(spec_norm)
+
+    # Convert validations DataFrames to JSON-serializable format
+    serializable_validations = {}
+    for key, df in validations.items():
+        if isinstance(df, pd.DataFrame):
+            # Convert DataFrame to list of dictionaries, handling numpy types
+            serializable_validations[key] = df.replace({np.nan: None}).to_dict('records')
+        else:
+            serializable_validations[key] = df
+
+    # Convert missing_in_data DataFrame to JSON-serializable format
+    serializable_missing_in_data = missing_in_data.replace({np.nan: None}).to_dict('records') if len(missing_in_data) > 0 else []
+
+    # Count total errors and warnings from all checkpoints
+    total_errors = sum(len(cp.get("row_errors", [])) for cp in checkpoints)
+    total_warnings = sum(len(cp.get("row_warnings", [])) for cp in checkpoints)
+
+    # Collect all failed rows from all checkpoints
+    all_failed_rows = []
+    all_warning_rows = []
+
+    for checkpoint in checkpoints:
+        # Add errors from this checkpoint
+        for error in checkpoint.get("row_errors", []):
+            error["checkpoint"] = checkpoint["checkpoint"]
+            all_failed_rows.append(error)
+
+        # Add warnings from this checkpoint
+        for warning in checkpoint.get("row_warnings", []):
+            warning["checkpoint"] = checkpoint["checkpoint"]
+            all_warning_rows.append(warning)
+
+    # Sort failed rows by row number for better readability
+    all_failed_rows.sort(key=lambda x: x.get("row", 0))
+    all_warning_rows.sort(key=lambda x: x.get("row", 0))
+
+    # Create summary of failed rows by row number
+    failed_rows_summary = {}
+    for error in all_failed_rows:
+        row_num = error.get("row", "unknown")
+        if row_num not in failed_rows_summary:
+            failed_rows_summary[row_num] = {
+                "row": row_num,
+                "test_name": error.get("test_name", "unknown"),
+                "errors": [],
+                "warnings": []
+            }
+        failed_rows_summary[row_num]["errors"].append({
+            "checkpoint": error.get("checkpoint"),
+            "issue": error.get("issue"),
+            "details": error.get("details", ""),
+            "values": {k: v for k, v in error.items() if k in ["usl", "lsl", "target"]}
+        })
+
+    # Add warnings to the summary
+    for warning in all_warning_rows:
+        row_num = warning.get("row", "unknown")
+        if row_num not in failed_rows_summary:
+            failed_rows_summary[row_num] = {
+                "row": row_num,
+                "test_name": warning.get("test_name", "unknown"),
+                "errors": [],
+                "warnings": []
+            }
+        failed_rows_summary[row_num]["warnings"].append({
+            "checkpoint": warning.get("checkpoint"),
+            "issue": warning.get("issue"),
+            "details": warning.get("details", ""),
+            "values": {k: v for k, v in warning.items() if k in ["usl", "lsl", "target"]}
+        })
+
+    validation_results = {
+        "valid": overall_valid,
+        "message": "CPK data validation completed" if overall_valid else "CPK validation completed with issues",
+        "checkpoints": checkpoints,
+        "route": route,
+        "sheets": ["spec", "data"] if route == "spec" else ["meta", "data"],
+        "spec_columns": spec_df.columns.tolist(),
+        "data_columns": data_df.columns.tolist(),
+        "required_columns": ["test_name", "usl", "lsl", "target"],
+        "missing_required_columns": checkpoint1_result["details"].get("missing_columns", []),
+        "column_mappings": column_mappings,
+        "fai_columns_found": len(fai_cols),
+        "matched_spec_rows": len(matched_spec),
+        "missing_in_data_rows": len(missing_in_data),
+        "missing_in_data": serializable_missing_in_data,
+        "validations": serializable_validations,
+        "has_errors": not overall_valid or total_errors > 0,
+        "has_warnings": total_warnings > 0 or any(k.startswith("Warning_") for k in validations.keys()),
+        "total_errors": total_errors,
+        "total_warnings": total_warnings,
+        "failed_rows": list(failed_rows_summary.values()),
+        "failed_rows_count": len(failed_rows_summary),
+        "all_errors": all_failed_rows,
+        "all_warnings": all_warning_rows
+    }
+
+    return validation_results
+
+
 @router.post("/validate-data")
 async def validate_data_modular(
-    file: UploadFile = File(...),
-    cat_var: str = Form("dummy")
+    request: Request,
+    file: UploadFile = File(None),
+    cat_var: str = Form("dummy"),
+    session_id: str = Form(None)
 ):
     """Validate data using modular approach - CPK validation logic"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
         logger.info(f"Validating CPK data (categorical variable not required)")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            # Load file and perform CPK-specific validation
-            spec_df, data_df, route = processor.analyzer.load_excel(tmp_file.name)
-            
-            # Convert column names to lowercase
-            spec_df.columns = spec_df.columns.str.lower()
-            
-            # Handle column name mappings as per CPK logic
-            if "y variable" in spec_df.columns:
-                spec_df["test_name"] = spec_df["y variable"]
-            if "usl" in spec_df.columns:
-                spec_df["usl"] = spec_df["usl"]
-            if "lsl" in spec_df.columns:
-                spec_df["lsl"] = spec_df["lsl"]
-            if "target" in spec_df.columns:
-                spec_df["target"] = spec_df["target"]
-            
-            # Perform additional validations
-            spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
-            fai_cols = processor.analyzer.find_fai_columns(data_df)
-            matched_spec, missing_in_data = processor.analyzer.match_spec_to_data(spec_norm, fai_cols)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
-            # Prepare validation results in the format expected by frontend
-            checkpoints = []
-            
-            # Checkpoint 1: Enhanced validation with row-level checks
-            checkpoint1_result = processor.analyzer.validate_checkpoint1_enhanced(spec_norm)
-            checkpoints.append({
-                "valid": checkpoint1_result["valid"],
-                "checkpoint": 1,
-                "message": checkpoint1_result["message"],
-                "details": checkpoint1_result["details"],
-                "row_errors": checkpoint1_result["row_errors"],
-                "row_warnings": checkpoint1_result["row_warnings"]
-            })
-            
-            # Checkpoint 2: Column mappings validation
-            column_mappings = {
-                "y_variable_mapped": "y variable" in spec_df.columns,
-                "usl_mapped": "usl" in spec_df.columns,
-                "lsl_mapped": "lsl" in spec_df.columns,
-                "target_mapped": "target" in spec_df.columns
-            }
-            checkpoint2_valid = all(column_mappings.values())
-            checkpoint2_message = "All column mappings successful" if checkpoint2_valid else "Some column mappings failed"
-            checkpoints.append({
-                "valid": checkpoint2_valid,
-                "checkpoint": 2,
-                "message": checkpoint2_message,
-                "details": {
-                    "column_mappings": column_mappings,
-                    "route": route,
-                    "sheets": ["spec", "data"] if route == "spec" else ["meta", "data"]
-                }
-            })
-            
-            # Checkpoint 3: FAI columns and data matching validation
-            checkpoint3_valid = len(fai_cols) > 0 and len(missing_in_data) == 0
-            checkpoint3_message = f"Found {len(fai_cols)} FAI columns, {len(matched_spec)} spec rows matched" if checkpoint3_valid else f"FAI columns: {len(fai_cols)}, Missing in data: {len(missing_in_data)}"
-            checkpoints.append({
-                "valid": checkpoint3_valid,
-                "checkpoint": 3,
-                "message": checkpoint3_message,
-                "details": {
-                    "fai_columns_found": len(fai_cols),
-                    "matched_spec_rows": len(matched_spec),
-                    "missing_in_data_rows": len(missing_in_data),
-                    "fai_columns": fai_cols,
-                    "data_columns": data_df.columns.tolist()
-                }
-            })
-            
-            # Overall validation result
-            overall_valid = all(checkpoint["valid"] for checkpoint in checkpoints)
-            
-            # Get additional validations for compatibility
-            validations = processor.analyzer.validate_spec(spec_norm)
-            
-            # Convert validations DataFrames to JSON-serializable format
-            serializable_validations = {}
-            for key, df in validations.items():
-                if isinstance(df, pd.DataFrame):
-                    # Convert DataFrame to list of dictionaries, handling numpy types
-                    serializable_validations[key] = df.replace({np.nan: None}).to_dict('records')
-                else:
-                    serializable_validations[key] = df
-            
-            # Convert missing_in_data DataFrame to JSON-serializable format
-            serializable_missing_in_data = missing_in_data.replace({np.nan: None}).to_dict('records') if len(missing_in_data) > 0 else []
-            
-            # Count total errors and warnings from all checkpoints
-            total_errors = sum(len(cp.get("row_errors", [])) for cp in checkpoints)
-            total_warnings = sum(len(cp.get("row_warnings", [])) for cp in checkpoints)
-            
-            # Collect all failed rows from all checkpoints
-            all_failed_rows = []
-            all_warning_rows = []
-            
-            for checkpoint in checkpoints:
-                # Add errors from this checkpoint
-                for error in checkpoint.get("row_errors", []):
-                    error["checkpoint"] = checkpoint["checkpoint"]
-                    all_failed_rows.append(error)
-                
-                # Add warnings from this checkpoint
-                for warning in checkpoint.get("row_warnings", []):
-                    warning["checkpoint"] = checkpoint["checkpoint"]
-                    all_warning_rows.append(warning)
-            
-            # Sort failed rows by row number for better readability
-            all_failed_rows.sort(key=lambda x: x.get("row", 0))
-            all_warning_rows.sort(key=lambda x: x.get("row", 0))
-            
-            # Create summary of failed rows by row number
-            failed_rows_summary = {}
-            for error in all_failed_rows:
-                row_num = error.get("row", "unknown")
-                if row_num not in failed_rows_summary:
-                    failed_rows_summary[row_num] = {
-                        "row": row_num,
-                        "test_name": error.get("test_name", "unknown"),
-                        "errors": [],
-                        "warnings": []
-                    }
-                failed_rows_summary[row_num]["errors"].append({
-                    "checkpoint": error.get("checkpoint"),
-                    "issue": error.get("issue"),
-                    "details": error.get("details", ""),
-                    "values": {k: v for k, v in error.items() if k in ["usl", "lsl", "target"]}
-                })
-            
-            # Add warnings to the summary
-            for warning in all_warning_rows:
-                row_num = warning.get("row", "unknown")
-                if row_num not in failed_rows_summary:
-                    failed_rows_summary[row_num] = {
-                        "row": row_num,
-                        "test_name": warning.get("test_name", "unknown"),
-                        "errors": [],
-                        "warnings": []
-                    }
-                failed_rows_summary[row_num]["warnings"].append({
-                    "checkpoint": warning.get("checkpoint"),
-                    "issue": warning.get("issue"),
-                    "details": warning.get("details", ""),
-                    "values": {k: v for k, v in warning.items() if k in ["usl", "lsl", "target"]}
-                })
-            
-            validation_results = {
-                "valid": overall_valid,
-                "message": "CPK data validation completed" if overall_valid else "CPK validation completed with issues",
-                "checkpoints": checkpoints,
-                "route": route,
-                "sheets": ["spec", "data"] if route == "spec" else ["meta", "data"],
-                "spec_columns": spec_df.columns.tolist(),
-                "data_columns": data_df.columns.tolist(),
-                "required_columns": ["test_name", "usl", "lsl", "target"],
-                "missing_required_columns": checkpoint1_result["details"].get("missing_columns", []),
-                "column_mappings": column_mappings,
-                "fai_columns_found": len(fai_cols),
-                "matched_spec_rows": len(matched_spec),
-                "missing_in_data_rows": len(missing_in_data),
-                "missing_in_data": serializable_missing_in_data,
-                "validations": serializable_validations,
-                "has_errors": not overall_valid or total_errors > 0,
-                "has_warnings": total_warnings > 0 or any(k.startswith("Warning_") for k in validations.keys()),
-                "total_errors": total_errors,
-                "total_warnings": total_warnings,
-                "failed_rows": list(failed_rows_summary.values()),
-                "failed_rows_count": len(failed_rows_summary),
-                "all_errors": all_failed_rows,
-                "all_warnings": all_warning_rows
-            }
-            
-            return validation_results
-            
+        # Load file and perform CPK-specific validation
+        spec_df, data_df, route = await _loaded(session, request)
+        return await _validate_frames(spec_df, data_df, route, request=request)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error validating CPK data: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -891,40 +921,34 @@ async def validate_data_modular(
 
 @router.post("/process-data")
 async def process_data_modular(
-    file: UploadFile = File(...),
-    cat_var: str = Form("dummy")
+    request: Request,
+    file: UploadFile = File(None),
+    cat_var: str = Form("dummy"),
+    session_id: str = Form(None)
 ):
     """Process data using modular approach - CPK doesn't require categorical grouping"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
         logger.info(f"Processing CPK data (categorical variable not required)")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            # Load file
-            spec_df, data_df, route = processor.analyzer.load_excel(tmp_file.name)
-            spec_norm = processor.analyzer.normalize_spec_columns(spec_df, route)
-            fai_cols = processor.analyzer.find_fai_columns(data_df)
-            matched_spec, missing_in_data = processor.analyzer.match_spec_to_data(spec_norm, fai_cols)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
-            return {
-                "success": True,
-                "message": "CPK data processing completed (no categorical grouping required)",
-                "route": route,
-                "fai_columns_found": len(fai_cols),
-                "matched_spec_rows": len(matched_spec),
-                "missing_in_data_rows": len(missing_in_data),
-                "fai_columns": fai_cols,
-                "missing_in_data": missing_in_data.to_dict() if not missing_in_data.empty else {},
-                "note": "Process Capability analysis processes individual variables without grouping"
-            }
-            
+        # Load file
+        spec_df, data_df, route = await _loaded(session, request)
+        fai_cols, matched_spec, missing_in_data = await _match_frames(spec_df, data_df, route, request=request)
+        
+        return {
+            "success": True,
+            "message": "CPK data processing completed (no categorical grouping required)",
+            "route": route,
+            "fai_columns_found": len(fai_cols),
+            "matched_spec_rows": len(matched_spec),
+            "missing_in_data_rows": len(missing_in_data),
+            "fai_columns": fai_cols,
+            "missing_in_data": missing_in_data.to_dict() if not missing_in_data.empty else {},
+            "note": "Process Capability analysis processes individual variables without grouping"
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing CPK data: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -937,43 +961,41 @@ async def process_data_modular(
 
 @router.post("/generate-files")
 async def generate_files_modular(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
     cat_var: str = Form("dummy"),
-    imgdir: str = Form("/tmp/")
+    imgdir: str = Form("/tmp/"),
+    session_id: str = Form(None)
 ):
     """Generate CSV and JSL files using modular approach - CPK doesn't require categorical grouping"""
+    session = await open_session(SESSION_KIND, file, session_id)
     try:
         logger.info(f"Generating CPK files (categorical variable not required)")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            # Process the file
-            result = processor.process_excel_file(tmp_file.name, "CPK Analysis", "", imgdir)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
-            if not result["success"]:
-                return JSONResponse(
-                    status_code=400,
-                    content={
-                        "success": False,
-                        "error": result["error"]
-                    }
-                )
-            
-            return {
-                "success": True,
-                "message": "CPK files generated successfully (no categorical grouping required)",
-                "files": result["files"],
-                "details": result["details"],
-                "note": "Process Capability analysis generates files for individual variables without grouping"
-            }
-            
+        # Process the file
+        result = await _process_file(
+            session.path, "CPK Analysis", "", imgdir, loaded=await _loaded(session, request), request=request
+        )
+        
+        if not result["success"]:
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "success": False,
+                    "error": result["error"]
+                }
+            )
+        
+        return {
+            "success": True,
+            "message": "CPK files generated successfully (no categorical grouping required)",
+            "files": result["files"],
+            "details": result["details"],
+            "note": "Process Capability analysis generates files for individual variables without grouping"
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating CPK files: {str(e)}", exc_info=True)
         return JSONResponse(
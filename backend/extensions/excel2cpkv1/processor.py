@@ -10,11 +10,12 @@ import numpy as np
 import tempfile
 import os
 import zipfile
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import logging
 
 from .analyzer import CPKAnalyzer
+from ..base.spec_validation import summarize_failed_rows
 
 logger = logging.getLogger(__name__)
 
@@ -24,44 +25,6 @@ class ExcelToCPKProcessor:
     def __init__(self):
         self.analyzer = CPKAnalyzer()
     
-    def _create_failed_rows_summary(self, row_errors, row_warnings):
-        """Create a summary of failed rows grouped by row number"""
-        failed_rows_summary = {}
-        
-        # Process errors
-        for error in row_errors:
-            row_num = error.get("row", "unknown")
-            if row_num not in failed_rows_summary:
-                failed_rows_summary[row_num] = {
-                    "row": row_num,
-                    "test_name": error.get("test_name", "unknown"),
-                    "errors": [],
-                    "warnings": []
-                }
-            failed_rows_summary[row_num]["errors"].append({
-                "issue": error.get("issue"),
-                "details": error.get("details", ""),
-                "values": {k: v for k, v in error.items() if k in ["usl", "lsl", "target"]}
-            })
-        
-        # Process warnings
-        for warning in row_warnings:
-            row_num = warning.get("row", "unknown")
-            if row_num not in failed_rows_summary:
-                failed_rows_summary[row_num] = {
-                    "row": row_num,
-                    "test_name": warning.get("test_name", "unknown"),
-                    "errors": [],
-                    "warnings": []
-                }
-            failed_rows_summary[row_num]["warnings"].append({
-                "issue": warning.get("issue"),
-                "details": warning.get("details", ""),
-                "values": {k: v for k, v in warning.items() if k in ["usl", "lsl", "target"]}
-            })
-        
-        return list(failed_rows_summary.values())
-    
     def fix_excel_file(self, file_path: str) -> Dict[str, Any]:
         """
         Fix corrupted Excel file by repairing window position settings
@@ -187,7 +150,7 @@ class ExcelToCPKProcessor:
             enhanced_validation = self.analyzer.validate_checkpoint1_enhanced(spec_norm)
             
             # Create failed rows summary
-            failed_rows_summary = self._create_failed_rows_summary(
+            failed_rows_summary = summarize_failed_rows(
                 enhanced_validation["row_errors"], 
                 enhanced_validation["row_warnings"]
             )
@@ -302,7 +265,8 @@ class ExcelToCPKProcessor:
             }
     
     def process_excel_file(self, file_path: str, project_name: str, 
-                          project_description: str = "", imgdir: str = "/tmp/") -> Dict[str, Any]:
+                          project_description: str = "", imgdir: str = "/tmp/",
+                          loaded: Optional[Tuple[pd.DataFrame, pd.DataFrame, str]] = None) -> Dict[str, Any]:
         """
         Process Excel file and generate CSV + JSL
         
@@ -311,13 +275,14 @@ class ExcelToCPKProcessor:
             project_name: Name of the project
             project_description: Description of the project
             imgdir: Directory for saving images
+            loaded: (spec_df, data_df, route) already loaded from the file
             
         Returns:
             Dict with processing results
         """
         try:
             # Run the complete analysis
-            result = self.analyzer.analyze_excel_file(file_path, imgdir)
+            result = self.analyzer.analyze_excel_file(file_path, imgdir, loaded=loaded)
             
             if not result["success"]:
                 return result
@@ -1,26 +1,103 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
 from typing import Dict, Any, List, Optional
 import pandas as pd
 import tempfile
 import os
 from pathlib import Path
 
+from ..base.executor import cpu_bound
+from ..base.jsl_render import JSLTemplate
+
 router = APIRouter(prefix="/excel2processcapability", tags=["excel2processcapability"])
 
+# Capability script; fields not known from the data keep their {{PLACEHOLDER}} text
+CAPABILITY_TEMPLATE = JSLTemplate("""{header}
+
+{open_csv}
+dt = Open( "{{{{CSV_PATH}}}}" );
+
+{calculate}
+capability = dt << Distribution(
+    Continuous Distribution( Column( :{value_column} ) ),
+    Capability Analysis(
+        Spec Limits( {spec_lower}, {spec_upper} ),
+        Target( ({spec_lower} + {spec_upper}) / 2 )
+    )
+);
+
+{save}
+capability << Save Picture( "process_capability_analysis.png" );
+
+{report}
+capability << Capability Report;
+
+{close}
+Close( dt );
+""", name="excel2processcapability.capability")
+
 # Initialize analyzer with default language
 from .analyzer import ProcessCapabilityAnalyzer
 analyzer = ProcessCapabilityAnalyzer()
 
+
+@cpu_bound("excel2processcapability")
+def _preview_sheets(path: str) -> List[Dict[str, Any]]:
+    excel_file = pd.ExcelFile(path)
+    sheets = []
+    
+    for sheet_name in excel_file.sheet_names:
+        df = pd.read_excel(path, sheet_name=sheet_name, nrows=5)
+        sheets.append({
+            'name': sheet_name,
+            'columns': df.columns.tolist(),
+            'row_count': len(pd.read_excel(path, sheet_name=sheet_name)),
+            'preview': df.head(3).values.tolist()
+        })
+    return sheets
+
+
+@cpu_bound("excel2processcapability")
+def _generate_analysis(path: str, sheet_name: Optional[str], chart_type: str, spec_lower: Optional[float],
+                       spec_upper: Optional[float], language: str):
+    """(validation_result, jsl_template, data_info); the template is None when validation fails"""
+    analyzer.language = language
+    if sheet_name:
+        df = pd.read_excel(path, sheet_name=sheet_name)
+    else:
+        df = pd.read_excel(path)
+    
+    # Add specification limits if provided
+    if spec_lower is not None and spec_upper is not None:
+        df['spec_lower'] = spec_lower
+        df['spec_upper'] = spec_upper
+    
+    validation_result = analyzer.validate_data(df, chart_type)
+    if not validation_result['valid']:
+        return validation_result, None, None
+    data_info = {
+        'rows': len(df),
+        'columns': len(df.columns),
+        'column_types': df.dtypes.to_dict()
+    }
+    return validation_result, generate_capability_jsl(df, chart_type, language), data_info
+
+
+@cpu_bound("excel2processcapability")
+def _validate_analysis(path: str, chart_type: str, language: str):
+    """(validation_result, data_shape, columns)"""
+    analyzer.language = language
+    df = pd.read_excel(path)
+    return analyzer.validate_data(df, chart_type), df.shape, df.columns.tolist()
+
+
 @router.post("/analyze")
 async def analyze_excel_file(
+    request: Request,
     file: UploadFile = File(...),
     language: str = Query("en", description="Language for responses (en/zh)")
 ):
     """Analyze uploaded Excel file for process capability"""
     try:
-        # Set analyzer language
-        analyzer.language = language
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
             content = await file.read()
@@ -28,20 +105,11 @@ async def analyze_excel_file(
             tmp_file.flush()
             
             # Read Excel file
-            excel_file = pd.ExcelFile(tmp_file.name)
-            sheets = []
-            
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(tmp_file.name, sheet_name=sheet_name, nrows=5)
-                sheets.append({
-                    'name': sheet_name,
-                    'columns': df.columns.tolist(),
-                    'row_count': len(pd.read_excel(tmp_file.name, sheet_name=sheet_name)),
-                    'preview': df.head(3).values.tolist()
-                })
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
+            try:
+                sheets = await _preview_sheets(tmp_file.name, request=request)
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_file.name)
             
             return {
                 'sheets': sheets,
@@ -50,6 +118,8 @@ async def analyze_excel_file(
                 'language': language
             }
             
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Failed to analyze Excel file: {str(e)}"
         if language == 'zh':
@@ -58,6 +128,7 @@ async def analyze_excel_file(
 
 @router.post("/generate")
 async def generate_capability_analysis(
+    request: Request,
     file: UploadFile = File(...),
     sheet_name: str = None,
     chart_type: str = "cpk_analysis",
@@ -67,47 +138,29 @@ async def generate_capability_analysis(
 ):
     """Generate process capability analysis from Excel file"""
     try:
-        # Set analyzer language
-        analyzer.language = language
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
             content = await file.read()
             tmp_file.write(content)
             tmp_file.flush()
             
-            # Read Excel file
-            if sheet_name:
-                df = pd.read_excel(tmp_file.name, sheet_name=sheet_name)
-            else:
-                df = pd.read_excel(tmp_file.name)
-            
-            # Add specification limits if provided
-            if spec_lower is not None and spec_upper is not None:
-                df['spec_lower'] = spec_lower
-                df['spec_upper'] = spec_upper
-            
-            # Validate data using analyzer
-            validation_result = analyzer.validate_data(df, chart_type)
+            # Read, validate and generate the JSL template
+            try:
+                validation_result, jsl_template, data_info = await _generate_analysis(
+                    tmp_file.name, sheet_name, chart_type, spec_lower, spec_upper, language, request=request
+                )
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_file.name)
             if not validation_result['valid']:
                 raise HTTPException(status_code=400, detail=validation_result['message'])
             
-            # Generate JSL template
-            jsl_template = generate_capability_jsl(df, chart_type, language)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
-            
             return {
                 'jsl_content': jsl_template,
                 'chart_type': chart_type,
                 'language': language,
                 'validation': validation_result,
-                'data_info': {
-                    'rows': len(df),
-                    'columns': len(df.columns),
-                    'column_types': df.dtypes.to_dict()
-                }
+                'data_info': data_info
             }
             
     except HTTPException:
@@ -142,71 +195,49 @@ def generate_capability_jsl(df: pd.DataFrame, chart_type: str, language: str = '
     }
     
     lang_comments = comments.get(language, comments['en'])
+    fields = {
+        **lang_comments,
+        'value_column': '{{VALUE_COLUMN}}',
+        'spec_lower': '{{SPEC_LOWER}}',
+        'spec_upper': '{{SPEC_UPPER}}',
+    }
     
-    template = f"""{lang_comments['header']}
-
-{lang_comments['open_csv']}
-dt = Open( "{{{{CSV_PATH}}}}" );
-
-{lang_comments['calculate']}
-capability = dt << Distribution(
-    Continuous Distribution( Column( :{{{{VALUE_COLUMN}}}} ) ),
-    Capability Analysis(
-        Spec Limits( {{{{SPEC_LOWER}}}}, {{{{SPEC_UPPER}}}} ),
-        Target( ({{{{SPEC_LOWER}}}} + {{{{SPEC_UPPER}}}}) / 2 )
-    )
-);
-
-{lang_comments['save']}
-capability << Save Picture( "process_capability_analysis.png" );
-
-{lang_comments['report']}
-capability << Capability Report;
-
-{lang_comments['close']}
-Close( dt );
-"""
-    
-    # Replace placeholders
+    # Fill placeholders from the data
     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
     if numeric_cols:
-        template = template.replace('{{VALUE_COLUMN}}', numeric_cols[0])
+        fields['value_column'] = numeric_cols[0]
     
     if 'spec_lower' in df.columns:
-        spec_lower = df['spec_lower'].iloc[0]
-        template = template.replace('{{SPEC_LOWER}}', str(spec_lower))
+        fields['spec_lower'] = df['spec_lower'].iloc[0]
     
     if 'spec_upper' in df.columns:
-        spec_upper = df['spec_upper'].iloc[0]
-        template = template.replace('{{SPEC_UPPER}}', str(spec_upper))
+        fields['spec_upper'] = df['spec_upper'].iloc[0]
     
-    return template
+    return CAPABILITY_TEMPLATE.render(**fields)
 
 @router.post("/validate")
 async def validate_data_for_capability(
+    request: Request,
     file: UploadFile = File(...),
     chart_type: str = Query("cpk_analysis", description="Type of analysis to validate"),
     language: str = Query("en", description="Language for responses (en/zh)")
 ):
     """Validate Excel data for process capability analysis"""
     try:
-        # Set analyzer language
-        analyzer.language = language
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
             content = await file.read()
             tmp_file.write(content)
             tmp_file.flush()
             
-            # Read Excel file
-            df = pd.read_excel(tmp_file.name)
-            
-            # Validate data using analyzer
-            validation_result = analyzer.validate_data(df, chart_type)
-            
-            # Clean up temp file
-            os.unlink(tmp_file.name)
+            # Read and validate the data
+            try:
+                validation_result, data_shape, columns = await _validate_analysis(
+                    tmp_file.name, chart_type, language, request=request
+                )
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_file.name)
             
             return {
                 'valid': validation_result['valid'],
@@ -216,11 +247,13 @@ async def validate_data_for_capability(
                 'details': {
                     'missing_columns': validation_result.get('missing_columns', []),
                     'numeric_columns': validation_result.get('numeric_columns', []),
-                    'data_shape': df.shape,
-                    'available_columns': df.columns.tolist()
+                    'data_shape': data_shape,
+                    'available_columns': columns
                 }
             }
             
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Failed to validate data: {str(e)}"
         if language == 'zh':
@@ -29,7 +29,7 @@ import psutil
 import json
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union, Callable
+from typing import Dict, List, Optional, Set, Tuple, Union, Callable
 import logging
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
@@ -78,6 +78,8 @@ class JMPRunner:
         
         self.max_wait_time = max_wait_time
         self.jmp_start_delay = jmp_start_delay
+        # PIDs of the JMP processes this runner launched; only these are ever closed
+        self._started_pids: Set[int] = set()
         
         # Create base task directory if it doesn't exist
         self.base_task_dir.mkdir(parents=True, exist_ok=True)
@@ -338,12 +340,20 @@ class JMPRunner:
                 continue
         return jmp_processes
     
+    def _record_started_jmp_processes(self, pids_before: Set[int]) -> None:
+        """Remember the JMP processes that appeared since pids_before as launched by this runner."""
+        started = {proc.pid for proc in self.find_jmp_processes()} - pids_before
+        if started:
+            logger.info(f"Launched JMP processes: {sorted(started)}")
+        self._started_pids |= started
+    
     def close_jmp_processes(self) -> None:
-        """Close all JMP processes."""
+        """Close the JMP processes this runner started, leaving other runners' and users' sessions alone."""
         try:
-            jmp_processes = self.find_jmp_processes()
+            jmp_processes = [proc for proc in self.find_jmp_processes() if proc.pid in self._started_pids]
+            self._started_pids.clear()
             if not jmp_processes:
-                logger.info("No JMP processes found to close")
+                logger.info("No JMP processes started by this runner to close")
                 return
             
             logger.info(f"Closing {len(jmp_processes)} JMP processes")
@@ -372,7 +382,8 @@ class JMPRunner:
         except Exception as e:
             logger.error(f"Error closing JMP processes: {e}")
     
-    def run_jsl_with_jmp(self, jsl_path: Path, task_dir: Path, on_progress: Optional[Callable[[str], None]] = None) -> str:
+    def run_jsl_with_jmp(self, jsl_path: Path, task_dir: Path, on_progress: Optional[Callable[[str], None]] = None,
+                         expected_outputs: Optional[List[str]] = None) -> str:
         """
         Run JSL script with JMP using AppleScript.
         
@@ -380,6 +391,7 @@ class JMPRunner:
             jsl_path: Path to JSL file
             task_dir: Task directory for monitoring
             on_progress: Optional callback for progress updates
+            expected_outputs: Optional list of image filenames the script will save
             
         Returns:
             Status message
@@ -683,7 +695,8 @@ class JMPRunner:
                 on_progress("Executed JSL script in JMP")
             
             # Wait for JMP to complete processing
-            completed, message = self.wait_for_jmp_completion(task_dir, on_progress=on_progress)
+            completed, message = self.wait_for_jmp_completion(task_dir, on_progress=on_progress,
+                                                              expected_outputs=expected_outputs)
             
             if completed:
                 return f"{result} - {message}"
@@ -695,18 +708,26 @@ class JMPRunner:
             logger.error(error_msg)
             return error_msg
     
-    def wait_for_jmp_completion(self, task_dir: Path, on_progress: Optional[Callable[[str], None]] = None) -> Tuple[bool, str]:
+    def wait_for_jmp_completion(self, task_dir: Path, on_progress: Optional[Callable[[str], None]] = None,
+                                expected_outputs: Optional[List[str]] = None) -> Tuple[bool, str]:
         """
-        Wait for JMP to finish by monitoring file count stability and CPU usage.
+        Wait for JMP to finish.
+        
+        With a manifest of expected outputs, completion is exact: every expected
+        image exists and its size is unchanged since the previous poll. Without
+        one, falls back to monitoring file count stability and CPU usage.
         
         Args:
             task_dir: Task directory to monitor for output files
             on_progress: Optional callback for progress updates
+            expected_outputs: Optional list of image filenames the script will save
             
         Returns:
             Tuple of (completed, message)
         """
         start_time = time.time()
+        expected_outputs = [name for name in (expected_outputs or []) if name]
+        last_expected_sizes: Optional[Dict[str, int]] = None
         
         # Wait a bit for JMP to start processing (reduced for faster timeout)
         initial_delay = min(2, self.max_wait_time // 10)  # 2 seconds or 10% of max wait time
@@ -745,6 +766,25 @@ class JMPRunner:
             else:
                 stable_count += 1
             
+            # Exact completion: all expected images written and no longer growing
+            if expected_outputs:
+                expected_sizes = {}
+                for name in expected_outputs:
+                    output_path = task_dir / name
+                    if output_path.exists():
+                        expected_sizes[name] = output_path.stat().st_size
+                if len(expected_sizes) == len(expected_outputs) and all(expected_sizes.values()):
+                    if expected_sizes == last_expected_sizes:
+                        completion_msg = f"JMP completed successfully. Generated {current_count} images ({len(expected_outputs)} expected)."
+                        logger.info(completion_msg)
+                        if on_progress:
+                            on_progress(completion_msg)
+                        return True, f"Completed successfully. Generated {current_count} images."
+                    last_expected_sizes = expected_sizes
+                    # Re-check sizes shortly instead of waiting a full interval
+                    time.sleep(0.5)
+                    continue
+            
             # Check if JMP is done (low CPU and stable file count)
             if (time.time() - start_time) >= min_runtime and cpu_usage < 5.0 and stable_count >= required_stable_count:
                 completion_msg = f"JMP completed successfully. Generated {current_count} images."
@@ -845,7 +885,8 @@ class JMPRunner:
                    jsl_path: Union[str, Path],
                    task_id: Optional[str] = None,
                    on_task_ready: Optional[Callable[[str, str, str], None]] = None,
-                   on_progress: Optional[Callable[[str], None]] = None) -> Dict:
+                   on_progress: Optional[Callable[[str], None]] = None,
+                   expected_outputs: Optional[List[str]] = None) -> Dict:
         """
         Run the complete JMP pipeline with CSV and JSL files.
 
@@ -860,6 +901,8 @@ class JMPRunner:
                          Called with (task_id, task_dir_path_str, csv_filename) before opening JSL.
             on_progress: Optional callback called at various stages of processing.
                         Called with progress messages as strings.
+            expected_outputs: Optional list of image filenames from the JSL output
+                        manifest, used for exact completion detection.
             
         Returns:
             Dictionary with results including status, images, and metadata
@@ -883,7 +926,8 @@ class JMPRunner:
             logger.info(f"[JMP_RUNNER] Task ID: {task_id}")
             
             # Check if called from Celery worker
-            is_celery_call = "app/worker/tasks.py" in caller_file or "worker/tasks.py" in caller_file
+            # Remote runner agents (app/worker/jmp_agent.py) are the other sanctioned caller
+            is_celery_call = "worker/tasks.py" in caller_file or "worker/jmp_agent.py" in caller_file
             logger.info(f"[JMP_RUNNER] Called from Celery worker: {is_celery_call}")
             
             if not is_celery_call:
@@ -974,7 +1018,7 @@ class JMPRunner:
                 except Exception as e:
                     logger.warning(f"Error in on_task_ready callback: {e}")
             
-            # Close any existing JMP processes
+            # Close any JMP processes left over from this runner's previous task
             self.close_jmp_processes()
             
             # Comprehensive verification: ensure task folder is fully ready before opening JSL
@@ -1013,6 +1057,10 @@ class JMPRunner:
                     "task_id": task_id
                 }
             
+            # Seconds per stage, returned to the caller for metrics
+            timings = {}
+            stage_started = time.perf_counter()
+            
             # Open JSL file with JMP
             logger.info(f"[JMP_RUNNER] Opening JSL file with JMP from task folder: {jsl_path}")
             if on_progress:
@@ -1020,6 +1068,7 @@ class JMPRunner:
             # Explicitly open with JMP (try multiple known names/paths)
             last_err: Optional[Exception] = None
             opened = False
+            jmp_pids_before = {proc.pid for proc in self.find_jmp_processes()}
             for app in self._candidate_jmp_apps():
                 try:
                     # Re-verify task folder is ready before each open attempt
@@ -1092,19 +1141,26 @@ class JMPRunner:
             logger.info(f"[CRITICAL] Fallback: Opening JSL from task folder with absolute path: {jsl_absolute_path}")
             subprocess.run(["open", jsl_absolute_path], check=True)
             time.sleep(self.jmp_start_delay)
+            self._record_started_jmp_processes(jmp_pids_before)
+            timings["jmp_launch"] = time.perf_counter() - stage_started
             
             
             # Run the JSL script
             logger.info("Running JSL script in JMP")
             if on_progress:
                 on_progress("Running JSL script in JMP")
-            run_status = self.run_jsl_with_jmp(jsl_path, task_dir, on_progress=on_progress)
+            stage_started = time.perf_counter()
+            run_status = self.run_jsl_with_jmp(jsl_path, task_dir, on_progress=on_progress,
+                                               expected_outputs=expected_outputs)
             
             # Always close JMP processes
             self.close_jmp_processes()
+            timings["jmp_render"] = time.perf_counter() - stage_started
             
             # Process images with OCR workflow
+            stage_started = time.perf_counter()
             processed_images, ocr_results = self._process_images_with_ocr(task_dir)
+            timings["ocr"] = time.perf_counter() - stage_started
             
             # Create results dictionary
             result = {
@@ -1117,6 +1173,7 @@ class JMPRunner:
                 "images": processed_images,
                 "image_count": len(processed_images),
                 "ocr_results": ocr_results,
+                "timings": timings,
                 "created_at": datetime.now().isoformat()
             }
             
@@ -1144,7 +1201,9 @@ class JMPRunner:
             error_msg = f"Error running JMP task: {str(e)}"
             logger.error(error_msg, exc_info=True)
             
-            # Always try to close JMP processes
+            # Always try to close JMP processes (including one opened just before the failure)
+            if 'jmp_pids_before' in locals():
+                self._record_started_jmp_processes(jmp_pids_before)
             self.close_jmp_processes()
             
             # Generate failure image for exception cases (only if task_dir is defined)
@@ -1,9 +1,10 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -13,12 +14,14 @@ from app.api.v1.api import api_router
 from app.core.websocket import router as websocket_router
 from app.core.exceptions import setup_exception_handlers
 from app.core.extensions import ExtensionManager
+from app.core.metrics import CONTENT_TYPE_LATEST, METRICS_AVAILABLE, MetricsMiddleware, render_metrics
 from extensions.excel2boxplotv1.api import router as excel2boxplotv1_router
 from extensions.excel2boxplotv2.api import router as excel2boxplotv2_router
 from extensions.excel2processcapability.api import router as excel2processcapability_router
 from extensions.excel2cpkv1.api import router as excel2cpkv1_router
 from extensions.excel2commonality.api import router as excel2commonality_router
 from extensions.excel2commonality_generic.api import router as excel2commonality_generic_router
+from extensions.base.executor import executor as extension_executor
 
 # Import workspace modules to register them
 import app.workspaces.modules
@@ -51,7 +54,7 @@ async def lifespan(app: FastAPI):
     
     yield
     # Shutdown
-    pass
+    extension_executor.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
@@ -65,6 +68,9 @@ app = FastAPI(
 # Security
 security = HTTPBearer()
 
+# Request latency metrics per route
+app.add_middleware(MetricsMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -72,6 +78,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # cursor of paginated list endpoints
 )
 
 # Trusted host middleware - temporarily disabled for testing
@@ -106,6 +113,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint."""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    if not METRICS_AVAILABLE:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="prometheus_client is not installed")
+    # Reads queue depths from Redis with a blocking client
+    payload = await asyncio.to_thread(render_metrics)
+    return Response(content=payload, media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
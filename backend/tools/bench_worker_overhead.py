@@ -0,0 +1,109 @@
+"""
+Benchmark per-task overhead of the Celery worker: restart-per-task vs warm.
+
+"restart" reproduces worker_max_tasks_per_child=1: every task runs in a freshly
+forked child of a parent that already imported app.worker.tasks (as the Celery
+prefork pool does), with a new event loop, new DB pool and Redis client, and the
+lazily imported modules a run touches (OCR processor, PIL).
+
+"warm" runs the same task body repeatedly through app.worker.runtime.run_async
+in one process, reusing the loop and the pooled connections.
+
+The task body does no JMP work, so the numbers are pure per-task overhead:
+
+    python tools/bench_worker_overhead.py --tasks 20
+    python tools/bench_worker_overhead.py --tasks 20 --no-io   # without Postgres/Redis
+"""
+import argparse
+import multiprocessing
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ensure backend is on sys.path
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import app.worker.tasks  # noqa: F401  (imported by the Celery parent before forking)
+from app.worker.runtime import run_async, init_worker_process
+
+
+async def task_body(with_io: bool):
+    """What every run pays before JMP starts: lazy imports, a DB round trip, a Redis round trip."""
+    import app.core.ocr_processor  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+    if not with_io:
+        return
+    from sqlalchemy import text
+    from app.core.database import AsyncSessionLocal
+    from app.core.websocket import get_redis
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+    redis_client = await get_redis()
+    await redis_client.ping()
+
+
+def _restart_child(with_io: bool):
+    import asyncio
+    from app.core import database, websocket
+
+    # Same state a freshly started prefork child has: no pool, no Redis client, no loop
+    database.engine.sync_engine.dispose(close=False)
+    websocket.redis_client = None
+    asyncio.run(task_body(with_io))
+
+
+def bench_restart(tasks: int, with_io: bool):
+    ctx = multiprocessing.get_context("fork")
+    timings = []
+    for _ in range(tasks):
+        started = time.perf_counter()
+        child = ctx.Process(target=_restart_child, args=(with_io,))
+        child.start()
+        child.join()
+        if child.exitcode != 0:
+            raise RuntimeError(f"Task child exited with {child.exitcode}")
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_warm(tasks: int, with_io: bool):
+    init_worker_process()
+    timings = []
+    for _ in range(tasks):
+        started = time.perf_counter()
+        run_async(task_body(with_io))
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(name: str, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<8} first={timings[0] * 1000:8.1f} ms  median={statistics.median(timings) * 1000:8.1f} ms  "
+          f"p95={p95 * 1000:8.1f} ms  total={sum(timings):7.2f} s")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker per-task overhead")
+    parser.add_argument("--tasks", type=int, default=20, help="Tasks per mode")
+    parser.add_argument("--no-io", action="store_true", help="Skip the Postgres/Redis round trips")
+    args = parser.parse_args()
+    with_io = not args.no_io
+
+    import logging
+    logging.disable(logging.INFO)
+
+    print(f"Per-task overhead over {args.tasks} tasks ({'with' if with_io else 'without'} DB/Redis I/O)")
+    restart = summarize("restart", bench_restart(args.tasks, with_io))
+    warm = summarize("warm", bench_warm(args.tasks, with_io))
+    print(f"median per-task overhead reduced {restart / warm:.1f}x ({(restart - warm) * 1000:.1f} ms saved per task)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Benchmarks for the analysis pipelines on synthetic workbooks.
+
+Every stage of excel2boxplotv1, excel2cpkv1, excel2commonality,
+excel2processcapability and the workspace modules (load, validate, process,
+CSV/JSL generation, numeric conversion, outlier removal, DuckDB conversion,
+DuckDB stats) is timed on generated meta/data workbooks from 10 to 10,000
+FAI columns and 1k to 1M rows. Results are stored per machine and commit
+under backend/.benchmarks/ so a regression shows up by comparing against the
+previous commit before deploying.
+
+From backend/:
+
+    python tools/benchmarks/run.py run --sizes tiny,small
+    python tools/benchmarks/run.py run --pipelines excel2cpkv1 --sizes medium --repeat 5
+    python tools/benchmarks/run.py compare                       # latest vs previous commit
+    python tools/benchmarks/run.py compare --fail-threshold 0.2  # exit 1 on a >20% slowdown
+    python tools/benchmarks/run.py history --pipeline excel2boxplotv1 --stage process
+
+Generated workbooks are cached in BENCH_CACHE_DIR (default: the system temp
+dir); the larger sizes take minutes to write the first time.
+"""
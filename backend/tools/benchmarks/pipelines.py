@@ -0,0 +1,307 @@
+"""
+The analysis pipelines, split into the stages the benchmarks time.
+
+Each pipeline calls the same entry points its API routes use, in the same
+order, so a stage's time is what a request spends there. A stage gets the
+shared ``state`` dict and returns the keys it adds for the stages after it.
+
+Imports of app/extension code happen inside the pipelines so ``run.py`` can
+point UPLOADS_DIR at a scratch directory before ``app.core.storage`` loads.
+"""
+import asyncio
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from .workbooks import SyntheticWorkbook
+
+CAT_VAR = "Stage"
+BENCH_WORKFLOW_ID = "benchmark"
+
+Stage = Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]
+
+
+class StageFailed(RuntimeError):
+    """A stage returned ``success: False`` rather than raising."""
+
+
+def _check(result: Dict[str, Any], stage: str) -> Dict[str, Any]:
+    if isinstance(result, dict) and result.get("success") is False:
+        raise StageFailed(f"{stage}: {result.get('error') or result.get('message') or 'failed'}")
+    return result
+
+
+class Pipeline:
+    name = ""
+    meta_style = "standard"
+
+    def __init__(self, workbook: SyntheticWorkbook, scratch_dir: Path):
+        self.workbook = workbook
+        self.scratch_dir = scratch_dir
+
+    def input_path(self) -> Path:
+        return self.workbook.workbook_path(self.meta_style)
+
+    def stages(self) -> List[Stage]:
+        raise NotImplementedError
+
+
+class Excel2BoxplotV1(Pipeline):
+    """excel2boxplotv1: FileHandler -> DataValidator -> DataProcessor -> FileProcessor."""
+
+    name = "excel2boxplotv1"
+
+    def stages(self) -> List[Stage]:
+        from extensions.excel2boxplotv1.data_process import DataProcessor
+        from extensions.excel2boxplotv1.data_validator import DataValidator
+        from extensions.excel2boxplotv1.file_handler import FileHandler
+        from extensions.excel2boxplotv1.file_processor import FileProcessor
+
+        def load(state):
+            handler = FileHandler()
+            _check(handler.load_excel_file(str(self.input_path())), "load")
+            handler.cleanup()
+            return {"meta": handler.df_meta, "data": handler.df_data_raw, "fai_columns": handler.fai_columns}
+
+        def validate(state):
+            return {"validation": DataValidator().run_full_validation(state["meta"], state["data"], CAT_VAR)}
+
+        def process(state):
+            result = _check(
+                DataProcessor().process_data(state["meta"], state["data"], state["fai_columns"], CAT_VAR), "process"
+            )
+            return {"boundaries": result["boundaries"], "processed": result["processed_data"]}
+
+        def csv(state):
+            return {"csv": FileProcessor().generate_csv(state["processed"], CAT_VAR, state["fai_columns"])}
+
+        def jsl(state):
+            return {"jsl": FileProcessor().generate_jsl(state["meta"], state["boundaries"], CAT_VAR)}
+
+        return [("load", load), ("validate", validate), ("process", process), ("csv", csv), ("jsl", jsl)]
+
+
+class Excel2CPKV1(Pipeline):
+    """excel2cpkv1: the steps of CPKAnalyzer.analyze_excel_file."""
+
+    name = "excel2cpkv1"
+
+    def stages(self) -> List[Stage]:
+        from extensions.excel2cpkv1.analyzer import CPKAnalyzer
+
+        analyzer = CPKAnalyzer()
+
+        def load(state):
+            spec, data, route = analyzer.load_excel(str(self.input_path()))
+            return {"spec_raw": spec, "data": data, "route": route}
+
+        def validate(state):
+            spec = analyzer.normalize_spec_columns(state["spec_raw"], route=state["route"])
+            return {"spec": spec, "validations": analyzer.validate_spec(spec)}
+
+        def process(state):
+            fai_columns = analyzer.find_fai_columns(state["data"])
+            matched, missing = analyzer.match_spec_to_data(state["spec"], fai_columns)
+            return {"matched": matched}
+
+        def csv(state):
+            return {"csv": state["data"].to_csv(index=False)}
+
+        def jsl(state):
+            return {"jsl": analyzer.generate_jsl(state["matched"], imgdir=str(self.scratch_dir))}
+
+        return [("load", load), ("validate", validate), ("process", process), ("csv", csv), ("jsl", jsl)]
+
+
+class Excel2Commonality(Pipeline):
+    """excel2commonality: validation routes, then the steps of analyze_excel_file (meta mode)."""
+
+    name = "excel2commonality"
+
+    def stages(self) -> List[Stage]:
+        import pandas as pd
+        from extensions.excel2commonality.analyzer import CommonalityAnalyzer
+        from extensions.excel2commonality.analyzer_meta import MetaAnalyzer
+
+        analyzer = CommonalityAnalyzer()
+        path = str(self.input_path())
+
+        def load(state):
+            engine = analyzer.get_excel_engine(path)
+            sheet = analyzer.find_data_sheet(path, engine)
+            has_meta = analyzer.check_meta_sheet(path, engine)
+            data = pd.read_excel(path, sheet_name=sheet, engine=engine)
+            return {"engine": engine, "sheet": sheet, "has_meta": has_meta, "data": data}
+
+        def validate(state):
+            _check(analyzer.validate_excel_structure(path), "validate")
+            return {"validation": _check(analyzer.validate_data_content(path), "validate")}
+
+        def process(state):
+            fai_columns = analyzer.find_fai_columns(state["data"])
+            if not fai_columns:
+                raise StageFailed("process: no FAI columns")
+            return {"fai_columns": fai_columns}
+
+        def csv(state):
+            return {"csv": state["data"].to_csv(index=False, encoding="utf-8-sig")}
+
+        def jsl(state):
+            if state["has_meta"]:
+                result = MetaAnalyzer().analyze_with_meta(path, state["sheet"], state["engine"])
+                return {"jsl": result["jsl_content"]}
+            return {"jsl": analyzer.generate_jsl(state["fai_columns"], "commonality_data.csv")}
+
+        return [("load", load), ("validate", validate), ("process", process), ("csv", csv), ("jsl", jsl)]
+
+
+class Excel2ProcessCapability(Pipeline):
+    """excel2processcapability: long-format values with spec limits."""
+
+    name = "excel2processcapability"
+    chart_type = "cpk_analysis"
+
+    def input_path(self) -> Path:
+        return self.workbook.capability_path()
+
+    def stages(self) -> List[Stage]:
+        import pandas as pd
+        from extensions.excel2processcapability.analyzer import ProcessCapabilityAnalyzer
+
+        analyzer = ProcessCapabilityAnalyzer()
+
+        def load(state):
+            return {"data": pd.read_excel(str(self.input_path()), sheet_name="data")}
+
+        def validate(state):
+            result = analyzer.validate_data(state["data"], self.chart_type)
+            if not result["valid"]:
+                raise StageFailed(f"validate: {result['message']}")
+            return {"validation": result}
+
+        def process(state):
+            return {"processed": analyzer.preprocess_data(state["data"], self.chart_type)}
+
+        def csv(state):
+            return {"csv": state["processed"].to_csv(index=False)}
+
+        def jsl(state):
+            return {"jsl": analyzer.generate_jsl_template(state["processed"], self.chart_type)}
+
+        return [("load", load), ("validate", validate), ("process", process), ("csv", csv), ("jsl", jsl)]
+
+
+class WorkspaceExcel2JMP(Pipeline):
+    """The workspace Excel2JMP module's processors (JMP-style meta column names)."""
+
+    name = "workspace_excel2jmp"
+    meta_style = "jmp"
+
+    def stages(self) -> List[Stage]:
+        from app.workspaces.modules.excel2jmp.data_process import DataProcessor
+        from app.workspaces.modules.excel2jmp.data_validator import DataValidator
+        from app.workspaces.modules.excel2jmp.file_handler import FileHandler
+        from app.workspaces.modules.excel2jmp.file_processor import FileProcessor
+
+        def load(state):
+            handler = FileHandler()
+            _check(handler.load_excel_file(str(self.input_path())), "load")
+            _check(handler.set_categorical_variable(CAT_VAR), "load")
+            return {"meta": handler.df_meta, "data": handler.df_data_raw, "fai_columns": handler.fai_columns}
+
+        def validate(state):
+            return {"validation": DataValidator().run_full_validation(state["meta"], state["data"], CAT_VAR)}
+
+        def process(state):
+            result = _check(
+                DataProcessor().process_data(state["meta"], state["data"], state["fai_columns"], CAT_VAR), "process"
+            )
+            return {"boundaries": result["boundaries"], "processed": result["processed_data"]}
+
+        def csv(state):
+            return {"csv": FileProcessor().generate_csv(state["processed"], CAT_VAR, state["fai_columns"])}
+
+        def jsl(state):
+            return {"jsl": FileProcessor().generate_jsl(state["meta"], state["boundaries"], CAT_VAR)}
+
+        return [("load", load), ("validate", validate), ("process", process), ("csv", csv), ("jsl", jsl)]
+
+
+class WorkspaceNodes(Pipeline):
+    """
+    The workspace data nodes, run through ``execute`` like the workflow engine does.
+
+    The workbook is copied into storage under a workflow node input key, since
+    OutlierRemover and DuckDBConvert derive their output location from it.
+    """
+
+    name = "workspace_nodes"
+
+    def stages(self) -> List[Stage]:
+        from app.core.storage import local_storage
+        from app.workspaces.engine.io_manager import WorkflowIOManager
+        from app.workspaces.modules.boxplot_stats.module import BoxplotStatsNode
+        from app.workspaces.modules.duckdb_convert.module import DuckDBConvertNode
+        from app.workspaces.modules.excel_loader.module import ExcelLoaderNode
+        from app.workspaces.modules.excel_to_numeric.module import ExcelToNumericNode
+        from app.workspaces.modules.outlier_remover.module import OutlierRemoverNode
+        from .workbooks import fai_name
+
+        io_manager = WorkflowIOManager(None, local_storage)
+        input_key = f"workflows/{BENCH_WORKFLOW_ID}/nodes/input/input/{self.input_path().name}"
+        fai_columns = [fai_name(i, self.workbook.n_fai) for i in range(self.workbook.n_fai)]
+        first_fai = fai_columns[0]
+
+        def execute(node, inputs):
+            result = asyncio.run(node.execute(inputs, io_manager))
+            if not result.success:
+                raise StageFailed(f"{node.module_type}: {result.error}")
+            return result
+
+        def stage_input(state):
+            target = local_storage.base_path / input_key
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(self.input_path(), target)
+            return {}
+
+        def load(state):
+            result = execute(ExcelLoaderNode("load", {"sheet_name": "data"}), {"file": input_key})
+            return {"data": result.outputs["dataframe"]}
+
+        def to_numeric(state):
+            node = ExcelToNumericNode("numeric", {"sheet_name": "data", "columns_to_convert": fai_columns})
+            execute(node, {"file": input_key})
+            return {}
+
+        def outliers(state):
+            node = OutlierRemoverNode("outliers", {
+                "outlier_rules": [
+                    {"column": column, "condition": "greater_than", "value": 1000, "action": "clear_cell"}
+                    for column in fai_columns
+                ],
+                "selected_columns": {"data": fai_columns},
+            })
+            execute(node, {"file": input_key})
+            return {}
+
+        def duckdb(state):
+            result = execute(DuckDBConvertNode("duckdb"), {"file": input_key})
+            return {"duckdb_path": result.metadata["db_path"], "tables": result.outputs["table_names"]}
+
+        def boxplot_stats(state):
+            node = BoxplotStatsNode("stats", {"column_name": first_fai})
+            result = execute(node, {"duckdb_path": state["duckdb_path"], "table_name": "data"})
+            return {"stats": result.outputs}
+
+        return [
+            ("stage_input", stage_input), ("load", load), ("to_numeric", to_numeric), ("outliers", outliers),
+            ("duckdb_convert", duckdb), ("boxplot_stats", boxplot_stats),
+        ]
+
+
+PIPELINES = {
+    cls.name: cls
+    for cls in (
+        Excel2BoxplotV1, Excel2CPKV1, Excel2Commonality, Excel2ProcessCapability, WorkspaceExcel2JMP, WorkspaceNodes
+    )
+}
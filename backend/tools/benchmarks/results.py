@@ -0,0 +1,173 @@
+"""
+Benchmark result files: one JSON document per run, grouped by machine.
+
+    <results_dir>/<machine>/<timestamp>_<commit>.json
+
+Timings are only comparable on the same machine, so comparisons and history
+never mix machine directories. A result records the commit it was measured
+at (and whether the tree was dirty), which is what ``compare`` and
+``history`` order by.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_RESULTS_DIR = BACKEND_DIR / ".benchmarks"
+
+LIBRARIES = ("pandas", "numpy", "openpyxl", "duckdb", "xlsxwriter", "pyarrow")
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10, check=True
+        ).stdout.strip()
+        return output or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def git_info() -> Dict[str, Any]:
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "subject": _git("log", "-1", "--format=%s"),
+        "committed_at": _git("log", "-1", "--format=%cI"),
+        "dirty": bool(status),
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    return {
+        "name": platform.node() or "unknown",
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "libraries": versions,
+    }
+
+
+def summarize(times: List[float]) -> Dict[str, Optional[float]]:
+    if not times:
+        return {"median": None, "min": None, "max": None, "stdev": None}
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def save_result(result: Dict[str, Any], results_dir: Path) -> Path:
+    machine_dir = results_dir / result["machine"]["name"]
+    machine_dir.mkdir(parents=True, exist_ok=True)
+    commit = (result["git"]["commit"] or "nogit")[:7] + ("-dirty" if result["git"]["dirty"] else "")
+    stamp = datetime.fromisoformat(result["started_at"]).strftime("%Y%m%dT%H%M%S")
+    path = machine_dir / f"{stamp}_{commit}.json"
+    path.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def load_results(results_dir: Path, machine: Optional[str] = None) -> List[Tuple[Path, Dict[str, Any]]]:
+    """Results for one machine (default: this one), oldest first."""
+    machine_dir = results_dir / (machine or platform.node() or "unknown")
+    results = []
+    for path in sorted(machine_dir.glob("*.json")):
+        try:
+            results.append((path, json.loads(path.read_text(encoding="utf-8"))))
+        except ValueError:
+            continue
+    results.sort(key=lambda item: item[1]["started_at"])
+    return results
+
+
+def case_key(case: Dict[str, Any]) -> Tuple[str, str, str]:
+    return case["pipeline"], case["size"], case["stage"]
+
+
+def index_cases(result: Dict[str, Any]) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    return {case_key(case): case for case in result["cases"]}
+
+
+def select_pair(results: List[Tuple[Path, Dict[str, Any]]], baseline: Optional[str] = None,
+                contender: Optional[str] = None):
+    """
+    Pick (baseline, contender) results to compare.
+
+    ``baseline``/``contender`` match a file name or a commit prefix. By default
+    the contender is the latest result and the baseline the latest one
+    measured at a different commit.
+    """
+
+    def find(ref):
+        for path, result in reversed(results):
+            if path.name == ref or path.stem == ref or (result["git"]["commit"] or "").startswith(ref):
+                return path, result
+        raise ValueError(f"No benchmark result matches {ref!r}")
+
+    if not results:
+        raise ValueError("No benchmark results recorded yet")
+    new = find(contender) if contender else results[-1]
+    if baseline:
+        return find(baseline), new
+    new_commit = new[1]["git"]["commit"]
+    for path, result in reversed(results):
+        if result["git"]["commit"] != new_commit and result["started_at"] < new[1]["started_at"]:
+            return (path, result), new
+    raise ValueError("No earlier result at a different commit to compare against")
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Per-case change in median time.
+
+    ``status`` is ``slower``/``faster`` when the median moved by more than
+    ``threshold`` (a fraction, 0.1 = 10%), ``failed`` when the case errored in
+    the new run but not the old one, and ``same`` otherwise.
+    """
+    old_cases = index_cases(old)
+    rows = []
+    for key, case in index_cases(new).items():
+        previous = old_cases.get(key)
+        if previous is None:
+            continue
+        row = {
+            "pipeline": key[0], "size": key[1], "stage": key[2],
+            "old": previous["median"], "new": case["median"], "ratio": None, "status": "same",
+        }
+        if case.get("error") and not previous.get("error"):
+            row["status"] = "failed"
+        elif previous["median"] and case["median"] is not None:
+            row["ratio"] = case["median"] / previous["median"]
+            if row["ratio"] > 1 + threshold:
+                row["status"] = "slower"
+            elif row["ratio"] < 1 - threshold:
+                row["status"] = "faster"
+        rows.append(row)
+    return rows
+
+
+def history(results: List[Tuple[Path, Dict[str, Any]]], pipeline: Optional[str] = None,
+            size: Optional[str] = None, stage: Optional[str] = None):
+    """Median per case over time: (case key, [(result, median or None)])."""
+    series: Dict[Tuple[str, str, str], List[Tuple[Dict[str, Any], Optional[float]]]] = {}
+    for _, result in results:
+        for case in result["cases"]:
+            key = case_key(case)
+            if (pipeline and key[0] != pipeline) or (size and key[1] != size) or (stage and key[2] != stage):
+                continue
+            series.setdefault(key, []).append((result, case["median"]))
+    return sorted(series.items())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Run the pipeline benchmarks and compare results across commits.
+
+    python tools/benchmarks/run.py run [--sizes tiny,small] [--pipelines ...] [--repeat 3]
+    python tools/benchmarks/run.py compare [--baseline SHA] [--contender SHA] [--fail-threshold 0.2]
+    python tools/benchmarks/run.py history [--pipeline P] [--size S] [--stage S]
+    python tools/benchmarks/run.py list
+
+See tools/benchmarks/__init__.py for what is measured.
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+# Ensure backend is on sys.path
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from tools.benchmarks import results as bench_results  # noqa: E402
+from tools.benchmarks.workbooks import DEFAULT_CACHE_DIR, SIZES, synthetic_workbook  # noqa: E402
+
+DEFAULT_SIZES = "tiny,small"
+DEFAULT_MAX_CELLS = 20_000_000
+
+
+def _format_seconds(value):
+    if value is None:
+        return "-"
+    if value < 1:
+        return f"{value * 1000:.1f}ms"
+    return f"{value:.2f}s"
+
+
+def run_pipeline(pipeline, size_name, repeat):
+    """Time each stage ``repeat`` times; a failed stage skips the rest of the pipeline."""
+    cases = []
+    try:
+        stages = pipeline.stages()
+    except Exception as e:
+        return [{
+            "pipeline": pipeline.name, "size": size_name, "stage": "setup",
+            "times": [], **bench_results.summarize([]), "error": f"{type(e).__name__}: {e}",
+        }]
+
+    state = {}
+    failed = None
+    for stage_name, stage in stages:
+        case = {"pipeline": pipeline.name, "size": size_name, "stage": stage_name, "times": [], "error": None}
+        if failed:
+            case["error"] = f"skipped: {failed} failed"
+        else:
+            update = {}
+            try:
+                for _ in range(repeat):
+                    gc.collect()
+                    started = time.perf_counter()
+                    update = stage(state) or {}
+                    case["times"].append(time.perf_counter() - started)
+                state.update(update)
+            except Exception as e:
+                case["error"] = f"{type(e).__name__}: {e}"
+                logging.getLogger("benchmarks").debug(traceback.format_exc())
+                failed = stage_name
+        case.update(bench_results.summarize(case["times"]))
+        cases.append(case)
+        status = case["error"] or f"median {_format_seconds(case['median'])}  min {_format_seconds(case['min'])}"
+        print(f"  {pipeline.name:<26} {stage_name:<16} {status}", flush=True)
+    return cases
+
+
+def command_run(args):
+    # Storage must point at a scratch dir before app.core.storage is imported
+    scratch_dir = Path(tempfile.mkdtemp(prefix="auto-jmp-bench-"))
+    os.environ["UPLOADS_DIR"] = str(scratch_dir / "uploads")
+    from tools.benchmarks.pipelines import PIPELINES
+
+    pipeline_names = args.pipelines.split(",") if args.pipelines else list(PIPELINES)
+    unknown = [name for name in pipeline_names if name not in PIPELINES]
+    if unknown:
+        print(f"Unknown pipelines: {', '.join(unknown)} (expected {', '.join(PIPELINES)})")
+        return 2
+
+    sizes = []
+    if args.fai and args.rows:
+        sizes.append(synthetic_workbook(f"{args.fai}x{args.rows}", args.seed, args.cache_dir, args.fai, args.rows))
+    else:
+        for name in args.sizes.split(","):
+            if name not in SIZES:
+                print(f"Unknown size {name!r} (expected {', '.join(SIZES)})")
+                return 2
+            sizes.append(synthetic_workbook(name, args.seed, args.cache_dir))
+
+    result = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git": bench_results.git_info(),
+        "machine": bench_results.machine_info(),
+        "settings": {"repeat": args.repeat, "seed": args.seed},
+        "cases": [],
+    }
+    print(f"Benchmarking {result['git']['commit'] or 'unknown commit'}"
+          f"{' (dirty tree)' if result['git']['dirty'] else ''} on {result['machine']['name']}")
+
+    for workbook in sizes:
+        if workbook.cells > args.max_cells:
+            print(f"Skipping {workbook.size}: {workbook.cells:,} cells exceeds --max-cells {args.max_cells:,}")
+            continue
+        print(f"{workbook.size}: {workbook.n_fai} FAI columns x {workbook.n_rows:,} rows")
+        for name in pipeline_names:
+            pipeline = PIPELINES[name](workbook, scratch_dir)
+            started = time.perf_counter()
+            try:
+                pipeline.input_path()
+            except Exception as e:
+                print(f"  {name:<26} could not generate workbook: {e}")
+                continue
+            generated = time.perf_counter() - started
+            if generated > 1:
+                print(f"  (workbook ready in {generated:.1f}s)")
+            for case in run_pipeline(pipeline, workbook.size, args.repeat):
+                case.update({"fai": workbook.n_fai, "rows": workbook.n_rows})
+                result["cases"].append(case)
+
+    result["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    if not args.no_save:
+        path = bench_results.save_result(result, args.results_dir)
+        print(f"Saved {path}")
+
+    failures = [case for case in result["cases"] if case["error"] and not case["error"].startswith("skipped")]
+    return 1 if failures and args.fail_on_error else 0
+
+
+def command_compare(args):
+    results = bench_results.load_results(args.results_dir, args.machine)
+    try:
+        (old_path, old), (new_path, new) = bench_results.select_pair(results, args.baseline, args.contender)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    print(f"baseline:  {old_path.name}  {old['git'].get('subject') or ''}")
+    print(f"contender: {new_path.name}  {new['git'].get('subject') or ''}")
+    rows = bench_results.compare(old, new, args.threshold)
+    print(f"{'pipeline':<26} {'size':<8} {'stage':<16} {'baseline':>10} {'contender':>10} {'change':>8}")
+    for row in rows:
+        change = f"{(row['ratio'] - 1) * 100:+.1f}%" if row["ratio"] is not None else "-"
+        marker = {"slower": "  SLOWER", "faster": "  faster", "failed": "  FAILED"}.get(row["status"], "")
+        print(
+            f"{row['pipeline']:<26} {row['size']:<8} {row['stage']:<16} {_format_seconds(row['old']):>10} "
+            f"{_format_seconds(row['new']):>10} {change:>8}{marker}"
+        )
+
+    if args.fail_threshold is not None:
+        regressions = [
+            row for row in bench_results.compare(old, new, args.fail_threshold)
+            if row["status"] in ("slower", "failed")
+        ]
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed beyond {args.fail_threshold:.0%}")
+            return 1
+    return 0
+
+
+def command_history(args):
+    results = bench_results.load_results(args.results_dir, args.machine)
+    if not results:
+        print("No benchmark results recorded yet")
+        return 2
+    for (pipeline, size, stage), points in bench_results.history(results, args.pipeline, args.size, args.stage):
+        print(f"{pipeline} / {size} / {stage}")
+        for result, median in points[-args.limit:]:
+            commit = (result["git"]["commit"] or "nogit")[:7] + ("*" if result["git"]["dirty"] else "")
+            print(f"  {result['started_at']}  {commit:<8}  {_format_seconds(median):>10}  "
+                  f"{(result['git'].get('subject') or '')[:60]}")
+    return 0
+
+
+def command_list(args):
+    from tools.benchmarks.pipelines import PIPELINES
+
+    print("Pipelines: " + ", ".join(PIPELINES))
+    print("Sizes:")
+    for name, (fai, rows) in SIZES.items():
+        print(f"  {name:<8} {fai:>6} FAI columns x {rows:>9,} rows")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipelines on synthetic workbooks")
+    parser.add_argument("--results-dir", type=Path, default=bench_results.DEFAULT_RESULTS_DIR,
+                        help="where results are stored (default: backend/.benchmarks)")
+    parser.add_argument("--machine", help="compare/history results recorded on another machine")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show pipeline logging")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="run benchmarks and record the result")
+    run.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated sizes (default: {DEFAULT_SIZES})")
+    run.add_argument("--fai", type=int, help="custom size: number of FAI columns (with --rows)")
+    run.add_argument("--rows", type=int, help="custom size: number of rows (with --fai)")
+    run.add_argument("--pipelines", help="comma-separated pipelines (default: all)")
+    run.add_argument("--repeat", type=int, default=3, help="timed repetitions per stage (default: 3)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--max-cells", type=int, default=DEFAULT_MAX_CELLS,
+                     help=f"skip sizes with more FAI cells than this (default: {DEFAULT_MAX_CELLS:,})")
+    run.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="generated workbook cache")
+    run.add_argument("--no-save", action="store_true", help="print timings without recording them")
+    run.add_argument("--fail-on-error", action="store_true", help="exit 1 if any stage raised")
+    run.set_defaults(func=command_run)
+
+    compare = subparsers.add_parser("compare", help="compare two recorded results")
+    compare.add_argument("--baseline", help="result file or commit (default: latest at an earlier commit)")
+    compare.add_argument("--contender", help="result file or commit (default: latest)")
+    compare.add_argument("--threshold", type=float, default=0.1,
+                         help="fraction of median change to flag (default: 0.1)")
+    compare.add_argument("--fail-threshold", type=float,
+                         help="exit 1 if any case is slower by more than this fraction, or newly fails")
+    compare.set_defaults(func=command_compare)
+
+    hist = subparsers.add_parser("history", help="median per case across recorded commits")
+    hist.add_argument("--pipeline")
+    hist.add_argument("--size")
+    hist.add_argument("--stage")
+    hist.add_argument("--limit", type=int, default=20, help="most recent results per case (default: 20)")
+    hist.set_defaults(func=command_history)
+
+    listing = subparsers.add_parser("list", help="list pipelines and sizes")
+    listing.set_defaults(func=command_list)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    if not args.verbose:
+        # The extensions log every step at INFO
+        logging.disable(logging.INFO)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
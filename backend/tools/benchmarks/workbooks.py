@@ -0,0 +1,206 @@
+"""
+Synthetic meta/data workbooks for the pipeline benchmarks.
+
+A workbook has the layout the extensions expect:
+
+- ``meta``: one row per FAI column (test_name, description, target, usl, lsl,
+  main_level), every ten FAIs sharing a main_level. ``meta_style="jmp"``
+  writes the column names the workspace Excel2JMP module reads
+  (Y Variable, DETAIL, Target, USL, LSL, Label);
+- ``data``: SN, Stage (the categorical variable), the five fixture/time
+  columns the commonality analyzer requires, then the FAI columns. About 1%
+  of FAI cells are empty and 0.1% hold text, so numeric conversion and
+  validation take their slow paths.
+
+Frames are generated in memory from a seed (identical for every run of the
+same size) and written once to CACHE_DIR; later runs reuse the file.
+"""
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+# Bump when the generated content changes so cached workbooks are rebuilt
+GENERATOR_VERSION = 1
+
+DEFAULT_CACHE_DIR = Path(os.getenv("BENCH_CACHE_DIR", Path(tempfile.gettempdir()) / "auto-jmp-bench"))
+
+# name -> (FAI columns, rows)
+SIZES: Dict[str, Tuple[int, int]] = {
+    "tiny": (10, 1_000),
+    "small": (100, 10_000),
+    "wide": (10_000, 1_000),
+    "medium": (1_000, 10_000),
+    "tall": (10, 1_000_000),
+    "large": (1_000, 100_000),
+    "xlarge": (10_000, 1_000_000),
+}
+
+STAGES = ("EVT", "DVT", "PVT", "MP")
+COMMONALITY_COLUMNS = ["测试时间", "EGL铆接治具号", "EGL焊接治具号", "镍片放料工位", "AFMT治具"]
+JMP_META_COLUMNS = {
+    "test_name": "Y Variable",
+    "description": "DETAIL",
+    "target": "Target",
+    "usl": "USL",
+    "lsl": "LSL",
+    "main_level": "Label",
+}
+FAIS_PER_LEVEL = 10
+
+
+def fai_name(index: int, n_fai: int) -> str:
+    return f"FAI_{index + 1:0{max(3, len(str(n_fai)))}d}"
+
+
+def make_meta(n_fai: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    targets = np.round(rng.uniform(1, 100, n_fai), 3)
+    tolerances = np.round(targets * rng.uniform(0.02, 0.1, n_fai), 3)
+    return pd.DataFrame({
+        "test_name": [fai_name(i, n_fai) for i in range(n_fai)],
+        "description": [f"Dimension {i + 1}" for i in range(n_fai)],
+        "target": targets,
+        "usl": targets + tolerances,
+        "lsl": targets - tolerances,
+        "main_level": [f"L{i // FAIS_PER_LEVEL + 1:04d}" for i in range(n_fai)],
+    })
+
+
+def make_data(meta: pd.DataFrame, n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed + 1)
+    n_fai = len(meta)
+    columns = {
+        "SN": np.char.add("SN", np.arange(n_rows).astype(str)),
+        "Stage": np.array(STAGES)[rng.integers(0, len(STAGES), n_rows)],
+        COMMONALITY_COLUMNS[0]: (pd.Timestamp("2026-01-01") + pd.to_timedelta(np.arange(n_rows) * 37, unit="s"))
+        .strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    for column in COMMONALITY_COLUMNS[1:]:
+        columns[column] = np.char.add(f"{column[:3]}-", rng.integers(1, 9, n_rows).astype(str))
+    frame = pd.DataFrame(columns)
+
+    sigma = ((meta["usl"] - meta["lsl"]).to_numpy() / 6.0)[None, :]
+    values = meta["target"].to_numpy()[None, :] + rng.standard_normal((n_rows, n_fai)) * sigma
+    values = np.round(values, 4)
+    values[rng.random((n_rows, n_fai)) < 0.01] = np.nan
+    fai = pd.DataFrame(values, columns=meta["test_name"].tolist())
+
+    # A sprinkling of text cells, as exported by real test stations. The first
+    # FAI column stays numeric so the DuckDB stats stage has a column to read.
+    text_mask = rng.random((n_rows, n_fai)) < 0.001
+    text_mask[:, 0] = False
+    if text_mask.any():
+        fai = fai.astype(object)
+        rows, cols = np.nonzero(text_mask)
+        for row, col in zip(rows, cols):
+            fai.iat[row, col] = "NA"
+    return pd.concat([frame, fai], axis=1)
+
+
+def make_capability_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Long-format values with spec limits, as the process capability analyzer reads them."""
+    rng = np.random.default_rng(seed + 2)
+    return pd.DataFrame({
+        "value": np.round(rng.normal(10.0, 0.2, n_rows), 4),
+        "spec_lower": 9.4,
+        "spec_upper": 10.6,
+        "subgroup": np.arange(n_rows) // 5 + 1,
+    })
+
+
+def _write_sheets(path: Path, sheets: Dict[str, pd.DataFrame]) -> None:
+    """Write frames row by row in constant memory (xlsxwriter when installed, else openpyxl write-only)."""
+    tmp_path = path.with_suffix(".tmp.xlsx")
+    if XLSXWRITER_AVAILABLE:
+        workbook = xlsxwriter.Workbook(str(tmp_path), {"constant_memory": True, "nan_inf_to_errors": False})
+        for name, frame in sheets.items():
+            worksheet = workbook.add_worksheet(name)
+            worksheet.write_row(0, 0, [str(c) for c in frame.columns])
+            for row_index, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+                for col_index, value in enumerate(row):
+                    if value is None or (isinstance(value, float) and value != value):
+                        continue
+                    worksheet.write(row_index, col_index, value)
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        for name, frame in sheets.items():
+            worksheet = workbook.create_sheet(name)
+            worksheet.append([str(c) for c in frame.columns])
+            for row in frame.itertuples(index=False, name=None):
+                worksheet.append([
+                    None if isinstance(value, float) and value != value else value for value in row
+                ])
+        workbook.save(str(tmp_path))
+    tmp_path.replace(path)
+
+
+@dataclass
+class SyntheticWorkbook:
+    """One generated size: the frames and the workbook files written from them."""
+
+    size: str
+    n_fai: int
+    n_rows: int
+    seed: int
+    cache_dir: Path
+    meta: pd.DataFrame = field(repr=False, default=None)
+    data: pd.DataFrame = field(repr=False, default=None)
+    _paths: Dict[str, Path] = field(repr=False, default_factory=dict)
+
+    @property
+    def cells(self) -> int:
+        return self.n_fai * self.n_rows
+
+    def _path(self, kind: str) -> Path:
+        return self.cache_dir / f"{kind}_{self.n_fai}x{self.n_rows}_s{self.seed}_v{GENERATOR_VERSION}.xlsx"
+
+    def ensure_frames(self) -> None:
+        if self.meta is None:
+            self.meta = make_meta(self.n_fai, self.seed)
+            self.data = make_data(self.meta, self.n_rows, self.seed)
+
+    def workbook_path(self, meta_style: str = "standard") -> Path:
+        """The meta/data workbook, written on first use."""
+        kind = f"meta_data_{meta_style}"
+        if kind not in self._paths:
+            path = self._path(kind)
+            if not path.exists():
+                self.ensure_frames()
+                meta = self.meta.rename(columns=JMP_META_COLUMNS) if meta_style == "jmp" else self.meta
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                _write_sheets(path, {"meta": meta, "data": self.data})
+            self._paths[kind] = path
+        return self._paths[kind]
+
+    def capability_path(self) -> Path:
+        """Long-format capability workbook (``data`` sheet), written on first use."""
+        if "capability" not in self._paths:
+            path = self._path("capability")
+            if not path.exists():
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                _write_sheets(path, {"data": make_capability_frame(self.n_rows, self.seed)})
+            self._paths["capability"] = path
+        return self._paths["capability"]
+
+
+def synthetic_workbook(size: str, seed: int = 0, cache_dir: Optional[Path] = None,
+                       n_fai: Optional[int] = None, n_rows: Optional[int] = None) -> SyntheticWorkbook:
+    """A named size from SIZES, or a custom one when ``n_fai``/``n_rows`` are given."""
+    if n_fai is None or n_rows is None:
+        if size not in SIZES:
+            raise ValueError(f"Unknown size {size!r}; expected one of {sorted(SIZES)}")
+        n_fai, n_rows = SIZES[size]
+    return SyntheticWorkbook(size, n_fai, n_rows, seed, Path(cache_dir or DEFAULT_CACHE_DIR))
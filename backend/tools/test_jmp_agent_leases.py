@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check that JMP agent heartbeats only renew leases the agent still owns
+
+Agent A claims a job, its lease expires, agent B steals the job; A's next
+heartbeat (still listing the job) must leave B as the owner.
+
+Runs against the Redis at REDIS_URL; the agents and job it creates use
+throwaway ids and are removed afterwards.
+
+Usage:
+  python tools/test_jmp_agent_leases.py        (or collect with pytest)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Ensure backend is on sys.path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.core.config import settings
+from app.core.websocket import get_redis
+from app.services import jmp_agents
+
+
+async def check_stolen_lease_stays_stolen() -> None:
+    redis_client = await get_redis()
+    agent_a, agent_b = f"test-a-{uuid.uuid4().hex[:8]}", f"test-b-{uuid.uuid4().hex[:8]}"
+    job_id = None
+    try:
+        for agent_id in (agent_a, agent_b):
+            await jmp_agents.register_agent(agent_id, {"hostname": "test", "capacity": 1})
+
+        job_id = await jmp_agents.enqueue_job(
+            f"test-run-{uuid.uuid4().hex[:8]}", Path(tempfile.gettempdir()), "data.csv", "script.jsl", [], 60
+        )
+        job = await jmp_agents.claim_job(agent_a)
+        assert job and job["spec"]["job_id"] == job_id, f"agent A did not get the job: {job}"
+        assert await jmp_agents.heartbeat_agent(agent_a, [job_id], busy=1)
+        assert await jmp_agents.owns_job(job_id, agent_a), "agent A's heartbeat did not keep its own lease"
+
+        # A stops heartbeating; once the lease expires B steals the job
+        await redis_client.delete(jmp_agents._lease_key(job_id))
+        stolen = await jmp_agents.claim_job(agent_b)
+        assert stolen and stolen["spec"]["job_id"] == job_id, f"agent B did not steal the job: {stolen}"
+
+        # A comes back and heartbeats with the job it still thinks it runs
+        assert await jmp_agents.heartbeat_agent(agent_a, [job_id], busy=1)
+        assert await jmp_agents.owns_job(job_id, agent_b), "agent A's heartbeat took the lease back from B"
+        assert not await jmp_agents.owns_job(job_id, agent_a)
+
+        # B's heartbeat still renews its lease
+        await redis_client.expire(jmp_agents._lease_key(job_id), 5)
+        assert await jmp_agents.heartbeat_agent(agent_b, [job_id], busy=1)
+        ttl = await redis_client.ttl(jmp_agents._lease_key(job_id))
+        assert ttl > 5, f"agent B's lease was not renewed (ttl={ttl})"
+    finally:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for agent_id in (agent_a, agent_b):
+                pipe.srem(jmp_agents.AGENTS_KEY, agent_id)
+                pipe.delete(jmp_agents._agent_key(agent_id))
+            if job_id:
+                pipe.lrem(jmp_agents.PENDING_JOBS_KEY, 0, job_id)
+                pipe.srem(jmp_agents.ACTIVE_JOBS_KEY, job_id)
+                pipe.delete(jmp_agents._job_key(job_id), jmp_agents._lease_key(job_id), jmp_agents._result_key(job_id))
+            await pipe.execute()
+
+
+def test_stolen_lease_stays_stolen():
+    asyncio.run(check_stolen_lease_stays_stolen())
+
+
+def main():
+    print(f"[INFO] Using Redis at {settings.REDIS_URL}")
+    test_stolen_lease_stays_stolen()
+    print("[OK] A heartbeat from the previous owner leaves a stolen lease with the new owner")
+
+
+if __name__ == "__main__":
+    main()
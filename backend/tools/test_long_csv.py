@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Differential check of write_long_csv against the in-memory melt it replaces.
+
+For every mix of FAI column dtypes (bool, int, float, object, nullable and
+datetime columns, with and without missing values) and a range of batch
+sizes, the streamed CSV must be byte-identical to
+
+    df.melt(id_vars=[id_var], value_vars=..., var_name="FAI", value_name="Data").dropna().to_csv(index=False)
+
+Usage:
+  python tools/test_long_csv.py        (or collect with pytest)
+"""
+import io
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Ensure backend is on sys.path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from extensions.base.long_csv import write_long_csv
+
+ID_VAR = "Category"
+BATCH_CELLS = (1, 3, 7, 11, 1_000_000)
+
+
+def sample_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        ID_VAR: ["a", "b", "c", "d", "e"],
+        "bool": [True, False, True, True, False],
+        "int": [1, 2, 3, -4, 5],
+        "float": [1.5, np.nan, 2.0, 3.25, -1.0],
+        "whole_float": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "object": ["x", None, "y", "1", "2.5"],
+        "mixed_object": [1, "two", 3.0, None, True],
+        "nullable_int": pd.array([1, None, 3, 4, 5], dtype="Int64"),
+        "nullable_bool": pd.array([True, None, False, True, False], dtype="boolean"),
+        "datetime": pd.to_datetime(["2024-01-01", None, "2024-01-03", "2024-01-04", "2024-01-05"]),
+        "all_missing": [np.nan] * 5,
+    })
+
+
+def expected_csv(df: pd.DataFrame, value_vars) -> str:
+    return df.melt(
+        id_vars=[ID_VAR], value_vars=list(value_vars), var_name="FAI", value_name="Data"
+    ).dropna().to_csv(index=False)
+
+
+def streamed_csv(df: pd.DataFrame, value_vars, batch_cells: int) -> str:
+    buffer = io.StringIO()
+    write_long_csv(df, ID_VAR, list(value_vars), buffer, batch_cells=batch_cells)
+    return buffer.getvalue()
+
+
+def column_mixes(columns, max_size: int = 3):
+    for size in range(1, max_size + 1):
+        for combo in itertools.combinations(columns, size):
+            yield combo
+            if size > 1:
+                # Column order decides which columns share a batch
+                yield tuple(reversed(combo))
+
+
+def find_mismatches(df: pd.DataFrame):
+    value_columns = [c for c in df.columns if c != ID_VAR]
+    for value_vars in column_mixes(value_columns):
+        expected = expected_csv(df, value_vars)
+        for batch_cells in BATCH_CELLS:
+            actual = streamed_csv(df, value_vars, batch_cells)
+            if actual != expected:
+                yield value_vars, batch_cells, expected, actual
+
+
+def test_long_csv_matches_melt():
+    mismatches = list(find_mismatches(sample_frame()))
+    assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[0][:2]}"
+
+
+def test_long_csv_empty_frame():
+    df = sample_frame().iloc[:0]
+    for value_vars in (("bool", "int"), ("float", "object")):
+        assert streamed_csv(df, value_vars, 7) == expected_csv(df, value_vars)
+
+
+def main():
+    mismatches = list(find_mismatches(sample_frame()))
+    for value_vars, batch_cells, expected, actual in mismatches[:5]:
+        print(f"[FAIL] columns={list(value_vars)} batch_cells={batch_cells}")
+        print("--- melt ---")
+        print(expected)
+        print("--- write_long_csv ---")
+        print(actual)
+    if mismatches:
+        print(f"[FAIL] {len(mismatches)} mismatching combinations")
+        sys.exit(1)
+    test_long_csv_empty_frame()
+    print("[OK] write_long_csv matches melt().dropna().to_csv() for every column mix and batch size")
+
+
+if __name__ == "__main__":
+    main()
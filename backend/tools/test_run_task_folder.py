@@ -14,8 +14,12 @@ from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.core.celery import celery_app
 from app.models import Run, RunStatus, Artifact
+from app.services.run_files import FINISHED_STATUSES, manifest_paths, with_manifest
 from sqlalchemy import select
 
+# Written by the worker's OCR step after JMP finishes; run ZIPs must include them
+OCR_OUTPUTS = ("initial_ocr.txt", "final_ocr.txt", "ocr_summary.json")
+
 
 async def create_run_with_task_folder(task_id: str, task_dir: Path) -> uuid.UUID:
     """Create a Run and input artifacts pointing to files in the provided task folder.
@@ -80,11 +84,37 @@ async def create_run_with_task_folder(task_id: str, task_dir: Path) -> uuid.UUID
         return run.id
 
 
+async def check_run_zip(run_id: uuid.UUID, task_dir: Path, timeout: float) -> bool:
+    """Wait for the run to finish, then check its ZIP (built from the manifest) has the OCR outputs."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        async with AsyncSessionLocal() as db:
+            run = await db.scalar(select(Run).options(with_manifest()).where(Run.id == run_id))
+        if run.status in FINISHED_STATUSES:
+            break
+        if asyncio.get_running_loop().time() > deadline:
+            print(f"[FAIL] Run {run_id} did not finish within {timeout:.0f}s (status {run.status})")
+            return False
+        await asyncio.sleep(2)
+
+    zipped = set(manifest_paths(run.file_manifest))
+    on_disk = [name for name in OCR_OUTPUTS if (task_dir / name).is_file()]
+    missing = [name for name in on_disk if name not in zipped]
+    if missing:
+        print(f"[FAIL] OCR outputs missing from the run ZIP: {', '.join(missing)}")
+        return False
+    print(f"[OK] Run ZIP includes OCR outputs: {', '.join(on_disk) or '(none written)'}")
+    return True
+
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description="Test running an existing task folder with Celery/JMPRunner")
     parser.add_argument("task_id", help="Task ID, e.g. 20251031_060448_64d8abd1")
+    parser.add_argument("--check-zip", action="store_true",
+                        help="Wait for the run and check its ZIP contents include the OCR outputs")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait with --check-zip")
     args = parser.parse_args()
 
     tasks_root = Path(settings.TASKS_DIRECTORY).expanduser().resolve()
@@ -99,6 +129,9 @@ def main():
     celery_app.send_task("run_jmp_boxplot", args=[str(run_id)])
     print(f"[INFO] Queued Celery task 'run_jmp_boxplot' for run {run_id}")
     print("[NOTE] Check worker logs and frontend for progress updates.")
+    
+    if args.check_zip and not asyncio.run(check_run_zip(run_id, task_dir, args.timeout)):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
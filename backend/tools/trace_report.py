@@ -0,0 +1,124 @@
+"""
+Summarize a TRACE_FILE written by app.core.tracing.
+
+Per-stage latency percentiles across all traces, to see which stage a tail
+latency regression comes from:
+
+    python tools/trace_report.py /var/log/auto-jmp/traces.jsonl
+    python tools/trace_report.py traces.jsonl --since 2026-10-01 --name run_jmp_boxplot
+
+One run's trace as a tree, with each span's offset from the start of the trace:
+
+    python tools/trace_report.py traces.jsonl --run 3f1c...   # by run id
+    python tools/trace_report.py traces.jsonl --trace 5b41... # by trace id
+"""
+import argparse
+import json
+import statistics
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+
+def load_spans(path, since=None):
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None and entry["start"] < since:
+                continue
+            spans.append(entry)
+    return spans
+
+
+def percentile(ordered, q):
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def print_summary(spans, name_filter=None):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for entry in spans:
+        if name_filter and name_filter not in entry["name"]:
+            continue
+        durations[entry["name"]].append(entry["duration_ms"])
+        if entry.get("error"):
+            errors[entry["name"]] += 1
+
+    print(f"{'span':<40} {'count':>7} {'errors':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    rows = sorted(durations.items(), key=lambda item: sum(item[1]), reverse=True)
+    for name, values in rows:
+        ordered = sorted(values)
+        print(
+            f"{name[:40]:<40} {len(ordered):>7} {errors[name]:>7} {statistics.mean(ordered):>10.1f} "
+            f"{percentile(ordered, 0.50):>10.1f} {percentile(ordered, 0.95):>10.1f} "
+            f"{percentile(ordered, 0.99):>10.1f} {ordered[-1]:>10.1f}"
+        )
+    print("(milliseconds)")
+
+
+def print_trace(spans, trace_id):
+    trace = [entry for entry in spans if entry["trace_id"] == trace_id]
+    if not trace:
+        print(f"No spans for trace {trace_id}")
+        return
+    children = defaultdict(list)
+    ids = {entry["span_id"] for entry in trace}
+    for entry in trace:
+        parent = entry["parent_id"] if entry["parent_id"] in ids else None
+        children[parent].append(entry)
+    started = min(entry["start"] for entry in trace)
+
+    def walk(parent, depth):
+        for entry in sorted(children[parent], key=lambda e: e["start"]):
+            offset = (entry["start"] - started) * 1000
+            error = f"  ERROR {entry['error']}" if entry.get("error") else ""
+            print(
+                f"{offset:>10.1f} ms  {'  ' * depth}{entry['name']} "
+                f"{entry['duration_ms']:.1f} ms [{entry['service']}]{error}"
+            )
+            walk(entry["span_id"], depth + 1)
+
+    print(f"Trace {trace_id}")
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize run traces")
+    parser.add_argument("file", help="TRACE_FILE (JSON lines)")
+    parser.add_argument("--since", help="only spans started after this ISO date/time")
+    parser.add_argument("--name", help="only spans whose name contains this")
+    parser.add_argument("--trace", help="print one trace as a tree")
+    parser.add_argument("--run", help="print the trace of a run id")
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    spans = load_spans(args.file, since)
+    if not spans:
+        print("No spans found")
+        return 1
+
+    if args.run:
+        matches = [entry for entry in spans if entry["attributes"].get("run.id") == args.run]
+        if not matches:
+            print(f"No spans for run {args.run}")
+            return 1
+        # A run's spans share one trace unless its trace context had expired
+        for trace_id in dict.fromkeys(entry["trace_id"] for entry in matches):
+            print_trace(spans, trace_id)
+    elif args.trace:
+        print_trace(spans, args.trace)
+    else:
+        print_summary(spans, args.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,12 +10,13 @@ export default function AdminDashboard() {
   const [isAuthenticated, setIsAuthenticated] = useState(false)
   const [isLoading, setIsLoading] = useState(true)
   const [user, setUser] = useState<any>(null)
-  const [stats, setStats] = useState({
+  const [stats, setStats] = useState<any>({
     total_users: 0,
     total_projects: 0,
     total_runs: 0,
     active_runs: 0
   })
+  const [throughput, setThroughput] = useState<any>(null)
 
   useEffect(() => {
     const checkAuth = async () => {
@@ -67,11 +68,26 @@ export default function AdminDashboard() {
         const statsData = await response.json()
         setStats(statsData)
       }
+
+      const throughputResponse = await fetch(`${process.env.NEXT_PUBLIC_BACKEND_URL}/api/v1/admin/stats/throughput?hours=24`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      })
+
+      if (throughputResponse.ok) {
+        setThroughput(await throughputResponse.json())
+      }
     } catch (error) {
       console.error('Failed to fetch stats:', error)
     }
   }
 
+  const formatSeconds = (seconds: number | null | undefined) => {
+    if (seconds === null || seconds === undefined) return '-'
+    return seconds >= 60 ? `${(seconds / 60).toFixed(1)} min` : `${seconds.toFixed(1)} s`
+  }
+
   const handleLogout = () => {
     localStorage.removeItem('access_token')
     localStorage.removeItem('user_id')
@@ -178,6 +194,55 @@ export default function AdminDashboard() {
           </div>
         </div>
 
+        {/* Run Throughput (last 24 hours) */}
+        {throughput && (
+          <div className="bg-white p-6 rounded-lg shadow mb-8">
+            <div className="flex justify-between items-center mb-4">
+              <h3 className="text-lg font-medium text-gray-900">Run Throughput (last 24 hours)</h3>
+              {stats.refreshed_at && (
+                <span className="text-xs text-gray-500">Updated {new Date(stats.refreshed_at).toLocaleTimeString()}</span>
+              )}
+            </div>
+            <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6">
+              <div>
+                <p className="text-sm text-gray-600">Runs / hour</p>
+                <p className="text-xl font-semibold text-gray-900">{throughput.summary.runs_per_hour}</p>
+              </div>
+              <div>
+                <p className="text-sm text-gray-600">Failure rate</p>
+                <p className="text-xl font-semibold text-gray-900">
+                  {throughput.summary.failure_rate === null ? '-' : `${(throughput.summary.failure_rate * 100).toFixed(1)}%`}
+                </p>
+              </div>
+              <div>
+                <p className="text-sm text-gray-600">Median queue wait</p>
+                <p className="text-xl font-semibold text-gray-900">{formatSeconds(throughput.summary.median_queue_wait_seconds)}</p>
+              </div>
+              <div>
+                <p className="text-sm text-gray-600">Median JMP time</p>
+                <p className="text-xl font-semibold text-gray-900">{formatSeconds(throughput.summary.median_jmp_seconds)}</p>
+              </div>
+            </div>
+            {throughput.buckets.length === 0 ? (
+              <p className="text-sm text-gray-500">No runs in the last 24 hours</p>
+            ) : (
+              <div className="flex items-end gap-1 h-24">
+                {throughput.buckets.map((bucket: any) => {
+                  const maxRuns = Math.max(...throughput.buckets.map((b: any) => b.runs_created))
+                  return (
+                    <div
+                      key={bucket.bucket}
+                      className={`flex-1 rounded-t ${bucket.failed > 0 ? 'bg-red-400' : 'bg-blue-500'}`}
+                      style={{ height: `${Math.max(4, (bucket.runs_created / maxRuns) * 100)}%` }}
+                      title={`${new Date(bucket.bucket).toLocaleString()}: ${bucket.runs_created} runs, ${bucket.failed} failed`}
+                    />
+                  )
+                })}
+              </div>
+            )}
+          </div>
+        )}
+
         {/* System Status */}
         <div className="bg-white p-6 rounded-lg shadow mb-8">
           <h3 className="text-lg font-medium text-gray-900 mb-4">System Status</h3>
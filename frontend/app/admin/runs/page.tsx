@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useRouter } from 'next/navigation'
 
 interface Run {
@@ -23,6 +23,10 @@ export default function AdminRunsPage() {
   const [runs, setRuns] = useState<Run[]>([])
   const [isLoading, setIsLoading] = useState(true)
   const [isAuthenticated, setIsAuthenticated] = useState(false)
+  // Runs are served newest first in pages; X-Next-Cursor points at the next older page
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
+  const olderPagesLoaded = useRef(false)
 
   useEffect(() => {
     const checkAuth = async () => {
@@ -60,24 +64,63 @@ export default function AdminRunsPage() {
     checkAuth()
   }, [router])
 
+  const fetchRunsPage = async (cursor?: string | null) => {
+    const token = localStorage.getItem('access_token')
+    const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+    const response = await fetch(`${process.env.NEXT_PUBLIC_BACKEND_URL}/api/v1/admin/runs${params}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    })
+    if (!response.ok) {
+      return null
+    }
+    const runsData: Run[] = await response.json()
+    return { runs: runsData, nextCursor: response.headers.get('X-Next-Cursor') }
+  }
+
+  // Refreshes the newest page; older pages loaded with "Load more" are kept
   const fetchRuns = async () => {
     try {
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`${process.env.NEXT_PUBLIC_BACKEND_URL}/api/v1/admin/runs`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      })
+      const page = await fetchRunsPage()
+      if (!page) return
 
-      if (response.ok) {
-        const runsData = await response.json()
-        setRuns(runsData)
+      setRuns(prev => {
+        const oldest = page.runs[page.runs.length - 1]
+        if (!olderPagesLoaded.current || !oldest) return page.runs
+        const ids = new Set(page.runs.map(run => run.id))
+        const oldestTime = new Date(oldest.created_at).getTime()
+        const older = prev.filter(run => !ids.has(run.id) && new Date(run.created_at).getTime() <= oldestTime)
+        return [...page.runs, ...older]
+      })
+      if (!olderPagesLoaded.current) {
+        setNextCursor(page.nextCursor)
       }
     } catch (error) {
       console.error('Failed to fetch runs:', error)
     }
   }
 
+  const loadMoreRuns = async () => {
+    if (!nextCursor) return
+    setIsLoadingMore(true)
+    try {
+      const page = await fetchRunsPage(nextCursor)
+      if (!page) return
+
+      olderPagesLoaded.current = true
+      setRuns(prev => {
+        const ids = new Set(prev.map(run => run.id))
+        return [...prev, ...page.runs.filter(run => !ids.has(run.id))]
+      })
+      setNextCursor(page.nextCursor)
+    } catch (error) {
+      console.error('Failed to load more runs:', error)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
   // Auto-refresh runs every 3 seconds if there are active runs
   useEffect(() => {
     if (!isAuthenticated) return
@@ -192,7 +235,7 @@ export default function AdminRunsPage() {
         {/* Runs Table */}
         <div className="bg-white shadow rounded-lg">
           <div className="px-6 py-4 border-b border-gray-200">
-            <h3 className="text-lg font-medium text-gray-900">All Runs ({runs.length})</h3>
+            <h3 className="text-lg font-medium text-gray-900">All Runs ({runs.length}{nextCursor ? '+' : ''})</h3>
           </div>
           <div className="overflow-x-auto">
             <table className="min-w-full divide-y divide-gray-200">
@@ -278,6 +321,17 @@ export default function AdminRunsPage() {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <div className="px-6 py-4 border-t border-gray-200 text-center">
+              <button
+                onClick={loadMoreRuns}
+                disabled={isLoadingMore}
+                className="text-blue-600 hover:text-blue-800 disabled:text-gray-400"
+              >
+                {isLoadingMore ? 'Loading...' : 'Load more runs'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -45,6 +45,8 @@ function ExcelProcessingWizardContent() {
   
   const [currentStep, setCurrentStep] = useState(0)
   const [excelFile, setExcelFile] = useState<File | null>(null)
+  // Set when load-file keeps the parsed workbook server-side; later steps send it instead of the file
+  const [sessionId, setSessionId] = useState<string | null>(null)
   const [fileAnalysis, setFileAnalysis] = useState<any>(null)
   const [selectedCategoricalVariable, setSelectedCategoricalVariable] = useState<string>('')
   const [selectedCategoricalVariables, setSelectedCategoricalVariables] = useState<string[]>([]) // For generic plugin
@@ -260,13 +262,75 @@ function ExcelProcessingWizardContent() {
     }
   }
 
+  const closeSession = (id: string | null) => {
+    if (!id) return
+    const token = localStorage.getItem('access_token')
+    fetch(`/api/v1/extensions/${pluginName}/session/${id}`, {
+      method: 'DELETE',
+      headers: {
+        'Authorization': `Bearer ${token}`
+      }
+    }).catch(() => {})
+  }
+
   const handleFileUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0]
     if (file) {
+      closeSession(sessionId)
+      setSessionId(null)
       setExcelFile(file)
     }
   }
 
+  // Stamp excel filename with timestamp + uuid
+  const stampExcelFile = (file: File) => {
+    const ts = new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').slice(0, 15)
+    const uid = (globalThis.crypto?.randomUUID?.() || Math.random().toString(36).slice(2, 10))
+    const dot = file.name.lastIndexOf('.')
+    const base = dot > -1 ? file.name.slice(0, dot) : file.name
+    const ext = dot > -1 ? file.name.slice(dot) : ''
+    return new File([file], `${base}_${ts}_${uid}${ext}`, { type: file.type })
+  }
+
+  // POST a wizard step with the session id, or the file when there is no session.
+  // An expired session (410) is retried once with the file.
+  const postWizardStep = async (endpoint: string, appendFields: (formData: FormData) => void) => {
+    const token = localStorage.getItem('access_token')
+    const send = (id: string | null) => {
+      const formData = new FormData()
+      if (id) {
+        formData.append('session_id', id)
+      } else if (excelFile) {
+        formData.append('file', stampExcelFile(excelFile))
+      }
+      appendFields(formData)
+      return fetch(`/api/v1/extensions/${pluginName}/${endpoint}`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`
+        },
+        body: formData
+      })
+    }
+
+    const response = await send(sessionId)
+    if (response.status === 410 && sessionId) {
+      setSessionId(null)
+      const retried = await send(null)
+      if (retried.ok) {
+        // The upload opened a new session; later steps send its id instead of the file
+        try {
+          const result = await retried.clone().json()
+          setSessionId(result?.session_id || null)
+        } catch {
+          // Not JSON (e.g. a file download); the next step uploads again
+        }
+      }
+      return retried
+    }
+    return response
+  }
+
   const handleAnalyzeFile = async () => {
     if (!excelFile) return
 
@@ -298,6 +362,8 @@ function ExcelProcessingWizardContent() {
       if (response.ok) {
         const result = await response.json()
         setFileAnalysis(result)
+        closeSession(sessionId)
+        setSessionId(result.session_id || null)
         
         // For generic plugin, call process-data to get non-FAI columns
         if (isGenericPlugin) {
@@ -378,29 +444,12 @@ function ExcelProcessingWizardContent() {
     if (!excelFile || !selectedCategoricalVariable) return
 
     try {
-      const formData = new FormData()
-      {
-        const ts = new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').slice(0, 15)
-        const uid = (globalThis.crypto?.randomUUID?.() || Math.random().toString(36).slice(2, 10))
-        const dot = excelFile.name.lastIndexOf('.')
-        const base = dot > -1 ? excelFile.name.slice(0, dot) : excelFile.name
-        const ext = dot > -1 ? excelFile.name.slice(dot) : ''
-        const stamped = new File([excelFile], `${base}_${ts}_${uid}${ext}`, { type: excelFile.type })
-        formData.append('file', stamped)
-      }
-      formData.append('cat_var', selectedCategoricalVariable)
-      // Add data type/modeling type for excel2commonality plugin
-      if (isCommonalityPlugin && variableDataType !== 'none') {
-        formData.append('variable_data_type', variableDataType)
-      }
-
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`/api/v1/extensions/${pluginName}/validate-data`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        },
-        body: formData
+      const response = await postWizardStep('validate-data', (formData) => {
+        formData.append('cat_var', selectedCategoricalVariable)
+        // Add data type/modeling type for excel2commonality plugin
+        if (isCommonalityPlugin && variableDataType !== 'none') {
+          formData.append('variable_data_type', variableDataType)
+        }
       })
 
       if (response.ok) {
@@ -428,25 +477,8 @@ function ExcelProcessingWizardContent() {
     if (!excelFile || !selectedCategoricalVariable) return
 
     try {
-      const formData = new FormData()
-      {
-        const ts = new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').slice(0, 15)
-        const uid = (globalThis.crypto?.randomUUID?.() || Math.random().toString(36).slice(2, 10))
-        const dot = excelFile.name.lastIndexOf('.')
-        const base = dot > -1 ? excelFile.name.slice(0, dot) : excelFile.name
-        const ext = dot > -1 ? excelFile.name.slice(dot) : ''
-        const stamped = new File([excelFile], `${base}_${ts}_${uid}${ext}`, { type: excelFile.type })
-        formData.append('file', stamped)
-      }
-      formData.append('cat_var', selectedCategoricalVariable)
-
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`/api/v1/extensions/${pluginName}/process-data`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        },
-        body: formData
+      const response = await postWizardStep('process-data', (formData) => {
+        formData.append('cat_var', selectedCategoricalVariable)
       })
 
       if (response.ok) {
@@ -472,30 +504,12 @@ function ExcelProcessingWizardContent() {
 
     setIsProcessing(true)
     try {
-      const formData = new FormData()
-      {
-        const ts = new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').slice(0, 15)
-        const uid = (globalThis.crypto?.randomUUID?.() || Math.random().toString(36).slice(2, 10))
-        const dot = excelFile.name.lastIndexOf('.')
-        const base = dot > -1 ? excelFile.name.slice(0, dot) : excelFile.name
-        const ext = dot > -1 ? excelFile.name.slice(dot) : ''
-        const stamped = new File([excelFile], `${base}_${ts}_${uid}${ext}`, { type: excelFile.type })
-        formData.append('file', stamped)
-      }
-      
-      if (isGenericPlugin) {
-        formData.append('categorical_columns', JSON.stringify(selectedCategoricalVariables))
-      } else {
-      formData.append('cat_var', selectedCategoricalVariable)
-      }
-
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`/api/v1/extensions/${pluginName}/generate-files`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        },
-        body: formData
+      const response = await postWizardStep('generate-files', (formData) => {
+        if (isGenericPlugin) {
+          formData.append('categorical_columns', JSON.stringify(selectedCategoricalVariables))
+        } else {
+          formData.append('cat_var', selectedCategoricalVariable)
+        }
       })
 
       if (response.ok) {
@@ -539,73 +553,57 @@ function ExcelProcessingWizardContent() {
     ])
 
     try {
-      const formData = new FormData()
-      {
-        const ts = new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').slice(0, 15)
-        const uid = (globalThis.crypto?.randomUUID?.() || Math.random().toString(36).slice(2, 10))
-        const dot = excelFile.name.lastIndexOf('.')
-        const base = dot > -1 ? excelFile.name.slice(0, dot) : excelFile.name
-        const ext = dot > -1 ? excelFile.name.slice(dot) : ''
-        const stamped = new File([excelFile], `${base}_${ts}_${uid}${ext}`, { type: excelFile.type })
-        formData.append('file', stamped)
-      }
-      
-      if (isGenericPlugin) {
-        formData.append('categorical_columns', JSON.stringify(selectedCategoricalVariables))
-        // Add data type/modeling type for each variable if any are set
-        const dataTypeConfig: Record<string, string> = {}
-        selectedCategoricalVariables.forEach((col: string) => {
-          const dataType = variableDataTypes[col] || 'none'
-          if (dataType !== 'none') {
-            dataTypeConfig[col] = dataType
+      const appendRunFields = (formData: FormData) => {
+        if (isGenericPlugin) {
+          formData.append('categorical_columns', JSON.stringify(selectedCategoricalVariables))
+          // Add data type/modeling type for each variable if any are set
+          const dataTypeConfig: Record<string, string> = {}
+          selectedCategoricalVariables.forEach((col: string) => {
+            const dataType = variableDataTypes[col] || 'none'
+            if (dataType !== 'none') {
+              dataTypeConfig[col] = dataType
+            }
+          })
+          if (Object.keys(dataTypeConfig).length > 0) {
+            formData.append('variable_data_types', JSON.stringify(dataTypeConfig))
           }
-        })
-        if (Object.keys(dataTypeConfig).length > 0) {
-          formData.append('variable_data_types', JSON.stringify(dataTypeConfig))
-        }
-        // Add caption boxes configuration
-        const captionBoxesConfig: Record<string, boolean> = {}
-        selectedCategoricalVariables.forEach((col: string) => {
-          if (captionBoxesEnabled[col]) {
-            captionBoxesConfig[col] = true
+          // Add caption boxes configuration
+          const captionBoxesConfig: Record<string, boolean> = {}
+          selectedCategoricalVariables.forEach((col: string) => {
+            if (captionBoxesEnabled[col]) {
+              captionBoxesConfig[col] = true
+            }
+          })
+          if (Object.keys(captionBoxesConfig).length > 0) {
+            formData.append('caption_boxes_enabled', JSON.stringify(captionBoxesConfig))
+          }
+          // Add color by variable if selected
+          if (colorByVariable) {
+            formData.append('color_by_variable', colorByVariable)
+          }
+          // Add reference line configuration if meta sheet is detected
+          if (fileAnalysis?.has_meta_sheet) {
+            formData.append('ref_line_config', JSON.stringify(refLineConfig))
+          }
+          // Add graph size configuration
+          formData.append('graph_width', graphWidth.toString())
+          formData.append('graph_height', graphHeight.toString())
+        } else {
+          formData.append('cat_var', selectedCategoricalVariable)
+          // Add data type/modeling type for excel2commonality plugin
+          if (isCommonalityPlugin && variableDataType !== 'none') {
+            formData.append('variable_data_type', variableDataType)
           }
-        })
-        if (Object.keys(captionBoxesConfig).length > 0) {
-          formData.append('caption_boxes_enabled', JSON.stringify(captionBoxesConfig))
-        }
-        // Add color by variable if selected
-        if (colorByVariable) {
-          formData.append('color_by_variable', colorByVariable)
-        }
-        // Add reference line configuration if meta sheet is detected
-        if (fileAnalysis?.has_meta_sheet) {
-          formData.append('ref_line_config', JSON.stringify(refLineConfig))
-        }
-        // Add graph size configuration
-        formData.append('graph_width', graphWidth.toString())
-        formData.append('graph_height', graphHeight.toString())
-      } else {
-      formData.append('cat_var', selectedCategoricalVariable)
-        // Add data type/modeling type for excel2commonality plugin
-        if (isCommonalityPlugin && variableDataType !== 'none') {
-          formData.append('variable_data_type', variableDataType)
         }
+        formData.append('project_id', String(projectId))
+        formData.append('project_name', projectInfo?.name || 'Analysis')
+        formData.append('project_description', projectInfo?.description || '')
       }
-      formData.append('project_id', String(projectId))
-      formData.append('project_name', projectInfo?.name || 'Analysis')
-      formData.append('project_description', projectInfo?.description || '')
 
-      const token = localStorage.getItem('access_token')
       let result: any = null
       let lastError: string | null = null
       for (let attempt = 1; attempt <= 3; attempt++) {
-        const response = await fetch(`/api/v1/extensions/${pluginName}/run-analysis`, {
-          method: 'POST',
-          headers: {
-            'Authorization': `Bearer ${token}`
-          },
-          body: formData
-        })
+        const response = await postWizardStep('run-analysis', appendRunFields)
 
         if (response.ok) {
           result = await response.json()
@@ -624,6 +622,8 @@ function ExcelProcessingWizardContent() {
       if (!result?.run?.id) {
         throw new Error(lastError || 'Failed to start analysis')
       }
+      // The run keeps its own copy of the workbook; the backend has closed the session
+      setSessionId(null)
 
       // Mark generation and save steps as done (backend does both before run creation)
       setAnalysisSteps(prev => prev.map((s, i) => ({ ...s, done: i <= 1 ? true : s.done })))
@@ -19,6 +19,22 @@ interface Artifact {
   mime_type?: string
   created_at: string
   download_url?: string
+  width?: number | null
+  height?: number | null
+  comment_count?: number
+  latest_comment?: {
+    id: string
+    content: string
+    created_at: string
+    user_email?: string | null
+  } | null
+  ocr?: {
+    artifact_id: string
+    filename: string
+    success?: boolean | null
+    confidence?: number | null
+    text_length?: number | null
+  } | null
 }
 
 interface Run {
@@ -33,11 +49,6 @@ interface Run {
   finished_at?: string
 }
 
-interface ArtifactCommentCount {
-  artifact_id: string
-  comment_count: number
-}
-
 interface ImageGalleryProps {
   runId: string
   projectId: string
@@ -64,11 +75,11 @@ export function ImageGallery({ runId, projectId, run, onClose }: ImageGalleryPro
   const [rotation, setRotation] = useState(0)
   const [searchQuery, setSearchQuery] = useState('')
 
-  // Fetch artifacts with auto-refresh
+  // Fetch artifacts with comment counts, OCR and image sizes in one request (auto-refresh while running)
   const { data: artifacts, isLoading, error, refetch } = useQuery({
-    queryKey: ['run-artifacts', runId],
+    queryKey: ['run-gallery', runId],
     queryFn: async () => {
-      const response = await fetch(`/api/v1/runs/${runId}/artifacts`, {
+      const response = await fetch(`/api/v1/runs/${runId}/gallery`, {
         headers: {
           'Authorization': `Bearer ${getAuthToken()}`,
           'Content-Type': 'application/json',
@@ -118,32 +129,10 @@ export function ImageGallery({ runId, projectId, run, onClose }: ImageGalleryPro
     enabled: run.status === 'succeeded',
   })
 
-  // Fetch comment counts for all image artifacts
-  const { data: commentCounts } = useQuery({
-    queryKey: ['artifact-comment-counts', imageArtifacts.map(a => a.id)],
-    queryFn: async () => {
-      if (imageArtifacts.length === 0) return []
-      
-      const response = await fetch('/api/v1/artifacts/comment-counts', {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${getAuthToken()}`,
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(imageArtifacts.map(a => a.id)),
-      })
-      if (!response.ok) {
-        throw new Error('Failed to fetch comment counts')
-      }
-      return response.json() as Promise<ArtifactCommentCount[]>
-    },
-    enabled: imageArtifacts.length > 0,
-  })
-
   // Helper function to get comment count for an artifact
   const getCommentCount = (artifactId: string): number => {
-    const count = commentCounts?.find(cc => cc.artifact_id === artifactId)
-    return count?.comment_count || 0
+    const artifact = allImageArtifacts.find(a => a.id === artifactId)
+    return artifact?.comment_count || 0
   }
 
   // Handle image download